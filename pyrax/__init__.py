@@ -35,7 +35,9 @@ import inspect
 import logging
 import os
 import re
+import requests
 import six.moves.configparser as ConfigParser
+import threading
 import warnings
 
 # keyring is an optional import
@@ -56,10 +58,10 @@ try:
 
     from novaclient import exceptions as _cs_exceptions
     from novaclient import auth_plugin as _cs_auth_plugin
-    from novaclient.shell import OpenStackComputeShell as _cs_shell
     from novaclient.v1_1 import client as _cs_client
     from novaclient.v1_1.servers import Server as CloudServer
 
+    from . import cs_extensions as _cs_extensions
     from .autoscale import AutoScaleClient
     from .clouddatabases import CloudDatabaseClient
     from .cloudloadbalancers import CloudLoadBalancerClient
@@ -70,6 +72,8 @@ try:
     from .image import ImageClient
     from .object_storage import StorageClient
     from .queueing import QueueClient
+    from .context_pool import ContextPool
+    from .region_pool import RegionPool
 except ImportError:
     # See if this is the result of the importing of version.py in setup.py
     callstack = inspect.stack()
@@ -165,6 +169,10 @@ class Settings(object):
             "debug": "CLOUD_DEBUG",
             "verify_ssl": "CLOUD_VERIFY_SSL",
             "use_servicenet": "USE_SERVICENET",
+            "transfer_bandwidth": "CLOUD_TRANSFER_BANDWIDTH",
+            "token_cache": "CLOUD_TOKEN_CACHE",
+            "token_refresh_margin": "CLOUD_TOKEN_REFRESH_MARGIN",
+            "novaclient_extension_cache": "CLOUD_NOVACLIENT_EXTENSION_CACHE",
             }
     _settings = {"default": dict.fromkeys(list(env_dct.keys()))}
     _default_set = False
@@ -315,6 +323,12 @@ class Settings(object):
             dct["tenant_id"] = safe_get(section, "tenant_id")
             use_servicenet = safe_get(section, "use_servicenet", "False")
             dct["use_servicenet"] = use_servicenet == "True"
+            dct["transfer_bandwidth"] = safe_get(section, "transfer_bandwidth")
+            dct["token_cache"] = safe_get(section, "token_cache")
+            dct["token_refresh_margin"] = safe_get(section,
+                    "token_refresh_margin")
+            dct["novaclient_extension_cache"] = safe_get(section,
+                    "novaclient_extension_cache")
             app_agent = safe_get(section, "custom_user_agent")
             if app_agent:
                 # Customize the user-agent string with the app name.
@@ -380,23 +394,32 @@ def set_default_region(region):
 
 
 def create_context(id_type=None, env=None, username=None, password=None,
-        tenant_id=None, tenant_name=None, api_key=None, verify_ssl=None):
+        tenant_id=None, tenant_name=None, api_key=None, verify_ssl=None,
+        settings=None):
     """
     Returns an instance of the specified identity class, or if none is
     specified, an instance of the current setting for 'identity_class'.
 
-    You may optionally set the environment by passing the name of that
-    environment in the 'env' parameter.
+    A context is independent of the module-level identity and clients, and of
+    other contexts, so several can be used at once, from different threads.
+    It reads its settings from the environment named in 'env', or from the
+    current environment, without changing the current environment. Values in
+    the 'settings' dict override those for the context alone. Each context
+    makes its requests with its own requests Session, which is closed by the
+    context's close() method.
     """
-    if env:
-        set_environment(env)
-    return _create_identity(id_type=id_type, username=username,
+    context = _create_identity(id_type=id_type, username=username,
             password=password, tenant_id=tenant_id, tenant_name=tenant_name,
-            api_key=api_key, verify_ssl=verify_ssl, return_context=True)
+            api_key=api_key, verify_ssl=verify_ssl, env=env,
+            return_context=True)
+    context.env = env
+    context.settings = dict(settings or {})
+    context.session = requests.Session()
+    return context
 
 
 def _create_identity(id_type=None, username=None, password=None, tenant_id=None,
-            tenant_name=None, api_key=None, verify_ssl=None,
+            tenant_name=None, api_key=None, verify_ssl=None, env=None,
             return_context=False):
     """
     Creates an instance of the current identity_class and assigns it to the
@@ -406,12 +429,12 @@ def _create_identity(id_type=None, username=None, password=None, tenant_id=None,
     if id_type:
         cls = _import_identity(id_type)
     else:
-        cls = settings.get("identity_class")
+        cls = settings.get("identity_class", env=env)
     if not cls:
         raise exc.IdentityClassNotDefined("No identity class has "
                 "been defined for the current environment.")
     if verify_ssl is None:
-        verify_ssl = get_setting("verify_ssl")
+        verify_ssl = get_setting("verify_ssl", env=env)
     context = cls(username=username, password=password, tenant_id=tenant_id,
             tenant_name=tenant_name, api_key=api_key, verify_ssl=verify_ssl)
     if return_context:
@@ -444,8 +467,11 @@ def _require_auth(fnc):
 
 def _safe_region(region=None, context=None):
     """Value to use when no region is specified."""
-    ret = region or settings.get("region")
-    context = context or identity
+    if context is not None:
+        ret = region or context.get_setting("region")
+    else:
+        ret = region or settings.get("region")
+        context = identity
     if not ret:
         # Nothing specified; get the default from the identity object.
         if not context:
@@ -608,22 +634,86 @@ def _make_agent_name(base):
         return USER_AGENT
 
 
+class _LazyClient(object):
+    """
+    Stands in for one of the module-level clients, such as 'cloudfiles',
+    until it is first used. The client is then created by calling its
+    connect_to_* function, and replaces this object as the module attribute,
+    so that only the first use goes through the proxy. References to the
+    proxy that were taken earlier continue to work by passing everything on
+    to the client.
+
+    The client is created with the identity that was current when the proxy
+    was, so later calls to set_credentials() or clear_credentials() don't
+    change the account it works with.
+    """
+    def __init__(self, name, connect_name, region=None, identity=None):
+        self.__dict__.update({"_name": name, "_connect_name": connect_name,
+                "_region": region, "_identity": identity, "_client": None,
+                "_loaded": False, "_lock": threading.Lock()})
+
+
+    def _load(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    connect = globals()[self._connect_name]
+                    self.__dict__["_client"] = connect(region=self._region,
+                            context=self._identity)
+                    self.__dict__["_loaded"] = True
+                    if globals().get(self._name) is self:
+                        globals()[self._name] = self._client
+        return self._client
+
+
+    def __getattr__(self, att):
+        client = self._load()
+        if client is None:
+            raise AttributeError("The '%s' service is not available, so it "
+                    "has no attribute '%s'." % (self._name, att))
+        return getattr(client, att)
+
+
+    def __setattr__(self, att, val):
+        setattr(self._load(), att, val)
+
+
+    def __nonzero__(self):
+        return self._load() is not None
+
+    __bool__ = __nonzero__
+
+
+    def __repr__(self):
+        if self._loaded:
+            return repr(self._client)
+        return "<Lazy '%s' client>" % self._name
+
+
+# The module-level clients, and the functions that create them.
+_lazy_clients = (("cloudservers", "connect_to_cloudservers"),
+        ("cloudfiles", "connect_to_cloudfiles"),
+        ("cloud_loadbalancers", "connect_to_cloud_loadbalancers"),
+        ("cloud_databases", "connect_to_cloud_databases"),
+        ("cloud_blockstorage", "connect_to_cloud_blockstorage"),
+        ("cloud_dns", "connect_to_cloud_dns"),
+        ("cloud_networks", "connect_to_cloud_networks"),
+        ("cloud_monitoring", "connect_to_cloud_monitoring"),
+        ("autoscale", "connect_to_autoscale"),
+        ("images", "connect_to_images"),
+        ("queues", "connect_to_queues"),
+        )
+
+
 def connect_to_services(region=None):
-    """Establishes authenticated connections to the various cloud APIs."""
-    global cloudservers, cloudfiles, cloud_loadbalancers, cloud_databases
-    global cloud_blockstorage, cloud_dns, cloud_networks, cloud_monitoring
-    global autoscale, images, queues
-    cloudservers = connect_to_cloudservers(region=region)
-    cloudfiles = connect_to_cloudfiles(region=region)
-    cloud_loadbalancers = connect_to_cloud_loadbalancers(region=region)
-    cloud_databases = connect_to_cloud_databases(region=region)
-    cloud_blockstorage = connect_to_cloud_blockstorage(region=region)
-    cloud_dns = connect_to_cloud_dns(region=region)
-    cloud_networks = connect_to_cloud_networks(region=region)
-    cloud_monitoring = connect_to_cloud_monitoring(region=region)
-    autoscale = connect_to_autoscale(region=region)
-    images = connect_to_images(region=region)
-    queues = connect_to_queues(region=region)
+    """
+    Sets up the connections to the various cloud APIs. Each client, such as
+    'pyrax.cloudfiles', is created when it is first used, so that programs
+    don't pay for creating clients for services that they don't use.
+    """
+    for name, connect_name in _lazy_clients:
+        globals()[name] = _LazyClient(name, connect_name, region=region,
+                identity=identity)
 
 
 def _get_service_endpoint(context, svc, region=None, public=True):
@@ -635,6 +725,9 @@ def _get_service_endpoint(context, svc, region=None, public=True):
     # identity reference.
     context = context or identity
     url_type = {True: "public", False: "private"}[public]
+    index = getattr(context, "catalog_index", None)
+    if index:
+        return index.url_for(svc, region, url_type)
     svc_obj = context.services.get(svc)
     if not svc_obj:
         return None
@@ -646,10 +739,23 @@ def _get_service_endpoint(context, svc, region=None, public=True):
 
 
 def connect_to_cloudservers(region=None, context=None, **kwargs):
-    """Creates a client for working with cloud servers."""
-    context = context or identity
-    _cs_auth_plugin.discover_auth_systems()
-    id_type = get_setting("identity_type")
+    """
+    Creates a client for working with cloud servers. If a context is given,
+    the client uses its settings and makes its requests with its session.
+    """
+    if context is None:
+        context = identity
+        get = get_setting
+    else:
+        get = context.get_setting
+    if context is identity:
+        http_debug = _http_debug
+    else:
+        http_debug = bool(get("http_debug"))
+    # Also discovers the auth plugins, the first time it is called.
+    extensions = _cs_extensions.get_extensions(
+            get("novaclient_extension_cache"))
+    id_type = get("identity_type")
     if id_type != "keystone":
         auth_plugin = _cs_auth_plugin.load_plugin(id_type)
     else:
@@ -660,14 +766,15 @@ def connect_to_cloudservers(region=None, context=None, **kwargs):
     if not mgt_url:
         # Service is not available
         return
-    insecure = not get_setting("verify_ssl")
-    cs_shell = _cs_shell()
-    extensions = cs_shell._discover_extensions("1.1")
+    insecure = not get("verify_ssl")
     cloudservers = _cs_client.Client(context.username, context.password,
             project_id=context.tenant_id, auth_url=context.auth_endpoint,
             auth_system=id_type, region_name=region, service_type="compute",
             auth_plugin=auth_plugin, insecure=insecure, extensions=extensions,
-            http_log_debug=_http_debug, **kwargs)
+            http_log_debug=http_debug, **kwargs)
+    if context.session is not None:
+        # novaclient makes its requests with this session when it has one.
+        cloudservers.client._session = context.session
     agt = cloudservers.client.USER_AGENT
     cloudservers.client.USER_AGENT = _make_agent_name(agt)
     cloudservers.client.management_url = mgt_url
@@ -707,84 +814,106 @@ def connect_to_cloudservers(region=None, context=None, **kwargs):
     cloudservers.list_base_images = list_base_images
     cloudservers.list_snapshots = list_snapshots
     cloudservers.find_images_by_name = find_images_by_name
-    cloudservers.identity = identity
+    cloudservers.identity = context
     return cloudservers
 
 
-def connect_to_cloudfiles(region=None, public=None):
+def connect_to_cloudfiles(region=None, public=None, context=None):
     """Creates a client for working with CloudFiles/Swift."""
     if public is None:
-        is_public = not bool(get_setting("use_servicenet"))
+        get = context.get_setting if context is not None else get_setting
+        is_public = not bool(get("use_servicenet"))
     else:
         is_public = public
     ret = _create_client(ep_name="object_store", region=region,
-            public=is_public)
+            public=is_public, context=context)
     if ret:
         # Add CDN endpoints, if available
-        region = _safe_region(region)
-        ret.cdn_management_url = _get_service_endpoint(None, "object_cdn",
+        region = _safe_region(region, context=context)
+        ret.cdn_management_url = _get_service_endpoint(context, "object_cdn",
                 region, public=is_public)
     return ret
 
 
-@_require_auth
-def _create_client(ep_name, region, public=True):
-    region = _safe_region(region)
-    ep = _get_service_endpoint(None, ep_name.split(":")[0], region,
+def _create_client(ep_name, region, public=True, context=None):
+    """
+    Creates a client for the service that works with the given identity, or
+    with the module-level identity if 'context' is None.
+    """
+    if context is None:
+        return _create_module_client(ep_name, region, public=public)
+    if not context.authenticated:
+        raise exc.NotAuthenticated("Authentication required before creating "
+                "a client.")
+    region = _safe_region(region, context=context)
+    ep = _get_service_endpoint(context, ep_name.split(":")[0], region,
             public=public)
     if not ep:
         return
-    verify_ssl = get_setting("verify_ssl")
+    verify_ssl = context.get_setting("verify_ssl")
+    if context is identity:
+        http_debug = _http_debug
+    else:
+        http_debug = bool(context.get_setting("http_debug"))
     cls = _client_classes[ep_name]
-    client = cls(identity, region_name=region, management_url=ep,
-            verify_ssl=verify_ssl, http_log_debug=_http_debug)
+    client = cls(context, region_name=region, management_url=ep,
+            verify_ssl=verify_ssl, http_log_debug=http_debug)
     client.user_agent = _make_agent_name(client.user_agent)
     return client
 
 
-def connect_to_cloud_databases(region=None):
+@_require_auth
+def _create_module_client(ep_name, region, public=True):
+    return _create_client(ep_name, region, public=public, context=identity)
+
+
+def connect_to_cloud_databases(region=None, context=None):
     """Creates a client for working with cloud databases."""
-    return _create_client(ep_name="database", region=region)
+    return _create_client(ep_name="database", region=region, context=context)
 
 
-def connect_to_cloud_loadbalancers(region=None):
+def connect_to_cloud_loadbalancers(region=None, context=None):
     """Creates a client for working with cloud loadbalancers."""
-    return _create_client(ep_name="load_balancer", region=region)
+    return _create_client(ep_name="load_balancer", region=region,
+            context=context)
 
 
-def connect_to_cloud_blockstorage(region=None):
+def connect_to_cloud_blockstorage(region=None, context=None):
     """Creates a client for working with cloud blockstorage."""
-    return _create_client(ep_name="volume", region=region)
+    return _create_client(ep_name="volume", region=region, context=context)
 
 
-def connect_to_cloud_dns(region=None):
+def connect_to_cloud_dns(region=None, context=None):
     """Creates a client for working with cloud dns."""
-    return _create_client(ep_name="dns", region=region)
+    return _create_client(ep_name="dns", region=region, context=context)
 
 
-def connect_to_cloud_networks(region=None):
+def connect_to_cloud_networks(region=None, context=None):
     """Creates a client for working with cloud networks."""
-    return _create_client(ep_name="compute:network", region=region)
+    return _create_client(ep_name="compute:network", region=region,
+            context=context)
 
 
-def connect_to_cloud_monitoring(region=None):
+def connect_to_cloud_monitoring(region=None, context=None):
     """Creates a client for working with cloud monitoring."""
-    return _create_client(ep_name="monitor", region=region)
+    return _create_client(ep_name="monitor", region=region, context=context)
 
 
-def connect_to_autoscale(region=None):
+def connect_to_autoscale(region=None, context=None):
     """Creates a client for working with AutoScale."""
-    return _create_client(ep_name="autoscale", region=region)
+    return _create_client(ep_name="autoscale", region=region, context=context)
 
 
-def connect_to_images(region=None, public=True):
+def connect_to_images(region=None, public=True, context=None):
     """Creates a client for working with Images."""
-    return _create_client(ep_name="image", region=region, public=public)
+    return _create_client(ep_name="image", region=region, public=public,
+            context=context)
 
 
-def connect_to_queues(region=None, public=True):
+def connect_to_queues(region=None, public=True, context=None):
     """Creates a client for working with Queues."""
-    return _create_client(ep_name="queues", region=region, public=public)
+    return _create_client(ep_name="queues", region=region, public=public,
+            context=context)
 
 
 def client_class_for_service(service):
@@ -808,6 +937,10 @@ def set_http_debug(val):
     for svc in (cloudservers, cloudfiles, cloud_loadbalancers,
             cloud_blockstorage, cloud_databases, cloud_dns, cloud_networks,
             autoscale, images, queues):
+        if isinstance(svc, _LazyClient):
+            # Clients that haven't been created yet will pick up the new
+            # value when they are.
+            svc = svc._client
         if svc is not None:
             svc.http_log_debug = val
 
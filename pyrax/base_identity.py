@@ -5,10 +5,13 @@
 from __future__ import absolute_import
 
 import six.moves.configparser as ConfigParser
+import calendar
 import datetime
 import json
+import logging
 import re
 import requests
+import threading
 import warnings
 
 try:
@@ -19,6 +22,8 @@ except ImportError:
 import pyrax
 from pyrax import exceptions as exc
 from .resource import BaseResource
+from .token_cache import cache_key
+from .token_cache import TokenCache
 from . import utils as utils
 
 
@@ -42,6 +47,17 @@ DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 # Default region for all services. Can be individually overridden if needed
 default_region = None
+# Tokens are renewed this many seconds before they expire, unless the
+# 'token_refresh_margin' setting says otherwise.
+DEFAULT_REFRESH_MARGIN = 300
+# Seconds the background refresher waits before trying again after it fails.
+REFRESH_RETRY_INTERVAL = 30
+# Maps the URL keys of catalog endpoints to the URL types used by the
+# ServiceCatalogIndex.
+_URL_TYPES = (("publicURL", "public"),
+        ("internalURL", "private"),
+        ("privateURL", "private"),
+        )
 
 
 class Tenant(BaseResource):
@@ -56,6 +72,131 @@ class Role(BaseResource):
     pass
 
 
+def _service_type(catalog):
+    """
+    Returns the prefix and service type for a service catalog entry. Dashes
+    in the type are replaced with underscores, and provider-specific
+    services have their prefix split off.
+    """
+    fulltype = catalog["type"].replace("-", "_")
+    try:
+        prefix, service_type = fulltype.split(":")
+    except ValueError:
+        prefix = ""
+        service_type = fulltype
+    return prefix, service_type
+
+
+def _is_first_gen_servers(service_type, name):
+    return service_type == "compute" and (name or "").lower() == "cloudservers"
+
+
+
+class ServiceCatalogIndex(object):
+    """
+    An immutable index of the URLs in a service catalog, keyed by service
+    type, region and URL type ('public' or 'private'), so that finding an
+    endpoint's URL takes a single dict lookup. Regions are case-insensitive.
+    As with the identity's services, endpoints that are not specific to a
+    region are listed under every region in the catalog.
+
+    The index can be converted to a JSON-compatible dict with to_dict(), and
+    back with from_dict(), so that it can be stored with a cached token.
+    """
+    __slots__ = ("_urls", "_regions")
+
+    def __init__(self, urls=None):
+        """
+        'urls' maps (service_type, region, url_type) tuples to URLs; regions
+        are normalized to upper case.
+        """
+        urls = dict(((svc, rgn.upper(), url_type), url)
+                for (svc, rgn, url_type), url in (urls or {}).items())
+        object.__setattr__(self, "_urls", urls)
+        object.__setattr__(self, "_regions",
+                frozenset(rgn for svc, rgn, url_type in urls))
+
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        """Compiles an index from a service catalog as returned by the API."""
+        urls = {}
+        regional = {}
+        unregioned = []
+        for svc in catalog or []:
+            prefix, service_type = _service_type(svc)
+            if _is_first_gen_servers(service_type, svc.get("name")):
+                continue
+            for ep in svc.get("endpoints", []):
+                region = ep.get("region")
+                for key, url_type in _URL_TYPES:
+                    url = ep.get(key)
+                    if not url:
+                        continue
+                    if region:
+                        regional[(service_type, region.upper(), url_type)] = url
+                    else:
+                        unregioned.append((service_type, url_type, url))
+        regions = set(rgn for svc, rgn, url_type in regional)
+        for service_type, url_type, url in unregioned:
+            for rgn in regions:
+                urls[(service_type, rgn, url_type)] = url
+        urls.update(regional)
+        return cls(urls)
+
+
+    @classmethod
+    def from_dict(cls, dct):
+        """Creates an index from the output of to_dict()."""
+        return cls(dict(((svc, rgn, url_type), url)
+                for svc, rgn, url_type, url in dct.get("urls", [])))
+
+
+    def to_dict(self):
+        """Returns the index as a dict that can be serialized as JSON."""
+        return {"urls": sorted([svc, rgn, url_type, url]
+                for (svc, rgn, url_type), url in self._urls.items())}
+
+
+    def url_for(self, service_type, region, url_type="public"):
+        """
+        Returns the URL of the given type for the service in the region, or
+        None if the catalog has no such URL.
+        """
+        if not region:
+            return None
+        return self._urls.get((service_type, region.upper(), url_type))
+
+
+    @property
+    def regions(self):
+        """The upper-cased names of the regions in the catalog."""
+        return self._regions
+
+
+    def __setattr__(self, att, val):
+        raise AttributeError("ServiceCatalogIndex objects are immutable.")
+
+
+    def __eq__(self, other):
+        return (isinstance(other, ServiceCatalogIndex) and
+                self._urls == other._urls)
+
+
+    def __ne__(self, other):
+        return not self == other
+
+
+    def __len__(self):
+        return len(self._urls)
+
+
+    def __repr__(self):
+        return "<ServiceCatalogIndex: %s URLs in %s regions>" % (
+                len(self._urls), len(self._regions))
+
+
+
 class Service(object):
     """
     Represents an available service from the service catalog.
@@ -66,18 +207,10 @@ class Service(object):
         """
         self.identity = identity
         self.name = catalog.get("name")
-        # Replace any dashes with underscores.
-        fulltype = catalog["type"].replace("-", "_")
-        # Some provider-specific services are prefixed with that info.
-        try:
-            self.prefix, self.service_type = fulltype.split(":")
-        except ValueError:
-            self.prefix = ""
-            self.service_type = fulltype
-        if self.service_type == "compute":
-            if self.name.lower() == "cloudservers":
-                # First-generation Rackspace cloud servers
-                return
+        self.prefix, self.service_type = _service_type(catalog)
+        if _is_first_gen_servers(self.service_type, self.name):
+            # First-generation Rackspace cloud servers
+            return
         self.clients = {}
         self.endpoints = utils.DotDict()
         eps = catalog.get("endpoints", [])
@@ -92,6 +225,18 @@ class Service(object):
         return "<'%s' Service object at %s>" % (self.service_type, memloc)
 
 
+    @property
+    def endpoints(self):
+        """A dict of this service's Endpoints, keyed by region."""
+        return self._endpoints
+
+
+    @endpoints.setter
+    def endpoints(self, val):
+        self._endpoints = val
+        self._region_map = None
+
+
     def _ep_for_region(self, region):
         """
         Given a region, returns the Endpoint for that region, or the Endpoint
@@ -99,17 +244,18 @@ class Service(object):
         is returned, and it is up to the calling method to handle it
         appropriately.
         """
-        rgn = region.upper()
-        try:
-            rgn_ep = [ep for ep in list(self.endpoints.values())
-                    if ep.region.upper() == rgn][0]
-        except IndexError:
+        region_map = self._region_map
+        if region_map is None:
+            # Index the endpoints by their upper-cased region the first time
+            # they are needed; assigning new endpoints clears the index.
+            region_map = {}
+            for ep in self.endpoints.values():
+                region_map.setdefault(ep.region.upper(), ep)
+            self._region_map = region_map
+        rgn_ep = region_map.get(region.upper())
+        if rgn_ep is None:
             # See if there is an 'ALL' region.
-            try:
-                rgn_ep = [ep for ep in list(self.endpoints.values())
-                        if ep.region.upper() == "ALL"][0]
-            except IndexError:
-                rgn_ep = None
+            rgn_ep = region_map.get("ALL")
         return rgn_ep
 
 
@@ -247,7 +393,7 @@ class Endpoint(object):
         """
         Creates a client instance for the service.
         """
-        verify_ssl = pyrax.get_setting("verify_ssl")
+        verify_ssl = self.identity.get_setting("verify_ssl")
         if self.service == "compute" and not special:
             # Novaclient requires different parameters.
             client = pyrax.connect_to_cloudservers(region=self.region,
@@ -266,6 +412,19 @@ class BaseIdentity(object):
     with an OpenStack Cloud system.
     """
     _creds_style = "password"
+    # A TokenCache shared with other processes, or False to disable caching.
+    # If this is None, the 'token_cache' setting is used.
+    token_cache = None
+    # Seconds before expiration at which the token is renewed. If this is
+    # None, the 'token_refresh_margin' setting is used.
+    refresh_margin = None
+    # The settings environment for this identity, or None for the current
+    # environment, and a dict of settings that override those in it.
+    env = None
+    settings = None
+    # A requests Session for the identity and its clients to make their
+    # requests with, or None to make each request on a new connection.
+    session = None
 
     def __init__(self, username=None, password=None, tenant_id=None,
             tenant_name=None, auth_endpoint=None, api_key=None, token=None,
@@ -285,13 +444,24 @@ class BaseIdentity(object):
         self.verify_ssl = verify_ssl
         self._auth_endpoint = auth_endpoint
         self.api_key = api_key
+        self.settings = {}
         self.services = utils.DotDict()
         self.regions = utils.DotDict()
+        self.catalog_index = ServiceCatalogIndex()
         self._default_creds_style = "password"
         self.authenticated = False
         self.user_agent = "pyrax"
         self.http_log_debug = False
         self._default_region = None
+        # Held while authenticating, so that concurrent refreshes of the token
+        # result in a single call to the auth service.
+        self._auth_lock = threading.RLock()
+        # Counts the authentications made through refresh_token(), and holds
+        # the error from the last one, so that threads waiting on the lock
+        # can share its result.
+        self._auth_generation = 0
+        self._auth_error = None
+        self._refresh_timer = None
         self.service_mapping = {
                 "cloudservers": "compute",
                 "nova": "compute",
@@ -315,6 +485,26 @@ class BaseIdentity(object):
                 }
 
 
+    def get_setting(self, key):
+        """
+        Returns the value of a setting for this identity: its own value from
+        'settings' if it has one, or else the value in its environment.
+        """
+        if self.settings and key in self.settings:
+            return self.settings[key]
+        return pyrax.get_setting(key, env=self.env)
+
+
+    def close(self):
+        """
+        Stops any background token refresh, and closes the connections in the
+        identity's session.
+        """
+        self.stop_token_refresh()
+        if self.session is not None:
+            self.session.close()
+
+
     @property
     def auth_token(self):
         """Simple alias to self.token."""
@@ -338,7 +528,7 @@ class BaseIdentity(object):
         """
         Broken out in case subclasses need to determine endpoints dynamically.
         """
-        return self._auth_endpoint or pyrax.get_setting("auth_endpoint")
+        return self._auth_endpoint or self.get_setting("auth_endpoint")
 
 
     def get_default_region(self):
@@ -372,7 +562,8 @@ class BaseIdentity(object):
         ret = utils.DotDict([(stype, svc.endpoints.get(att))
                 for stype, svc in list(self.services.items())
                 if svc.endpoints.get(att) is not None])
-        ret._att_mapper.update(self.service_mapping)
+        # Set on the instance, as DotDict's mapper is shared by the class.
+        ret.__dict__["_att_mapper"] = self.service_mapping
         if ret:
             return ret
         # Invalid attribute
@@ -567,6 +758,8 @@ class BaseIdentity(object):
         if "tokens" in uri:
             # We'll handle the exception here
             kwargs["raise_exception"] = False
+        if self.session is not None:
+            kwargs["session"] = self.session
         return pyrax.http.request(mthd, uri, **kwargs)
 
 
@@ -584,13 +777,37 @@ class BaseIdentity(object):
         The 'connect' parameter is retained for backwards compatibility. It no
         longer has any effect.
         """
-        self.username = username or self.username or pyrax.get_setting(
+        self.username = username or self.username or self.get_setting(
                 "username")
         # Different identity systems may pass these under inconsistent names.
         self.password = password or self.password or api_key or self.api_key
         self.api_key = api_key or self.api_key or self.password
-        self.tenant_id = tenant_id or self.tenant_id or pyrax.get_setting(
+        self.tenant_id = tenant_id or self.tenant_id or self.get_setting(
                 "tenant_id")
+        cache = self._get_token_cache()
+        if not cache:
+            self._authenticate_with_service()
+            return
+        # A token that was already in use is being replaced, probably because
+        # it was rejected, so the cached copy of it must not be reused.
+        stale_token = self.token
+        key = self._token_cache_key()
+        if self._use_cached_token(cache, key, stale_token):
+            return
+        with cache.lock(key):
+            # Another process may have authenticated while this one waited.
+            if self._use_cached_token(cache, key, stale_token):
+                return
+            resp_body = self._authenticate_with_service()
+            expires = calendar.timegm(self.expires.timetuple())
+            cache.set(key, resp_body, expires)
+
+
+    def _authenticate_with_service(self):
+        """
+        Posts the current credentials to the authentication service, and
+        parses the response. Returns the response body.
+        """
         creds = self._format_credentials()
         headers = {"Content-Type": "application/json",
                 "Accept": "application/json",
@@ -621,6 +838,48 @@ class BaseIdentity(object):
             raise exc.AuthenticationFailed(err)
         self._parse_response(resp_body)
         self.authenticated = True
+        return resp_body
+
+
+    def _get_token_cache(self):
+        """
+        Returns the TokenCache to use, or None if tokens are not cached.
+        """
+        if self.token_cache is None:
+            setting = self.get_setting("token_cache")
+            if setting in (None, False, "", "False", "false", "0"):
+                return None
+            if setting in (True, "True", "true", "1"):
+                setting = None
+            self.token_cache = TokenCache(setting)
+        return self.token_cache or None
+
+
+    def _token_cache_key(self):
+        return cache_key(self.auth_endpoint, self.username,
+                self.tenant_id or self.tenant_name, self.password or
+                self.api_key)
+
+
+    def _use_cached_token(self, cache, key, stale_token=None):
+        """
+        Loads the token and service catalog from the cache entry for 'key'.
+        Returns False if there is no usable entry.
+        """
+        resp_body = cache.get(key)
+        if not resp_body:
+            return False
+        try:
+            token = resp_body["access"]["token"]["id"]
+        except (KeyError, TypeError):
+            cache.delete(key)
+            return False
+        if stale_token and token == stale_token:
+            cache.delete(key)
+            return False
+        self._parse_response(resp_body)
+        self.authenticated = True
+        return True
 
 
     def _parse_response(self, resp):
@@ -641,6 +900,12 @@ class BaseIdentity(object):
 
 
     def _parse_service_catalog(self):
+        index = ServiceCatalogIndex.from_catalog(self.service_catalog)
+        if self.services and index == self.catalog_index:
+            # The catalog hasn't changed since the last authentication, so
+            # keep the existing services, along with their clients.
+            return
+        self.catalog_index = index
         self.services = utils.DotDict()
         self.regions = set()
         for svc in self.service_catalog:
@@ -658,6 +923,7 @@ class BaseIdentity(object):
             if ep:
                 for rgn in self.regions:
                     eps[rgn] = ep
+            svc.endpoints = eps
 
 
     def keyring_auth(self, username=None):
@@ -669,7 +935,7 @@ class BaseIdentity(object):
             raise exc.KeyringModuleNotInstalled("The 'keyring' Python module "
                     "is not installed on this system.")
         if username is None:
-            username = pyrax.get_setting("keyring_username")
+            username = self.get_setting("keyring_username")
         if not username:
             raise exc.KeyringUsernameMissing("No username specified for "
                     "keyring authentication.")
@@ -702,6 +968,7 @@ class BaseIdentity(object):
         self.api_key = ""
         self.services = utils.DotDict()
         self.regions = utils.DotDict()
+        self.catalog_index = ServiceCatalogIndex()
         self.authenticated = False
 
 
@@ -741,8 +1008,132 @@ class BaseIdentity(object):
         This only checks the token's existence and expiration. If it has been
         invalidated on the server, this method may indicate that the token is
         valid when it might actually not be.
+
+        If there is no valid token but tokens are cached, a cached token for
+        the current credentials is loaded.
         """
-        return bool(self.token and (self.expires > datetime.datetime.now()))
+        if self.token and (self.expires > datetime.datetime.utcnow()):
+            return True
+        cache = self._get_token_cache()
+        if not (cache and self.username):
+            return False
+        return self._use_cached_token(cache, self._token_cache_key(),
+                self.token)
+
+
+    def _get_refresh_margin(self):
+        if self.refresh_margin is not None:
+            return self.refresh_margin
+        margin = self.get_setting("token_refresh_margin")
+        if margin in (None, ""):
+            return DEFAULT_REFRESH_MARGIN
+        return float(margin)
+
+
+    def _token_expires_soon(self):
+        """
+        Returns True if there is a token, and it expires within the refresh
+        margin.
+        """
+        if not (self.token and self.expires):
+            return False
+        margin = datetime.timedelta(seconds=self._get_refresh_margin())
+        return self.expires - margin <= datetime.datetime.utcnow()
+
+
+    def refresh_token(self, force=False, stale_token=None):
+        """
+        Re-authenticates if the token expires within the refresh margin, or
+        if 'force' is True, and returns the token. 'stale_token' is the token
+        that needs replacing, such as one that the server has rejected; it
+        defaults to the current token.
+
+        Only one thread at a time authenticates. Threads that were waiting for
+        it use the token it obtained instead of authenticating again, or raise
+        the same error if it failed.
+        """
+        if stale_token is None:
+            stale_token = self.token
+        if force:
+            if self.token != stale_token:
+                return self.token
+        else:
+            if not (self.password or self.api_key):
+                # Without credentials the token cannot be renewed here.
+                return self.token
+            if not self._token_expires_soon():
+                return self.token
+        generation = self._auth_generation
+        with self._auth_lock:
+            if self._auth_generation != generation:
+                # Another thread authenticated while this one waited.
+                if self._auth_error is not None:
+                    raise self._auth_error
+                return self.token
+            if self.token != stale_token:
+                # Another thread has already replaced the token.
+                return self.token
+            if not (force or self._token_expires_soon()):
+                return self.token
+            try:
+                self.authenticate()
+            except Exception as e:
+                self._auth_error = e
+                raise
+            else:
+                self._auth_error = None
+            finally:
+                self._auth_generation += 1
+        return self.token
+
+
+    def start_token_refresh(self):
+        """
+        Starts a background timer that renews the token when it comes within
+        the refresh margin of expiring, and again after each renewal, so that
+        requests never wait for authentication. Call stop_token_refresh() to
+        stop it.
+        """
+        with self._auth_lock:
+            self.stop_token_refresh()
+            self._schedule_refresh(0 if self._token_expires_soon() else None)
+
+
+    def stop_token_refresh(self):
+        """Stops the background refresh started by start_token_refresh()."""
+        with self._auth_lock:
+            timer, self._refresh_timer = self._refresh_timer, None
+        if timer is not None:
+            timer.cancel()
+
+
+    def _schedule_refresh(self, delay=None):
+        if delay is None:
+            delay = REFRESH_RETRY_INTERVAL
+            if self.expires:
+                remaining = self.expires - datetime.datetime.utcnow()
+                until_refresh = (remaining.total_seconds() -
+                        self._get_refresh_margin())
+                if until_refresh > 0:
+                    delay = until_refresh
+        timer = threading.Timer(delay, self._background_refresh)
+        timer.daemon = True
+        self._refresh_timer = timer
+        timer.start()
+
+
+    def _background_refresh(self):
+        delay = None
+        try:
+            self.refresh_token()
+        except Exception as e:
+            log = logging.getLogger("pyrax")
+            log.warning("Unable to refresh the auth token: %s", e)
+            delay = REFRESH_RETRY_INTERVAL
+        with self._auth_lock:
+            # Don't reschedule if the refresh was stopped or restarted.
+            if self._refresh_timer is threading.current_thread():
+                self._schedule_refresh(delay)
 
 
     def list_tokens(self):
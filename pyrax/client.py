@@ -129,6 +129,17 @@ class BaseClient(object):
         return self._manager.findall(**kwargs)
 
 
+    def paginate(self, page_size=None, limit=None, marker=None,
+            prefetch=False):
+        """
+        Returns an iterator over every resource, which requests them from the
+        API 'page_size' at a time as they are needed. See
+        BaseManager.paginate() for the details.
+        """
+        return self._manager.paginate(page_size=page_size, limit=limit,
+                marker=marker, prefetch=prefetch)
+
+
     def unauthenticate(self):
         """Clears all of our authentication information."""
         self.identity.unauthenticate()
@@ -182,6 +193,9 @@ class BaseClient(object):
                 del kwargs["headers"]["Content-Type"]
         # Allow subclasses to add their own headers
         self._add_custom_headers(kwargs["headers"])
+        session = getattr(self.identity, "session", None)
+        if session is not None:
+            kwargs["session"] = session
         resp, body = pyrax.http.request(method, uri, *args, **kwargs)
         if resp.status_code >= 400:
             raise exc.from_response(resp, body)
@@ -205,7 +219,11 @@ class BaseClient(object):
         """
         id_svc = self.identity
         if not all((self.management_url, id_svc.token, id_svc.tenant_id)):
-            id_svc.authenticate()
+            id_svc.refresh_token(force=True)
+        else:
+            # Renew a token that is about to expire before using it, rather
+            # than waiting for the request to be rejected.
+            id_svc.refresh_token()
 
         if not self.management_url:
             # We've authenticated but no management_url has been set. This
@@ -225,15 +243,18 @@ class BaseClient(object):
         # Perform the request once. If we get a 401 back then it
         # might be because the auth token expired, so try to
         # re-authenticate and try again. If it still fails, bail.
+        token = id_svc.token
         try:
-            kwargs.setdefault("headers", {})["X-Auth-Token"] = id_svc.token
+            kwargs.setdefault("headers", {})["X-Auth-Token"] = token
             if id_svc.tenant_id:
                 kwargs["headers"]["X-Auth-Project-Id"] = id_svc.tenant_id
             resp, body = self._time_request(safe_uri, method, **kwargs)
             return resp, body
         except exc.Unauthorized as ex:
             try:
-                id_svc.authenticate()
+                # When many threads get a 401 for the same token, only one of
+                # them re-authenticates, and the rest use its new token.
+                id_svc.refresh_token(force=True, stale_token=token)
                 kwargs["headers"]["X-Auth-Token"] = id_svc.token
                 resp, body = self._time_request(safe_uri, method, **kwargs)
                 return resp, body
@@ -244,6 +244,9 @@ class CloudBlockStorageManager(BaseManager):
     """
     Manager class for Cloud Block Storage.
     """
+    # Volume listings are paged by ID.
+    marker_attribute = "id"
+
     def _create_body(self, name, size=None, volume_type=None, description=None,
              metadata=None, snapshot_id=None, clone_id=None,
              availability_zone=None):
@@ -329,6 +332,9 @@ class CloudBlockStorageSnapshotManager(BaseManager):
     """
     Manager class for Cloud Block Storage.
     """
+    # Snapshot listings are paged by ID.
+    marker_attribute = "id"
+
     def _create_body(self, name, description=None, volume=None, force=False):
         """
         Used to create the dict required to create a new snapshot
@@ -406,13 +412,14 @@ class CloudBlockStorageClient(BaseClient):
         """
         self._manager = CloudBlockStorageManager(self,
                 resource_class=CloudBlockStorageVolume, response_key="volume",
-                uri_base="volumes")
+                uri_base="volumes", detail_uri="volumes/detail")
         self._types_manager = BaseManager(self,
                 resource_class=CloudBlockStorageVolumeType,
                 response_key="volume_type", uri_base="types")
         self._snapshot_manager = CloudBlockStorageSnapshotManager(self,
                 resource_class=CloudBlockStorageSnapshot,
-                response_key="snapshot", uri_base="snapshots")
+                response_key="snapshot", uri_base="snapshots",
+                detail_uri="snapshots/detail")
 
 
     def list_types(self):
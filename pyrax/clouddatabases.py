@@ -70,6 +70,9 @@ class CloudDatabaseManager(BaseManager):
     """
     This class manages communication with Cloud Database instances.
     """
+    # Instance listings are paged by ID.
+    marker_attribute = "id"
+
     def get(self, item):
         """
         This additional code is necessary to properly return the 'volume'
@@ -165,6 +168,9 @@ class CloudDatabaseDatabaseManager(BaseManager):
     """
     This class manages communication with databases on Cloud Database instances.
     """
+    # Database listings are paged by name.
+    marker_attribute = "name"
+
     def _create_body(self, name, character_set=None, collate=None):
         body = {"databases": [
                 {"name": name,
@@ -180,6 +186,9 @@ class CloudDatabaseUserManager(BaseManager):
     This class handles operations on the users in a database on a Cloud
     Database instance.
     """
+    # User listings are paged by name.
+    marker_attribute = "name"
+
     def _create_body(self, name, password, databases=None, database_names=None,
             host=None):
         db_dicts = [{"name": db} for db in database_names]
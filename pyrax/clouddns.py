@@ -29,6 +29,8 @@ from pyrax.client import BaseClient
 from pyrax.cloudloadbalancers import CloudLoadBalancer
 import pyrax.exceptions as exc
 from pyrax.manager import BaseManager
+from pyrax.pagination import marker_from_uri
+from pyrax.pagination import Paginator
 from pyrax.resource import BaseResource
 import pyrax.utils as utils
 
@@ -364,17 +366,24 @@ class CloudDNSManager(BaseManager):
         if not body:
             return
         svc_dct["total_entries"] = body.get("totalEntries")
-        links = body.get("links")
-        uri_base = self.uri_base
-        if links:
-            for link in links:
-                href = link["href"]
-                pos = href.index(uri_base)
-                page_uri = href[pos - 1:]
-                if link["rel"] == "next":
-                    svc_dct["next_uri"] = page_uri
-                elif link["rel"] == "previous":
-                    svc_dct["prev_uri"] = page_uri
+        svc_dct["prev_uri"], svc_dct["next_uri"] = self._page_links(body)
+
+
+    def _page_links(self, body):
+        """
+        Returns a 2-tuple of the URIs of the previous and next pages linked
+        from a listing's response body, with None for those that are absent.
+        """
+        prev_uri = next_uri = None
+        for link in body.get("links") or []:
+            href = link["href"]
+            pos = href.index(self.uri_base)
+            page_uri = href[pos - 1:]
+            if link["rel"] == "next":
+                next_uri = page_uri
+            elif link["rel"] == "previous":
+                prev_uri = page_uri
+        return prev_uri, next_uri
 
 
     def _get_pagination_qs(self, limit, offset):
@@ -394,18 +403,39 @@ class CloudDNSManager(BaseManager):
         return self._list(uri)
 
 
-    def _list(self, uri, obj_class=None, list_all=False):
+    def _fetch_page(self, marker, page_size):
         """
-        Handles the communication with the API when getting
-        a full listing of the resources managed by this class.
+        Domains are paged by offset; the marker is the offset in the link to
+        the next page. The paging info used by list_next_page() is left
+        alone, so pages can be fetched in a background thread.
+        """
+        uri = "/%s%s" % (self.uri_base, self._get_pagination_qs(page_size,
+                marker))
+        domains, resp_body = self._domains_page(uri)
+        next_uri = self._page_links(resp_body)[1]
+        return domains, marker_from_uri(next_uri, "offset")
+
+
+    def _domains_page(self, uri, obj_class=None):
+        """
+        Returns the domains in the listing at 'uri', along with the response
+        body.
         """
         resp, resp_body = self._retry_get(uri)
         if obj_class is None:
             obj_class = self.resource_class
-
         data = resp_body[self.plural_response_key]
         ret = [obj_class(self, res, loaded=False)
                 for res in data if res]
+        return ret, resp_body
+
+
+    def _list(self, uri, obj_class=None, list_all=False):
+        """
+        Handles the communication with the API when getting
+        a full listing of the resources managed by this class.
+        """
+        ret, resp_body = self._domains_page(uri, obj_class=obj_class)
         self._reset_paging("domain", resp_body)
         if list_all:
             dom_paging = self._paging.get("domain", {})
@@ -416,6 +446,14 @@ class CloudDNSManager(BaseManager):
         return ret
 
 
+    def _list_pages(self, **params):
+        """
+        Domain listings are paged by offset rather than marker, so searches
+        read the whole listing at once.
+        """
+        yield self._list("/%s" % self.uri_base, list_all=True)
+
+
     def list_previous_page(self):
         """
         When paging through results, this will return the previous page, using
@@ -722,12 +760,21 @@ class CloudDNSManager(BaseManager):
 
 
     def _list_subdomains(self, uri, domain_id):
-        resp, body = self._retry_get(uri)
+        ret, body = self._subdomains_page(uri, domain_id)
         self._reset_paging("subdomain", body)
+        return ret
+
+
+    def _subdomains_page(self, uri, domain_id):
+        """
+        Returns the subdomains in the listing at 'uri', along with the
+        response body.
+        """
+        resp, body = self._retry_get(uri)
         subdomains = body.get("domains", [])
         return [CloudDNSDomain(self, subdomain, loaded=False)
                 for subdomain in subdomains
-                if subdomain["id"] != domain_id]
+                if subdomain["id"] != domain_id], body
 
 
     def list_subdomains_previous_page(self):
@@ -766,8 +813,17 @@ class CloudDNSManager(BaseManager):
 
 
     def _list_records(self, uri):
-        resp, body = self._retry_get(uri)
+        ret, body = self._records_page(uri)
         self._reset_paging("record", body)
+        return ret
+
+
+    def _records_page(self, uri):
+        """
+        Returns the records in the listing at 'uri', along with the response
+        body.
+        """
+        resp, body = self._retry_get(uri)
         # The domain ID will be in the URL
         pat = "domains/([^/]+)/records"
         mtch = re.search(pat, uri)
@@ -776,7 +832,7 @@ class CloudDNSManager(BaseManager):
         for record in records:
             record["domain_id"] = dom_id
         return [CloudDNSRecord(self, record, loaded=False)
-                for record in records if record]
+                for record in records if record], body
 
 
     def list_records_previous_page(self):
@@ -1106,13 +1162,15 @@ class CloudDNSClient(BaseClient):
         return self._manager.list_next_page()
 
 
-    def get_domain_iterator(self):
+    def get_domain_iterator(self, prefetch=False):
         """
         Returns an iterator that will return each available domain. If there are
         more than the limit of 100 domains, the iterator will continue to fetch
-        domains from the API until all domains have been returned.
+        domains from the API until all domains have been returned. If
+        'prefetch' is True, each page is requested while the previous one is
+        being consumed.
         """
-        return DomainResultsIterator(self._manager)
+        return DomainResultsIterator(self._manager, prefetch=prefetch)
 
 
     @assure_domain
@@ -1202,14 +1260,17 @@ class CloudDNSClient(BaseClient):
         return domain.list_subdomains(limit=limit, offset=offset)
 
 
-    def get_subdomain_iterator(self, domain, limit=None, offset=None):
+    def get_subdomain_iterator(self, domain, limit=None, offset=None,
+            prefetch=False):
         """
         Returns an iterator that will return each available subdomain for the
         specified domain. If there are more than the limit of 100 subdomains,
         the iterator will continue to fetch subdomains from the API until all
-        subdomains have been returned.
+        subdomains have been returned. If 'prefetch' is True, each page is
+        requested while the previous one is being consumed.
         """
-        return SubdomainResultsIterator(self._manager, domain=domain)
+        return SubdomainResultsIterator(self._manager, domain=domain,
+                prefetch=prefetch)
 
 
     def list_subdomains_previous_page(self):
@@ -1230,14 +1291,16 @@ class CloudDNSClient(BaseClient):
         return domain.list_records(limit=limit, offset=offset)
 
 
-    def get_record_iterator(self, domain):
+    def get_record_iterator(self, domain, prefetch=False):
         """
         Returns an iterator that will return each available DNS record for the
         specified domain. If there are more than the limit of 100 records, the
         iterator will continue to fetch records from the API until all records
-        have been returned.
+        have been returned. If 'prefetch' is True, each page is requested while
+        the previous one is being consumed.
         """
-        return RecordResultsIterator(self._manager, domain=domain)
+        return RecordResultsIterator(self._manager, domain=domain,
+                prefetch=prefetch)
 
 
     def list_records_previous_page(self):
@@ -1400,15 +1463,19 @@ class ResultsIterator(object):
     type of listing, no matter how many items exist.
 
     This is an abstract class; subclasses must define the
-    _init_methods() method.
+    _init_methods() method, which sets the 'first_uri' of the listing and
+    the manager's 'page_method' that returns the items at a URI along with
+    the response body. Pass prefetch=True to have the next page requested
+    in a background thread while the current page is consumed.
     """
-    def __init__(self, manager, domain=None):
+    def __init__(self, manager, domain=None, prefetch=False):
         self.manager = manager
         self.domain = domain
         self.domain_id = utils.get_id(domain) if domain else None
-        self.results = []
+        self.prefetch = prefetch
         self.next_uri = ""
         self.extra_args = tuple()
+        self._items = None
         self._init_methods()
 
 
@@ -1425,32 +1492,29 @@ class ResultsIterator(object):
 
     def next(self):
         """
-        Return the next available item. If there are no more items in the
-        local 'results' list, check if there is a 'next_uri' value. If so,
-        use that to get the next page of results from the API, and return
-        the first item from that query.
+        Return the next available item, requesting the pages of the listing
+        as they are needed. Iteration starts at 'next_uri' if it is set, and
+        is over at once if it is None.
         """
-        try:
-            return self.results.pop(0)
-        except IndexError:
+        if self._items is None:
             if self.next_uri is None:
                 raise StopIteration()
-            else:
-                if not self.next_uri:
-                    if self.domain:
-                        self.results = self.list_method(self.domain)
-                    else:
-                        self.results = self.list_method()
-                else:
-                    args = self.extra_args
-                    self.results = self._list_method(self.next_uri, *args)
-                self.next_uri = self.manager._paging.get(
-                        self.paging_service, {}).get("next_uri")
-        # We should have more results.
-        try:
-            return self.results.pop(0)
-        except IndexError:
-            raise StopIteration()
+            paginator = Paginator(self._fetch, marker=self.next_uri or None,
+                    prefetch=self.prefetch)
+            self._items = iter(paginator)
+        return next(self._items)
+
+
+    def _fetch(self, marker, page_size):
+        """
+        Requests the page of results at the URI in 'marker', or the first
+        page if it is None, and returns them along with the URI for the page
+        after them. Nothing is shared between calls, so the next page can be
+        requested in a background thread.
+        """
+        uri = marker or self.first_uri
+        results, body = self.page_method(uri, *self.extra_args)
+        return results, self.manager._page_links(body)[1]
 
 
 class DomainResultsIterator(ResultsIterator):
@@ -1458,9 +1522,8 @@ class DomainResultsIterator(ResultsIterator):
     ResultsIterator subclass for iterating over all domains.
     """
     def _init_methods(self):
-        self.list_method = self.manager.list
-        self._list_method = self.manager._list
-        self.paging_service = "domain"
+        self.first_uri = "/%s" % self.manager.uri_base
+        self.page_method = self.manager._domains_page
 
 
 class SubdomainResultsIterator(ResultsIterator):
@@ -1468,10 +1531,10 @@ class SubdomainResultsIterator(ResultsIterator):
     ResultsIterator subclass for iterating over all subdomains.
     """
     def _init_methods(self):
-        self.list_method = self.manager.list_subdomains
-        self._list_method = self.manager._list_subdomains
+        if self.domain is not None:
+            self.first_uri = "/domains?name=%s" % self.domain.name
+        self.page_method = self.manager._subdomains_page
         self.extra_args = (self.domain_id, )
-        self.paging_service = "subdomain"
 
 
 class RecordResultsIterator(ResultsIterator):
@@ -1479,6 +1542,5 @@ class RecordResultsIterator(ResultsIterator):
     ResultsIterator subclass for iterating over all domain records.
     """
     def _init_methods(self):
-        self.list_method = self.manager.list_records
-        self._list_method = self.manager._list_records
-        self.paging_service = "record"
+        self.first_uri = "/domains/%s/records" % self.domain_id
+        self.page_method = self.manager._records_page
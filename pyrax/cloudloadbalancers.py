@@ -431,6 +431,9 @@ class CloudLoadBalancer(BaseResource):
 
 
 class CloudLoadBalancerManager(BaseManager):
+    # Load balancer listings are paged by ID.
+    marker_attribute = "id"
+
     def update(self, lb, name=None, algorithm=None, protocol=None,
             halfClosed=None, port=None, timeout=None, httpsRedirect=None):
         """
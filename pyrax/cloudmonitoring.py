@@ -278,6 +278,13 @@ class _PaginationManager(BaseManager):
             return ret
 
 
+    def _fetch_page(self, marker, page_size):
+        """
+        The 'next_marker' of each page is the marker for the page after it.
+        """
+        return self.list(limit=page_size, marker=marker, return_next=True)
+
+
 
 class CloudMonitorNotificationManager(_PaginationManager):
     """
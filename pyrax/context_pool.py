@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Keeps the contexts for many accounts alive in one process, such as a
+service that works on behalf of many customers. Each context is an
+isolated identity created by pyrax.create_context(), with its own token,
+settings, clients and connections, and the pool discards the least recently
+used ones once it holds 'maxsize' of them:
+
+    pool = pyrax.ContextPool(maxsize=200)
+    with pool.checkout(account_id, username=username, api_key=api_key) as ctx:
+        cf = ctx.get_client("object_store", "DFW")
+        ...
+
+A context that is checked out is not closed until it is checked back in,
+even if it is pushed out of the pool in the meantime. A context returned by
+get() has no such protection, and must not be used once it has been removed
+from the pool.
+"""
+
+from __future__ import absolute_import
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+
+import pyrax
+
+
+# The default number of contexts that a ContextPool keeps alive.
+DEFAULT_MAX_CONTEXTS = 100
+
+
+
+class ContextPool(object):
+    """
+    A thread-safe, bounded collection of contexts, keyed by any hashable
+    value chosen by the caller, such as an account ID. Contexts that are
+    removed from the pool, or pushed out of it by newer ones, are closed
+    once no thread has them checked out.
+    """
+    def __init__(self, maxsize=DEFAULT_MAX_CONTEXTS):
+        self.maxsize = maxsize
+        self._contexts = OrderedDict()
+        # Events for the contexts that are being created, by key.
+        self._pending = {}
+        # The number of checkouts of each context that is in use, and the
+        # contexts that are to be closed once they are no longer in use.
+        self._checkouts = {}
+        self._retired = set()
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return "<ContextPool %s/%s contexts>" % (len(self), self.maxsize)
+
+
+    def __len__(self):
+        return len(self._contexts)
+
+
+    def __contains__(self, key):
+        return key in self._contexts
+
+
+    def get(self, key, authenticate=True, **kwargs):
+        """
+        Returns the context for 'key'. If the pool doesn't have one, it is
+        created by calling pyrax.create_context() with the keyword arguments,
+        and authenticated unless 'authenticate' is False.
+
+        When several threads ask for a missing context at once, only one of
+        them creates it. If that fails, the exception is raised in that
+        thread, and the next waiting thread tries again.
+
+        The context is closed as soon as it leaves the pool, so when other
+        threads may push it out, use checkout() instead.
+        """
+        return self._get(key, authenticate, False, kwargs)
+
+
+    @contextmanager
+    def checkout(self, key, authenticate=True, **kwargs):
+        """
+        Works like get(), but for use in a 'with' statement. The context is
+        not closed until the 'with' block exits, even if it is removed from
+        the pool while the block is running.
+        """
+        context = self._get(key, authenticate, True, kwargs)
+        try:
+            yield context
+        finally:
+            self._checkin(context)
+
+
+    def _get(self, key, authenticate, hold, kwargs):
+        while True:
+            with self._lock:
+                context = self._contexts.pop(key, None)
+                if context is not None:
+                    # Move it to the most recently used end.
+                    self._contexts[key] = context
+                    if hold:
+                        self._hold(context)
+                    return context
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    break
+            pending.wait()
+        try:
+            context = pyrax.create_context(**kwargs)
+            if authenticate:
+                context.authenticate()
+            evicted = self._add(key, context, hold=hold)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+        self._close(evicted)
+        return context
+
+
+    def _hold(self, context):
+        # Must be called with the lock held.
+        self._checkouts[context] = self._checkouts.get(context, 0) + 1
+
+
+    def _checkin(self, context):
+        with self._lock:
+            count = self._checkouts.pop(context) - 1
+            if count:
+                self._checkouts[context] = count
+                return
+            if context not in self._retired:
+                return
+            self._retired.discard(context)
+        context.close()
+
+
+    def _close(self, contexts):
+        """
+        Closes the contexts that have left the pool, except for those that
+        are checked out, which are closed when they are checked in.
+        """
+        with self._lock:
+            to_close = []
+            for context in contexts:
+                if context in self._checkouts:
+                    self._retired.add(context)
+                else:
+                    to_close.append(context)
+        for context in to_close:
+            context.close()
+
+
+    def add(self, key, context):
+        """
+        Puts an existing context in the pool as the context for 'key',
+        closing any context that it replaces.
+        """
+        self._close(self._add(key, context))
+
+
+    def _add(self, key, context, hold=False):
+        """
+        Stores the context, and returns a list of the contexts that it
+        replaced or pushed out of the pool. If 'hold' is True, the context is
+        also checked out.
+        """
+        evicted = []
+        with self._lock:
+            old = self._contexts.pop(key, None)
+            if old is not None and old is not context:
+                evicted.append(old)
+            self._contexts[key] = context
+            self._retired.discard(context)
+            if hold:
+                self._hold(context)
+            while len(self._contexts) > self.maxsize:
+                old_key, old = self._contexts.popitem(last=False)
+                evicted.append(old)
+        return evicted
+
+
+    def remove(self, key):
+        """
+        Removes the context for 'key', if there is one, and closes it once it
+        is no longer checked out.
+        """
+        with self._lock:
+            context = self._contexts.pop(key, None)
+        if context is not None:
+            self._close([context])
+
+
+    def clear(self):
+        """
+        Removes every context from the pool, closing each once it is no
+        longer checked out.
+        """
+        with self._lock:
+            contexts = list(self._contexts.values())
+            self._contexts.clear()
+        self._close(contexts)
+
+
+    def keys(self):
+        """Returns the keys of the contexts, least recently used first."""
+        with self._lock:
+            return list(self._contexts.keys())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Finds the novaclient extensions and auth plugins used by the cloudservers
+clients. novaclient finds them by walking the Python path, its contrib
+directory and the installed entry points, which is slow enough to dominate
+the creation of a client; here that is done once per process, and the result
+is shared by the clients for every region and context.
+
+If the 'novaclient_extension_cache' setting names a file, the extensions that
+were found are also recorded there, keyed by the version of novaclient, so
+that later processes can import them directly instead of searching for them.
+Since the cache determines which code is loaded, it is ignored if users other
+than its owner can write to it, and source files are only loaded from
+novaclient's own contrib directory.
+"""
+
+from __future__ import absolute_import
+
+import imp
+import importlib
+import json
+import os
+import tempfile
+import threading
+
+import novaclient
+from novaclient import auth_plugin
+from novaclient.extension import Extension
+from novaclient.shell import OpenStackComputeShell
+
+import pyrax.utils as utils
+
+
+# The version of the compute API whose extensions are loaded.
+API_VERSION = "1.1"
+
+_extensions = None
+_lock = threading.Lock()
+
+
+
+def get_extensions(cache_file=None):
+    """
+    Returns the list of novaclient extensions, discovering them, along with
+    the novaclient auth plugins, the first time that it is called.
+    """
+    global _extensions
+    if _extensions is None:
+        with _lock:
+            if _extensions is None:
+                auth_plugin.discover_auth_systems()
+                extensions = None
+                if cache_file:
+                    extensions = load_cache(cache_file)
+                if extensions is None:
+                    extensions = discover_extensions()
+                    if cache_file:
+                        save_cache(cache_file, extensions)
+                _extensions = extensions
+    return _extensions
+
+
+def reset():
+    """Forgets the extensions, so that they are discovered again."""
+    global _extensions
+    with _lock:
+        _extensions = None
+
+
+def discover_extensions():
+    """Searches for the novaclient extensions, the way the nova shell does."""
+    return OpenStackComputeShell()._discover_extensions(API_VERSION)
+
+
+def _version():
+    return getattr(novaclient, "__version__", None) or "unknown"
+
+
+def _contrib_dir():
+    version = API_VERSION.replace(".", "_")
+    return os.path.join(os.path.dirname(os.path.abspath(novaclient.__file__)),
+            "v%s" % version, "contrib")
+
+
+def _source_path(module):
+    path = getattr(module, "__file__", None)
+    if path and path.endswith((".pyc", ".pyo")):
+        path = path[:-1]
+    return path and os.path.abspath(path)
+
+
+def _entry(extension):
+    """
+    Returns how to load the extension's module again: contrib modules are
+    loaded from their source files, while others are imported by name.
+    """
+    module = extension.module
+    path = _source_path(module)
+    if not path or os.path.dirname(path) != _contrib_dir():
+        path = None
+    return {"name": extension.name, "module": module.__name__, "path": path}
+
+
+def _in_contrib_dir(path):
+    contrib = os.path.realpath(_contrib_dir())
+    return os.path.dirname(os.path.realpath(path)) == contrib
+
+
+def _read(cache_file):
+    try:
+        with open(cache_file) as ff:
+            cached = json.load(ff)
+    except (IOError, OSError, ValueError):
+        return {}
+    return cached if isinstance(cached, dict) else {}
+
+
+def load_cache(cache_file):
+    """
+    Loads the extensions recorded in the cache file for the installed version
+    of novaclient. Returns None if there are none, if any of them can no
+    longer be loaded, or if the cache can't be trusted: when other users can
+    write to it, or it names a source file outside novaclient's contrib
+    directory.
+    """
+    cache_file = os.path.abspath(os.path.expanduser(cache_file))
+    if not utils.is_trusted_path(cache_file):
+        return None
+    entries = _read(cache_file).get(_version())
+    if not isinstance(entries, list):
+        return None
+    extensions = []
+    try:
+        for entry in entries:
+            path = entry["path"]
+            if path:
+                if not _in_contrib_dir(path):
+                    return None
+                module = imp.load_source(entry["module"], path)
+            else:
+                module = importlib.import_module(entry["module"])
+            extensions.append(Extension(entry["name"], module))
+    except Exception:
+        return None
+    return extensions
+
+
+def save_cache(cache_file, extensions):
+    """
+    Records the extensions in the cache file under the installed version of
+    novaclient, keeping the entries for other versions. The file is replaced
+    atomically; failing to write it is not an error.
+    """
+    cache_file = os.path.abspath(os.path.expanduser(cache_file))
+    # Entries written by someone else are not carried over into the new file.
+    cached = (_read(cache_file) if utils.is_trusted_path(cache_file)
+            else {})
+    cached[_version()] = [_entry(ext) for ext in extensions]
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_file),
+                prefix=".tmp-")
+        with os.fdopen(fd, "w") as ff:
+            json.dump(cached, ff)
+        utils.replace_file(tmp_path, cache_file)
+    except (IOError, OSError):
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
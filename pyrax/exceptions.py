@@ -134,6 +134,9 @@ class InvalidImageMember(PyraxException):
 class InvalidImageMemberStatus(PyraxException):
     pass
 
+class InvalidInventoryFormat(PyraxException):
+    pass
+
 class InvalidLoadBalancer(PyraxException):
     pass
 
@@ -143,6 +146,9 @@ class InvalidLoadBalancerParameters(PyraxException):
 class InvalidImageMemberStatus(PyraxException):
     pass
 
+class InvalidManifestType(PyraxException):
+    pass
+
 class InvalidMonitoringCheckDetails(PyraxException):
     pass
 
@@ -257,6 +263,9 @@ class NoEndpointForService(PyraxException):
 class NoContentSpecified(PyraxException):
     pass
 
+class NoMetadataSpecified(PyraxException):
+    pass
+
 class NoMoreResults(PyraxException):
     pass
 
@@ -308,6 +317,9 @@ class PTRRecordUpdateFailed(PyraxException):
 class QueueClientIDNotDefined(PyraxException):
     pass
 
+class RegionTimeout(PyraxException):
+    pass
+
 class ServiceNotAvailable(PyraxException):
     pass
 
@@ -223,7 +223,7 @@ class FakeFolderUploader(FolderUploader):
         self.actual_run = self.run
         self.run = self.fake_run
 
-    def fake_run(self):
+    def fake_run(self, job=None):
         pass
 
 
@@ -234,7 +234,7 @@ class FakeBulkDeleter(BulkDeleter):
         self.actual_run = self.run
         self.run = self.fake_run
 
-    def fake_run(self):
+    def fake_run(self, job=None):
         time.sleep(0.0001)
         self.results = {}
         self.completed = True
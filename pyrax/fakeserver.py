@@ -0,0 +1,1149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+An in-process stand-in for the Identity and Object Storage (Swift) APIs,
+served over HTTP on a local port from an in-memory store.
+
+Unlike the classes in pyrax.fakes, which replace pyrax objects at the Python
+level, the FakeSwiftServer is reached through pyrax's real HTTP code, so it
+can be used to benchmark and test the full request path without a network
+connection or an account:
+
+    with FakeSwiftServer() as server:
+        clt = server.get_client()
+        cont = clt.create("photos")
+        cont.store_object("cat.jpg", data)
+
+It implements the parts of the API that pyrax uses: account, container and
+object CRUD and metadata, listings with the usual paging and filtering
+parameters, ranged downloads, server-side copies, DLO and SLO manifests,
+object expiration and bulk deletes.
+
+It also serves a Keystone-style identity endpoint that issues tokens and a
+service catalog for its 'username' and 'password' (which is also accepted as
+an API key), and a small JSON API of generic collections under 'json_url',
+which accepts POST, GET, PUT and DELETE requests with the same tokens, and
+supports 'limit', 'marker' and attribute filters when listing.
+
+To load-test the network code paths, requests can be slowed down by setting
+'latency', a fraction of them made to fail by setting 'error_rate', and the
+server can be rate limited by setting 'rate_limit' to the number of requests
+allowed per second. Specific failures can be injected with inject_fault(),
+and expire_tokens() forces clients to re-authenticate.
+"""
+
+from __future__ import absolute_import
+
+import datetime
+import email.utils
+import hashlib
+import json
+import math
+import mimetypes
+import random
+import re
+import threading
+import time
+import uuid
+
+import six
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves import urllib
+
+import pyrax.base_identity
+import pyrax.object_storage
+
+
+DEFAULT_ACCOUNT = "AUTH_fake"
+DEFAULT_USERNAME = "fakeuser"
+DEFAULT_PASSWORD = "fakepassword"
+DEFAULT_REGION = "LOCAL"
+# Number of seconds that issued tokens are valid for.
+DEFAULT_TOKEN_TTL = 86400
+# Maximum number of items returned in a single listing.
+LISTING_LIMIT = 10000
+_LISTING_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+
+def _md5(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def _http_date(stamp):
+    return email.utils.formatdate(stamp, usegmt=True)
+
+
+def _to_bytes(data):
+    if isinstance(data, six.text_type):
+        return data.encode("utf-8")
+    return data
+
+
+def _json_error(status, kind, message):
+    """Returns the body of an error response in the OpenStack style."""
+    return {kind: {"code": status, "message": message}}
+
+
+def _parse_range(header, size):
+    """
+    Returns the (start, end) of the single byte range in a Range header,
+    with 'end' being exclusive, or None if the header is not a satisfiable
+    single range.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].split(",")[0].strip()
+    start, sep, end = spec.partition("-")
+    try:
+        if not start:
+            # A suffix range: the last 'end' bytes.
+            length = int(end)
+            return (max(0, size - length), size) if length else None
+        start = int(start)
+        end = int(end) + 1 if end else size
+    except ValueError:
+        return None
+    if start >= size or end <= start:
+        return None
+    return start, min(end, size)
+
+
+
+class FakeObject(object):
+    """An object stored by a FakeSwiftServer."""
+    def __init__(self, data, content_type, metadata=None, manifest=None,
+            segments=None, delete_at=None):
+        self.data = data
+        self.etag = _md5(data)
+        self.content_type = content_type
+        self.metadata = metadata or {}
+        # 'container/prefix' for a DLO manifest.
+        self.manifest = manifest
+        # A list of 'container/object' paths for an SLO manifest.
+        self.segments = segments
+        self.delete_at = delete_at
+        self.last_modified = time.time()
+
+
+    @property
+    def expired(self):
+        return self.delete_at is not None and self.delete_at <= time.time()
+
+
+    @property
+    def size(self):
+        return len(self.data)
+
+
+
+class FakeContainer(object):
+    """A container stored by a FakeSwiftServer."""
+    def __init__(self, metadata=None):
+        self.metadata = metadata or {}
+        self.objects = {}
+
+
+    def live_objects(self):
+        return dict((name, obj) for name, obj in self.objects.items()
+                if not obj.expired)
+
+
+
+class _Fault(object):
+    """A response to be returned in place of the normal one."""
+    def __init__(self, status, method=None, path=None, count=1, headers=None,
+            body=None):
+        self.status = status
+        self.method = method
+        self.path = path
+        self.count = count
+        self.headers = headers
+        self.body = body or ""
+
+
+    def matches(self, method, path):
+        return ((self.method is None or self.method == method) and
+                (self.path is None or re.search(self.path, path) is not None))
+
+
+
+class FakeSwiftServer(object):
+    """
+    Serves an in-memory Swift account over HTTP on 'host' and 'port'; a port
+    of 0 picks a free port. The server runs in a background thread from
+    start() until stop(), and can also be used as a context manager.
+
+    Requests must carry a valid token in their X-Auth-Token header. Tokens
+    are issued by the identity endpoint at 'auth_endpoint', and 'token' is
+    issued when the server is created. The number of requests handled, in
+    total and by method, is kept in 'request_count' and
+    'requests_by_method'.
+    """
+    def __init__(self, host="127.0.0.1", port=0, account=None, username=None,
+            password=None, region=None, token_ttl=None):
+        self.host = host
+        self.port = port
+        self.account = account or DEFAULT_ACCOUNT
+        self.username = username or DEFAULT_USERNAME
+        self.password = password or DEFAULT_PASSWORD
+        self.region = region or DEFAULT_REGION
+        self.token_ttl = token_ttl or DEFAULT_TOKEN_TTL
+        self.lock = threading.RLock()
+        # Maps each issued token to the time that it expires.
+        self.tokens = {}
+        self.token = self.issue_token()
+        self.containers = {}
+        self.account_metadata = {}
+        # Maps the name of each collection in the JSON API to a dict of its
+        # items, keyed by their IDs.
+        self.collections = {}
+        self.request_count = 0
+        self.requests_by_method = {}
+        # The number of seconds to wait before handling each request.
+        self.latency = 0
+        # The fraction of requests that fail with 'error_status'.
+        self.error_rate = 0
+        self.error_status = 503
+        # The number of requests allowed per second, or None for no limit.
+        # Requests over the limit get a 'rate_limit_status' response.
+        self.rate_limit = None
+        self.rate_limit_status = 413
+        self.faults = []
+        # Seed this for a repeatable sequence of random errors.
+        self.random = random.Random()
+        self._allowance = None
+        self._allowance_stamp = None
+        self._id_counter = 0
+        self._httpd = None
+        self._thread = None
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+    def start(self):
+        """Starts serving requests in a background thread."""
+        self._httpd = _ThreadingHTTPServer((self.host, self.port),
+                _SwiftRequestHandler)
+        self._httpd.fake = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                kwargs={"poll_interval": 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+
+    def stop(self):
+        """Stops the server and closes its socket."""
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self._httpd = self._thread = None
+
+
+    @property
+    def url(self):
+        """The storage URL of the account."""
+        return "http://%s:%s/v1/%s" % (self.host, self.port, self.account)
+
+
+    @property
+    def auth_endpoint(self):
+        """The URL of the identity endpoint."""
+        return "http://%s:%s/v2.0/" % (self.host, self.port)
+
+
+    @property
+    def json_url(self):
+        """The base URL of the JSON API."""
+        return "http://%s:%s/json/v1/%s" % (self.host, self.port, self.account)
+
+
+    def get_identity(self):
+        """
+        Returns a BaseIdentity that has authenticated with this server's
+        identity endpoint.
+        """
+        ident = pyrax.base_identity.BaseIdentity(username=self.username,
+                password=self.password, tenant_id=self.account,
+                auth_endpoint=self.auth_endpoint, region=self.region)
+        ident.authenticate()
+        return ident
+
+
+    def get_client(self, **kwargs):
+        """
+        Returns a StorageClient that is authenticated against this server.
+        Any keyword arguments are passed to the StorageClient.
+        """
+        return pyrax.object_storage.StorageClient(self.get_identity(),
+                region_name=self.region, management_url=self.url, **kwargs)
+
+
+    def issue_token(self):
+        """Issues and returns a new token."""
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens[token] = time.time() + self.token_ttl
+        return token
+
+
+    def valid_token(self, token):
+        """Returns True if 'token' has been issued and has not expired."""
+        with self.lock:
+            expires = self.tokens.get(token)
+        return expires is not None and expires > time.time()
+
+
+    def expire_tokens(self):
+        """
+        Expires every token that has been issued, so that clients have to
+        authenticate again.
+        """
+        with self.lock:
+            now = time.time()
+            for token in self.tokens:
+                self.tokens[token] = now
+
+
+    def service_catalog(self):
+        """Returns the service catalog given to authenticated users."""
+        def endpoint(url):
+            return [{"region": self.region, "tenantId": self.account,
+                    "publicURL": url, "internalURL": url}]
+        return [{"name": "cloudFiles", "type": "object-store",
+                "endpoints": endpoint(self.url)},
+                {"name": "fakeJSON", "type": "rax:fake-json",
+                "endpoints": endpoint(self.json_url)},
+                ]
+
+
+    def access_info(self, token):
+        """Returns the body of an identity response for 'token'."""
+        with self.lock:
+            expires = self.tokens[token]
+        stamp = datetime.datetime.utcfromtimestamp(expires)
+        return {"access": {
+                "token": {"id": token,
+                    "expires": stamp.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                    "tenant": {"id": self.account, "name": self.account},
+                    },
+                "serviceCatalog": self.service_catalog(),
+                "user": {"id": self.username, "name": self.username,
+                    "roles": [{"name": "admin"}],
+                    "RAX-AUTH:defaultRegion": self.region,
+                    },
+                }}
+
+
+    def inject_fault(self, status, method=None, path=None, count=1,
+            headers=None, body=None):
+        """
+        Makes the next 'count' requests that match 'method' and 'path' fail
+        with the specified status, headers and body. 'path' is a regular
+        expression that is searched for in the path of the request; when
+        'method' or 'path' is None, any value matches. A 'count' of None
+        makes every matching request fail until clear_faults() is called.
+        """
+        with self.lock:
+            self.faults.append(_Fault(status, method=method, path=path,
+                    count=count, headers=headers, body=body))
+
+
+    def clear_faults(self):
+        """Removes any faults added with inject_fault()."""
+        with self.lock:
+            del self.faults[:]
+
+
+    def _take_fault(self, method, path):
+        """
+        Returns the _Fault that the request should get, or None if it should
+        be handled normally.
+        """
+        with self.lock:
+            for fault in self.faults:
+                if fault.matches(method, path):
+                    if fault.count is not None:
+                        fault.count -= 1
+                        if fault.count <= 0:
+                            self.faults.remove(fault)
+                    return fault
+            if self.error_rate and self.random.random() < self.error_rate:
+                return _Fault(self.error_status, body="Injected error")
+        return None
+
+
+    def _check_rate_limit(self):
+        """
+        Returns the number of seconds until the next request will be allowed
+        if the rate limit has been reached, or None if it hasn't.
+        """
+        with self.lock:
+            if not self.rate_limit:
+                return None
+            burst = max(1.0, self.rate_limit)
+            now = time.time()
+            if self._allowance is None:
+                self._allowance, self._allowance_stamp = burst, now
+            elapsed = now - self._allowance_stamp
+            self._allowance = min(burst,
+                    self._allowance + elapsed * self.rate_limit)
+            self._allowance_stamp = now
+            if self._allowance < 1:
+                return (1 - self._allowance) / self.rate_limit
+            self._allowance -= 1
+            return None
+
+
+    def add_item(self, collection, item):
+        """
+        Adds a copy of the dict 'item' to a collection of the JSON API,
+        giving it an ID if it doesn't have one, and returns it.
+        """
+        item = dict(item)
+        with self.lock:
+            if "id" not in item:
+                self._id_counter += 1
+                item["id"] = "%08d" % self._id_counter
+            self.collections.setdefault(collection, {})[item["id"]] = item
+        return item
+
+
+    def list_items(self, collection):
+        """Returns the items in a collection of the JSON API, in ID order."""
+        with self.lock:
+            items = self.collections.get(collection, {})
+            return [items[key] for key in sorted(items)]
+
+
+    def reset(self):
+        """Deletes all containers, objects and metadata."""
+        with self.lock:
+            self.containers.clear()
+            self.account_metadata.clear()
+            self.collections.clear()
+            self.request_count = 0
+            self.requests_by_method.clear()
+
+
+    def create_container(self, name, metadata=None):
+        """Creates a container directly, without going through HTTP."""
+        with self.lock:
+            return self.containers.setdefault(name, FakeContainer(metadata))
+
+
+    def put_object(self, container, name, data, content_type=None,
+            metadata=None):
+        """
+        Stores an object directly, without going through HTTP, creating the
+        container if necessary.
+        """
+        data = _to_bytes(data)
+        content_type = (content_type or mimetypes.guess_type(name)[0] or
+                "application/octet-stream")
+        obj = FakeObject(data, content_type, metadata=metadata)
+        with self.lock:
+            self.create_container(container).objects[name] = obj
+        return obj
+
+
+    def get_object(self, container, name):
+        """
+        Returns the FakeObject with the specified name, or None if there is
+        no such object.
+        """
+        with self.lock:
+            cont = self.containers.get(container)
+            obj = cont and cont.objects.get(name)
+            if obj is None or obj.expired:
+                return None
+            return obj
+
+
+    def object_content(self, obj):
+        """
+        Returns the content of a FakeObject, joining the segments of a
+        manifest.
+        """
+        if obj.manifest is not None:
+            cname, sep, prefix = obj.manifest.partition("/")
+            with self.lock:
+                cont = self.containers.get(cname)
+                objects = cont.live_objects() if cont else {}
+            names = sorted(nm for nm in objects if nm.startswith(prefix))
+            return b"".join(objects[nm].data for nm in names)
+        if obj.segments is not None:
+            parts = []
+            for path in obj.segments:
+                cname, sep, oname = path.lstrip("/").partition("/")
+                seg = self.get_object(cname, oname)
+                parts.append(seg.data if seg else b"")
+            return b"".join(parts)
+        return obj.data
+
+
+    def _count_request(self, method):
+        with self.lock:
+            self.request_count += 1
+            self.requests_by_method[method] = (
+                    self.requests_by_method.get(method, 0) + 1)
+
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+        BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+
+class _SwiftRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Handles the requests made to a FakeSwiftServer."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        # Keep test and benchmark output quiet.
+        pass
+
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+
+    def do_HEAD(self):
+        self._dispatch("HEAD")
+
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+    def do_COPY(self):
+        self._dispatch("COPY")
+
+
+    def _read_body(self):
+        if self.headers.get("transfer-encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                line = self.rfile.readline().strip()
+                size = int(line.split(b";")[0], 16)
+                if not size:
+                    # Skip any trailers.
+                    while self.rfile.readline().strip():
+                        pass
+                    break
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(parts)
+        length = int(self.headers.get("content-length") or 0)
+        return self.rfile.read(length) if length else b""
+
+
+    def _send(self, status, body=b"", headers=None, length=None):
+        """
+        Sets the response to the current request. For HEAD requests 'length'
+        is the size of the resource, which is reported without sending a
+        body. The response is written by _write_response() once the store's
+        lock has been released, so that slow clients don't hold it.
+        """
+        self._response = (status, body, headers, length)
+
+
+    def _write_response(self):
+        status, body, headers, length = self._response
+        body = _to_bytes(body)
+        self.send_response(status)
+        headers = dict(headers or {})
+        headers.setdefault("Content-Type", "text/plain; charset=utf-8")
+        headers["X-Trans-Id"] = "tx%s" % uuid.uuid4().hex
+        headers["Date"] = _http_date(time.time())
+        if self.command == "HEAD":
+            headers["Content-Length"] = str(len(body) if length is None
+                    else length)
+            body = b""
+        else:
+            headers["Content-Length"] = str(len(body))
+        for key, val in headers.items():
+            self.send_header(key, val)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+    def _send_json(self, data, headers=None, status=200):
+        headers = dict(headers or {})
+        headers["Content-Type"] = "application/json; charset=utf-8"
+        self._send(status, json.dumps(data), headers=headers)
+
+
+    def _wants_json(self, query):
+        fmt = query.get("format", [""])[0]
+        return fmt == "json" or "json" in self.headers.get("accept", "")
+
+
+    def _meta_headers(self, prefix):
+        """Returns the request headers that start with 'prefix'."""
+        low_prefix = prefix.lower()
+        return dict((key.lower(), val.strip()) for key, val in
+                self.headers.items() if key.lower().startswith(low_prefix))
+
+
+    def _update_metadata(self, metadata, prefix):
+        for key, val in self._meta_headers(prefix).items():
+            if val:
+                metadata[key] = val
+            else:
+                metadata.pop(key, None)
+        remove_prefix = "x-remove-%s" % prefix[2:]
+        for key in self._meta_headers(remove_prefix):
+            metadata.pop("x-%s" % key[len("x-remove-"):], None)
+
+
+    def _delete_at(self):
+        after = self.headers.get("x-delete-after")
+        if after:
+            return time.time() + float(after)
+        delete_at = self.headers.get("x-delete-at")
+        return float(delete_at) if delete_at else None
+
+
+    def _dispatch(self, method):
+        self._response = None
+        self._handle(method)
+        self._write_response()
+
+
+    def _handle(self, method):
+        fake = self.fake
+        fake._count_request(method)
+        # Always read the body, so that the connection can be reused even if
+        # the request fails.
+        body = self._read_body()
+        parsed = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(parsed.query, keep_blank_values=True)
+        if fake.latency:
+            time.sleep(fake.latency)
+        retry_after = fake._check_rate_limit()
+        if retry_after is not None:
+            return self._send(fake.rate_limit_status, "Rate limit exceeded",
+                    headers={"Retry-After": str(int(math.ceil(retry_after)))})
+        fault = fake._take_fault(method, parsed.path)
+        if fault is not None:
+            return self._send(fault.status, fault.body, headers=fault.headers)
+        if parsed.path.startswith("/v2.0/"):
+            parts = parsed.path[len("/v2.0/"):].split("/")
+            with fake.lock:
+                return self._identity_request(method, parts, body)
+        json_prefix = "/json/v1/%s/" % fake.account
+        if parsed.path.startswith(json_prefix):
+            if not fake.valid_token(self.headers.get("x-auth-token")):
+                return self._send_json(_json_error(401, "unauthorized",
+                        "Invalid or expired token"), status=401)
+            parts = [urllib.parse.unquote(part) for part in
+                    parsed.path[len(json_prefix):].split("/")]
+            with fake.lock:
+                return self._json_request(method, parts, query, body)
+        parts = parsed.path.split("/", 4)
+        if len(parts) < 3 or parts[1] != "v1" or parts[2] != fake.account:
+            return self._send(404, "Not Found")
+        if not fake.valid_token(self.headers.get("x-auth-token")):
+            return self._send(401, "Unauthorized")
+        container = urllib.parse.unquote(parts[3]) if len(parts) > 3 else ""
+        obj = urllib.parse.unquote(parts[4]) if len(parts) > 4 else ""
+        if six.PY2:
+            container = container.decode("utf-8")
+            obj = obj.decode("utf-8")
+        if obj:
+            handler = getattr(self, "_object_%s" % method.lower(), None)
+            args = (container, obj, query, body)
+        elif container:
+            handler = getattr(self, "_container_%s" % method.lower(), None)
+            args = (container, query, body)
+        else:
+            handler = getattr(self, "_account_%s" % method.lower(), None)
+            args = (query, body)
+        if handler is None:
+            return self._send(405, "Method Not Allowed")
+        with fake.lock:
+            return handler(*args)
+
+
+    def _json_body(self, body):
+        """Returns the decoded JSON request body, or None if it isn't JSON."""
+        try:
+            return json.loads(body.decode("utf-8"))
+        except ValueError:
+            return None
+
+
+    # Identity requests
+    def _valid_credentials(self, auth):
+        fake = self.fake
+        if "passwordCredentials" in auth:
+            creds = auth["passwordCredentials"]
+            secret = creds.get("password")
+        elif "RAX-KSKEY:apiKeyCredentials" in auth:
+            creds = auth["RAX-KSKEY:apiKeyCredentials"]
+            secret = creds.get("apiKey")
+        elif "token" in auth:
+            return fake.valid_token(auth["token"].get("id"))
+        else:
+            return False
+        return creds.get("username") == fake.username and (
+                secret == fake.password)
+
+
+    def _identity_request(self, method, parts, body):
+        fake = self.fake
+        if parts[0] != "tokens" or len(parts) > 2:
+            return self._send_json(_json_error(404, "itemNotFound",
+                    "Resource not found"), status=404)
+        if len(parts) == 1:
+            if method != "POST":
+                return self._send(405, "Method Not Allowed")
+            auth = (self._json_body(body) or {}).get("auth")
+            if not isinstance(auth, dict):
+                return self._send_json(_json_error(400, "badRequest",
+                        "Invalid request body"), status=400)
+            if not self._valid_credentials(auth):
+                return self._send_json(_json_error(401, "unauthorized",
+                        "Unable to authenticate user with credentials "
+                        "provided."), status=401)
+            return self._send_json(fake.access_info(fake.issue_token()))
+        token = parts[1]
+        if not fake.valid_token(token):
+            return self._send_json(_json_error(404, "itemNotFound",
+                    "Token not found"), status=404)
+        if method in ("GET", "HEAD"):
+            return self._send_json(fake.access_info(token))
+        if method == "DELETE":
+            del fake.tokens[token]
+            return self._send(204)
+        return self._send(405, "Method Not Allowed")
+
+
+    # JSON API requests
+    def _json_request(self, method, parts, query, body):
+        fake = self.fake
+        name = parts[0]
+        if not name or len(parts) > 2:
+            return self._send_json(_json_error(404, "itemNotFound",
+                    "Resource not found"), status=404)
+        singular = name[:-1] if name.endswith("s") else name
+        if len(parts) == 1:
+            if method == "GET":
+                return self._list_items(name, query)
+            if method != "POST":
+                return self._send(405, "Method Not Allowed")
+            data = self._json_item(body, singular)
+            if data is None:
+                return self._send_json(_json_error(400, "badRequest",
+                        "Invalid request body"), status=400)
+            return self._send_json({singular: fake.add_item(name, data)},
+                    status=201)
+        item = fake.collections.get(name, {}).get(parts[1])
+        if item is None:
+            return self._send_json(_json_error(404, "itemNotFound",
+                    "%s %s not found" % (singular, parts[1])), status=404)
+        if method in ("GET", "HEAD"):
+            return self._send_json({singular: item})
+        if method == "PUT":
+            data = self._json_item(body, singular)
+            if data is None:
+                return self._send_json(_json_error(400, "badRequest",
+                        "Invalid request body"), status=400)
+            data.pop("id", None)
+            item.update(data)
+            return self._send_json({singular: item})
+        if method == "DELETE":
+            del fake.collections[name][parts[1]]
+            return self._send(204)
+        return self._send(405, "Method Not Allowed")
+
+
+    def _json_item(self, body, singular):
+        """
+        Returns the item in a request body, which may be wrapped in a dict
+        keyed by the singular name of the collection.
+        """
+        data = self._json_body(body)
+        if not isinstance(data, dict):
+            return None
+        item = data.get(singular, data)
+        return item if isinstance(item, dict) else None
+
+
+    def _list_items(self, name, query):
+        items = self.fake.list_items(name)
+        marker = query.pop("marker", [None])[0]
+        limit = query.pop("limit", [None])[0]
+        for key, vals in query.items():
+            items = [item for item in items
+                    if six.text_type(item.get(key)) == vals[0]]
+        if marker:
+            ids = [item["id"] for item in items]
+            if marker not in ids:
+                return self._send_json(_json_error(400, "badRequest",
+                        "Marker %s not found" % marker), status=400)
+            items = items[ids.index(marker) + 1:]
+        if limit:
+            items = items[:int(limit)]
+        return self._send_json({name: items})
+
+
+    # Account requests
+    def _account_headers(self):
+        fake = self.fake
+        count = nbytes = 0
+        for cont in fake.containers.values():
+            objects = cont.live_objects()
+            count += len(objects)
+            nbytes += sum(obj.size for obj in objects.values())
+        headers = {"X-Account-Container-Count": str(len(fake.containers)),
+                "X-Account-Object-Count": str(count),
+                "X-Account-Bytes-Used": str(nbytes),
+                }
+        headers.update(fake.account_metadata)
+        return headers
+
+
+    def _account_head(self, query, body):
+        self._send(204, headers=self._account_headers())
+
+
+    def _account_get(self, query, body):
+        entries = []
+        for name, cont in self.fake.containers.items():
+            objects = cont.live_objects()
+            entries.append({"name": name,
+                    "count": len(objects),
+                    "bytes": sum(obj.size for obj in objects.values()),
+                    })
+        self._send_listing(entries, query, self._account_headers())
+
+
+    def _account_post(self, query, body):
+        self._update_metadata(self.fake.account_metadata, "X-Account-Meta-")
+        self._send(204)
+
+
+    def _account_delete(self, query, body):
+        if "bulk-delete" not in query:
+            return self._send(405, "Method Not Allowed")
+        deleted = not_found = 0
+        errors = []
+        for line in body.decode("utf-8").splitlines():
+            path = urllib.parse.unquote(line.strip()).lstrip("/")
+            if not path:
+                continue
+            cname, sep, oname = path.partition("/")
+            cont = self.fake.containers.get(cname)
+            if cont is None:
+                not_found += 1
+            elif oname:
+                if cont.objects.pop(oname, None) is None:
+                    not_found += 1
+                else:
+                    deleted += 1
+            elif cont.live_objects():
+                errors.append([path, "409 Conflict"])
+            else:
+                del self.fake.containers[cname]
+                deleted += 1
+        status = "400 Bad Request" if errors else "200 OK"
+        self._send_json({"Number Deleted": deleted,
+                "Number Not Found": not_found,
+                "Response Status": status,
+                "Response Body": "",
+                "Errors": errors,
+                })
+
+
+    # Container requests
+    def _container_headers(self, cont):
+        objects = cont.live_objects()
+        headers = {"X-Container-Object-Count": str(len(objects)),
+                "X-Container-Bytes-Used": str(sum(obj.size
+                        for obj in objects.values())),
+                }
+        headers.update(cont.metadata)
+        return headers
+
+
+    def _container_put(self, name, query, body):
+        cont = self.fake.containers.get(name)
+        if cont is None:
+            cont = self.fake.containers[name] = FakeContainer()
+            status = 201
+        else:
+            status = 202
+        self._update_metadata(cont.metadata, "X-Container-Meta-")
+        self._send(status)
+
+
+    def _container_head(self, name, query, body):
+        cont = self.fake.containers.get(name)
+        if cont is None:
+            return self._send(404, "Not Found")
+        self._send(204, headers=self._container_headers(cont))
+
+
+    def _container_get(self, name, query, body):
+        cont = self.fake.containers.get(name)
+        if cont is None:
+            return self._send(404, "Not Found")
+        entries = []
+        for oname, obj in cont.live_objects().items():
+            stamp = datetime.datetime.utcfromtimestamp(obj.last_modified)
+            entries.append({"name": oname,
+                    "bytes": obj.size,
+                    "hash": obj.etag,
+                    "last_modified": stamp.strftime(_LISTING_TIME_FORMAT),
+                    "content_type": obj.content_type,
+                    })
+        self._send_listing(entries, query, self._container_headers(cont))
+
+
+    def _container_post(self, name, query, body):
+        cont = self.fake.containers.get(name)
+        if cont is None:
+            return self._send(404, "Not Found")
+        self._update_metadata(cont.metadata, "X-Container-Meta-")
+        self._send(204)
+
+
+    def _container_delete(self, name, query, body):
+        cont = self.fake.containers.get(name)
+        if cont is None:
+            return self._send(404, "Not Found")
+        if cont.live_objects():
+            return self._send(409, "Conflict")
+        del self.fake.containers[name]
+        self._send(204)
+
+
+    def _send_listing(self, entries, query, headers):
+        """
+        Sends a listing of 'entries', applying the standard prefix,
+        delimiter, marker, end_marker and limit parameters.
+        """
+        def param(key):
+            val = query.get(key, [None])[0]
+            if six.PY2 and val is not None:
+                val = val.decode("utf-8")
+            return val
+
+        prefix = param("prefix") or ""
+        delimiter = param("delimiter")
+        marker = param("marker")
+        end_marker = param("end_marker")
+        limit = min(int(param("limit") or LISTING_LIMIT), LISTING_LIMIT)
+        entries.sort(key=lambda entry: entry["name"].encode("utf-8"))
+        listing = []
+        seen_subdirs = set()
+        for entry in entries:
+            name = entry["name"]
+            if not name.startswith(prefix):
+                continue
+            if marker and name.encode("utf-8") <= marker.encode("utf-8"):
+                continue
+            if end_marker and (name.encode("utf-8") >=
+                    end_marker.encode("utf-8")):
+                break
+            if delimiter:
+                pos = name.find(delimiter, len(prefix))
+                if pos >= 0:
+                    subdir = name[:pos + len(delimiter)]
+                    if subdir not in seen_subdirs:
+                        seen_subdirs.add(subdir)
+                        listing.append({"subdir": subdir})
+                    if len(listing) >= limit:
+                        break
+                    continue
+            listing.append(entry)
+            if len(listing) >= limit:
+                break
+        if self._wants_json(query):
+            return self._send_json(listing, headers=headers)
+        if not listing:
+            return self._send(204, headers=headers)
+        names = [entry.get("name", entry.get("subdir")) for entry in listing]
+        self._send(200, "\n".join(names) + "\n", headers=headers)
+
+
+    # Object requests
+    def _object_headers(self, obj, content):
+        headers = {"Content-Type": obj.content_type,
+                "Last-Modified": _http_date(obj.last_modified),
+                "X-Timestamp": "%.5f" % obj.last_modified,
+                "Accept-Ranges": "bytes",
+                }
+        if obj.manifest is not None:
+            headers["X-Object-Manifest"] = obj.manifest
+            headers["Etag"] = '"%s"' % _md5(content)
+        elif obj.segments is not None:
+            headers["X-Static-Large-Object"] = "True"
+            headers["Etag"] = '"%s"' % _md5(content)
+        else:
+            headers["Etag"] = obj.etag
+        if obj.delete_at is not None:
+            headers["X-Delete-At"] = str(int(obj.delete_at))
+        headers.update(obj.metadata)
+        return headers
+
+
+    def _object_get(self, cname, oname, query, body):
+        obj = self.fake.get_object(cname, oname)
+        if obj is None:
+            return self._send(404, "Not Found")
+        content = self.fake.object_content(obj)
+        headers = self._object_headers(obj, content)
+        if obj.segments is not None and query.get("multipart-manifest") == [
+                "get"]:
+            segments = [{"name": path} for path in obj.segments]
+            return self._send_json(segments, headers=headers)
+        range_header = self.headers.get("range")
+        if range_header:
+            byte_range = _parse_range(range_header, len(content))
+            if byte_range is None:
+                return self._send(416, "Requested Range Not Satisfiable",
+                        headers={"Content-Range": "bytes */%s" %
+                        len(content)})
+            start, end = byte_range
+            headers["Content-Range"] = "bytes %s-%s/%s" % (start, end - 1,
+                    len(content))
+            return self._send(206, content[start:end], headers=headers)
+        self._send(200, content, headers=headers, length=len(content))
+
+
+    def _object_head(self, cname, oname, query, body):
+        obj = self.fake.get_object(cname, oname)
+        if obj is None:
+            return self._send(404, "Not Found")
+        content = self.fake.object_content(obj)
+        self._send(200, headers=self._object_headers(obj, content),
+                length=len(content))
+
+
+    def _object_put(self, cname, oname, query, body):
+        cont = self.fake.containers.get(cname)
+        if cont is None:
+            return self._send(404, "Not Found")
+        copy_from = self.headers.get("x-copy-from")
+        if copy_from:
+            return self._copy(urllib.parse.unquote(copy_from), cname, oname)
+        manifest = self.headers.get("x-object-manifest")
+        segments = None
+        if query.get("multipart-manifest") == ["put"]:
+            try:
+                segments = [seg["path"] for seg in
+                        json.loads(body.decode("utf-8"))]
+            except (ValueError, KeyError, TypeError):
+                return self._send(400, "Invalid SLO manifest")
+            body = b""
+        else:
+            etag = self.headers.get("etag", "").strip('"').lower()
+            if etag and etag != _md5(body):
+                return self._send(422, "Unprocessable Entity")
+        content_type = (self.headers.get("content-type") or
+                mimetypes.guess_type(oname)[0] or "application/octet-stream")
+        metadata = {}
+        self._update_metadata(metadata, "X-Object-Meta-")
+        obj = FakeObject(body, content_type, metadata=metadata,
+                manifest=manifest, segments=segments,
+                delete_at=self._delete_at())
+        cont.objects[oname] = obj
+        self._send(201, headers={"Etag": obj.etag,
+                "Last-Modified": _http_date(obj.last_modified)})
+
+
+    def _object_copy(self, cname, oname, query, body):
+        dest = urllib.parse.unquote(self.headers.get("destination", ""))
+        dest_cname, sep, dest_oname = dest.lstrip("/").partition("/")
+        if six.PY2:
+            dest_cname = dest_cname.decode("utf-8")
+            dest_oname = dest_oname.decode("utf-8")
+        if dest_cname not in self.fake.containers:
+            return self._send(404, "Not Found")
+        self._copy("%s/%s" % (cname, oname), dest_cname, dest_oname)
+
+
+    def _copy(self, source, cname, oname):
+        if six.PY2 and isinstance(source, six.binary_type):
+            source = source.decode("utf-8")
+        src_cname, sep, src_oname = source.lstrip("/").partition("/")
+        src = self.fake.get_object(src_cname, src_oname)
+        if src is None:
+            return self._send(404, "Not Found")
+        content_type = self.headers.get("content-type") or src.content_type
+        metadata = dict(src.metadata)
+        self._update_metadata(metadata, "X-Object-Meta-")
+        obj = FakeObject(self.fake.object_content(src), content_type,
+                metadata=metadata, delete_at=self._delete_at())
+        self.fake.containers[cname].objects[oname] = obj
+        self._send(201, headers={"Etag": obj.etag})
+
+
+    def _object_post(self, cname, oname, query, body):
+        obj = self.fake.get_object(cname, oname)
+        if obj is None:
+            return self._send(404, "Not Found")
+        # A POST replaces all of the object's metadata.
+        obj.metadata = {}
+        self._update_metadata(obj.metadata, "X-Object-Meta-")
+        content_type = self.headers.get("content-type")
+        if content_type:
+            obj.content_type = content_type
+        delete_at = self._delete_at()
+        if delete_at is not None:
+            obj.delete_at = delete_at
+        self._send(202)
+
+
+    def _object_delete(self, cname, oname, query, body):
+        obj = self.fake.get_object(cname, oname)
+        if obj is None:
+            return self._send(404, "Not Found")
+        del self.fake.containers[cname].objects[oname]
+        self._send(204)
@@ -17,6 +17,7 @@
 Wrapper around the requests library. Used for making all HTTP calls.
 """
 
+from functools import partial
 import logging
 import json
 import requests
@@ -45,8 +46,15 @@ def request(method, uri, *args, **kwargs):
 
     Formats the request into a dict representing the headers
     and body that will be used to make the API call.
+
+    If a requests Session is passed as 'session', the request is made with
+    it, so that its connections are reused.
     """
-    req_method = req_methods[method.upper()]
+    session = kwargs.pop("session", None)
+    if session is None:
+        req_method = req_methods[method.upper()]
+    else:
+        req_method = partial(session.request, method.upper())
     raise_exception = kwargs.pop("raise_exception", True)
     raw_content = kwargs.pop("raw_content", False)
     kwargs["headers"] = kwargs.get("headers", {})
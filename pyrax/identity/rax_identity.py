@@ -25,7 +25,7 @@ class RaxIdentity(BaseIdentity):
 
 
     def _get_auth_endpoint(self):
-        return (self._auth_endpoint or pyrax.get_setting("auth_endpoint")
+        return (self._auth_endpoint or self.get_setting("auth_endpoint")
                 or AUTH_ENDPOINT)
 
 
@@ -24,6 +24,7 @@ from pyrax.object_storage import StorageObject
 from pyrax.client import BaseClient
 import pyrax.exceptions as exc
 from pyrax.manager import BaseManager
+from pyrax.pagination import marker_from_uri
 from pyrax.resource import BaseResource
 import pyrax.utils as utils
 
@@ -190,6 +191,10 @@ class ImageManager(BaseManager):
     """
     Manager class for an Image.
     """
+    marker_attribute = "id"
+    # The findall() searches that the API can filter the listing on.
+    _list_filters = ("name", "status", "tag")
+
     def _create_body(self, name, metadata=None):
         """
         Used to create the dict required to create a new queue
@@ -220,36 +225,45 @@ class ImageManager(BaseManager):
         return self._list(uri, return_raw=return_raw)
 
 
+    def _findall_params(self, searches):
+        """
+        Passes searches on name, status and tag to the API. Images have a
+        list of 'tags' rather than a 'tag' attribute, so searching for a tag
+        is only possible this way.
+        """
+        params = {}
+        searches = dict(searches)
+        for key in self._list_filters:
+            if key in searches:
+                params[key] = searches.pop(key)
+        return params, searches
+
+
     def list_all(self, name=None, visibility=None, member_status=None,
             owner=None, tag=None, status=None, size_min=None, size_max=None,
-            sort_key=None, sort_dir=None):
+            sort_key=None, sort_dir=None, prefetch=False):
         """
         Returns all of the images in one call, rather than in paginated batches.
+        If 'prefetch' is True, each page is requested in a background thread
+        while the images in the previous page are being created.
         """
+        return list(self.paginate(prefetch=prefetch, name=name,
+                visibility=visibility, member_status=member_status,
+                owner=owner, tag=tag, status=status, size_min=size_min,
+                size_max=size_max, sort_key=sort_key, sort_dir=sort_dir))
 
-        def strip_version(uri):
-            """
-            The 'next' uri contains a redundant version number. We need to
-            strip it to use in the method_get() call.
-            """
-            pos = uri.find("/images")
-            return uri[pos:]
 
-        obj_class = self.resource_class
-        resp, resp_body = self.list(name=name, visibility=visibility,
-                member_status=member_status, owner=owner, tag=tag,
-                status=status, size_min=size_min, size_max=size_max,
-                sort_key=sort_key, sort_dir=sort_dir, return_raw=True)
+    def _fetch_page(self, marker, page_size, **params):
+        """
+        The API only includes a link to the next page when there is one, so
+        the marker is taken from that link instead of the last image.
+        """
+        resp, resp_body = self.list(limit=page_size, marker=marker,
+                return_raw=True, **params)
         data = resp_body.get(self.plural_response_key, resp_body)
-        next_uri = strip_version(resp_body.get("next", ""))
-        ret = [obj_class(manager=self, info=res) for res in data if res]
-        while next_uri:
-            resp, resp_body = self.api.method_get(next_uri)
-            data = resp_body.get(self.plural_response_key, resp_body)
-            next_uri = strip_version(resp_body.get("next", ""))
-            ret.extend([obj_class(manager=self, info=res)
-                    for res in data if res])
-        return ret
+        images = [self.resource_class(manager=self, info=res)
+                for res in data if res]
+        return images, marker_from_uri(resp_body.get("next"))
 
 
     def create(self, name, img_format=None, img_container_format=None,
@@ -307,7 +321,7 @@ class ImageManager(BaseManager):
         uri = "/%s/%s" % (self.uri_base, utils.get_id(img))
         body = []
         for key, val in value_dict.items():
-            op = "replace" if key in img.__dict__ else "add"
+            op = "replace" if key in img._attribute_names() else "add"
             body.append({"op": op,
                     "path": "/%s" % key,
                     "value": val})
@@ -541,16 +555,17 @@ class ImageClient(BaseClient):
 
     def list_all(self, name=None, visibility=None, member_status=None,
             owner=None, tag=None, status=None, size_min=None, size_max=None,
-            sort_key=None, sort_dir=None):
+            sort_key=None, sort_dir=None, prefetch=False):
         """
         Returns all of the images in one call, rather than in paginated batches.
         The same filtering options available in list() apply here, with the
-        obvious exception of limit and marker.
+        obvious exception of limit and marker. If 'prefetch' is True, each
+        page is requested while the previous one is being processed.
         """
         return self._manager.list_all(name=name, visibility=visibility,
                 member_status=member_status, owner=owner, tag=tag,
                 status=status, size_min=size_min, size_max=size_max,
-                sort_key=sort_key, sort_dir=sort_dir)
+                sort_key=sort_key, sort_dir=sort_dir, prefetch=prefetch)
 
 
     def update(self, img, value_dict):
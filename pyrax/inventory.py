@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Exports inventory snapshots of the objects in an account's containers, and
+compares two snapshots to find what has changed between them.
+
+A snapshot holds one record per object, with the keys 'container', 'name',
+'bytes', 'hash', 'last_modified' and 'content_type'. Records are written in
+container order and, within each container, in the order of Swift's
+listings, so two snapshots can be compared in a single streaming pass.
+
+Two file formats are supported:
+
+    ndjson   - one JSON record per line. If the file name ends with '.gz',
+               the file is gzip-compressed.
+    columnar - gzip-compressed lines, each holding a batch of records from
+               one container as one list per field. This is much smaller
+               than NDJSON, since repeated values such as content types
+               compress well when they are stored together.
+"""
+
+from __future__ import absolute_import
+
+import gzip
+import json
+import threading
+
+import six
+from six.moves import queue
+
+import pyrax.exceptions as exc
+import pyrax.utils as utils
+
+
+FIELDS = ("name", "bytes", "hash", "last_modified", "content_type")
+FORMATS = ("ndjson", "columnar")
+# Number of objects requested in each listing call.
+DEFAULT_PAGE_SIZE = 10000
+# Number of records in each line of a columnar snapshot.
+COLUMNAR_BATCH_SIZE = 10000
+# Number of listing pages for each container that may be held in memory
+# while waiting to be written.
+_MAX_QUEUED_PAGES = 4
+# Seconds a worker waits for room in its queue before checking whether it
+# has been stopped.
+_PUT_INTERVAL = 0.1
+_GZIP_MAGIC = b"\x1f\x8b"
+_DONE = object()
+
+
+def _open_snapshot(path, mode, compress=False):
+    if compress:
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _is_gzipped(path):
+    with open(path, "rb") as ff:
+        return ff.read(2) == _GZIP_MAGIC
+
+
+def _write_line(fileobj, data):
+    line = json.dumps(data, separators=(",", ":"), sort_keys=True)
+    fileobj.write((line + "\n").encode("utf-8"))
+
+
+def _record(container_name, elem):
+    rec = dict((field, elem.get(field)) for field in FIELDS)
+    rec["container"] = container_name
+    return rec
+
+
+def _utf8(val):
+    if isinstance(val, six.text_type):
+        return val.encode("utf-8")
+    return val
+
+
+def _sort_key(rec):
+    # Swift sorts names by their UTF-8 bytes.
+    return (_utf8(rec["container"]), _utf8(rec["name"]))
+
+
+class _ListingWorker(threading.Thread):
+    """
+    Lists one container in the background, passing its pages to the writer
+    through a bounded queue. If the writer gives up, it calls stop() so that
+    the worker exits instead of waiting forever for room in the queue.
+    """
+    def __init__(self, client, container_name, prefix, page_size):
+        self.client = client
+        self.container_name = container_name
+        self.prefix = prefix
+        self.page_size = page_size
+        self.pages = queue.Queue(_MAX_QUEUED_PAGES)
+        self._halt = threading.Event()
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+
+    def run(self):
+        try:
+            cont = self.client.get_container(self.container_name)
+            listing = cont.object_manager.iter_raw_listing(prefix=self.prefix,
+                    page_size=self.page_size)
+            page = []
+            for elem in listing:
+                if "name" not in elem:
+                    # Pseudo-folder entries have no object data.
+                    continue
+                page.append(elem)
+                if len(page) >= self.page_size:
+                    if not self._put(page):
+                        return
+                    page = []
+            if page and not self._put(page):
+                return
+            self._put(_DONE)
+        except Exception as e:
+            self._put(e)
+
+
+    def _put(self, item):
+        """
+        Queues the item for the writer. Returns False without queueing it if
+        the worker has been stopped.
+        """
+        while not self._halt.is_set():
+            try:
+                self.pages.put(item, timeout=_PUT_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+    def stop(self):
+        """Tells the worker to stop listing, and discards its queued pages."""
+        self._halt.set()
+        while True:
+            try:
+                self.pages.get_nowait()
+            except queue.Empty:
+                return
+
+
+    def __iter__(self):
+        while True:
+            page = self.pages.get()
+            if page is _DONE:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+
+
+
+def export_inventory(client, path, containers=None, format="ndjson",
+        concurrency=1, prefix=None, page_size=None):
+    """
+    Writes a snapshot of the objects in the account to the file at 'path',
+    streaming each container's listing straight to the file so that the
+    whole inventory is never held in memory.
+
+    By default every container in the account is included; pass a list of
+    containers or container names as 'containers' to limit the snapshot to
+    those. If 'prefix' is given, only objects whose names start with it are
+    included. Up to 'concurrency' containers are listed at the same time;
+    their records are still written one container at a time.
+
+    Returns a dict with the number of 'containers' and 'objects' written,
+    and their total 'bytes'.
+    """
+    if format not in FORMATS:
+        raise exc.InvalidInventoryFormat("The format must be one of %s; "
+                "received '%s'." % (", ".join(FORMATS), format))
+    page_size = page_size or DEFAULT_PAGE_SIZE
+    concurrency = max(1, concurrency or 1)
+    if containers is None:
+        names = (info["name"] for info in
+                client._manager.iter_containers_info(page_size=page_size))
+    else:
+        names = set(utils.get_name(cont) for cont in containers)
+        names = iter(sorted(names, key=_utf8))
+    summary = {"containers": 0, "objects": 0, "bytes": 0}
+    compress = format == "columnar" or path.endswith(".gz")
+    workers = []
+    with _open_snapshot(path, "wb", compress=compress) as out:
+
+        def start_next():
+            for name in names:
+                worker = _ListingWorker(client, name, prefix, page_size)
+                worker.start()
+                workers.append(worker)
+                return
+
+        try:
+            for num in range(concurrency):
+                start_next()
+            while workers:
+                worker = workers[0]
+                start_next()
+                summary["containers"] += 1
+                cname = worker.container_name
+                for page in worker:
+                    summary["objects"] += len(page)
+                    summary["bytes"] += sum(elem.get("bytes") or 0
+                            for elem in page)
+                    if format == "ndjson":
+                        for elem in page:
+                            _write_line(out, _record(cname, elem))
+                        continue
+                    for start in range(0, len(page), COLUMNAR_BATCH_SIZE):
+                        batch = page[start:start + COLUMNAR_BATCH_SIZE]
+                        cols = dict((field, [elem.get(field)
+                                for elem in batch]) for field in FIELDS)
+                        cols["container"] = cname
+                        _write_line(out, cols)
+                workers.pop(0)
+        finally:
+            # If the export failed, the workers that are still listing
+            # would otherwise block forever on their full queues.
+            for worker in workers:
+                worker.stop()
+    return summary
+
+
+def read_inventory(path):
+    """
+    Returns a generator that yields the records in the snapshot at 'path',
+    in the order in which they were written. Both formats, compressed or
+    not, are detected automatically.
+    """
+    with _open_snapshot(path, "rb", compress=_is_gzipped(path)) as ff:
+        for line in ff:
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line.decode("utf-8"))
+            if not isinstance(data["name"], list):
+                yield data
+                continue
+            cname = data["container"]
+            for values in zip(*[data[field] for field in FIELDS]):
+                rec = dict(zip(FIELDS, values))
+                rec["container"] = cname
+                yield rec
+
+
+def diff_inventories(old, new):
+    """
+    Compares two snapshots, which may be either file paths or iterables of
+    records, and returns a generator that yields a 2-tuple of (change,
+    record) for every object that differs between them. 'change' is one of:
+
+        added    - the object is only in the new snapshot
+        removed  - the object is only in the old snapshot; the record is
+                   the one from the old snapshot
+        modified - the object is in both, but its size, hash or content
+                   type has changed
+
+    Both snapshots are read in a single pass, so their size is not limited
+    by the available memory.
+    """
+    if isinstance(old, six.string_types):
+        old = read_inventory(old)
+    if isinstance(new, six.string_types):
+        new = read_inventory(new)
+    old = iter(old)
+    new = iter(new)
+    old_rec = next(old, None)
+    new_rec = next(new, None)
+    while old_rec is not None or new_rec is not None:
+        if new_rec is None:
+            yield ("removed", old_rec)
+            old_rec = next(old, None)
+            continue
+        if old_rec is None:
+            yield ("added", new_rec)
+            new_rec = next(new, None)
+            continue
+        old_key = _sort_key(old_rec)
+        new_key = _sort_key(new_rec)
+        if old_key < new_key:
+            yield ("removed", old_rec)
+            old_rec = next(old, None)
+        elif new_key < old_key:
+            yield ("added", new_rec)
+            new_rec = next(new, None)
+        else:
+            if any(old_rec.get(field) != new_rec.get(field)
+                    for field in ("bytes", "hash", "content_type")):
+                yield ("modified", new_rec)
+            old_rec = next(old, None)
+            new_rec = next(new, None)
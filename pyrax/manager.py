@@ -21,9 +21,21 @@
 Base utilities to build API operation managers and objects on top of.
 """
 
+import sys
+import threading
+
+import six
+
 import pyrax.exceptions as exc
+from pyrax.pagination import Paginator
 import pyrax.utils as utils
 
+# Default number of concurrent GETs made by load_all().
+DEFAULT_LOAD_CONCURRENCY = 10
+# Number of items requested in each page when findall() and build_index()
+# page through a listing.
+LIST_PAGE_SIZE = 1000
+
 
 # Python 2.4 compat
 try:
@@ -43,11 +55,17 @@ class BaseManager(object):
     response_key = None
     plural_response_key = None
     uri_base = None
-    _hooks_map = {}
+    detail_uri = None
+    # For managers whose API pages their listing with a 'marker', the
+    # attribute of the last item in a page that list() takes as the marker
+    # for the next one. When this is None, the listing is fetched as a single
+    # page, unless the manager overrides _fetch_page().
+    marker_attribute = None
+    _index = None
 
 
     def __init__(self, api, resource_class=None, response_key=None,
-            plural_response_key=None, uri_base=None):
+            plural_response_key=None, uri_base=None, detail_uri=None):
         self.api = api
         self.resource_class = resource_class
         self.response_key = response_key
@@ -56,6 +74,16 @@ class BaseManager(object):
             # Default to adding 's'
             self.plural_response_key = "%ss" % response_key
         self.uri_base = uri_base
+        # Some APIs, such as Cinder's '/volumes/detail', offer a listing of
+        # the full details of their resources; load_all() uses it if set.
+        self.detail_uri = detail_uri
+        # The number of lazy-load GETs made for this manager's resources, by
+        # resource class name.
+        self.lazy_loads = {}
+        self._lazy_load_lock = threading.Lock()
+        # The functions run by run_hooks(), by hook type.
+        self._hooks_map = {}
+        self._hooks_lock = threading.Lock()
 
 
     def list(self, limit=None, marker=None, return_raw=False, other_keys=None):
@@ -165,6 +193,78 @@ class BaseManager(object):
             return ret
 
 
+    def load_all(self, resources, concurrency=None):
+        """
+        Loads the full details of every resource in 'resources' that has not
+        been loaded yet, so that reading their attributes doesn't make a
+        separate GET for each one. Returns the resources as a list.
+
+        If the manager has a 'detail_uri', the details are read from that
+        listing, a page at a time, until all the resources have been found.
+        Any that aren't found there, or all of them if there is no such
+        listing, are fetched with up to 'concurrency' GETs at a time. If any
+        of those fail, the first exception is raised once the rest are done.
+        """
+        resources = list(resources)
+        pending = []
+        for res in resources:
+            if res.loaded:
+                continue
+            if not res.get_details:
+                res.loaded = True
+                continue
+            pending.append(res)
+        if pending and self.detail_uri:
+            pending = self._load_from_detail_listing(pending)
+        if not pending:
+            return resources
+        concurrency = concurrency or DEFAULT_LOAD_CONCURRENCY
+        if concurrency == 1 or len(pending) == 1:
+            for res in pending:
+                res.get()
+            return resources
+        errors = []
+
+        def load(res):
+            try:
+                res.get()
+            except Exception:
+                errors.append(sys.exc_info())
+
+        utils.run_in_workers(load, ((res,) for res in pending),
+                min(concurrency, len(pending)))
+        if errors:
+            six.reraise(*errors[0])
+        return resources
+
+
+    def _load_from_detail_listing(self, resources):
+        """
+        Adds the details for the resources from the pages of the detail
+        listing, and returns those that weren't in it.
+        """
+        by_id = dict((utils.get_id(res), res) for res in resources)
+        marker = None
+        while by_id:
+            uri = "/%s" % self.detail_uri
+            if marker is not None:
+                uri = "%s?marker=%s" % (uri, marker)
+            resp, resp_body = self.api.method_get(uri)
+            data = self._data_from_response(resp_body)
+            if not data:
+                break
+            for info in data:
+                res = by_id.pop(info.get("id"), None)
+                if res is not None:
+                    res._add_details(info)
+                    res.loaded = True
+            last_id = data[-1].get("id")
+            if last_id is None or last_id == marker:
+                break
+            marker = last_id
+        return list(by_id.values())
+
+
     def _data_from_response(self, resp_body, key=None):
         """
         This works for most API responses, but some don't structure their
@@ -257,10 +357,8 @@ class BaseManager(object):
 
     def find(self, **kwargs):
         """
-        Finds a single item with attributes matching ``**kwargs``.
-
-        This isn't very efficient: it loads the entire list then filters on
-        the Python side.
+        Finds a single item with attributes matching ``**kwargs``. See
+        findall() for how the items are searched.
         """
         matches = self.findall(**kwargs)
         num_matches = len(matches)
@@ -279,32 +377,153 @@ class BaseManager(object):
         """
         Finds all items with attributes matching ``**kwargs``.
 
-        This isn't very efficient: it loads the entire list then filters on
-        the Python side.
+        If an index has been built with build_index() for any of the
+        attributes, the matches are looked up in it. Otherwise the listing
+        is searched a page at a time, with any filters that the API supports
+        passed to list() so that only the candidate items are returned; the
+        rest are checked on the Python side.
         """
+        candidates = self._indexed_candidates(kwargs)
+        if candidates is not None:
+            return [obj for obj in candidates if self._matches(obj, kwargs)]
+        params, searches = self._findall_params(kwargs)
         found = []
-        searches = kwargs.items()
+        for page in self._list_pages(**params):
+            found.extend(obj for obj in page if self._matches(obj, searches))
+        return found
+
+
+    @staticmethod
+    def _matches(obj, searches):
+        try:
+            return all(getattr(obj, attr) == value
+                    for (attr, value) in searches.items())
+        except AttributeError:
+            return False
 
-        for obj in self.list():
+
+    def _findall_params(self, searches):
+        """
+        Splits the findall() searches into the parameters to pass to list()
+        for the filters that the API can apply, and the searches that still
+        have to be checked for each listed item. Managers whose APIs support
+        filtering override this.
+        """
+        return {}, searches
+
+
+    def paginate(self, page_size=None, limit=None, marker=None,
+            prefetch=False, **params):
+        """
+        Returns a Paginator that lazily iterates over every item in the
+        listing, requesting 'page_size' items at a time, and stopping after
+        'limit' items if that is given. Any other parameters are passed to
+        list(). If 'prefetch' is True, each page is requested in a background
+        thread while the page before it is being consumed.
+        """
+        fetch = lambda mark, size: self._fetch_page(mark, size, **params)
+        return Paginator(fetch, marker=marker, page_size=page_size,
+                limit=limit, prefetch=prefetch)
+
+
+    def _fetch_page(self, marker, page_size, **params):
+        """
+        Returns a page of the listing starting after 'marker', along with the
+        marker for the next page, or None if this is the last one. A page with
+        fewer than 'page_size' items is the last one, so 'page_size' should
+        not be more than the API returns in a page. If no 'page_size' is
+        given, the listing is not paged. Managers whose APIs page their
+        listings differently override this.
+        """
+        if not self.marker_attribute or page_size is None:
+            # The whole listing is one page.
+            return self.list(**params), None
+        if marker is not None:
+            params["marker"] = marker
+        params["limit"] = page_size
+        page = self.list(**params)
+        if len(page) < page_size:
+            return page, None
+        last = getattr(page[-1], self.marker_attribute, None)
+        if last is None:
+            return page, None
+        if last == marker:
+            # The API ignored the marker.
+            return [], None
+        return page, last
+
+
+    def _list_pages(self, **params):
+        """
+        Yields the pages of the listing, fetching each one as it is needed.
+        """
+        return self.paginate(page_size=LIST_PAGE_SIZE, **params).pages()
+
+
+    def build_index(self, *attributes):
+        """
+        Lists all the items, and indexes them by their values for each of the
+        'attributes', so that find() and findall() searches on any of them
+        are answered from memory instead of making API calls. The index is
+        not updated as items change; call this again to rebuild it, or call
+        clear_index() to go back to listing the items for each search.
+        """
+        index = dict((attr, {}) for attr in attributes)
+        for page in self._list_pages():
+            for obj in page:
+                for attr, values in index.items():
+                    try:
+                        values.setdefault(getattr(obj, attr), []).append(obj)
+                    except (AttributeError, TypeError):
+                        # Missing or unhashable values can't be looked up.
+                        continue
+        self._index = index
+
+
+    def clear_index(self):
+        """Discards the index built by build_index()."""
+        self._index = None
+
+
+    def _indexed_candidates(self, searches):
+        """
+        Returns the items from the index whose value matches that of one of
+        the searches, or None if none of the searched attributes are indexed.
+        """
+        if not self._index:
+            return None
+        for attr, value in searches.items():
+            values = self._index.get(attr)
+            if values is None:
+                continue
             try:
-                if all(getattr(obj, attr) == value
-                        for (attr, value) in searches):
-                    found.append(obj)
-            except AttributeError:
+                return values.get(value, [])
+            except TypeError:
                 continue
-        return found
+        return None
+
 
+    def count_lazy_load(self, resource):
+        """
+        Counts a GET made to load the full details of 'resource' when one of
+        its attributes was missing.
+        """
+        name = resource.__class__.__name__
+        with self._lazy_load_lock:
+            self.lazy_loads[name] = self.lazy_loads.get(name, 0) + 1
 
-    @classmethod
-    def add_hook(cls, hook_type, hook_func):
-        if hook_type not in cls._hooks_map:
-            cls._hooks_map[hook_type] = []
 
-        cls._hooks_map[hook_type].append(hook_func)
+    def add_hook(self, hook_type, hook_func):
+        """
+        Adds 'hook_func' to the functions that this manager calls for
+        'hook_type', such as "modify_body_for_create".
+        """
+        with self._hooks_lock:
+            self._hooks_map.setdefault(hook_type, []).append(hook_func)
 
 
-    @classmethod
-    def run_hooks(cls, hook_type, *args, **kwargs):
-        hook_funcs = cls._hooks_map.get(hook_type) or []
+    def run_hooks(self, hook_type, *args, **kwargs):
+        with self._hooks_lock:
+            hook_funcs = list(self._hooks_map.get(hook_type, []))
         for hook_func in hook_funcs:
             hook_func(*args, **kwargs)
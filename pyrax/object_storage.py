@@ -20,10 +20,16 @@
 
 from __future__ import print_function
 from __future__ import absolute_import
+import atexit
+import calendar
+import collections
 import datetime
+from functools import partial
 from functools import wraps
 import hashlib
+import heapq
 import hmac
+import itertools
 import json
 import logging
 import math
@@ -31,15 +37,26 @@ import mimetypes
 import os
 import re
 import six
+import tempfile
 import threading
 import time
 import uuid
+import weakref
+
 
 import pyrax
 from pyrax.client import BaseClient
 import pyrax.exceptions as exc
+import pyrax.inventory as inventory
 from pyrax.manager import BaseManager
 from pyrax.resource import BaseResource
+from pyrax.transfer import BandwidthLimiter
+from pyrax.transfer import get_bandwidth_limiter
+from pyrax.transfer import ProgressReader
+from pyrax.transfer import throttle_iter
+from pyrax.transfer import ThrottledReader
+from pyrax.transfer import TransferJob
+from pyrax.transfer import TransferManager
 import pyrax.utils as utils
 
 ACCOUNT_META_PREFIX = "X-Account-Meta-"
@@ -51,8 +68,47 @@ OBJECT_META_PREFIX = "X-Object-Meta-"
 MAX_FILE_SIZE = 5368709119
 # Default size for chunked uploads, in bytes
 DEFAULT_CHUNKSIZE = 65536
+# Default size of the segments that streamed uploads are split into, in bytes
+DEFAULT_SEGMENT_SIZE = 104857600
+# Default number of segments of a streamed upload that are sent at once
+DEFAULT_UPLOAD_CONCURRENCY = 4
+# Size of the ranges in which objects are streamed to disk when a container
+# is synced to a folder, in bytes
+DEFAULT_DOWNLOAD_CHUNKSIZE = 8388608
+# Default number of objects downloaded at once when a container is synced to
+# a folder
+DEFAULT_DOWNLOAD_CONCURRENCY = 4
+# Default number of concurrent requests made by bulk metadata updates
+DEFAULT_BULK_CONCURRENCY = 10
 # The default for CDN when TTL is not specified.
 DEFAULT_CDN_TTL = 86400
+# Seconds that CDN settings fetched by prefetch_cdn_data() are reused
+DEFAULT_CDN_CACHE_TTL = 60
+# Maps the keys of the CDN container listing to the equivalent headers
+# returned for a single container.
+_CDN_LISTING_HEADERS = {"cdn_enabled": "X-Cdn-Enabled",
+        "cdn_uri": "X-Cdn-Uri",
+        "ttl": "X-Ttl",
+        "cdn_ssl_uri": "X-Cdn-Ssl-Uri",
+        "cdn_streaming_uri": "X-Cdn-Streaming-Uri",
+        "cdn_ios_uri": "X-Cdn-Ios-Uri",
+        "log_retention": "X-Log-Retention",
+        }
+# Default number of CDN purge requests sent per second by a CDNPurgeQueue
+DEFAULT_PURGE_RATE = 1
+# Seconds a queued purge waits, so that repeated purges of the same object
+# can be combined into one request
+DEFAULT_PURGE_WINDOW = 5
+# Number of times a purge is retried when the CDN reports that the request
+# limit has been exceeded, and the initial delay before retrying, in seconds
+DEFAULT_PURGE_RETRIES = 5
+DEFAULT_PURGE_RETRY_DELAY = 2
+# Seconds the CDNPurgeQueue worker thread waits for new purges before exiting
+PURGE_IDLE_TIMEOUT = 1
+# Most seconds spent sending the queued CDN purges when the program exits
+PURGE_EXIT_TIMEOUT = 10
+# Number of the most recent failed purges that a CDNPurgeQueue reports
+MAX_PURGE_FAILURES = 100
 # When comparing files dates, represents a date older than anything.
 EARLY_DATE_STR = "1900-01-01T00:00:00"
 
@@ -110,9 +166,7 @@ def _validate_file_or_path(file_or_path, obj_name):
 def _valid_upload_key(fnc):
     @wraps(fnc)
     def wrapped(self, upload_key, *args, **kwargs):
-        try:
-            self.folder_upload_status[upload_key]
-        except KeyError:
+        if self.transfer_manager.get_job(upload_key) is None:
             raise exc.InvalidUploadID("There is no folder upload with the "
                     "key '%s'." % upload_key)
         return fnc(self, upload_key, *args, **kwargs)
@@ -154,6 +208,166 @@ def get_file_size(fileobj):
     return total_size
 
 
+def _run_bulk(func, items, concurrency=None, transform=None):
+    """
+    Calls func(item, value) for each (item, value) pair in 'items', using up
+    to 'concurrency' threads, and returns a dict summarizing the results.
+    If 'transform' is given, each value is first replaced by the result of
+    transform(value); an exception raised by it is recorded as a failure of
+    that item. Pairs whose value is None are skipped. 'items' is consumed as
+    the calls complete, so it can be a generator of any length.
+
+    The summary has the number of items processed ('total'), and how many
+    were 'updated', 'skipped' or 'failed'. 'failures' is a list of
+    (name, exception) 2-tuples for the failed items, and 'elapsed' and
+    'per_second' report the overall throughput.
+    """
+    concurrency = concurrency or DEFAULT_BULK_CONCURRENCY
+    summary = {"total": 0,
+            "updated": 0,
+            "skipped": 0,
+            "failed": 0,
+            "failures": [],
+            }
+    lock = threading.Lock()
+
+    def failed(item, e):
+        with lock:
+            summary["failed"] += 1
+            summary["failures"].append((utils.get_name(item), e))
+
+    def call(item, value):
+        try:
+            func(item, value)
+            with lock:
+                summary["updated"] += 1
+        except Exception as e:
+            failed(item, e)
+
+    def pending():
+        for item, value in items:
+            summary["total"] += 1
+            if transform is not None:
+                try:
+                    value = transform(value)
+                except Exception as e:
+                    failed(item, e)
+                    continue
+            if value is None:
+                summary["skipped"] += 1
+                continue
+            yield (item, value)
+
+    start = time.time()
+    utils.run_in_workers(call, pending(), concurrency)
+    elapsed = time.time() - start
+    summary["elapsed"] = elapsed
+    summary["per_second"] = (summary["updated"] / elapsed) if elapsed else 0.0
+    return summary
+
+
+def _iter_stream(stream, chunk_size=None):
+    """
+    Yields successive non-empty chunks of bytes from 'stream', which can be
+    either a file-like object, such as a pipe, or any iterable of bytes.
+    """
+    if hasattr(stream, "read"):
+        chunk_size = chunk_size or DEFAULT_CHUNKSIZE
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for chunk in stream:
+            if chunk:
+                yield chunk
+
+
+
+def _unthrottled(fileobj):
+    """
+    Returns the file that 'fileobj' reads from, without any ThrottledReader
+    wrapped around it.
+    """
+    while isinstance(fileobj, ThrottledReader):
+        fileobj = fileobj.fileobj
+    return fileobj
+
+
+def _is_throttled(content):
+    """
+    Returns True if reading from 'content' already goes through a
+    ThrottledReader, either directly or as a FileSegment of one.
+    """
+    while content is not None:
+        if isinstance(content, ThrottledReader):
+            return True
+        content = getattr(content, "fileobj", None)
+    return False
+
+
+def _local_checksum(content):
+    """
+    Returns the MD5 of the content. Files are read directly rather than
+    through any ThrottledReader, since local reads should neither count
+    against the bandwidth limit nor be reported as transfer progress.
+    """
+    if isinstance(content, FileSegment):
+        content = FileSegment(_unthrottled(content.fileobj), content.offset,
+                content.length)
+    return utils.get_checksum(_unthrottled(content))
+
+
+
+class FileSegment(object):
+    """
+    Read-only file-like view of a range of bytes within an open file. Reads
+    are passed directly through to the underlying file, so a segment of a
+    large file can be checksummed and uploaded without first copying it to a
+    temporary file, and without holding more than a single read buffer in
+    memory.
+
+    The 'tell()' and 'seek()' positions are relative to the start of the
+    segment, and reads never go past its end. Since the underlying file's
+    position is moved on every read, segments sharing the same file must not
+    be read concurrently.
+    """
+    def __init__(self, fileobj, offset, length):
+        self.fileobj = fileobj
+        self.offset = offset
+        self.length = length
+        self._pos = 0
+
+
+    def __len__(self):
+        return self.length
+
+
+    def tell(self):
+        return self._pos
+
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self._pos
+        elif whence == 2:
+            pos += self.length
+        self._pos = max(0, min(pos, self.length))
+
+
+    def read(self, size=-1):
+        remaining = self.length - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b""
+        self.fileobj.seek(self.offset + self._pos)
+        data = self.fileobj.read(size)
+        self._pos += len(data)
+        return data
+
+
 
 class Container(BaseResource):
     def __init__(self, *args, **kwargs):
@@ -210,6 +424,15 @@ class Container(BaseResource):
             headers = self.manager.fetch_cdn_data(self)
         else:
             headers = {}
+        self._set_cdn_data(headers)
+
+
+    def _set_cdn_data(self, headers):
+        """
+        Sets the container's CDN attributes from the headers returned by the
+        CDN service. An empty dict means that the container is not
+        CDN-enabled.
+        """
         # Set defaults in case not all headers are present.
         self._set_cdn_defaults()
         if not headers:
@@ -219,7 +442,9 @@ class Container(BaseResource):
             self._cdn_enabled = True
         for key, value in headers.items():
             low_key = key.lower()
-            if low_key == "x-cdn-uri":
+            if low_key == "x-cdn-enabled":
+                self._cdn_enabled = ("%s" % value).lower() == "true"
+            elif low_key == "x-cdn-uri":
                 self._cdn_uri = value
             elif low_key == "x-ttl":
                 self._cdn_ttl = int(value)
@@ -329,29 +554,35 @@ class Container(BaseResource):
 
 
     def list(self, marker=None, limit=None, prefix=None, delimiter=None,
-            end_marker=None, full_listing=False, return_raw=False):
+            end_marker=None, full_listing=False, return_raw=False,
+            compact=False):
         """
         List the objects in this container, using the parameters to control the
         number and content of objects. Note that this is limited by the
         absolute request limits of Swift (currently 10,000 objects). If you
         need to list all objects in the container, use the `list_all()` method
         instead.
+
+        If 'compact' is True, lightweight StorageObjectRecord instances are
+        returned instead of StorageObjects.
         """
         if full_listing:
-            return self.list_all(prefix=prefix)
+            return self.list_all(prefix=prefix, compact=compact)
         else:
             return self.object_manager.list(marker=marker, limit=limit,
                     prefix=prefix, delimiter=delimiter, end_marker=end_marker,
-                    return_raw=return_raw)
+                    return_raw=return_raw, compact=compact)
 
 
-    def list_all(self, prefix=None):
+    def list_all(self, prefix=None, compact=False):
         """
         List all the objects in this container, optionally filtered by an
         initial prefix. Returns an iterator that will yield all the objects in
         the container, even if the number exceeds the absolute limits of Swift.
+        If 'compact' is True, it yields StorageObjectRecord instances.
         """
-        return self.manager.object_listing_iterator(self, prefix=prefix)
+        return self.manager.object_listing_iterator(self, prefix=prefix,
+                compact=compact)
 
 
     def list_object_names(self, marker=None, limit=None, prefix=None,
@@ -477,6 +708,30 @@ class Container(BaseResource):
                 return_none=return_none)
 
 
+    def upload_stream(self, obj_name, stream, segment_size=None,
+            concurrency=None, manifest="dlo", content_type=None,
+            content_encoding=None, ttl=None, metadata=None, headers=None,
+            return_none=False):
+        """
+        Uploads data whose total size is not known in advance, such as the
+        output of a pipe or a generator, to the object 'obj_name'. The
+        'stream' can be either a file-like object or any iterable that yields
+        bytes.
+
+        The data is split into segments of 'segment_size' bytes, which are
+        uploaded in the background as they fill up, with at most
+        'concurrency' segments being sent at the same time. A manifest that
+        joins the segments is then written to 'obj_name'; this is a Dynamic
+        Large Object manifest unless `manifest="slo"` is passed. If all of the
+        data fits in a single segment, it is stored directly in 'obj_name'.
+        """
+        return self.object_manager.upload_stream(obj_name, stream,
+                segment_size=segment_size, concurrency=concurrency,
+                manifest=manifest, content_type=content_type,
+                content_encoding=content_encoding, ttl=ttl, metadata=metadata,
+                headers=headers, return_none=return_none)
+
+
     def fetch(self, obj, include_meta=False, chunk_size=None, size=None,
             extra_info=None):
         """
@@ -687,6 +942,17 @@ class Container(BaseResource):
                 prefix=prefix)
 
 
+    def bulk_set_object_metadata(self, items=None, name_prefix=None,
+            transform=None, clear=False, prefix=None, concurrency=None):
+        """
+        Updates the metadata of many objects in this container at once. See
+        StorageObjectManager.bulk_set_metadata() for details.
+        """
+        return self.object_manager.bulk_set_metadata(items=items,
+                name_prefix=name_prefix, transform=transform, clear=clear,
+                prefix=prefix, concurrency=concurrency)
+
+
     def list_subdirs(self, marker=None, limit=None, prefix=None, delimiter=None,
             full_listing=False):
         """
@@ -784,6 +1050,13 @@ class Container(BaseResource):
 
 
 class ContainerManager(BaseManager):
+    # Seconds that the CDN settings fetched by prefetch_cdn_data() are used
+    # in place of requesting each container's settings separately.
+    cdn_cache_ttl = DEFAULT_CDN_CACHE_TTL
+    # An (expiration_time, {container_name: headers}) 2-tuple, or None.
+    _cdn_cache = None
+    marker_attribute = "name"
+
     def list(self, limit=None, marker=None, end_marker=None, prefix=None):
         """
         Swift doesn't return listings in the same format as the rest of
@@ -854,6 +1127,7 @@ class ContainerManager(BaseManager):
             self.api.bulk_delete(container, nms, async=False)
         uri = "/%s" % utils.get_name(container)
         resp, resp_body = self.api.method_delete(uri)
+        self.clear_cdn_cache()
 
 
     def _create_body(self, name, *args, **kwargs):
@@ -870,6 +1144,9 @@ class ContainerManager(BaseManager):
         container. If the container is not CDN-enabled, returns an empty dict.
         """
         name = utils.get_name(container)
+        cached = self._get_cached_cdn_data()
+        if cached is not None:
+            return cached.get(name, {})
         uri = "/%s" % name
         try:
             resp, resp_body = self.api.cdn_request(uri, "HEAD")
@@ -878,6 +1155,71 @@ class ContainerManager(BaseManager):
         return resp.headers
 
 
+    def _get_cached_cdn_data(self):
+        """
+        Returns the dict of CDN headers by container name fetched by the last
+        call to prefetch_cdn_data(), or None if it has expired.
+        """
+        cache = self._cdn_cache
+        if cache and cache[0] > time.time():
+            return cache[1]
+        return None
+
+
+    def clear_cdn_cache(self):
+        """
+        Discards the CDN settings fetched by prefetch_cdn_data(), so that they
+        are requested from the CDN service again when next needed.
+        """
+        self._cdn_cache = None
+
+
+    def iter_cdn_containers_info(self, page_size=None):
+        """
+        Returns a generator that yields a dict with the CDN settings of every
+        container in the account that has been CDN-enabled, requesting further
+        pages of the CDN container listing as needed. Each dict has the keys
+        'name', 'cdn_enabled', 'cdn_uri', 'cdn_ssl_uri', 'cdn_streaming_uri',
+        'cdn_ios_uri', 'ttl' and 'log_retention'.
+        """
+        marker = None
+        while True:
+            qs = utils.dict_to_qs({"format": "json", "limit": page_size,
+                    "marker": marker})
+            resp, page = self.api.cdn_request("/?%s" % qs, "GET")
+            if not page:
+                return
+            for info in page:
+                yield info
+            if page_size and len(page) < page_size:
+                return
+            marker = page[-1]["name"]
+
+
+    def prefetch_cdn_data(self, containers=None, page_size=None):
+        """
+        Fetches the CDN settings of every container in the account from the
+        CDN container listing, which takes one request per page instead of
+        one HEAD request per container. The settings are cached for
+        'cdn_cache_ttl' seconds, during which any container loading its CDN
+        attributes uses them instead of making its own request. If a list of
+        Container objects is passed as 'containers', their CDN attributes are
+        set immediately.
+
+        Returns a dict mapping the names of the CDN-enabled containers to
+        their CDN headers.
+        """
+        cdn_data = {}
+        for info in self.iter_cdn_containers_info(page_size=page_size):
+            cdn_data[info["name"]] = dict((hdr, "%s" % info[key])
+                    for key, hdr in _CDN_LISTING_HEADERS.items()
+                    if info.get(key) is not None)
+        self._cdn_cache = (time.time() + self.cdn_cache_ttl, cdn_data)
+        for container in containers or []:
+            container._set_cdn_data(cdn_data.get(container.name, {}))
+        return cdn_data
+
+
     def get_account_headers(self):
         """
         Return the headers for the account. This includes all the headers, not
@@ -1012,6 +1354,26 @@ class ContainerManager(BaseManager):
         return 200 <= resp.status_code <= 299
 
 
+    def bulk_set_metadata(self, items, clear=False, prefix=None,
+            concurrency=None):
+        """
+        Updates the metadata of many containers at once. 'items' is an
+        iterable of (container, metadata) 2-tuples; each is applied as in
+        set_metadata(), with up to 'concurrency' requests being made at the
+        same time. Since container metadata is merged by the server, no HEAD
+        request is needed unless 'clear' is True.
+
+        Returns a dict summarizing the results, including a list of the
+        'failures' as (name, exception) 2-tuples, and the overall throughput
+        as 'per_second'.
+        """
+        def update(container, metadata):
+            self.set_metadata(container, metadata, clear=clear,
+                    prefix=prefix)
+
+        return _run_bulk(update, items, concurrency=concurrency)
+
+
     def remove_metadata_key(self, container, key):
         """
         Removes the specified key from the container's metadata. If the key
@@ -1085,6 +1447,7 @@ class ContainerManager(BaseManager):
                     ", ".join(bad))
         uri = "%s/%s" % (self.uri_base, utils.get_name(container))
         resp, resp_body = self.api.cdn_request(uri, "POST", headers=hdrs)
+        self.clear_cdn_cache()
         return resp
 
 
@@ -1151,6 +1514,24 @@ class ContainerManager(BaseManager):
         return resp_body
 
 
+    def iter_containers_info(self, page_size=None):
+        """
+        Returns a generator that yields the info dict for every container in
+        the account, as described in list_containers_info(), requesting
+        further pages of the listing as needed.
+        """
+        marker = None
+        while True:
+            page = self.list_containers_info(limit=page_size, marker=marker)
+            if not page:
+                return
+            for info in page:
+                yield info
+            if page_size and len(page) < page_size:
+                return
+            marker = page[-1]["name"]
+
+
     def list_public_containers(self):
         """
         Returns a list of the names of all CDN-enabled containers.
@@ -1186,6 +1567,7 @@ class ContainerManager(BaseManager):
             headers["X-Ttl"] = ttl
         self.api.cdn_request("/%s" % utils.get_name(container), method="PUT",
                 headers=headers)
+        self.clear_cdn_cache()
 
 
     @_handle_container_not_found
@@ -1208,6 +1590,7 @@ class ContainerManager(BaseManager):
         headers = {"X-Log-Retention": "%s" % enabled}
         self.api.cdn_request("/%s" % utils.get_name(container), method="PUT",
                 headers=headers)
+        self.clear_cdn_cache()
 
 
     @_handle_container_not_found
@@ -1271,21 +1654,30 @@ class ContainerManager(BaseManager):
         return container.purge_cdn_object(obj, email_addresses=email_addresses)
 
 
+    def _findall_params(self, searches):
+        """Lists only the containers whose names start with a searched name."""
+        if "name" in searches:
+            return {"prefix": searches["name"]}, searches
+        return {}, searches
+
+
     @assure_container
     def list_objects(self, container, limit=None, marker=None, prefix=None,
-            delimiter=None, end_marker=None, full_listing=False):
+            delimiter=None, end_marker=None, full_listing=False,
+            compact=False):
         """
         Return a list of StorageObjects representing the objects in this
         container. You can use the marker, end_marker, and limit params to
         handle pagination, and the prefix and delimiter params to filter the
         objects returned. By default only the first 10,000 objects are
         returned; if you need to access more than that, set the 'full_listing'
-        parameter to True.
+        parameter to True. If 'compact' is True, StorageObjectRecords are
+        returned instead of StorageObjects.
         """
         if full_listing:
-            return container.list_all(prefix=prefix)
+            return container.list_all(prefix=prefix, compact=compact)
         return container.list(limit=limit, marker=marker, prefix=prefix,
-                delimiter=delimiter, end_marker=end_marker)
+                delimiter=delimiter, end_marker=end_marker, compact=compact)
 
 
     @assure_container
@@ -1304,12 +1696,17 @@ class ContainerManager(BaseManager):
 
 
     @assure_container
-    def object_listing_iterator(self, container, prefix=None):
+    def object_listing_iterator(self, container, prefix=None, compact=False,
+            prefetch=False):
         """
         Returns an iterator that can be used to access the objects within this
-        container. They can be optionally limited by a prefix.
+        container. They can be optionally limited by a prefix. If 'compact' is
+        True, the iterator yields StorageObjectRecords. If 'prefetch' is True,
+        each page of the listing is requested while the previous one is being
+        consumed.
         """
-        return StorageObjectIterator(container.object_manager, prefix=prefix)
+        return StorageObjectIterator(container.object_manager, prefix=prefix,
+                compact=compact, prefetch=prefetch)
 
 
     @assure_container
@@ -1376,6 +1773,31 @@ class ContainerManager(BaseManager):
                 return_none=return_none)
 
 
+    @assure_container
+    def upload_stream(self, container, obj_name, stream, segment_size=None,
+            concurrency=None, manifest="dlo", content_type=None,
+            content_encoding=None, ttl=None, metadata=None, headers=None,
+            return_none=False):
+        """
+        Uploads data whose total size is not known in advance, such as the
+        output of a pipe or a generator, to the object 'obj_name'. The
+        'stream' can be either a file-like object or any iterable that yields
+        bytes.
+
+        The data is split into segments of 'segment_size' bytes, which are
+        uploaded in the background as they fill up, with at most
+        'concurrency' segments being sent at the same time. A manifest that
+        joins the segments is then written to 'obj_name'; this is a Dynamic
+        Large Object manifest unless `manifest="slo"` is passed. If all of the
+        data fits in a single segment, it is stored directly in 'obj_name'.
+        """
+        return container.upload_stream(obj_name, stream,
+                segment_size=segment_size, concurrency=concurrency,
+                manifest=manifest, content_type=content_type,
+                content_encoding=content_encoding, ttl=ttl, metadata=metadata,
+                headers=headers, return_none=return_none)
+
+
     @assure_container
     def fetch_object(self, container, obj, include_meta=False,
             chunk_size=None, size=None, extra_info=None):
@@ -1553,6 +1975,19 @@ class ContainerManager(BaseManager):
                 prefix=prefix)
 
 
+    @assure_container
+    def bulk_set_object_metadata(self, container, items=None,
+            name_prefix=None, transform=None, clear=False, prefix=None,
+            concurrency=None):
+        """
+        Updates the metadata of many objects in the specified container at
+        once. See StorageObjectManager.bulk_set_metadata() for details.
+        """
+        return container.bulk_set_object_metadata(items=items,
+                name_prefix=name_prefix, transform=transform, clear=clear,
+                prefix=prefix, concurrency=concurrency)
+
+
 
 class StorageObject(BaseResource):
     """
@@ -1729,13 +2164,92 @@ class StorageObject(BaseResource):
 
 
 
+class StorageObjectRecord(object):
+    """
+    A compact, read-only record of an object in a container listing.
+
+    StorageObjects keep their attributes in a per-instance dict as well as a
+    copy of the listing dict, which adds up for listings of millions of
+    objects. These records only hold the fields that Swift returns in a
+    listing, in slots. Call to_object() to get a full StorageObject for the
+    object.
+    """
+    __slots__ = ("manager", "name", "bytes", "hash", "content_type",
+            "last_modified")
+
+    def __init__(self, manager, info):
+        self.manager = manager
+        name = info.get("name")
+        if name is None and "subdir" in info:
+            # Subdir dicts lack a 'name' and 'content_type' key
+            self.name = info["subdir"]
+            self.content_type = "pseudo/subdirectory"
+        else:
+            self.name = name
+            self.content_type = info.get("content_type")
+        self.bytes = info.get("bytes")
+        self.hash = info.get("hash")
+        self.last_modified = info.get("last_modified")
+
+
+    def __repr__(self):
+        return "<ObjectRecord '%s' (%s)>" % (self.name, self.content_type)
+
+
+    def __eq__(self, other):
+        return (isinstance(other, StorageObjectRecord) and
+                self.to_dict() == other.to_dict())
+
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+    @property
+    def id(self):
+        """Objects use their 'name' attribute as their ID."""
+        return self.name
+
+
+    @property
+    def total_bytes(self):
+        return self.bytes
+
+
+    @property
+    def etag(self):
+        return self.hash
+
+
+    @property
+    def container(self):
+        return self.manager.container
+
+
+    def to_dict(self):
+        """Returns the record as a listing dict."""
+        return {"name": self.name, "bytes": self.bytes, "hash": self.hash,
+                "content_type": self.content_type,
+                "last_modified": self.last_modified}
+
+
+    def to_object(self):
+        """Returns a StorageObject for the object in this record."""
+        return StorageObject(self.manager, self.to_dict())
+
+
+
 class StorageObjectIterator(utils.ResultsIterator):
     """
     Allows you to iterate over all the objects in a container, even if they
-    exceed the limit for any single listing call.
+    exceed the limit for any single listing call. Pass compact=True to get
+    StorageObjectRecords instead of StorageObjects.
     """
     def _init_methods(self):
-        self.list_method = self.manager.list
+        if getattr(self, "compact", False):
+            self.list_method = partial(self.manager.list, compact=True)
+        else:
+            self.list_method = self.manager.list
         # Swift uses the object name as its ID.
         self.marker_att = "name"
 
@@ -1745,6 +2259,8 @@ class StorageObjectManager(BaseManager):
     """
     Handles all the interactions with StorageObjects.
     """
+    marker_attribute = "name"
+
     @property
     def name(self):
         """The URI base is the same as the container name."""
@@ -1762,7 +2278,12 @@ class StorageObjectManager(BaseManager):
 
 
     def list(self, marker=None, limit=None, prefix=None, delimiter=None,
-            end_marker=None, return_raw=False):
+            end_marker=None, return_raw=False, compact=False):
+        """
+        Returns a list of the objects in the container, as StorageObjects,
+        or as StorageObjectRecords if 'compact' is True. If 'return_raw' is
+        True, the listing dicts are returned as they were received.
+        """
         uri = "/%s" % self.uri_base
         qs = utils.dict_to_qs({"marker": marker, "limit": limit,
                 "prefix": prefix, "delimiter": delimiter,
@@ -1772,10 +2293,40 @@ class StorageObjectManager(BaseManager):
         resp, resp_body = self.api.method_get(uri)
         if return_raw:
             return resp_body
+        if compact:
+            return [StorageObjectRecord(self, elem) for elem in resp_body]
         objs = [StorageObject(self, elem) for elem in resp_body]
         return objs
 
 
+    def _findall_params(self, searches):
+        """Lists only the objects whose names start with a searched name."""
+        if "name" in searches:
+            return {"prefix": searches["name"]}, searches
+        return {}, searches
+
+
+    def iter_raw_listing(self, prefix=None, page_size=None):
+        """
+        Returns a generator that yields the raw listing dict for every object
+        in the container, without creating StorageObject instances for them.
+        Further pages of the listing are requested as needed, so the listing
+        is never held in memory all at once.
+        """
+        marker = None
+        while True:
+            page = self.list(marker=marker, limit=page_size, prefix=prefix,
+                    return_raw=True)
+            if not page:
+                return
+            for elem in page:
+                yield elem
+            if page_size and len(page) < page_size:
+                return
+            last = page[-1]
+            marker = last.get("name", last.get("subdir"))
+
+
     @_handle_object_not_found
     def get(self, obj):
         """
@@ -1893,27 +2444,29 @@ class StorageObjectManager(BaseManager):
                 fsize = get_file_size(content)
             else:
                 fsize = content_length
-        if fsize <= MAX_FILE_SIZE:
-            # We can just upload it as-is.
+        if fsize is None or fsize <= MAX_FILE_SIZE:
+            # We can just upload it as-is. Streams of unknown length are
+            # sent as-is, too; use upload_stream() for those that may
+            # exceed MAX_FILE_SIZE.
             return self._store_object(obj_name, content=content, etag=etag,
                     chunked=chunked, chunk_size=chunk_size, headers=headers)
         # Files larger than MAX_FILE_SIZE must be segmented
         # and uploaded separately.
         num_segments = int(math.ceil(float(fsize) / MAX_FILE_SIZE))
         digits = int(math.log10(num_segments)) + 1
-        # NOTE: This could be greatly improved with threading or other
-        # async design.
+        # Each segment is read directly from its range in the source file
+        # rather than being copied out to a tempfile first.
+        start = content.tell()
         for segment in range(num_segments):
             sequence = str(segment + 1).zfill(digits)
             seg_name = "%s.%s" % (obj_name, sequence)
-            with utils.SelfDeletingTempfile() as tmpname:
-                with open(tmpname, "wb") as tmp:
-                    tmp.write(content.read(MAX_FILE_SIZE))
-                with open(tmpname, "rb") as tmp:
-                    # We have to calculate the etag for each segment
-                    etag = utils.get_checksum(tmp)
-                    self._store_object(seg_name, content=tmp, etag=etag,
-                            chunked=False, headers=headers)
+            seg_offset = segment * MAX_FILE_SIZE
+            seg_length = min(MAX_FILE_SIZE, fsize - seg_offset)
+            seg = FileSegment(content, start + seg_offset, seg_length)
+            # We have to calculate the etag for each segment
+            etag = _local_checksum(seg)
+            self._store_object(seg_name, content=seg, etag=etag,
+                    chunked=False, headers=headers)
         # Upload the manifest
         headers.pop("ETag", "")
         headers["X-Object-Manifest"] = "%s/%s." % (self.name, obj_name)
@@ -1931,16 +2484,158 @@ class StorageObjectManager(BaseManager):
             headers.pop("Content-Length", "")
             headers["Transfer-Encoding"] = "chunked"
         elif etag is None and content is not None:
-            etag = utils.get_checksum(content)
+            etag = _local_checksum(content)
         if etag:
             headers["ETag"] = etag
         if not headers.get("Content-Type"):
             headers["Content-Type"] = None
+        if get_bandwidth_limiter().rate:
+            # Pace the upload to stay within the 'transfer_bandwidth' limit,
+            # unless the content is already read through a ThrottledReader,
+            # such as the ProgressReader of a transfer job.
+            if hasattr(content, "read"):
+                if not _is_throttled(content):
+                    content = ThrottledReader(content)
+            elif content is not None and not isinstance(content,
+                    six.string_types):
+                content = throttle_iter(content)
         uri = "/%s/%s" % (self.uri_base, obj_name)
         resp, resp_body = self.api.method_put(uri, data=content,
                 headers=headers)
 
 
+    def upload_stream(self, obj_name, stream, segment_size=None,
+            concurrency=None, manifest="dlo", content_type=None,
+            content_encoding=None, ttl=None, metadata=None, headers=None,
+            return_none=False):
+        """
+        Uploads data whose total size is not known in advance, such as the
+        output of a pipe or a generator, to the object 'obj_name'. The
+        'stream' can be either a file-like object or any iterable that yields
+        bytes.
+
+        The data is split into segments of 'segment_size' bytes (100MB by
+        default; never more than MAX_FILE_SIZE), which are named
+        '<obj_name>.00000001', '<obj_name>.00000002', and so on. Each segment
+        is uploaded in the background as soon as it fills up, with at most
+        'concurrency' segments being sent at the same time. When the stream
+        is exhausted, a manifest is written to 'obj_name' that joins the
+        segments into a single object. By default this is a Dynamic Large
+        Object (DLO) manifest; pass `manifest="slo"` to create a Static Large
+        Object manifest instead. If all of the data fits in a single segment,
+        it is stored directly in 'obj_name' and no manifest is needed.
+
+        Segments are spooled to temporary files while they are being filled
+        and uploaded, so memory use does not depend on the size of the
+        stream.
+
+        The 'content_type', 'content_encoding' and 'metadata' values are
+        applied to the manifest. If 'ttl' is specified, both the manifest and
+        the segments will be deleted after that number of seconds.
+
+        If any segment fails to upload, reading from the stream stops, and
+        the exception is raised once the segments already in progress have
+        finished. In that case no manifest is written.
+        """
+        manifest = manifest.lower()
+        if manifest not in ("dlo", "slo"):
+            raise exc.InvalidManifestType("The manifest type must be either "
+                    "'dlo' or 'slo'; received '%s'." % manifest)
+        segment_size = min(segment_size or DEFAULT_SEGMENT_SIZE, MAX_FILE_SIZE)
+        concurrency = concurrency or DEFAULT_UPLOAD_CONCURRENCY
+        # The caller's dict is not modified.
+        headers = dict(headers or {})
+        if metadata:
+            headers.update(_massage_metakeys(metadata, OBJECT_META_PREFIX))
+        if content_type is not None:
+            headers["Content-Type"] = content_type
+        if content_encoding is not None:
+            headers["Content-Encoding"] = content_encoding
+        seg_headers = {}
+        if ttl is not None:
+            headers["X-Delete-After"] = ttl
+            seg_headers["X-Delete-After"] = ttl
+        slots = threading.BoundedSemaphore(concurrency)
+        uploaders = []
+
+        def start_segment(segment):
+            # Blocks while 'concurrency' segments are already in flight.
+            slots.acquire()
+            failed = [up for up in uploaders if up.error]
+            if failed:
+                slots.release()
+                segment.close()
+                return False
+            seg_name = "%s.%08d" % (obj_name, len(uploaders) + 1)
+            uploader = SegmentUploader(self, seg_name, segment,
+                    dict(seg_headers), slots)
+            uploaders.append(uploader)
+            uploader.start()
+            return True
+
+        segment = tempfile.TemporaryFile()
+        seg_bytes = 0
+        try:
+            for chunk in _iter_stream(stream):
+                while chunk:
+                    if seg_bytes == segment_size:
+                        if not start_segment(segment):
+                            segment = None
+                            break
+                        segment = tempfile.TemporaryFile()
+                        seg_bytes = 0
+                    piece = chunk[:segment_size - seg_bytes]
+                    chunk = chunk[len(piece):]
+                    segment.write(piece)
+                    seg_bytes += len(piece)
+                if segment is None:
+                    break
+        except Exception:
+            if segment is not None:
+                segment.close()
+            for uploader in uploaders:
+                uploader.join()
+            raise
+        if segment is not None:
+            if not uploaders:
+                # Everything fit into a single segment, so it can be stored
+                # directly without needing a manifest.
+                try:
+                    segment.seek(0)
+                    self._store_object(obj_name, content=segment,
+                            headers=headers)
+                finally:
+                    segment.close()
+                if return_none:
+                    return
+                return self.get(obj_name)
+            if seg_bytes:
+                start_segment(segment)
+            else:
+                segment.close()
+        for uploader in uploaders:
+            uploader.join()
+        for uploader in uploaders:
+            if uploader.error:
+                raise uploader.error
+        if not headers.get("Content-Type"):
+            headers["Content-Type"] = None
+        if manifest == "dlo":
+            headers["X-Object-Manifest"] = "%s/%s." % (self.name, obj_name)
+            self._store_object(obj_name, content=None, headers=headers)
+        else:
+            segments = [{"path": "/%s/%s" % (self.name, uploader.obj_name),
+                    "etag": uploader.etag,
+                    "size_bytes": uploader.size}
+                    for uploader in uploaders]
+            uri = "/%s/%s?multipart-manifest=put" % (self.uri_base, obj_name)
+            self.api.method_put(uri, data=json.dumps(segments),
+                    headers=headers)
+        if return_none:
+            return
+        return self.get(obj_name)
+
+
     @_handle_object_not_found
     def fetch(self, obj, include_meta=False, chunk_size=None, size=None,
             extra_info=None):
@@ -2001,12 +2696,60 @@ class StorageObjectManager(BaseManager):
             if not resp_body:
                 # End of file
                 raise StopIteration
+            get_bandwidth_limiter().consume(len(resp_body))
             yield resp_body
             total_bytes += len(resp_body)
             if total_bytes >= max_size:
                 raise StopIteration
 
 
+    def _download_to_file(self, obj, target, size=None, chunk_size=None,
+            job=None):
+        """
+        Streams the object to the file at 'target', creating any folders
+        that are needed. The content is written to a temporary file in the
+        same folder, which replaces 'target' once the download is complete.
+        If a TransferJob is given, the bytes received are reported to it.
+
+        If 'size' is not known, or is zero (which is also how the manifests of
+        large objects are listed), the object's size is looked up first. The
+        content is always requested in ranges of 'chunk_size' bytes, each of
+        which is written as soon as it arrives.
+        """
+        obj_name = utils.get_name(obj)
+        dirname = os.path.dirname(target)
+        if dirname and not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # Another download may have just created it.
+                if not os.path.isdir(dirname):
+                    raise
+        if not size:
+            size = self.get(obj_name).total_bytes
+            if job and not job.total_bytes:
+                job.total_bytes = size
+        tmp = "%s.%s.part" % (target, uuid.uuid4().hex)
+        try:
+            with open(tmp, "wb") as out:
+                chunks = []
+                if size:
+                    uri = "/%s/%s" % (self.uri_base, obj_name)
+                    chunks = self._fetch_chunker(uri,
+                            chunk_size or DEFAULT_DOWNLOAD_CHUNKSIZE, None,
+                            size)
+                for chunk in chunks:
+                    out.write(chunk)
+                    if job:
+                        job.add_progress(len(chunk))
+            if os.path.exists(target):
+                os.remove(target)
+            os.rename(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
     def fetch_partial(self, obj, size):
         """
         Returns the first 'size' bytes of an object. If the object is smaller
@@ -2161,6 +2904,51 @@ class StorageObjectManager(BaseManager):
         resp, resp_body = self.api.method_post(uri, headers=new_meta)
 
 
+    def bulk_set_metadata(self, items=None, name_prefix=None, transform=None,
+            clear=False, prefix=None, concurrency=None):
+        """
+        Updates the metadata of many objects at once, making up to
+        'concurrency' requests at the same time.
+
+        The updates can be specified either as 'items', an iterable of
+        (object, metadata) 2-tuples, or as a 'transform' function. The
+        transform is called with the listing entry (a dict with the 'name',
+        'bytes', 'hash', 'last_modified' and 'content_type' keys) of every
+        object whose name begins with 'name_prefix', and returns the metadata
+        for that object, or None to leave it unchanged. The listing is
+        streamed, so neither form needs to hold all the objects in memory.
+        If the transform raises an exception for an object, that object is
+        counted as failed, and the others are still updated.
+
+        Each update is applied as in set_metadata(). Updating an object's
+        metadata replaces all of it, so when 'clear' is False the current
+        metadata has to be fetched with a HEAD request first in order to
+        merge the new values into it. When you supply the complete set of
+        metadata for each object, pass `clear=True` to skip the HEAD and make
+        a single POST per object.
+
+        Returns a dict summarizing the results, with the number of objects
+        'updated', 'skipped' and 'failed', a list of the 'failures' as
+        (name, exception) 2-tuples, and the overall throughput as
+        'per_second'.
+        """
+        if items is None:
+            if transform is None:
+                raise exc.NoMetadataSpecified("You must specify either the "
+                        "items to update or a transform function.")
+            items = ((elem["name"], elem) for elem in
+                    self.iter_raw_listing(prefix=name_prefix)
+                    if "name" in elem)
+        else:
+            transform = None
+
+        def update(obj, metadata):
+            self.set_metadata(obj, metadata, clear=clear, prefix=prefix)
+
+        return _run_bulk(update, items, concurrency=concurrency,
+                transform=transform)
+
+
     @_handle_object_not_found
     def remove_metadata_key(self, obj, key):
         """
@@ -2177,15 +2965,23 @@ class StorageClient(BaseClient):
     This is the primary class for interacting with OpenStack Object Storage.
     """
     name = "Object Storage"
-    # Folder upload status dict. Each upload will generate its own UUID key.
-    # The app can use that key query the status of the upload. This dict
-    # will also be used to hold the flag to interrupt uploads in progress.
-    folder_upload_status = {}
-    # Interval in seconds between checks for completion of bulk deletes.
+    # Maximum number of background transfers (folder uploads, folder syncs
+    # and bulk deletes) that each client will run at the same time.
+    max_transfer_workers = 4
+    # Deprecated, and no longer used: bulk_delete() now waits for its
+    # TransferJob to finish instead of polling. It is kept so that code which
+    # sets it continues to work.
     bulk_delete_interval = 1
 
     def __init__(self, *args, **kwargs):
-        # Constants used in metadata headers
+        # The state of a folder sync is kept separately for each thread, so
+        # that several syncs can run in the background at the same time.
+        self._sync_state = threading.local()
+        # Each client runs its background transfers in its own pool, and
+        # keeps track of them by their job IDs.
+        self.transfer_manager = TransferManager(self.max_transfer_workers)
+        # CDN purges made with queue_cdn_purge() are batched and paced here.
+        self.purge_queue = CDNPurgeQueue(self)
         super(StorageClient, self).__init__(*args, **kwargs)
         self._sync_summary = {"total": 0,
                 "uploaded": 0,
@@ -2239,6 +3035,24 @@ class StorageClient(BaseClient):
         self.get_info = self.get_account_info
 
 
+    def _get_sync_attr(self, att):
+        return getattr(self._sync_state, att, None)
+
+
+    def _set_sync_attr(self, att, val):
+        setattr(self._sync_state, att, val)
+
+
+    _local_files = property(lambda self: self._get_sync_attr("local_files"),
+            lambda self, val: self._set_sync_attr("local_files", val))
+    _remote_files = property(lambda self: self._get_sync_attr("remote_files"),
+            lambda self, val: self._set_sync_attr("remote_files", val))
+    _sync_summary = property(lambda self: self._get_sync_attr("summary"),
+            lambda self, val: self._set_sync_attr("summary", val))
+    _sync_job = property(lambda self: self._get_sync_attr("job"),
+            lambda self, val: self._set_sync_attr("job", val))
+
+
     def get(self, item):
         """
         Returns the container whose name is provided as 'item'. If 'item' is
@@ -2399,6 +3213,16 @@ class StorageClient(BaseClient):
         return self._manager.list_public_containers()
 
 
+    def prefetch_cdn_data(self, containers=None):
+        """
+        Fetches the CDN settings of all the account's containers in a single
+        listing request rather than one request per container, and caches
+        them for a short time. See ContainerManager.prefetch_cdn_data() for
+        details.
+        """
+        return self._manager.prefetch_cdn_data(containers=containers)
+
+
     def make_container_public(self, container, ttl=None):
         """
         Enables CDN access for the specified container, and optionally sets the
@@ -2475,11 +3299,29 @@ class StorageClient(BaseClient):
 
         If one or more email_addresses are included, an email confirming the
         purge is sent to each address.
+
+        To purge many objects, use queue_cdn_purge() instead.
         """
         return self._manager.purge_cdn_object(container, obj,
                 email_addresses=email_addresses)
 
 
+    def queue_cdn_purge(self, container, obj, email_addresses=None):
+        """
+        Adds a purge of the specified CDN-enabled object to the client's
+        purge_queue, which sends purges in the background. Repeated purges of
+        the same object are combined, requests are paced to stay within the
+        CDN's limits, and requests rejected for exceeding those limits are
+        retried. Returns True if a new purge was queued, or False if it was
+        combined with one that was already waiting.
+
+        Use `purge_queue.flush()` to wait for the queued purges to complete,
+        and `purge_queue.stats()` to check on their progress.
+        """
+        return self.purge_queue.add(container, obj,
+                email_addresses=email_addresses)
+
+
     def list_container_names(self):
         """
         Returns a list of the names of the containers in this account.
@@ -2499,6 +3341,32 @@ class StorageClient(BaseClient):
         return self._manager.list_containers_info(limit=limit, marker=marker)
 
 
+    def export_inventory(self, path, containers=None, format="ndjson",
+            concurrency=1, prefix=None):
+        """
+        Writes a snapshot of the objects in this account to the file at
+        'path', in either "ndjson" or the more compact "columnar" format. The
+        container listings are streamed straight to the file, so no
+        StorageObjects are created and memory use stays flat no matter how
+        many objects there are. Up to 'concurrency' containers are listed at
+        the same time. See pyrax.inventory for details of the formats.
+
+        Returns a dict with the number of 'containers' and 'objects' in the
+        snapshot, and their total 'bytes'.
+        """
+        return inventory.export_inventory(self, path, containers=containers,
+                format=format, concurrency=concurrency, prefix=prefix)
+
+
+    def diff_inventories(self, old_path, new_path):
+        """
+        Compares two snapshots written by export_inventory(), and returns a
+        generator that yields a 2-tuple of (change, record) for every object
+        that was 'added', 'removed' or 'modified' between them.
+        """
+        return inventory.diff_inventories(old_path, new_path)
+
+
     def list_container_subdirs(self, container, limit=None, marker=None,
             prefix=None, delimiter=None, full_listing=False):
         """
@@ -2549,6 +3417,17 @@ class StorageClient(BaseClient):
                 prefix=prefix)
 
 
+    def bulk_set_container_metadata(self, items, clear=False, prefix=None,
+            concurrency=None):
+        """
+        Updates the metadata of many containers at once. 'items' is an
+        iterable of (container, metadata) 2-tuples. See
+        ContainerManager.bulk_set_metadata() for details.
+        """
+        return self._manager.bulk_set_metadata(items, clear=clear,
+                prefix=prefix, concurrency=concurrency)
+
+
     def remove_container_metadata_key(self, container, key):
         """
         Removes the specified key from the container's metadata. If the key
@@ -2616,6 +3495,22 @@ class StorageClient(BaseClient):
                 clear=clear, prefix=prefix)
 
 
+    def bulk_set_object_metadata(self, container, items=None,
+            name_prefix=None, transform=None, clear=False, prefix=None,
+            concurrency=None):
+        """
+        Updates the metadata of many objects in the specified container at
+        once, either from an iterable of (object, metadata) 2-tuples passed as
+        'items', or by calling 'transform' with the listing entry of each
+        object whose name begins with 'name_prefix'. Pass `clear=True` when
+        the complete metadata is supplied to avoid a HEAD request per object.
+        See StorageObjectManager.bulk_set_metadata() for details.
+        """
+        return self._manager.bulk_set_object_metadata(container, items=items,
+                name_prefix=name_prefix, transform=transform, clear=clear,
+                prefix=prefix, concurrency=concurrency)
+
+
     def remove_object_metadata_key(self, container, obj, key, prefix=None):
         """
         Removes the specified key from the storage object's metadata. If the key
@@ -2625,7 +3520,8 @@ class StorageClient(BaseClient):
 
 
     def list_container_objects(self, container, limit=None, marker=None,
-            prefix=None, delimiter=None, end_marker=None, full_listing=False):
+            prefix=None, delimiter=None, end_marker=None, full_listing=False,
+            compact=False):
         """
         Return a list of StorageObjects representing the objects in the
         container. You can use the marker, end_marker, and limit params to
@@ -2635,17 +3531,23 @@ class StorageClient(BaseClient):
         the objects in the container is returned. In this case, only the
         'prefix' parameter is used; if you specify any others, they are
         ignored.
+
+        For large listings, pass compact=True to get StorageObjectRecords,
+        which use a fraction of the memory of StorageObjects and can be
+        converted to them with their to_object() method.
         """
         if full_listing:
             return self._manager.object_listing_iterator(container,
-                    prefix=prefix)
+                    prefix=prefix, compact=compact)
         return self._manager.list_objects(container, limit=limit,
                 marker=marker, prefix=prefix, delimiter=delimiter,
-                end_marker=end_marker)
+                end_marker=end_marker, compact=compact)
 
 
-    def object_listing_iterator(self, container, prefix=None):
-        return self._manager.object_listing_iterator(container, prefix=prefix)
+    def object_listing_iterator(self, container, prefix=None, compact=False,
+            prefetch=False):
+        return self._manager.object_listing_iterator(container, prefix=prefix,
+                compact=compact, prefetch=prefetch)
 
 
     def delete_object_in_seconds(self, cont, obj, seconds, extra_info=None):
@@ -2756,6 +3658,30 @@ class StorageClient(BaseClient):
                 metadata=metadata, headers=headers, return_none=return_none)
 
 
+    def upload_stream(self, container, obj_name, stream, segment_size=None,
+            concurrency=None, manifest="dlo", content_type=None,
+            content_encoding=None, ttl=None, metadata=None, headers=None,
+            return_none=False):
+        """
+        Uploads data whose total size is not known in advance, such as the
+        output of a pipe or a generator, to the object 'obj_name'. The
+        'stream' can be either a file-like object or any iterable that yields
+        bytes.
+
+        The data is split into segments of 'segment_size' bytes, which are
+        uploaded in the background as they fill up, with at most
+        'concurrency' segments being sent at the same time. A manifest that
+        joins the segments is then written to 'obj_name'; this is a Dynamic
+        Large Object manifest unless `manifest="slo"` is passed. If all of the
+        data fits in a single segment, it is stored directly in 'obj_name'.
+        """
+        return self._manager.upload_stream(container, obj_name, stream,
+                segment_size=segment_size, concurrency=concurrency,
+                manifest=manifest, content_type=content_type,
+                content_encoding=content_encoding, ttl=ttl, metadata=metadata,
+                headers=headers, return_none=return_none)
+
+
     def fetch_object(self, container, obj, include_meta=False,
             chunk_size=None, size=None, extra_info=None):
         """
@@ -2930,7 +3856,8 @@ class StorageClient(BaseClient):
                 new_ctype, guess=guess)
 
 
-    def upload_folder(self, folder_path, container=None, ignore=None, ttl=None):
+    def upload_folder(self, folder_path, container=None, ignore=None, ttl=None,
+            max_rate=None, weight=None):
         """
         Convenience method for uploading an entire folder, including any
         sub-folders, to Cloud Files.
@@ -2954,11 +3881,14 @@ class StorageClient(BaseClient):
         'program.pyc' and 'abcpyc'.
 
         The upload will happen asynchronously; in other words, the call to
-        upload_folder() will generate a UUID and return a 2-tuple of (UUID,
-        total_bytes) immediately. Uploading will happen in the background; your
-        app can call get_uploaded(uuid) to get the current status of the
-        upload. When the upload is complete, the value returned by
-        get_uploaded(uuid) will match the total_bytes for the upload.
+        upload_folder() will queue the upload with this client's
+        transfer_manager and return a 2-tuple of (UUID, total_bytes)
+        immediately. Uploading will happen in the background; your app can
+        call get_uploaded(uuid) to get the current status of the upload. When
+        the upload is complete, the value returned by get_uploaded(uuid) will
+        match the total_bytes for the upload. The TransferJob for the upload,
+        which also reports its progress, rate and ETA and can be waited on, is
+        available from get_transfer_job(uuid).
 
         If you start an upload and need to cancel it, call
         cancel_folder_upload(uuid), passing the uuid returned by the initial
@@ -2967,33 +3897,36 @@ class StorageClient(BaseClient):
 
         If you specify a `ttl` parameter, the uploaded files will be deleted
         after that number of seconds.
+
+        If you specify `max_rate`, the upload will be limited to that many
+        bytes per second. When a 'transfer_bandwidth' limit is set with
+        pyrax.set_setting(), all transfers share that bandwidth in proportion
+        to their `weight` (1 by default).
         """
         if not os.path.isdir(folder_path):
             raise exc.FolderNotFound("No such folder: '%s'" % folder_path)
 
         ignore = utils.coerce_to_list(ignore)
         total_bytes = utils.folder_size(folder_path, ignore)
-        upload_key = str(uuid.uuid4())
-        self.folder_upload_status[upload_key] = {"continue": True,
-                "total_bytes": total_bytes,
-                "uploaded": 0,
-                }
-        self._upload_folder_in_background(folder_path, container, ignore,
-                upload_key, ttl)
-        return (upload_key, total_bytes)
+        job = self._upload_folder_in_background(folder_path, container,
+                ignore, total_bytes, ttl=ttl, max_rate=max_rate, weight=weight)
+        return (job.id, total_bytes)
 
 
     def _upload_folder_in_background(self, folder_path, container, ignore,
-            upload_key, ttl=None):
-        """Runs the folder upload in the background."""
-        uploader = FolderUploader(folder_path, container, ignore, upload_key,
-                self, ttl=ttl)
-        uploader.start()
+            total_bytes=None, ttl=None, max_rate=None, weight=None):
+        """Queues the folder upload to run in the background."""
+        uploader = FolderUploader(folder_path, container, ignore, self,
+                ttl=ttl)
+        return self.transfer_manager.submit(uploader.run,
+                total_bytes=total_bytes, max_rate=max_rate,
+                name="upload_folder %s" % folder_path, weight=weight)
 
 
     def sync_folder_to_container(self, folder_path, container, delete=False,
             include_hidden=False, ignore=None, ignore_timestamps=False,
-            object_prefix="", verbose=False):
+            object_prefix="", verbose=False, async=False, max_rate=None,
+            weight=None):
         """
         Compares the contents of the specified folder, and checks to make sure
         that the corresponding object is present in the specified container. If
@@ -3026,7 +3959,31 @@ class StorageClient(BaseClient):
 
         Set `verbose` to True to make it print what is going on. It will
         show which files are being uploaded and which ones are not and why.
-        """
+
+        By default the sync runs to completion before this method returns. If
+        `async` is True, the sync is instead queued with this client's
+        transfer_manager, and the TransferJob for it is returned immediately;
+        the job's `result` will be the sync summary dict once it completes.
+        Background syncs can be cancelled with the job's `cancel()` method.
+        Either way, the sync can be limited to `max_rate` bytes per second,
+        and given a `weight` for its share of the 'transfer_bandwidth' limit.
+        """
+        if async or max_rate or weight:
+            kwargs = dict(folder_path=folder_path, container=container,
+                    delete=delete, include_hidden=include_hidden,
+                    ignore=ignore, ignore_timestamps=ignore_timestamps,
+                    object_prefix=object_prefix, verbose=verbose)
+            name = "sync_folder_to_container %s" % folder_path
+            if async:
+                return self.transfer_manager.submit(self._sync_in_background,
+                        kwargs=kwargs, max_rate=max_rate, name=name,
+                        weight=weight)
+            # Run the sync as a job in this thread, so that the job applies
+            # the rate limit to the files that it uploads.
+            job = TransferJob(self._sync_in_background, kwargs=kwargs,
+                    max_rate=max_rate, name=name, weight=weight)
+            job.run()
+            return job.wait()
         cont = self.get_container(container)
         self._local_files = []
         # Load a list of all the remote objects so we don't have to keep
@@ -3065,6 +4022,19 @@ class StorageClient(BaseClient):
             if summary["failed"]:
                 for reason in summary["failure_reasons"]:
                     log.info("  Reason: %s" % reason)
+        return self._sync_summary
+
+
+    def _sync_in_background(self, job, **kwargs):
+        """
+        Runs sync_folder_to_container() as a TransferJob, so that the files
+        uploaded are reported to the job, and the job can be cancelled.
+        """
+        self._sync_job = job
+        try:
+            return self.sync_folder_to_container(**kwargs)
+        finally:
+            self._sync_job = None
 
 
     def _sync_folder_to_container(self, folder_path, container, prefix, delete,
@@ -3078,7 +4048,10 @@ class StorageClient(BaseClient):
         log = logging.getLogger("pyrax")
         if not include_hidden:
             ignore.append(".*")
+        job = self._sync_job
         for fname in fnames:
+            if job and job.cancelled:
+                return
             if utils.match_pattern(fname, ignore):
                 self._sync_summary["ignored"] += 1
                 continue
@@ -3123,8 +4096,13 @@ class StorageClient(BaseClient):
                                     local_mod_str, obj_time_str))
                         continue
                 try:
-                    container.upload_file(pth, obj_name=fullname_with_prefix,
-                        etag=local_etag, return_none=True)
+                    if job:
+                        self._upload_file_in_job(job, container, pth,
+                                fullname_with_prefix, etag=local_etag)
+                    else:
+                        container.upload_file(pth,
+                                obj_name=fullname_with_prefix,
+                                etag=local_etag, return_none=True)
                     self._sync_summary["uploaded"] += 1
                     if verbose:
                         log.info("%s UPLOADED", fullname_with_prefix)
@@ -3140,10 +4118,24 @@ class StorageClient(BaseClient):
                 if verbose:
                     log.info("%s NOT UPLOADED because it already exists",
                             fullname_with_prefix)
-        if delete and not prefix:
+        if delete and not prefix and not (job and job.cancelled):
             self._delete_objects_not_in_list(container, object_prefix)
 
 
+    def _upload_file_in_job(self, job, container, file_path, obj_name,
+            etag=None, ttl=None):
+        """
+        Uploads a single file as part of a background TransferJob. The bytes
+        are reported to the job as they are sent, which is also what enforces
+        the job's throughput cap.
+        """
+        with open(file_path, "rb") as fileobj:
+            if etag is None:
+                etag = utils.get_checksum(fileobj)
+            self.upload_file(container, ProgressReader(fileobj, job),
+                    obj_name=obj_name, etag=etag, ttl=ttl, return_none=True)
+
+
     def _delete_objects_not_in_list(self, cont, object_prefix=""):
         """
         Finds all the objects in the specified container that are not present
@@ -3154,11 +4146,185 @@ class StorageClient(BaseClient):
         localnames = set(self._local_files)
         to_delete = list(objnames.difference(localnames))
         self._sync_summary["deleted"] += len(to_delete)
-        # We don't need to wait around for this to complete. Store the thread
-        # reference in case it is needed at some point.
+        # We don't need to wait around for this to complete. Store the
+        # deleter in case it is needed at some point.
         self._thread = self.bulk_delete(cont, to_delete, async=True)
 
 
+    def sync_container_to_folder(self, container, folder_path, prefix=None,
+            delete=False, ignore=None, concurrency=None, checksum_cache=None,
+            chunk_size=None, verbose=False):
+        """
+        Mirrors the objects in the specified container to a local folder; the
+        reverse of sync_folder_to_container(). Each object is saved to the
+        path given by its name relative to 'folder_path', which is created if
+        it doesn't exist. If 'prefix' is given, only the objects whose names
+        begin with it are synced.
+
+        The container listing is streamed, and each entry is compared with the
+        local file. Files that are missing are always downloaded, as are files
+        whose size differs, unless the checksum cache shows that they have not
+        changed since they last matched the object. Otherwise the local
+        file's MD5 is compared with the object's etag, and the object is only
+        downloaded if they differ.
+
+        MD5 values can be cached between runs by passing the path of a file
+        to use as the `checksum_cache`. The cache records each file's size
+        and modification time along with the etag of the object it matches,
+        so files that have not changed since the last sync are not hashed
+        again. It also allows large objects, whose etags are not the MD5 of
+        their content, to be recognized as unchanged.
+
+        Up to `concurrency` objects are downloaded at the same time. Each is
+        streamed to disk in ranges of `chunk_size` bytes, so objects are
+        never held in memory in full, and a file is only replaced once its
+        download has completed. Downloaded files are given the object's last
+        modified time.
+
+        You can selectively skip objects by passing either a single pattern or
+        a list of patterns as `ignore`. If `delete` is True, local files that
+        have no corresponding object in the container are deleted, unless
+        they match one of the `ignore` patterns.
+
+        Returns a dict summarizing the sync, with the number of objects that
+        were 'downloaded', skipped as 'duplicate' or 'ignored', or 'failed'
+        (along with the 'failure_reasons'), and the number of local files
+        'deleted'.
+        """
+        cont = self.get_container(container)
+        ignore = utils.coerce_to_list(ignore)
+        concurrency = concurrency or DEFAULT_DOWNLOAD_CONCURRENCY
+        chunk_size = chunk_size or DEFAULT_DOWNLOAD_CHUNKSIZE
+        log = logging.getLogger("pyrax")
+        if not os.path.isdir(folder_path):
+            os.makedirs(folder_path)
+        folder_path = os.path.abspath(folder_path)
+        cache = {}
+        if checksum_cache and os.path.exists(checksum_cache):
+            with open(checksum_cache) as ff:
+                cache = json.load(ff)
+        summary = {"total": 0,
+                "downloaded": 0,
+                "ignored": 0,
+                "duplicate": 0,
+                "failed": 0,
+                "failure_reasons": [],
+                "deleted": 0,
+                }
+        lock = threading.Lock()
+        remote_paths = set()
+
+        def download(obj_name, size, etag, target, mtime):
+            try:
+                cont.object_manager._download_to_file(obj_name, target,
+                        size=size, chunk_size=chunk_size)
+                if mtime is not None:
+                    os.utime(target, (mtime, mtime))
+                stat = os.stat(target)
+                with lock:
+                    cache[obj_name] = [stat.st_size, stat.st_mtime, etag]
+                    summary["downloaded"] += 1
+                if verbose:
+                    log.info("%s DOWNLOADED", obj_name)
+            except Exception as e:
+                with lock:
+                    summary["failed"] += 1
+                    summary["failure_reasons"].append("%s: %s" % (obj_name,
+                            e))
+                if verbose:
+                    log.error("%s DOWNLOAD FAILED. Exception: %s" %
+                            (obj_name, e))
+
+        def pending():
+            for elem in cont.object_manager.iter_raw_listing(prefix=prefix):
+                obj_name = elem.get("name")
+                if not obj_name or obj_name.endswith("/"):
+                    # Pseudo-folders have no content to download.
+                    continue
+                with lock:
+                    summary["total"] += 1
+                if utils.match_pattern(obj_name, ignore):
+                    with lock:
+                        summary["ignored"] += 1
+                    continue
+                target = os.path.abspath(os.path.join(folder_path, obj_name))
+                if not target.startswith(folder_path + os.sep):
+                    with lock:
+                        summary["failed"] += 1
+                        summary["failure_reasons"].append("%s: the object "
+                                "name is not a valid local path" % obj_name)
+                    continue
+                if delete:
+                    remote_paths.add(target)
+                size = elem.get("bytes")
+                etag = elem.get("hash")
+                if self._local_file_matches(target, obj_name, size, etag,
+                        cache, lock):
+                    with lock:
+                        summary["duplicate"] += 1
+                    if verbose:
+                        log.info("%s NOT DOWNLOADED because the local file "
+                                "is the same", obj_name)
+                    continue
+                last_modified = elem.get("last_modified")
+                mtime = None
+                if last_modified:
+                    mtime = calendar.timegm(time.strptime(
+                            last_modified[:19], "%Y-%m-%dT%H:%M:%S"))
+                yield (obj_name, size, etag, target, mtime)
+
+        utils.run_in_workers(download, pending(), concurrency)
+
+        if delete:
+            cache_path = checksum_cache and os.path.abspath(checksum_cache)
+            for dirname, dirnames, fnames in os.walk(folder_path):
+                for fname in fnames:
+                    pth = os.path.join(dirname, fname)
+                    relpath = os.path.relpath(pth, folder_path)
+                    if pth in remote_paths or pth == cache_path:
+                        continue
+                    if prefix and not relpath.startswith(prefix):
+                        continue
+                    if utils.match_pattern(relpath, ignore):
+                        continue
+                    os.remove(pth)
+                    cache.pop(relpath, None)
+                    summary["deleted"] += 1
+                    if verbose:
+                        log.info("%s DELETED", relpath)
+        if checksum_cache:
+            with open(checksum_cache, "w") as ff:
+                json.dump(cache, ff)
+        return summary
+
+
+    def _local_file_matches(self, target, obj_name, size, etag, cache, lock):
+        """
+        Returns True if the local file at 'target' has the same content as
+        the object with the given size and etag, as described in
+        sync_container_to_folder().
+
+        The checksum cache is consulted before the sizes are compared, since
+        the manifests of large objects are listed with a size of zero and an
+        etag of their own rather than those of their content.
+        """
+        try:
+            stat = os.stat(target)
+        except OSError:
+            return False
+        with lock:
+            cached = cache.get(obj_name)
+        if cached and cached == [stat.st_size, stat.st_mtime, etag]:
+            return True
+        if stat.st_size != size:
+            return False
+        matches = utils.get_checksum(target) == etag
+        if matches:
+            with lock:
+                cache[obj_name] = [stat.st_size, stat.st_mtime, etag]
+        return matches
+
+
     def bulk_delete(self, container, object_names, async=False):
         """
         Deletes multiple objects from a container in a single call.
@@ -3170,7 +4336,8 @@ class StorageClient(BaseClient):
         object is returned with a 'completed' attribute that will be set to
         True as soon as the bulk deletion is complete, and a 'results'
         attribute that will contain a dictionary (described below) with the
-        results of the bulk deletion.
+        results of the bulk deletion. Its 'job' attribute is the TransferJob
+        that the deletion runs as in this client's transfer_manager.
 
         When deletion is complete the bulk deletion object's 'results'
         attribute will be populated with the information returned from the API
@@ -3186,11 +4353,11 @@ class StorageClient(BaseClient):
         after the client code in that library.
         """
         deleter = BulkDeleter(self, container, object_names)
-        deleter.start()
+        deleter.job = self.transfer_manager.submit(deleter.run,
+                name="bulk_delete %s" % utils.get_name(container))
         if async:
             return deleter
-        while not deleter.completed:
-            time.sleep(self.bulk_delete_interval)
+        deleter.job.wait()
         return deleter.results
 
 
@@ -3217,15 +4384,22 @@ class StorageClient(BaseClient):
         return resp, resp_body
 
 
-    @_valid_upload_key
-    def _update_progress(self, upload_key, size):
-        self.folder_upload_status[upload_key]["uploaded"] += size
+    def get_transfer_job(self, job_id):
+        """
+        Returns the TransferJob for the background transfer with the specified
+        ID, such as the key returned by upload_folder().
+        """
+        job = self.transfer_manager.get_job(job_id)
+        if job is None:
+            raise exc.InvalidUploadID("There is no transfer with the ID '%s'."
+                    % job_id)
+        return job
 
 
     @_valid_upload_key
     def get_uploaded(self, upload_key):
         """Returns the number of bytes uploaded for the specified process."""
-        return self.folder_upload_status[upload_key]["uploaded"]
+        return self.transfer_manager.get_job(upload_key).bytes_done
 
 
     @_valid_upload_key
@@ -3234,27 +4408,19 @@ class StorageClient(BaseClient):
         Cancels any folder upload happening in the background. If there is no
         such upload in progress, calling this method has no effect.
         """
-        self.folder_upload_status[upload_key]["continue"] = False
-
-
-    @_valid_upload_key
-    def _should_abort_folder_upload(self, upload_key):
-        """
-        Returns True if the user has canceled upload; returns False otherwise.
-        """
-        return not self.folder_upload_status[upload_key]["continue"]
+        self.transfer_manager.get_job(upload_key).cancel()
 
 
 
-class FolderUploader(threading.Thread):
+class FolderUploader(object):
     """
-    Threading class to allow for uploading multiple files in the background.
+    Uploads the files in a folder, including any sub-folders. The upload is
+    run as a TransferJob by the client's transfer_manager, which calls run()
+    with the job that tracks its progress.
     """
-    def __init__(self, root_folder, container, ignore, upload_key, client,
-            ttl=None):
+    def __init__(self, root_folder, container, ignore, client, ttl=None):
         self.root_folder = root_folder.rstrip("/")
         self.ignore = utils.coerce_to_list(ignore)
-        self.upload_key = upload_key
         self.ttl = ttl
         self.client = client
         if container:
@@ -3265,7 +4431,6 @@ class FolderUploader(threading.Thread):
         else:
             self.container = self.client.create(
                     self.folder_name_from_path(root_folder))
-        threading.Thread.__init__(self)
 
 
     @staticmethod
@@ -3274,37 +4439,42 @@ class FolderUploader(threading.Thread):
         return os.path.basename(pth.rstrip(os.sep))
 
 
-    def upload_files_in_folder(self, arg, dirname, fnames):
+    def upload_files_in_folder(self, job, dirname, fnames):
         """Handles the iteration across files within a folder."""
         if utils.match_pattern(dirname, self.ignore):
             return False
         good_names = (nm for nm in fnames
                 if not utils.match_pattern(nm, self.ignore))
         for fname in good_names:
-            if self.client._should_abort_folder_upload(self.upload_key):
+            if job.cancelled:
                 return
             full_path = os.path.join(dirname, fname)
             if os.path.isdir(full_path):
                 # Skip folders; os.walk will include them in the next pass.
                 continue
             obj_name = os.path.relpath(full_path, self.root_folder)
-            obj_size = os.stat(full_path).st_size
-            self.client.upload_file(self.container, full_path,
-                    obj_name=obj_name, return_none=True, ttl=self.ttl)
-            self.client._update_progress(self.upload_key, obj_size)
+            self.client._upload_file_in_job(job, self.container, full_path,
+                    obj_name, ttl=self.ttl)
 
 
-    def run(self):
-        """Starts the uploading thread."""
+    def run(self, job):
+        """Uploads the folder, reporting progress to the TransferJob."""
         root_path, folder_name = os.path.split(self.root_folder)
         self.root_folder = os.path.join(root_path, folder_name)
-        os.path.walk(self.root_folder, self.upload_files_in_folder, None)
+        for dirname, dirnames, fnames in os.walk(self.root_folder):
+            if job.cancelled:
+                return
+            # Don't descend into ignored folders.
+            dirnames[:] = [nm for nm in dirnames
+                    if not utils.match_pattern(nm, self.ignore)]
+            self.upload_files_in_folder(job, dirname, fnames)
 
 
 
-class BulkDeleter(threading.Thread):
+class BulkDeleter(object):
     """
-    Threading class to allow for bulk deletion of objects from a container.
+    Deletes a list of objects from a container in a single call. The
+    deletion is run as a TransferJob by the client's transfer_manager.
     """
     def __init__(self, client, container, object_names):
         self.client = client
@@ -3312,10 +4482,10 @@ class BulkDeleter(threading.Thread):
         self.object_names = object_names
         self.completed = False
         self.results = None
-        threading.Thread.__init__(self)
+        self.job = None
 
 
-    def run(self):
+    def run(self, job=None):
         client = self.client
         container = self.container
         object_names = self.object_names
@@ -3327,8 +4497,296 @@ class BulkDeleter(threading.Thread):
         obj_paths = ("%s/%s" % (cname, nm) for nm in object_names)
         body = "\n".join(obj_paths)
         uri = "/?bulk-delete=1"
-        resp, resp_body = self.client.method_delete(uri, data=body,
-                headers=headers)
-        status = resp_body.get("Response Status", "").split(" ")[0]
-        self.results = resp_body
-        self.completed = True
+        try:
+            resp, resp_body = self.client.method_delete(uri, data=body,
+                    headers=headers)
+            self.results = resp_body
+        finally:
+            self.completed = True
+        return self.results
+
+
+
+class CDNPurgeQueue(object):
+    """
+    Purges CDN-enabled objects in the background, so that large numbers of
+    objects can be invalidated without exceeding the CDN's request limits.
+
+    Each purge waits 'window' seconds before it is sent; any further purges
+    of the same object made during that time are combined with it, so that
+    an object is only purged once no matter how many times it is queued.
+    Requests are paced to 'rate' per second, with bursts of up to 'burst'
+    requests. When the CDN rejects a purge for exceeding its limits (HTTP
+    413), it is retried up to 'max_retries' times, doubling the delay from
+    'retry_delay' seconds each time.
+
+    The worker thread is a daemon, so it never keeps a program running.
+    Purges that are still queued when the program exits are sent then,
+    for up to PURGE_EXIT_TIMEOUT seconds; call close() to send them sooner.
+    """
+    def __init__(self, client, rate=None, burst=None, window=None,
+            max_retries=None, retry_delay=None):
+        self.client = client
+        self.limiter = BandwidthLimiter(rate=rate or DEFAULT_PURGE_RATE,
+                burst=burst)
+        self.window = DEFAULT_PURGE_WINDOW if window is None else window
+        self.max_retries = (DEFAULT_PURGE_RETRIES if max_retries is None
+                else max_retries)
+        self.retry_delay = (DEFAULT_PURGE_RETRY_DELAY if retry_delay is None
+                else retry_delay)
+        self._cond = threading.Condition()
+        self._counter = itertools.count()
+        # Purges waiting to be sent, by path, and a heap of
+        # (due_time, counter, path) entries giving the order to send them.
+        self._pending = {}
+        self._schedule = []
+        self._in_flight = 0
+        self._worker = None
+        self._stats = {"queued": 0,
+                "coalesced": 0,
+                "purged": 0,
+                "retried": 0,
+                "failed": 0,
+                "failures": collections.deque(maxlen=MAX_PURGE_FAILURES),
+                }
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        _purge_queues.add(self)
+
+
+    def add(self, container, obj, email_addresses=None):
+        """
+        Queues a purge of the specified object. If one or more
+        email_addresses are included, an email confirming the purge is sent
+        to each address.
+
+        Returns True if a new purge was queued, or False if it was combined
+        with a purge of the same object that was already waiting.
+        """
+        path = "/%s/%s" % (utils.get_name(container), utils.get_name(obj))
+        emails = utils.coerce_to_list(email_addresses) if email_addresses \
+                else []
+        with self._cond:
+            entry = self._pending.get(path)
+            if entry:
+                self._stats["coalesced"] += 1
+                self._merge_emails(entry, emails)
+                return False
+            now = time.time()
+            entry = {"path": path,
+                    "emails": [],
+                    "added": now,
+                    "attempts": 0,
+                    }
+            self._merge_emails(entry, emails)
+            self._stats["queued"] += 1
+            self._schedule_entry(entry, now + self.window)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work)
+                self._worker.daemon = True
+                self._worker.start()
+            return True
+
+
+    def _merge_emails(self, entry, emails):
+        for email in emails:
+            if email not in entry["emails"]:
+                entry["emails"].append(email)
+
+
+    def _schedule_entry(self, entry, due):
+        self._pending[entry["path"]] = entry
+        heapq.heappush(self._schedule,
+                (due, next(self._counter), entry["path"]))
+        self._cond.notify_all()
+
+
+    def _next_entry(self):
+        """
+        Waits for the next purge that is due and returns it, or returns None
+        if no purges are queued for PURGE_IDLE_TIMEOUT seconds.
+        """
+        with self._cond:
+            while True:
+                if not self._schedule:
+                    self._cond.wait(PURGE_IDLE_TIMEOUT)
+                    if not self._schedule:
+                        self._worker = None
+                        return None
+                    continue
+                due, count, path = self._schedule[0]
+                delay = due - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._schedule)
+                entry = self._pending.pop(path, None)
+                if entry is None:
+                    # Already sent by an earlier schedule entry.
+                    continue
+                self._in_flight += 1
+                return entry
+
+
+    def _work(self):
+        while True:
+            entry = self._next_entry()
+            if entry is None:
+                return
+            try:
+                self._purge(entry)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+
+    def _purge(self, entry):
+        headers = {}
+        if entry["emails"]:
+            headers["X-Purge-Email"] = ", ".join(entry["emails"])
+        self.limiter.consume(1)
+        try:
+            self.client.cdn_request(entry["path"], method="DELETE",
+                    headers=headers)
+        except exc.OverLimit as e:
+            with self._cond:
+                entry["attempts"] += 1
+                if entry["attempts"] > self.max_retries:
+                    self._record_failure(entry, e)
+                    return
+                self._stats["retried"] += 1
+                waiting = self._pending.get(entry["path"])
+                if waiting:
+                    # The object was queued again while this purge was being
+                    # sent; the new purge will cover both.
+                    self._merge_emails(waiting, entry["emails"])
+                    return
+                delay = self.retry_delay * 2 ** (entry["attempts"] - 1)
+                self._schedule_entry(entry, time.time() + delay)
+        except Exception as e:
+            with self._cond:
+                self._record_failure(entry, e)
+        else:
+            latency = time.time() - entry["added"]
+            with self._cond:
+                self._stats["purged"] += 1
+                self._total_latency += latency
+                self._max_latency = max(self._max_latency, latency)
+
+
+    def _record_failure(self, entry, err):
+        self._stats["failed"] += 1
+        self._stats["failures"].append((entry["path"], err))
+
+
+    @property
+    def depth(self):
+        """The number of purges that are waiting or being sent."""
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+
+    def stats(self):
+        """
+        Returns a dict with the queue 'depth' and the number of purges that
+        were 'queued', 'coalesced' into an earlier purge, 'purged', 'retried'
+        and 'failed'. 'failures' is a list of (path, exception) 2-tuples for
+        the most recent MAX_PURGE_FAILURES failures, and 'mean_latency' and
+        'max_latency' are the seconds between a purge being queued and being
+        completed.
+        """
+        with self._cond:
+            ret = dict(self._stats)
+            ret["failures"] = list(self._stats["failures"])
+            ret["depth"] = len(self._pending) + self._in_flight
+            purged = self._stats["purged"]
+            ret["mean_latency"] = (self._total_latency / purged
+                    if purged else 0.0)
+            ret["max_latency"] = self._max_latency
+        return ret
+
+
+    def flush(self, timeout=None):
+        """
+        Sends the queued purges without waiting for the rest of their
+        coalescing window, and waits until every purge has completed or
+        failed. Returns True if the queue was emptied, or False if 'timeout'
+        seconds passed first. Purges that are waiting to be retried keep
+        their delay.
+        """
+        end = None if timeout is None else time.time() + timeout
+        with self._cond:
+            now = time.time()
+            self._schedule = [(due if self._pending[path]["attempts"]
+                    else min(due, now), count, path)
+                    for due, count, path in self._schedule
+                    if path in self._pending]
+            heapq.heapify(self._schedule)
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                if end is None:
+                    self._cond.wait(1)
+                    continue
+                remaining = end - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+
+    def close(self, timeout=None):
+        """
+        Sends the queued purges as flush() does, and returns True if they all
+        completed within 'timeout' seconds.
+        """
+        return self.flush(timeout)
+
+
+# The CDNPurgeQueues in use, whose queued purges are sent at exit.
+_purge_queues = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_purge_queues():
+    end = time.time() + PURGE_EXIT_TIMEOUT
+    for purge_queue in list(_purge_queues):
+        if purge_queue.depth:
+            purge_queue.flush(max(0, end - time.time()))
+
+
+
+class SegmentUploader(threading.Thread):
+    """
+    Threading class to upload a single segment of a streamed upload in the
+    background. The segment's file is closed once the upload completes, and
+    one slot of the supplied semaphore is released so that another segment
+    can start.
+    """
+    def __init__(self, manager, obj_name, fileobj, headers, slots):
+        self.manager = manager
+        self.obj_name = obj_name
+        self.fileobj = fileobj
+        self.headers = headers
+        self.slots = slots
+        self.etag = None
+        self.size = None
+        self.error = None
+        self.completed = False
+        threading.Thread.__init__(self)
+
+
+    def run(self):
+        try:
+            self.size = get_file_size(self.fileobj)
+            self.fileobj.seek(0)
+            etag = utils.get_checksum(self.fileobj)
+            self.manager._store_object(self.obj_name, content=self.fileobj,
+                    etag=etag, headers=self.headers)
+            self.etag = etag
+        except Exception as e:
+            self.error = e
+        finally:
+            self.fileobj.close()
+            self.completed = True
+            self.slots.release()
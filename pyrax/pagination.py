@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Iterates over paged listings. Each manager's paginate() method returns a
+Paginator, which requests the pages of the listing only as they are needed
+and holds no more than the current page and the one after it, so listings of
+any size can be processed in constant memory:
+
+    for server in clt._manager.paginate(page_size=100, prefetch=True):
+        ...
+
+Managers plug into this by implementing _fetch_page(), which returns a page
+of items along with the marker for the page after it. What the marker is
+depends on the API: the ID of the last item, the first item of the next page,
+or an offset.
+"""
+
+from __future__ import absolute_import
+
+import sys
+import threading
+
+import six
+from six.moves import urllib
+
+
+
+def marker_from_uri(uri, name="marker"):
+    """
+    Returns the value of the 'name' parameter in the query string of 'uri',
+    such as the marker in an API's link to the next page, or None if it is
+    not present.
+    """
+    if not uri:
+        return None
+    query = urllib.parse.urlparse(uri).query
+    values = urllib.parse.parse_qs(query).get(name)
+    return values[0] if values else None
+
+
+
+class PrefetchThread(threading.Thread):
+    """
+    Threading class to call a function in the background, such as one that
+    fetches the next page of a listing while the current page is being used.
+    Calling result() waits for the call to finish, and returns its value or
+    raises its exception.
+    """
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self._value = None
+        self._exc_info = None
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def run(self):
+        """Starts the thread."""
+        try:
+            self._value = self.func(*self.args, **self.kwargs)
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+    def result(self):
+        """Waits for the call to finish, and returns its value."""
+        self.join()
+        if self._exc_info is not None:
+            six.reraise(*self._exc_info)
+        return self._value
+
+
+
+class Paginator(object):
+    """
+    A lazy iterator over the items of a paged listing, which can be iterated
+    over more than once; each iteration lists the items again.
+
+    'fetch' is called as fetch(marker, page_size) and must return a 2-tuple of
+    the items in that page and the marker for the next page, or None as the
+    marker if there are no more pages. 'marker' is the marker for the first
+    page, and 'page_size' the number of items to request in each page, with
+    None leaving it up to the API. 'limit' is the most items to return in
+    total. If 'prefetch' is True, each page is requested in a background
+    thread while the items of the page before it are being consumed.
+    """
+    def __init__(self, fetch, marker=None, page_size=None, limit=None,
+            prefetch=False):
+        self.fetch = fetch
+        self.marker = marker
+        self.page_size = page_size
+        self.limit = limit
+        self.prefetch = prefetch
+
+
+    def __repr__(self):
+        return "<Paginator page_size=%s, limit=%s, prefetch=%s>" % (
+                self.page_size, self.limit, self.prefetch)
+
+
+    def __iter__(self):
+        for page in self.pages():
+            for item in page:
+                yield item
+
+
+    def _size(self, remaining):
+        if remaining is None or self.page_size is None:
+            return self.page_size
+        return min(self.page_size, remaining)
+
+
+    def pages(self):
+        """Yields each non-empty page of the listing as a list."""
+        marker = self.marker
+        remaining = self.limit
+        prefetched = None
+        while remaining is None or remaining > 0:
+            if prefetched is not None:
+                page, next_marker = prefetched.result()
+                prefetched = None
+            else:
+                page, next_marker = self.fetch(marker, self._size(remaining))
+            page = list(page or [])
+            if remaining is not None:
+                page = page[:remaining]
+                remaining -= len(page)
+            if not page or next_marker is None:
+                if page:
+                    yield page
+                return
+            if self.prefetch and (remaining is None or remaining > 0):
+                prefetched = PrefetchThread(self.fetch, next_marker,
+                        self._size(remaining))
+                prefetched.start()
+            yield page
+            marker = next_marker
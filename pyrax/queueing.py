@@ -306,42 +306,34 @@ class QueueMessageManager(BaseQueueManager):
     def list(self, include_claimed=False, echo=False, marker=None, limit=None):
         """
         Need to form the URI differently, so we can't use the default list().
+        The API returns no more than 10 messages per call, so they are listed
+        a page at a time until 'limit' of them, or all of them, are returned.
         """
-        return self._iterate_list(include_claimed=include_claimed, echo=echo,
-                marker=marker, limit=limit)
+        return list(self.paginate(page_size=MSG_LIMIT, limit=limit,
+                marker=marker, include_claimed=include_claimed, echo=echo))
 
 
-    def _iterate_list(self, include_claimed, echo, marker, limit):
+    def _fetch_page(self, marker, page_size, include_claimed=False,
+            echo=False):
         """
-        Recursive method to work around the hard limit of 10 items per call.
+        Returns a page of messages, and the marker for the next page taken
+        from the link to it in the response.
         """
-        ret = []
-        if limit is None:
-            this_limit = MSG_LIMIT
-        else:
-            this_limit = min(MSG_LIMIT, limit)
-            limit = limit - this_limit
         uri = "/%s?include_claimed=%s&echo=%s" % (self.uri_base,
                 json.dumps(include_claimed), json.dumps(echo))
         qs_parts = []
         if marker is not None:
             qs_parts.append("marker=%s" % marker)
-        if this_limit is not None:
-            qs_parts.append("limit=%s" % this_limit)
+        if page_size is not None:
+            qs_parts.append("limit=%s" % page_size)
         if qs_parts:
             uri = "%s&%s" % (uri, "&".join(qs_parts))
         resp, resp_body = self._list(uri, return_raw=True)
         if not resp_body:
-            return ret
+            return [], None
         messages = resp_body.get(self.plural_response_key, [])
         ret = [QueueMessage(manager=self, info=item) for item in messages]
-        marker = _parse_marker(resp_body)
-
-        loop = 0
-        if ((limit is None) or limit > 0) and marker:
-            loop += 1
-            ret.extend(self._iterate_list(include_claimed, echo, marker, limit))
-        return ret
+        return ret, _parse_marker(resp_body)
 
 
     def delete(self, msg, claim_id=None):
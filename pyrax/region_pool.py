@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Works with a service in every region of the service catalog at once. A
+RegionPool creates the clients for each region as they are first needed,
+and its map() method runs a call with each region's client concurrently:
+
+    pool = pyrax.RegionPool()
+    results = pool.map("compute", lambda clt: clt.servers.list())
+    for server in results.merged():
+        ...
+    for region, error in results.errors.items():
+        ...
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+import pyrax
+from pyrax import exceptions as exc
+
+
+
+class RegionResults(dict):
+    """
+    The results of RegionPool.map(), keyed by region. Regions where the call
+    raised an exception, or did not finish in time, are not included; their
+    exceptions are in 'errors' instead, with RegionTimeout for the latter.
+    """
+    def __init__(self, *args, **kwargs):
+        super(RegionResults, self).__init__(*args, **kwargs)
+        self.errors = {}
+
+
+    @property
+    def failed(self):
+        """Returns a sorted list of the regions that failed."""
+        return sorted(self.errors)
+
+
+    def merged(self):
+        """
+        Returns a single list with the items from every region's result, in
+        order of region. Results that are None are skipped, and results that
+        are not lists are added as single items.
+        """
+        ret = []
+        for region in sorted(self):
+            result = self[region]
+            if result is None:
+                continue
+            if isinstance(result, (list, tuple)):
+                ret.extend(result)
+            else:
+                ret.append(result)
+        return ret
+
+
+    def raise_for_errors(self):
+        """
+        Raises the exception from the first failed region, in order of
+        region, if any region failed.
+        """
+        if self.errors:
+            raise self.errors[self.failed[0]]
+
+
+
+class RegionPool(object):
+    """
+    Creates and holds the clients for services in each of the regions that
+    offer them, and runs calls across those regions concurrently.
+
+    'identity' defaults to the global pyrax identity, and must be
+    authenticated. 'regions' limits the pool to those regions; by default,
+    every region in the service catalog is used. 'public' selects between the
+    public and internal endpoints. 'max_workers' limits how many regions
+    map() calls at once; by default, they are all called at once.
+    """
+    def __init__(self, identity=None, regions=None, public=True,
+            max_workers=None):
+        self.identity = identity or pyrax.identity
+        self.regions = regions
+        self.public = public
+        self.max_workers = max_workers
+        self._clients = {}
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return "<RegionPool %s clients>" % len(self._clients)
+
+
+    def _get_service(self, service):
+        ident = self.identity
+        if not ident or not ident.authenticated:
+            raise exc.NotAuthenticated("You must authenticate before using a "
+                    "RegionPool.")
+        mapped = ident.service_mapping.get(service) or service
+        return ident.services.get(mapped)
+
+
+    def regions_for(self, service):
+        """
+        Returns a sorted list of the regions in this pool that offer the
+        service.
+        """
+        svc = self._get_service(service)
+        if svc is None:
+            return []
+        regions = svc.endpoints.keys()
+        if self.regions is not None:
+            wanted = set(rgn.upper() for rgn in self.regions)
+            regions = [rgn for rgn in regions if rgn.upper() in wanted]
+        return sorted(regions)
+
+
+    def client(self, service, region):
+        """
+        Returns the client for the service in the region, creating it the
+        first time it is requested.
+        """
+        key = (service, region)
+        clt = self._clients.get(key)
+        if clt is None:
+            with self._lock:
+                clt = self._clients.get(key)
+                if clt is None:
+                    clt = self.identity.get_client(service, region,
+                            public=self.public)
+                    self._clients[key] = clt
+        return clt
+
+
+    def clients(self, service):
+        """Returns a dict of the clients for the service, keyed by region."""
+        return dict((region, self.client(service, region))
+                for region in self.regions_for(service))
+
+
+    def map(self, service, fn, regions=None, timeout=None):
+        """
+        Calls 'fn' with the client for the service in each region, running
+        the calls concurrently, and returns a RegionResults with what each
+        call returned. 'regions' limits the calls to those regions.
+
+        Failures do not stop the other calls; they are reported in the
+        'errors' of the results. A call that has not finished 'timeout'
+        seconds after it started is reported as a RegionTimeout error, and
+        no longer counts against 'max_workers'; it is left to run to
+        completion in a background daemon thread.
+        """
+        names = self.regions_for(service)
+        if regions is not None:
+            wanted = set(rgn.upper() for rgn in regions)
+            names = [rgn for rgn in names if rgn.upper() in wanted]
+        results = RegionResults()
+        if not names:
+            return results
+        workers = min(self.max_workers or len(names), len(names))
+        cond = threading.Condition()
+        finished = []
+
+        def call(region):
+            try:
+                outcome = (region, fn(self.client(service, region)), None)
+            except Exception as e:
+                outcome = (region, None, e)
+            with cond:
+                finished.append(outcome)
+                cond.notify()
+
+        pending = list(names)
+        # The regions being called, and when each of their calls times out.
+        deadlines = {}
+        with cond:
+            while pending or deadlines:
+                while pending and len(deadlines) < workers:
+                    region = pending.pop(0)
+                    thread = threading.Thread(target=call, args=(region,))
+                    thread.daemon = True
+                    thread.start()
+                    deadlines[region] = (None if timeout is None
+                            else time.time() + timeout)
+                while finished:
+                    region, value, err = finished.pop()
+                    if deadlines.pop(region, False) is False:
+                        # Already reported as timed out.
+                        continue
+                    if err is None:
+                        results[region] = value
+                    else:
+                        results.errors[region] = err
+                now = time.time()
+                for region, end in list(deadlines.items()):
+                    if end is not None and end <= now:
+                        del deadlines[region]
+                        results.errors[region] = exc.RegionTimeout("The call "
+                                "to the '%s' service in the region '%s' did "
+                                "not finish within %s seconds." % (service,
+                                region, timeout))
+                if not deadlines or (pending and len(deadlines) < workers):
+                    continue
+                ends = [end for end in deadlines.values() if end is not None]
+                cond.wait(max(0, min(ends) - now) if ends else None)
+        return results
@@ -27,6 +27,45 @@ import pyrax
 import pyrax.utils as utils
 
 
+# Maps each resource class to the names of its attributes.
+_class_attribute_names = {}
+
+
+def _get_class_attribute_names(cls):
+    """
+    Returns the names of the attributes defined by a resource class and its
+    bases. Details with these names would be hidden by the class attributes
+    if they were looked up lazily, so they are set on the instance instead.
+    """
+    try:
+        return _class_attribute_names[cls]
+    except KeyError:
+        names = _class_attribute_names[cls] = frozenset(dir(cls))
+        return names
+
+
+def _attribute_name(key):
+    """Returns the attribute name for a key in a details dict."""
+    if isinstance(key, six.text_type):
+        return key.encode(pyrax.get_encoding())
+    elif isinstance(key, bytes):
+        return key.decode("utf-8")
+    return key
+
+
+def _detail_key(name):
+    """
+    Returns the other form that the key for the attribute 'name' may have in
+    a details dict: unicode on Python 2, and bytes on Python 3.
+    """
+    if six.PY2:
+        try:
+            return name.decode(pyrax.get_encoding())
+        except UnicodeDecodeError:
+            return name
+    return name.encode("utf-8")
+
+
 class BaseResource(object):
     """
     A resource represents a particular instance of an object (server, flavor,
@@ -41,6 +80,10 @@ class BaseResource(object):
     _non_display = []
     # Properties to add to the __repr__() display
     _repr_properties = []
+    # When an attribute isn't found on a resource that hasn't been loaded, a
+    # GET is made to load its full details. Set this to False to raise an
+    # AttributeError instead.
+    lazy_load = True
 
 
     def __init__(self, manager, info, key=None, loaded=False):
@@ -57,43 +100,92 @@ class BaseResource(object):
         """Subclasses may override this to provide a pretty ID which can be used
         for bash completion.
         """
-        if self.NAME_ATTR in self.__dict__ and self.HUMAN_ID:
+        if self.HUMAN_ID and self.NAME_ATTR in self._attribute_names():
             return utils.slugify(getattr(self, self.NAME_ATTR))
         return None
 
 
     def _add_details(self, info):
         """
-        Takes the dict returned by the API call and sets the
-        corresponding attributes on the object.
+        Takes the dict returned by the API call and makes its values
+        available as attributes of the object.
+
+        Setting every key as an attribute is costly for large listings, so
+        the dict is kept, and its values are looked up by __getattr__() when
+        they are used. Only the keys that would otherwise be hidden by an
+        existing class or instance attribute are set directly.
+        """
+        details = self.__dict__.get("_details")
+        if details is None:
+            self._details = info
+        else:
+            details = self._details = dict(details)
+            details.update(info)
+        names = set(key for key in self.__dict__ if key in info)
+        names.update(_get_class_attribute_names(self.__class__).intersection(
+                info))
+        for key in names:
+            setattr(self, _attribute_name(key), info[key])
+
+
+    def _lookup_detail(self, key):
+        details = self.__dict__.get("_details")
+        if details:
+            try:
+                return details[key]
+            except KeyError:
+                raw_key = _detail_key(key)
+                if raw_key in details:
+                    return details[raw_key]
+        raise AttributeError("'%s' object has no attribute "
+                "'%s'." % (self.__class__, key))
+
+
+    def _attribute_names(self):
         """
-        for (key, val) in six.iteritems(info):
-            if isinstance(key, six.text_type):
-                key = key.encode(pyrax.get_encoding())
-            elif isinstance(key, bytes):
-                key = key.decode("utf-8")
-            setattr(self, key, val)
+        Returns the names of the attributes of this object, including those
+        that are looked up from its details.
+        """
+        names = set(self.__dict__)
+        names.update(_attribute_name(key)
+                for key in self.__dict__.get("_details") or ())
+        return names
 
 
     def __getattr__(self, key):
         """
+        Attributes that aren't set on the object are looked up in the details
+        returned by the API.
+
         Many objects are lazy-loaded: only their most basic details
         are initially returned. The first time any of the other attributes
         are referenced, a GET is made to get the full details for the
-        object.
+        object, and counted in its manager's 'lazy_loads'. Classes that set
+        'lazy_load' to False raise an AttributeError instead.
         """
-        if not self.loaded:
-            self.get()
-        # Attribute should be set; if not, it's not valid
+        try:
+            return self._lookup_detail(key)
+        except AttributeError:
+            if (self.__dict__.get("_loaded", True) or key.startswith("__")
+                    or not self.lazy_load):
+                raise
+        self._lazy_load()
         try:
             return self.__dict__[key]
         except KeyError:
-            raise AttributeError("'%s' object has no attribute "
-                    "'%s'." % (self.__class__, key))
+            return self._lookup_detail(key)
+
+
+    def _lazy_load(self):
+        """Loads the full details of the object when an attribute is missing."""
+        count = getattr(self.manager, "count_lazy_load", None)
+        if count is not None:
+            count(self)
+        self.get()
 
 
     def __repr__(self):
-        reprkeys = sorted(key for key in self.__dict__.keys()
+        reprkeys = sorted(key for key in self._attribute_names()
                 if (key[0] != "_")
                 and (key not in ("manager", "created", "updated"))
                 and (key not in self._non_display))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Caches authentication responses on disk, so that processes run by the same
+user can share a token and service catalog instead of each authenticating
+with the identity service.
+
+The cache is enabled with the 'token_cache' setting, which is either the
+directory in which to keep the cached tokens or 'True' to use the default
+directory of ~/.pyrax/tokens. Each entry is a JSON file that only its owner
+can read, and which is replaced atomically when it is updated. Entries are
+only used if they, and the directory, can be written to by no one but the
+current user.
+"""
+
+from __future__ import absolute_import
+
+import contextlib
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import six
+
+import pyrax.utils as utils
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; entries are still replaced atomically, but
+    # processes may authenticate at the same time.
+    fcntl = None
+
+
+DEFAULT_DIRECTORY = os.path.join("~", ".pyrax", "tokens")
+# Cached tokens that expire within this many seconds are not used.
+EXPIRATION_MARGIN = 60
+
+
+
+def cache_key(*parts):
+    """
+    Returns the key of the cache entry for the given parts, which are
+    typically the auth endpoint, username, tenant and password or API key.
+    The parts are hashed so that the secret is not stored in the file name.
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            part = ""
+        if isinstance(part, six.text_type):
+            part = part.encode("utf-8")
+        hasher.update(part)
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+
+class TokenCache(object):
+    """
+    A directory of cached authentication responses, keyed by the values
+    returned from cache_key().
+    """
+    def __init__(self, directory=None, margin=EXPIRATION_MARGIN):
+        self.directory = os.path.abspath(os.path.expanduser(directory or
+                DEFAULT_DIRECTORY))
+        self.margin = margin
+
+
+    def __repr__(self):
+        return "<TokenCache %s>" % self.directory
+
+
+    def _ensure_directory(self):
+        try:
+            os.makedirs(self.directory, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+
+    def _path(self, key):
+        return os.path.join(self.directory, "%s.json" % key)
+
+
+    def get(self, key):
+        """
+        Returns the cached authentication response for 'key', or None if there
+        is no entry, it cannot be read, another user could have written it,
+        or its token expires within 'margin' seconds.
+        """
+        path = self._path(key)
+        if not (utils.is_trusted_path(self.directory)
+                and utils.is_trusted_path(path)):
+            return None
+        try:
+            with open(path) as ff:
+                entry = json.load(ff)
+        except (IOError, OSError, ValueError):
+            return None
+        try:
+            if entry["expires"] - self.margin <= time.time():
+                return None
+            return entry["response"]
+        except (KeyError, TypeError):
+            return None
+
+
+    def set(self, key, response, expires):
+        """
+        Stores the authentication response for 'key'. 'expires' is the time
+        when its token expires, in seconds since the epoch.
+        """
+        self._ensure_directory()
+        entry = {"expires": expires, "response": response}
+        # mkstemp() creates the file so that only its owner can access it.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as ff:
+                json.dump(entry, ff)
+                ff.flush()
+                os.fsync(ff.fileno())
+            utils.replace_file(tmp_path, self._path(key))
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+    def delete(self, key):
+        """Removes the entry for 'key', if there is one."""
+        try:
+            os.remove(self._path(key))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".json"):
+                self.delete(name[:-5])
+
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        """
+        Holds an exclusive lock on the entry for 'key', so that only one
+        process at a time authenticates with the same credentials. Locking is
+        skipped on platforms without fcntl.
+        """
+        if fcntl is None:
+            yield
+            return
+        self._ensure_directory()
+        fd = os.open(os.path.join(self.directory, "%s.lock" % key),
+                os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
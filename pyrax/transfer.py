@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Runs long transfers, such as folder uploads and bulk deletes, on a bounded
+pool of background worker threads, and paces the bytes that transfers send
+and receive so that they share a configurable amount of bandwidth.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import heapq
+import itertools
+import threading
+import time
+import uuid
+
+import six
+from six.moves import queue
+
+import pyrax
+
+
+# Default number of worker threads for a TransferManager.
+DEFAULT_MAX_WORKERS = 4
+# Seconds an idle worker thread waits for a new job before exiting.
+WORKER_IDLE_TIMEOUT = 1
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+CANCELLED = "CANCELLED"
+
+
+
+class BandwidthLimiter(object):
+    """
+    Token bucket that limits the combined throughput of all the transfers
+    that draw from it to 'rate' bytes per second, allowing bursts of up to
+    'burst' bytes (one second's worth by default). A rate of None or 0 means
+    that there is no limit.
+
+    When several transfers are waiting for bandwidth, they are served in
+    order of their weighted share, so that a transfer with a weight of 2
+    gets about twice the bandwidth of one with a weight of 1.
+    """
+    def __init__(self, rate=None, burst=None):
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._counter = itertools.count()
+        self._virtual_time = 0.0
+        self.set_rate(rate, burst=burst)
+
+
+    def set_rate(self, rate, burst=None):
+        """Changes the rate (and optionally the burst size) of the limiter."""
+        with self._cond:
+            self.rate = float(rate) if rate else None
+            self.burst = float(burst or self.rate or 0)
+            self._tokens = self.burst
+            self._stamp = time.time()
+            self._cond.notify_all()
+
+
+    def _refill(self):
+        now = time.time()
+        if self.rate:
+            self._tokens = min(self.burst,
+                    self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+
+    def consume(self, nbytes, weight=None):
+        """
+        Blocks until 'nbytes' bytes may be transferred without exceeding the
+        limiter's rate. A single call larger than the burst size is allowed
+        through once the bucket is full, and the excess is paid back by
+        later callers.
+        """
+        if not self.rate or nbytes <= 0:
+            return
+        weight = float(weight or 1)
+        with self._cond:
+            entry = (self._virtual_time + nbytes / weight,
+                    next(self._counter))
+            heapq.heappush(self._waiting, entry)
+            try:
+                while self.rate:
+                    self._refill()
+                    timeout = None
+                    if self._waiting[0] is entry:
+                        needed = min(nbytes, self.burst)
+                        if self._tokens >= needed:
+                            self._tokens -= nbytes
+                            self._virtual_time = entry[0]
+                            return
+                        timeout = (needed - self._tokens) / self.rate
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+
+# The limiter shared by all object transfers in this process. Its rate is
+# taken from the 'transfer_bandwidth' setting.
+bandwidth_limiter = BandwidthLimiter()
+_configured_bandwidth = None
+
+
+def get_bandwidth_limiter():
+    """
+    Returns the shared BandwidthLimiter, first updating its rate if the
+    'transfer_bandwidth' setting has changed.
+    """
+    global _configured_bandwidth
+    setting = pyrax.get_setting("transfer_bandwidth")
+    if setting != _configured_bandwidth:
+        bandwidth_limiter.set_rate(setting)
+        _configured_bandwidth = setting
+    return bandwidth_limiter
+
+
+def throttle_iter(iterable, weight=None):
+    """
+    Yields the chunks from 'iterable', waiting as needed so that they are
+    consumed within the shared bandwidth limit.
+    """
+    for chunk in iterable:
+        get_bandwidth_limiter().consume(len(chunk), weight)
+        yield chunk
+
+
+
+class TransferJob(object):
+    """
+    Handle for a job that has been submitted to a TransferManager. It is
+    used to follow the progress of the job, to cancel it, or to wait for it
+    to finish.
+
+    The job's function is called with the job itself as its first argument.
+    Long-running functions should call `add_progress()` as they process
+    bytes, and check `cancelled` at convenient points so that they can stop
+    early when asked to.
+
+    If 'max_rate' is given, it is the maximum throughput for the job in bytes
+    per second; `add_progress()` will sleep as needed to keep the average
+    rate of the job at or below that value. The job's 'weight' sets its share
+    of the bandwidth when the shared limit from the 'transfer_bandwidth'
+    setting is in effect.
+    """
+    def __init__(self, func, args=None, kwargs=None, total_bytes=None,
+            max_rate=None, name=None, weight=None):
+        self.id = str(uuid.uuid4())
+        self.func = func
+        self.args = args or ()
+        self.kwargs = kwargs or {}
+        self.total_bytes = total_bytes
+        self.max_rate = max_rate
+        self.name = name
+        self.weight = weight or 1
+        self.status = QUEUED
+        self.bytes_done = 0
+        self.result = None
+        self.error = None
+        self.start_time = None
+        self.end_time = None
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+
+
+    def __repr__(self):
+        return "<TransferJob %s %s (%s/%s bytes)>" % (self.name or self.id,
+                self.status, self.bytes_done, self.total_bytes)
+
+
+    def run(self):
+        """
+        Runs the job's function in the current thread, and records the
+        outcome. This is normally called by a TransferManager worker.
+        """
+        if self.cancelled:
+            self.status = CANCELLED
+            self._done_event.set()
+            return
+        self.status = RUNNING
+        self.start_time = time.time()
+        try:
+            self.result = self.func(self, *self.args, **self.kwargs)
+        except Exception as e:
+            self.error = e
+            self.status = FAILED
+        else:
+            self.status = CANCELLED if self.cancelled else COMPLETED
+        finally:
+            self.end_time = time.time()
+            self._done_event.set()
+
+
+    def add_progress(self, nbytes):
+        """
+        Records that 'nbytes' more bytes have been processed. When the job
+        has a 'max_rate', this will block as long as needed to keep the
+        job's throughput under that rate.
+        """
+        with self._lock:
+            self.bytes_done += nbytes
+            done = self.bytes_done
+        if self.max_rate and self.start_time:
+            ahead = (float(done) / self.max_rate) - self.elapsed
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+    def cancel(self):
+        """
+        Asks the job to stop. A job that has not started yet will not be run
+        at all; a running job will stop the next time it checks for
+        cancellation. Any work already completed is not undone.
+        """
+        self._cancel_event.set()
+
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the job has finished, and returns the result of the
+        job's function. If the function raised an exception, it is re-raised
+        here. If 'timeout' is given and the job has not finished by then,
+        None is returned.
+        """
+        if not self._done_event.wait(timeout):
+            return None
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+    @property
+    def cancelled(self):
+        """Returns True if cancel() has been called for this job."""
+        return self._cancel_event.is_set()
+
+
+    @property
+    def completed(self):
+        """Returns True if the job has finished, for whatever reason."""
+        return self._done_event.is_set()
+
+
+    @property
+    def elapsed(self):
+        """Returns the number of seconds that the job has been running."""
+        if not self.start_time:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+
+    @property
+    def rate(self):
+        """Returns the average throughput of the job, in bytes per second."""
+        elapsed = self.elapsed
+        if not elapsed:
+            return 0.0
+        return self.bytes_done / elapsed
+
+
+    @property
+    def progress(self):
+        """
+        Returns the fraction of the job that has been completed, from 0.0 to
+        1.0, or None if the job's total size is not known.
+        """
+        if self.completed and self.status == COMPLETED:
+            return 1.0
+        if not self.total_bytes:
+            return None
+        return min(1.0, float(self.bytes_done) / self.total_bytes)
+
+
+    @property
+    def eta(self):
+        """
+        Returns the estimated number of seconds until the job completes, or
+        None if that cannot be estimated yet.
+        """
+        if self.completed:
+            return 0.0
+        rate = self.rate
+        if not self.total_bytes or not rate:
+            return None
+        return max(0.0, (self.total_bytes - self.bytes_done) / rate)
+
+
+
+class ThrottledReader(object):
+    """
+    Wraps a file-like object so that the bytes read from it, such as when it
+    is sent as the body of an upload, stay within the shared bandwidth limit.
+    """
+    def __init__(self, fileobj, weight=None):
+        self.fileobj = fileobj
+        self.weight = weight
+        self.name = getattr(fileobj, "name", None)
+
+
+    def __len__(self):
+        if hasattr(self.fileobj, "__len__"):
+            return len(self.fileobj)
+        currpos = self.fileobj.tell()
+        self.fileobj.seek(0, 2)
+        total_size = self.fileobj.tell()
+        self.fileobj.seek(currpos)
+        return total_size
+
+
+    def tell(self):
+        return self.fileobj.tell()
+
+
+    def seek(self, *args):
+        return self.fileobj.seek(*args)
+
+
+    def read(self, *args):
+        data = self.fileobj.read(*args)
+        get_bandwidth_limiter().consume(len(data), self.weight)
+        return data
+
+
+    def close(self):
+        return self.fileobj.close()
+
+
+
+class ProgressReader(ThrottledReader):
+    """
+    Wraps a file-like object so that the bytes read from it are reported to
+    a TransferJob. Re-reading data that has already been reported, such as
+    when a checksum is calculated before the upload, is not counted twice.
+    """
+    def __init__(self, fileobj, job):
+        super(ProgressReader, self).__init__(fileobj, weight=job.weight)
+        self.job = job
+        self._reported = fileobj.tell()
+
+
+    def read(self, *args):
+        data = super(ProgressReader, self).read(*args)
+        pos = self.fileobj.tell()
+        if pos > self._reported:
+            self.job.add_progress(pos - self._reported)
+            self._reported = pos
+        return data
+
+
+
+class TransferManager(object):
+    """
+    Runs TransferJobs on a bounded pool of background threads. Jobs are
+    queued and run in the order they are submitted, with at most
+    'max_workers' of them running at once. Worker threads are started as
+    needed, and exit after being idle for a moment. Like the threads that
+    they replace, workers are not daemon threads, so a program will not exit
+    while jobs are still running.
+
+    Each manager keeps track of its own jobs, so separate managers (for
+    example, those belonging to different clients) share no state. Finished
+    jobs are kept, so that their status can still be looked up by ID, until
+    remove_finished() is called. A manager whose job IDs are never handed
+    out can pass 'max_finished' to keep only that many of the most recently
+    finished jobs.
+    """
+    def __init__(self, max_workers=None, max_finished=None):
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.max_finished = max_finished
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._finished = collections.deque()
+        self._workers = []
+        self._lock = threading.Lock()
+
+
+    def submit(self, func, args=None, kwargs=None, total_bytes=None,
+            max_rate=None, name=None, weight=None):
+        """
+        Queues 'func' to be run in the background, and returns the
+        TransferJob handle for it. The function will be called with the job
+        as its first argument, followed by 'args' and 'kwargs'.
+        """
+        job = TransferJob(func, args=args, kwargs=kwargs,
+                total_bytes=total_bytes, max_rate=max_rate, name=name,
+                weight=weight)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._queue.put(job)
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work)
+                self._workers.append(worker)
+                worker.start()
+        return job
+
+
+    def _work(self):
+        """Main loop for the worker threads."""
+        worker = threading.current_thread()
+        while True:
+            try:
+                job = self._queue.get(timeout=WORKER_IDLE_TIMEOUT)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._workers.remove(worker)
+                        return
+                continue
+            try:
+                job.run()
+            finally:
+                self._record_finished(job)
+                self._queue.task_done()
+
+
+    def _record_finished(self, job):
+        """
+        Adds the job to the history of finished jobs, discarding the oldest
+        ones once there are more than 'max_finished' of them.
+        """
+        if self.max_finished is None:
+            return
+        with self._lock:
+            if job.id not in self._jobs:
+                return
+            self._finished.append(job.id)
+            while len(self._finished) > self.max_finished:
+                self._jobs.pop(self._finished.popleft(), None)
+
+
+    def get_job(self, job_id):
+        """
+        Returns the TransferJob with the specified ID, or None if there is no
+        such job.
+        """
+        return self._jobs.get(job_id)
+
+
+    def list_jobs(self, include_finished=True):
+        """
+        Returns a list of the jobs submitted to this manager. Pass
+        `include_finished=False` to list only the jobs that are still queued
+        or running.
+        """
+        jobs = list(self._jobs.values())
+        if not include_finished:
+            jobs = [job for job in jobs if not job.completed]
+        return jobs
+
+
+    def remove_finished(self):
+        """Discards the handles of all jobs that have finished."""
+        with self._lock:
+            for job_id, job in list(six.iteritems(self._jobs)):
+                if job.completed:
+                    del self._jobs[job_id]
+            self._finished.clear()
+
+
+    def cancel_all(self):
+        """Cancels every job that has not yet finished."""
+        for job in self.list_jobs(include_finished=False):
+            job.cancel()
+
+
+    def wait_all(self, timeout=None):
+        """
+        Blocks until all submitted jobs have finished, or until 'timeout'
+        seconds have passed. Returns True if all jobs finished.
+        """
+        end = None if timeout is None else time.time() + timeout
+        for job in self.list_jobs(include_finished=False):
+            remaining = None if end is None else max(0, end - time.time())
+            job._done_event.wait(remaining)
+        return not self.list_jobs(include_finished=False)
@@ -7,11 +7,13 @@ import datetime
 import email.utils
 import fnmatch
 import hashlib
+import logging
 import numbers
 import os
 import random
 import re
 import shutil
+import stat
 import string
 from subprocess import Popen, PIPE
 import sys
@@ -27,9 +29,11 @@ except ImportError:
 trace = pudb.set_trace
 
 import six
+from six.moves import queue
 
 import pyrax
 import pyrax.exceptions as exc
+from pyrax.pagination import Paginator
 
 
 def runproc(cmd):
@@ -149,25 +153,30 @@ class ResultsIterator(object):
     is called.
 
     By default the marker will be unspecified, and the limit will be 1000. You
-    can override either by specifying them during instantiation.
+    can override either by specifying them during instantiation. A page with
+    fewer than 'limit' results is the last one. Pass prefetch=True to have the
+    next page requested in a background thread while the items of the
+    current page are being consumed.
 
     The 'kwargs' will be converted to attributes. E.g., in this call:
         rit = ResultsIterator(mgr, foo="bar")
     will result in the object having a 'foo' attribute with the value of 'bar'.
     """
-    def __init__(self, manager, marker=None, limit=1000, **kwargs):
+    def __init__(self, manager, marker=None, limit=1000, prefetch=False,
+            **kwargs):
         self.manager = manager
         self.marker = marker
         self.limit = limit
+        self.prefetch = prefetch
         for att, val in list(kwargs.items()):
             setattr(self, att, val)
-        self.results = []
         self.list_method = None
         self._list_method = None
         self.marker_att = "id"
         self.extra_args = tuple()
         self._init_methods()
         self.next_uri = ""
+        self._items = None
 
 
     def _init_methods(self):
@@ -189,31 +198,33 @@ class ResultsIterator(object):
 
     def next(self):
         """
-        Return the next available item. If there are no more items in the
-        local 'results' list, check if there is a 'next_uri' value. If so,
-        use that to get the next page of results from the API, and return
-        the first item from that query.
+        Return the next available item, requesting the pages of results from
+        the API as they are needed. Iteration is over at once if 'next_uri'
+        is None.
         """
-        try:
-            return self.results.pop(0)
-        except IndexError:
+        if self._items is None:
             if self.next_uri is None:
                 raise StopIteration()
-            else:
-                if not self.next_uri:
-                    self.results = self.list_method(marker=self.marker,
-                            limit=self.limit, prefix=self.prefix)
-                else:
-                    args = self.extra_args
-                    self.results = self._list_method(self.next_uri, *args)
-                if self.results:
-                    last_res = self.results[-1]
-                    self.marker = getattr(last_res, self.marker_att)
-        # We should have more results.
-        try:
-            return self.results.pop(0)
-        except IndexError:
-            raise StopIteration()
+            paginator = Paginator(self._fetch, marker=self.marker,
+                    page_size=self.limit, prefetch=self.prefetch)
+            self._items = iter(paginator)
+        return next(self._items)
+
+
+    def _fetch(self, marker, limit):
+        """
+        Requests the page of results after 'marker' from the API, and returns
+        them along with the marker for the page after them, or None if this
+        page was the last.
+        """
+        if self.next_uri:
+            results = self._list_method(self.next_uri, *self.extra_args)
+        else:
+            results = self.list_method(marker=marker, limit=limit,
+                    prefix=self.prefix)
+        if not results or (limit and len(results) < limit):
+            return results, None
+        return results, getattr(results[-1], self.marker_att)
 
 
 def get_checksum(content, encoding="utf8", block_size=8192):
@@ -317,23 +328,49 @@ def folder_size(pth, ignore=None):
         raise exc.FolderNotFound
 
     ignore = coerce_to_list(ignore)
+    total = 0
+    for root, dirnames, fnames in os.walk(pth):
+        # Only files are considered; folder stat sizes are not counted.
+        for fname in fnames:
+            fpth = os.path.realpath(os.path.join(root, fname))
+            if not os.path.exists(fpth) or os.path.isdir(fpth):
+                continue
+            if match_pattern(fpth, ignore):
+                continue
+            total += os.stat(fpth).st_size
+    return total
+
+
+def replace_file(src, dest):
+    """
+    Moves the file at 'src' to 'dest', replacing any file that is already
+    there. Where the platform allows it, readers of 'dest' see either the
+    old file or the new one, never a partial file.
+    """
+    try:
+        os.replace(src, dest)
+    except AttributeError:
+        # Python 2 has no os.replace(); rename() is atomic on POSIX, but on
+        # Windows it fails if the destination exists.
+        if os.name == "nt" and os.path.exists(dest):
+            os.remove(dest)
+        os.rename(src, dest)
 
-    def get_size(total, root, names):
-        paths = [os.path.realpath(os.path.join(root, nm)) for nm in names]
-        for pth in paths[::-1]:
-            if not os.path.exists(pth):
-                paths.remove(pth)
-            elif os.path.isdir(pth):
-                # Don't count folder stat sizes
-                paths.remove(pth)
-            elif match_pattern(pth, ignore):
-                paths.remove(pth)
-        total[0] += sum(os.stat(pth).st_size for pth in paths)
 
-    # Need a mutable to pass
-    total = [0]
-    os.path.walk(pth, get_size, total)
-    return total[0]
+def is_trusted_path(path):
+    """
+    Returns True if the file or directory at 'path' exists and only the
+    current user, or root, can write to it.
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return False
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        return False
+    if hasattr(os, "getuid"):
+        return info.st_uid in (0, os.getuid())
+    return True
 
 
 def add_method(obj, func, name=None):
@@ -369,6 +406,41 @@ class _WaitThread(threading.Thread):
         self.callback(resp)
 
 
+def run_in_workers(func, items, concurrency):
+    """
+    Calls func(*args) for each tuple of args in 'items', in a fixed pool of
+    'concurrency' threads fed from a bounded queue. No more items are taken
+    from 'items' than there are threads to work on them, so it can be a
+    generator of any length. 'func' is expected to handle its own errors;
+    any it does not are logged, and the remaining items are still processed.
+    """
+    pending = queue.Queue(concurrency)
+
+    def work():
+        while True:
+            args = pending.get()
+            if args is None:
+                return
+            try:
+                func(*args)
+            except Exception:
+                logging.getLogger("pyrax").exception("Unhandled error in "
+                        "worker thread")
+
+    workers = [threading.Thread(target=work) for num in range(concurrency)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    try:
+        for args in items:
+            pending.put(args)
+    finally:
+        for worker in workers:
+            pending.put(None)
+        for worker in workers:
+            worker.join()
+
+
 def wait_until(obj, att, desired, callback=None, interval=5, attempts=0,
         verbose=False, verbose_atts=None):
     """
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks the object storage operations of pyrax against a FakeSwiftServer
+running in the same process, so that the results reflect the cost of the
+client code and the HTTP round trips rather than that of a real cluster.
+
+Run it from the top of the source tree:
+
+    python -m tests.benchmarks.object_storage --output results.json
+
+Each benchmark reports the number of operations, the elapsed time, the
+throughput in operations and megabytes per second, the latency percentiles
+of the individual operations in milliseconds, and the number of HTTP
+requests that were made. The results are written as JSON, and a previous
+results file can be passed with --compare to show how the throughput and
+median latency have changed.
+
+The amount of work done by every benchmark is multiplied by --scale, and
+individual benchmarks can be selected by name.
+"""
+
+from __future__ import print_function
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import pyrax
+from pyrax.fakeserver import FakeSwiftServer
+import pyrax.version
+
+MB = 1024 * 1024
+CONTAINER = "bench"
+
+
+
+class Recorder(object):
+    """
+    Records the latency and size of each operation in a benchmark, and the
+    number of requests the server handled during them.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.latencies = []
+        self.nbytes = 0
+        self.requests = 0
+
+
+    @contextlib.contextmanager
+    def op(self, nbytes=0):
+        requests = self.server.request_count
+        start = time.time()
+        yield
+        self.latencies.append(time.time() - start)
+        self.nbytes += nbytes
+        self.requests += self.server.request_count - requests
+
+
+
+def _scaled(num, scale):
+    return max(1, int(num * scale))
+
+
+def _chunks(size, chunk_size=MB):
+    chunk = b"x" * chunk_size
+    while size > 0:
+        yield chunk[:size]
+        size -= chunk_size
+
+
+def bench_small_puts(server, clt, scale, workdir):
+    """Stores many 1KB objects, one request each."""
+    clt.create(CONTAINER)
+    data = b"x" * 1024
+    rec = Recorder(server)
+    for num in range(_scaled(500, scale)):
+        with rec.op(len(data)):
+            clt.store_object(CONTAINER, "small-%06d" % num, data,
+                    return_none=True)
+    return rec
+
+
+def bench_segmented_upload(server, clt, scale, workdir):
+    """Streams 32MB objects as 8MB segments with a DLO manifest."""
+    clt.create(CONTAINER)
+    size = _scaled(32 * MB, scale)
+    segment_size = max(1, size // 4)
+    rec = Recorder(server)
+    for num in range(4):
+        with rec.op(size):
+            clt.upload_stream(CONTAINER, "large-%d" % num, _chunks(size),
+                    segment_size=segment_size, concurrency=4,
+                    return_none=True)
+    return rec
+
+
+def bench_ranged_download(server, clt, scale, workdir):
+    """Downloads a 32MB object in 1MB ranges."""
+    size = _scaled(32 * MB, scale)
+    server.put_object(CONTAINER, "large", b"x" * size)
+    rec = Recorder(server)
+    for num in range(4):
+        with rec.op(size):
+            for chunk in clt.fetch_object(CONTAINER, "large", chunk_size=MB):
+                pass
+    return rec
+
+
+def bench_full_listing(server, clt, scale, workdir):
+    """Lists every object in a container of 20,000 objects."""
+    for num in range(_scaled(20000, scale)):
+        server.put_object(CONTAINER, "obj-%06d" % num, b"")
+    rec = Recorder(server)
+    for num in range(3):
+        with rec.op():
+            clt.list_container_object_names(CONTAINER, full_listing=True)
+    return rec
+
+
+def bench_bulk_delete(server, clt, scale, workdir):
+    """Deletes objects in batches of 1,000 with bulk-delete requests."""
+    batch = _scaled(1000, scale)
+    batches = []
+    for num in range(10):
+        names = ["del-%02d-%06d" % (num, pos) for pos in range(batch)]
+        for name in names:
+            server.put_object(CONTAINER, name, b"")
+        batches.append(names)
+    rec = Recorder(server)
+    for names in batches:
+        with rec.op():
+            clt.bulk_delete(CONTAINER, names)
+    return rec
+
+
+def _make_folder(workdir, scale):
+    folder = os.path.join(workdir, "sync")
+    data = b"x" * 4096
+    count = _scaled(200, scale)
+    for num in range(count):
+        subdir = os.path.join(folder, "dir%02d" % (num % 10))
+        if not os.path.isdir(subdir):
+            os.makedirs(subdir)
+        with open(os.path.join(subdir, "file%05d" % num), "wb") as ff:
+            ff.write(data)
+    return folder, count * len(data)
+
+
+def bench_folder_sync(server, clt, scale, workdir):
+    """Syncs a folder of 200 4KB files to an empty container."""
+    folder, nbytes = _make_folder(workdir, scale)
+    rec = Recorder(server)
+    for num in range(3):
+        server.reset()
+        clt.create(CONTAINER)
+        with rec.op(nbytes):
+            clt.sync_folder_to_container(folder, CONTAINER)
+    return rec
+
+
+def bench_folder_sync_unchanged(server, clt, scale, workdir):
+    """Syncs a folder of 200 4KB files that are already in the container."""
+    folder, nbytes = _make_folder(workdir, scale)
+    clt.create(CONTAINER)
+    clt.sync_folder_to_container(folder, CONTAINER)
+    rec = Recorder(server)
+    for num in range(3):
+        with rec.op():
+            clt.sync_folder_to_container(folder, CONTAINER)
+    return rec
+
+
+BENCHMARKS = (("small_puts", bench_small_puts),
+        ("segmented_upload", bench_segmented_upload),
+        ("ranged_download", bench_ranged_download),
+        ("full_listing", bench_full_listing),
+        ("bulk_delete", bench_bulk_delete),
+        ("folder_sync", bench_folder_sync),
+        ("folder_sync_unchanged", bench_folder_sync_unchanged),
+        )
+
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    pos = int(round(pct / 100.0 * (len(ordered) - 1)))
+    return ordered[pos]
+
+
+def summarize(rec):
+    """Returns the results dict for a benchmark's Recorder."""
+    ops = len(rec.latencies)
+    elapsed = sum(rec.latencies)
+    latency = dict(("p%s" % pct, _percentile(rec.latencies, pct) * 1000)
+            for pct in (50, 90, 99))
+    latency["mean"] = sum(rec.latencies) / ops * 1000
+    latency["min"] = min(rec.latencies) * 1000
+    latency["max"] = max(rec.latencies) * 1000
+    return {"operations": ops,
+            "elapsed": elapsed,
+            "ops_per_sec": ops / elapsed if elapsed else 0.0,
+            "bytes": rec.nbytes,
+            "mb_per_sec": rec.nbytes / float(MB) / elapsed if elapsed else 0.0,
+            "latency_ms": latency,
+            "requests": rec.requests,
+            }
+
+
+def run_benchmarks(names=None, scale=1.0):
+    """
+    Runs the named benchmarks (all of them by default), each against a fresh
+    FakeSwiftServer, and returns the results as a dict.
+    """
+    results = {"pyrax_version": pyrax.version.version,
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+            "scale": scale,
+            "benchmarks": {},
+            }
+    for name, func in BENCHMARKS:
+        if names and name not in names:
+            continue
+        workdir = tempfile.mkdtemp()
+        try:
+            with FakeSwiftServer() as server:
+                clt = server.get_client()
+                rec = func(server, clt, scale, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results["benchmarks"][name] = summarize(rec)
+    return results
+
+
+def compare(results, baseline):
+    """
+    Returns lines describing the change in throughput and median latency of
+    each benchmark from those in 'baseline'.
+    """
+    lines = []
+    for name, func in BENCHMARKS:
+        new = results["benchmarks"].get(name)
+        old = baseline.get("benchmarks", {}).get(name)
+        if not (new and old):
+            continue
+        ops_change = ((new["ops_per_sec"] / old["ops_per_sec"] - 1) * 100
+                if old["ops_per_sec"] else 0.0)
+        old_p50 = old["latency_ms"]["p50"]
+        p50_change = ((new["latency_ms"]["p50"] / old_p50 - 1) * 100
+                if old_p50 else 0.0)
+        lines.append("%-24s ops/s %+7.1f%%   p50 latency %+7.1f%%" % (name,
+                ops_change, p50_change))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pyrax object "
+            "storage operations against an in-process fake Swift server.")
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+            help="The benchmarks to run: %s. All are run by default." %
+            ", ".join(name for name, func in BENCHMARKS))
+    parser.add_argument("--scale", type=float, default=1.0,
+            help="Multiplies the amount of work done by each benchmark.")
+    parser.add_argument("--output", help="Write the results as JSON to this "
+            "file.")
+    parser.add_argument("--compare", help="A results file from an earlier "
+            "run to compare these results with.")
+    args = parser.parse_args(argv)
+    known = [name for name, func in BENCHMARKS]
+    unknown = [name for name in args.benchmarks if name not in known]
+    if unknown:
+        parser.error("Unknown benchmark(s): %s" % ", ".join(unknown))
+    results = run_benchmarks(args.benchmarks, scale=args.scale)
+    for name, func in BENCHMARKS:
+        res = results["benchmarks"].get(name)
+        if res:
+            print("%-24s %8.1f ops/s %9.2f MB/s   p50 %8.2f ms   p99 %8.2f ms"
+                    % (name, res["ops_per_sec"], res["mb_per_sec"],
+                    res["latency_ms"]["p50"], res["latency_ms"]["p99"]))
+    if args.output:
+        with open(args.output, "w") as ff:
+            json.dump(results, ff, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as ff:
+            baseline = json.load(ff)
+        print()
+        print("Compared with %s (pyrax %s):" % (args.compare,
+                baseline.get("pyrax_version")))
+        for line in compare(results, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
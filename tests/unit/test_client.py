@@ -139,6 +139,14 @@ class ClientTest(unittest.TestCase):
         self.client.findall(prop=val)
         mgr.findall.assert_called_once_with(prop=val)
 
+    def test_paginate(self):
+        mgr = self.client._manager
+        mgr.paginate = Mock()
+        marker = utils.random_unicode()
+        self.client.paginate(page_size=10, marker=marker)
+        mgr.paginate.assert_called_once_with(page_size=10, limit=None,
+                marker=marker, prefetch=False)
+
     def test_unauthenticate(self):
         clt = self.client
         id_svc = clt.identity
@@ -179,6 +187,19 @@ class ClientTest(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(body, body_content)
 
+    @patch("pyrax.http.request")
+    def test_request_session(self, mock_req):
+        clt = self.client
+        fakeresp = fakes.FakeResponse()
+        fakeresp.status_code = 200
+        mock_req.return_value = (fakeresp, {})
+        clt.identity.session = None
+        clt.request(DUMMY_URL, "GET")
+        self.assertFalse("session" in mock_req.call_args[1])
+        clt.identity.session = session = Mock()
+        clt.request(DUMMY_URL, "GET")
+        self.assertTrue(mock_req.call_args[1]["session"] is session)
+
     @patch("pyrax.http.request")
     def test_request_content_type_header(self, mock_req):
         clt = self.client
@@ -305,6 +326,36 @@ class ClientTest(unittest.TestCase):
         clt.request = sav_req
         id_svc.authenticate = sav_auth
 
+    def test_api_request_refresh_token(self):
+        clt = self.client
+        id_svc = clt.identity
+        clt.request = Mock(return_value=(1, 1))
+        clt.management_url = DUMMY_URL
+        id_svc.token = utils.random_unicode()
+        id_svc.tenant_id = utils.random_unicode()
+        with patch.object(id_svc, "refresh_token") as refresh:
+            clt._api_request(DUMMY_URL, "GET")
+        refresh.assert_called_once_with()
+
+    def test_api_request_unauthorized_refresh(self):
+        clt = self.client
+        id_svc = clt.identity
+        clt.management_url = DUMMY_URL
+        id_svc.token = token = utils.random_unicode()
+        id_svc.tenant_id = utils.random_unicode()
+        new_token = utils.random_unicode()
+        clt.request = Mock(side_effect=[exc.Unauthorized(""), (1, 1)])
+
+        def refresh(force=False, stale_token=None):
+            if force:
+                id_svc.token = new_token
+
+        with patch.object(id_svc, "refresh_token", side_effect=refresh) as rt:
+            clt._api_request(DUMMY_URL, "GET")
+        rt.assert_called_with(force=True, stale_token=token)
+        hdrs = clt.request.call_args[1]["headers"]
+        self.assertEqual(hdrs["X-Auth-Token"], new_token)
+
     def test_api_request_auth_failed(self):
         clt = self.client
         id_svc = clt.identity
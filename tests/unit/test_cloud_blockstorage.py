@@ -210,6 +210,13 @@ class CloudBlockStorageTest(unittest.TestCase):
         mgr.update(vol)
         self.assertEqual(mgr.api.method_put.call_count, 0)
 
+    def test_paginate_volumes(self):
+        mgr = self.client._manager
+        vols = [fakes.FakeEntity() for num in range(3)]
+        mgr.list = Mock(side_effect=[vols[:2], vols[2:]])
+        self.assertEqual(list(mgr.paginate(page_size=2)), vols)
+        mgr.list.assert_called_with(marker=vols[1].id, limit=2)
+
     def test_list_types(self):
         clt = self.client
         clt._types_manager.list = Mock()
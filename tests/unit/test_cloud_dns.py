@@ -141,6 +141,20 @@ class CloudDNSTest(unittest.TestCase):
         ret = clt.list()
         self.assertEqual(len(ret), 1)
 
+    def test_manager_paginate(self):
+        clt = self.client
+        mgr = clt._manager
+        bodies = [
+                {"domains": [{"name": "a"}, {"name": "b"}],
+                    "links": [{"rel": "next",
+                        "href": "%s/domains?limit=2&offset=2" % example_uri}]},
+                {"domains": [{"name": "c"}]}]
+        clt.method_get = Mock(side_effect=[({}, body) for body in bodies])
+        ret = list(mgr.paginate(page_size=2))
+        self.assertEqual(len(ret), 3)
+        self.assertEqual(clt.method_get.call_args_list,
+                [call("/domains?limit=2"), call("/domains?limit=2&offset=2")])
+
     def test_manager_list_all(self):
         clt = self.client
         mgr = clt._manager
@@ -306,6 +320,13 @@ class CloudDNSTest(unittest.TestCase):
         BaseManager.findall.assert_called_once_with(foo="bar")
         BaseManager.findall = sav
 
+    def test_manager_list_pages(self):
+        clt = self.client
+        mgr = clt._manager
+        mgr._list = Mock(return_value=[self.domain])
+        self.assertEqual(list(mgr._list_pages()), [[self.domain]])
+        mgr._list.assert_called_once_with("/domains", list_all=True)
+
     def test_manager_empty_get_body_error(self):
         clt = self.client
         mgr = clt._manager
@@ -853,17 +874,53 @@ class CloudDNSTest(unittest.TestCase):
         res_iter.next_uri = None
         self.assertRaises(StopIteration, res_iter.next)
 
+    def test_iter_prefetch(self):
+        clt = self.client
+        mgr = clt._manager
+        names = [utils.random_unicode() for ii in range(3)]
+        bodies = [
+                {"domains": [{"name": names[0]}, {"name": names[1]}],
+                    "links": [{"rel": "next",
+                        "href": "%s/domains?offset=2" % example_uri}]},
+                {"domains": [{"name": names[2]}]}]
+        clt.method_get = Mock(side_effect=[({}, body) for body in bodies])
+        res_iter = clt.get_domain_iterator(prefetch=True)
+        self.assertEqual(len(list(res_iter)), 3)
+        self.assertEqual(clt.method_get.call_args_list,
+                [call("/domains"), call("/domains?offset=2")])
+        # Iterating doesn't change the paging info used by list_next_page().
+        self.assertIsNone(mgr._paging["domain"]["next_uri"])
+
     def test_subdomain_iter(self):
         clt = self.client
         mgr = clt._manager
-        res_iter = SubdomainResultsIterator(mgr)
-        self.assertEqual(res_iter.paging_service, "subdomain")
+        domain = self.domain
+        body = {"domains": [{"id": domain.id, "name": domain.name},
+                {"id": utils.random_ascii(), "name": "sub.%s" % domain.name}]}
+        clt.method_get = Mock(return_value=({}, body))
+        res_iter = SubdomainResultsIterator(mgr, domain=domain)
+        subdomains = list(res_iter)
+        self.assertEqual([sub.name for sub in subdomains],
+                ["sub.%s" % domain.name])
+        clt.method_get.assert_called_once_with("/domains?name=%s" %
+                domain.name)
 
     def test_record_iter(self):
         clt = self.client
         mgr = clt._manager
-        res_iter = RecordResultsIterator(mgr)
-        self.assertEqual(res_iter.paging_service, "record")
+        domain = self.domain
+        body = {"records": [{"name": domain.name, "type": "A"}],
+                "links": [{"rel": "next", "href": "%s/domains/%s/records?"
+                    "offset=1" % (example_uri, domain.id)}]}
+        last_body = {"records": [{"name": domain.name, "type": "MX"}]}
+        clt.method_get = Mock(side_effect=[({}, body), ({}, last_body)])
+        res_iter = RecordResultsIterator(mgr, domain=domain)
+        records = list(res_iter)
+        self.assertEqual([rec.type for rec in records], ["A", "MX"])
+        self.assertEqual(records[0].domain_id, domain.id)
+        self.assertEqual(clt.method_get.call_args_list,
+                [call("/domains/%s/records" % domain.id),
+                call("/domains/%s/records?offset=1" % domain.id)])
 
     # patch BaseClients method_get to make it always return an empty
     # body. client method_get uses super to get at BaseClient's
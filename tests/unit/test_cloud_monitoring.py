@@ -196,6 +196,17 @@ class CloudMonitoringTest(unittest.TestCase):
                 other_keys="metadata")
         self.assertEqual(ret, (ents, next_marker))
 
+    def test_pagination_mgr_paginate(self):
+        pm = _PaginationManager(self.client)
+        ents = [utils.random_unicode() for ii in range(3)]
+        next_marker = utils.random_unicode()
+        pm.list = Mock(side_effect=[(ents[:2], next_marker),
+                (ents[2:], None)])
+        ret = list(pm.paginate(page_size=2))
+        self.assertEqual(ret, ents)
+        pm.list.assert_called_with(limit=2, marker=next_marker,
+                return_next=True)
+
     def test_notif_manager_create(self):
         clt = self.client
         mgr = clt._notification_manager
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+
+from mock import MagicMock as Mock
+from mock import patch
+
+import pyrax
+from pyrax.context_pool import ContextPool
+import pyrax.exceptions as exc
+import pyrax.utils as utils
+
+
+class ContextPoolTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(ContextPoolTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.pool = ContextPool(maxsize=2)
+        patcher = patch.object(pyrax, "create_context",
+                side_effect=lambda **kwargs: Mock())
+        self.create_context = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        pass
+
+    def test_get(self):
+        username = utils.random_unicode()
+        ctx = self.pool.get("a", username=username)
+        self.create_context.assert_called_once_with(username=username)
+        ctx.authenticate.assert_called_once_with()
+        self.assertTrue(self.pool.get("a") is ctx)
+        self.assertEqual(self.create_context.call_count, 1)
+        self.assertTrue("a" in self.pool)
+        self.assertEqual(len(self.pool), 1)
+
+    def test_get_no_authenticate(self):
+        ctx = self.pool.get("a", authenticate=False)
+        self.assertFalse(ctx.authenticate.called)
+
+    def test_lru_eviction(self):
+        ctx_a = self.pool.get("a")
+        ctx_b = self.pool.get("b")
+        self.pool.get("a")
+        ctx_c = self.pool.get("c")
+        self.assertEqual(self.pool.keys(), ["a", "c"])
+        ctx_b.close.assert_called_once_with()
+        self.assertFalse(ctx_a.close.called)
+        self.assertFalse(ctx_c.close.called)
+
+    def test_get_failure(self):
+        self.create_context.side_effect = exc.AuthenticationFailed("")
+        self.assertRaises(exc.AuthenticationFailed, self.pool.get, "a")
+        self.assertEqual(len(self.pool), 0)
+        self.create_context.side_effect = lambda **kwargs: Mock()
+        self.assertIsNotNone(self.pool.get("a"))
+
+    def test_get_concurrent(self):
+        def slow_create(**kwargs):
+            time.sleep(0.1)
+            return Mock()
+
+        self.create_context.side_effect = slow_create
+        contexts = []
+        threads = [threading.Thread(target=lambda:
+                contexts.append(self.pool.get("a"))) for num in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.create_context.call_count, 1)
+        self.assertEqual(len(set(id(ctx) for ctx in contexts)), 1)
+
+    def test_checkout(self):
+        with self.pool.checkout("a", username="me") as ctx:
+            self.create_context.assert_called_once_with(username="me")
+            with self.pool.checkout("a") as same:
+                self.assertTrue(same is ctx)
+            self.pool.get("b")
+            self.pool.get("c")
+            self.assertFalse("a" in self.pool)
+            self.assertFalse(ctx.close.called)
+        ctx.close.assert_called_once_with()
+
+    def test_checkout_not_evicted(self):
+        with self.pool.checkout("a") as ctx:
+            pass
+        self.assertTrue("a" in self.pool)
+        self.assertFalse(ctx.close.called)
+        with self.pool.checkout("a"):
+            self.pool.remove("a")
+            self.assertFalse(ctx.close.called)
+        ctx.close.assert_called_once_with()
+
+    def test_checkout_readded(self):
+        with self.pool.checkout("a") as ctx:
+            self.pool.remove("a")
+            self.pool.add("a", ctx)
+        self.assertFalse(ctx.close.called)
+        self.assertTrue(self.pool.get("a") is ctx)
+
+    def test_add_remove_clear(self):
+        ctx = Mock()
+        replacement = Mock()
+        self.pool.add("a", ctx)
+        self.pool.add("a", replacement)
+        ctx.close.assert_called_once_with()
+        self.pool.remove("a")
+        replacement.close.assert_called_once_with()
+        self.pool.remove("a")
+        ctx_b = self.pool.get("b")
+        self.pool.clear()
+        ctx_b.close.assert_called_once_with()
+        self.assertEqual(len(self.pool), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import unittest
+
+from mock import patch
+
+import pyrax
+from pyrax import cs_extensions
+from pyrax import fakes
+import pyrax.utils as utils
+
+
+class CSExtensionsTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(CSExtensionsTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        cs_extensions.reset()
+        self.tmpdir = utils.SelfDeletingTempDirectory()
+        self.cache_file = os.path.join(self.tmpdir.__enter__(), "ext.json")
+
+    def tearDown(self):
+        cs_extensions.reset()
+        self.tmpdir.__exit__(None, None, None)
+
+    def test_get_extensions_once(self):
+        with patch.object(cs_extensions, "discover_extensions",
+                return_value=[]) as disc:
+            with patch.object(cs_extensions.auth_plugin,
+                    "discover_auth_systems") as auth:
+                first = cs_extensions.get_extensions()
+                second = cs_extensions.get_extensions()
+        self.assertTrue(first is second)
+        disc.assert_called_once_with()
+        auth.assert_called_once_with()
+
+    def test_reset(self):
+        with patch.object(cs_extensions, "discover_extensions",
+                return_value=[]) as disc:
+            cs_extensions.get_extensions()
+            cs_extensions.reset()
+            cs_extensions.get_extensions()
+        self.assertEqual(disc.call_count, 2)
+
+    def test_cache_round_trip(self):
+        extensions = cs_extensions.get_extensions(self.cache_file)
+        with open(self.cache_file) as ff:
+            cached = json.load(ff)
+        self.assertEqual(list(cached), [cs_extensions._version()])
+        cs_extensions.reset()
+        with patch.object(cs_extensions, "discover_extensions") as disc:
+            loaded = cs_extensions.get_extensions(self.cache_file)
+        self.assertFalse(disc.called)
+        self.assertEqual([ext.name for ext in loaded],
+                [ext.name for ext in extensions])
+        self.assertEqual([ext.module.__name__ for ext in loaded],
+                [ext.module.__name__ for ext in extensions])
+
+    def test_cache_keeps_other_versions(self):
+        other = {utils.random_unicode(): []}
+        with open(self.cache_file, "w") as ff:
+            json.dump(other, ff)
+        cs_extensions.save_cache(self.cache_file, [])
+        with open(self.cache_file) as ff:
+            cached = json.load(ff)
+        self.assertEqual(len(cached), 2)
+        self.assertEqual(cached[cs_extensions._version()], [])
+        self.assertEqual(os.listdir(os.path.dirname(self.cache_file)),
+                ["ext.json"])
+
+    def test_cache_unloadable(self):
+        entry = {"name": "fake", "module": utils.random_ascii(), "path": None}
+        with open(self.cache_file, "w") as ff:
+            json.dump({cs_extensions._version(): [entry]}, ff)
+        self.assertIsNone(cs_extensions.load_cache(self.cache_file))
+        with open(self.cache_file, "w") as ff:
+            ff.write("{")
+        self.assertIsNone(cs_extensions.load_cache(self.cache_file))
+
+    def test_cache_writable_by_others(self):
+        cs_extensions.save_cache(self.cache_file, [])
+        self.assertEqual(cs_extensions.load_cache(self.cache_file), [])
+        os.chmod(self.cache_file, 0o666)
+        self.assertIsNone(cs_extensions.load_cache(self.cache_file))
+
+    def test_cache_path_outside_contrib(self):
+        with utils.SelfDeletingTempfile() as pth:
+            entry = {"name": "fake", "module": utils.random_ascii(),
+                    "path": pth}
+            cs_extensions.save_cache(self.cache_file, [])
+            with open(self.cache_file, "w") as ff:
+                json.dump({cs_extensions._version(): [entry]}, ff)
+            with patch.object(cs_extensions.imp, "load_source") as load:
+                self.assertIsNone(cs_extensions.load_cache(self.cache_file))
+        self.assertFalse(load.called)
+
+    @patch('pyrax._cs_client.Client', new=fakes.FakeCSClient)
+    def test_connect_to_cloudservers_discovers_once(self):
+        ident = fakes.FakeIdentity()
+        ident._parse_response(fakes.fake_identity_response)
+        ident.authenticated = True
+        with patch.object(cs_extensions, "discover_extensions",
+                return_value=[]) as disc:
+            pyrax.connect_to_cloudservers("DFW", context=ident)
+            pyrax.connect_to_cloudservers("ORD", context=ident)
+        disc.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+import unittest
+
+import requests
+
+import pyrax.exceptions as exc
+from pyrax.fakeserver import _parse_range
+from pyrax.fakeserver import FakeSwiftServer
+import pyrax.utils as utils
+
+
+class FakeServerTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(FakeServerTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.server = FakeSwiftServer().start()
+        self.client = self.server.get_client()
+        self.client.create("cont")
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_parse_range(self):
+        self.assertEqual(_parse_range("bytes=0-9", 100), (0, 10))
+        self.assertEqual(_parse_range("bytes=90-", 100), (90, 100))
+        self.assertEqual(_parse_range("bytes=-5", 100), (95, 100))
+        self.assertEqual(_parse_range("bytes=50-500", 100), (50, 100))
+        self.assertIsNone(_parse_range("bytes=100-", 100))
+        self.assertIsNone(_parse_range("bytes=x-y", 100))
+        self.assertIsNone(_parse_range(None, 100))
+
+    def test_unauthorized(self):
+        resp = requests.get(self.server.url,
+                headers={"X-Auth-Token": utils.random_ascii()})
+        self.assertEqual(resp.status_code, 401)
+
+    def test_store_and_fetch(self):
+        clt = self.client
+        name = utils.random_unicode()
+        data = utils.random_ascii(100)
+        clt.store_object("cont", name, data, content_type="text/plain",
+                metadata={"color": "blue"})
+        obj = clt.get_object("cont", name)
+        self.assertEqual(obj.total_bytes, len(data))
+        self.assertEqual(obj.etag, utils.get_checksum(data))
+        self.assertEqual(obj.content_type, "text/plain")
+        self.assertEqual(clt.fetch_object("cont", name), data)
+        self.assertEqual(clt.get_object_metadata("cont", name),
+                {"color": "blue"})
+
+    def test_etag_mismatch(self):
+        self.assertRaises(exc.ClientException, self.client.store_object,
+                "cont", "obj", "data", etag=utils.random_ascii())
+
+    def test_ranged_fetch(self):
+        data = utils.random_ascii(100)
+        self.server.put_object("cont", "obj", data)
+        chunks = list(self.client.fetch_object("cont", "obj", chunk_size=30))
+        self.assertEqual([len(chunk) for chunk in chunks], [30, 30, 30, 10])
+        self.assertEqual(b"".join(chunks), data)
+        resp = requests.get("%s/cont/obj" % self.server.url,
+                headers={"X-Auth-Token": self.server.token,
+                "Range": "bytes=200-"})
+        self.assertEqual(resp.status_code, 416)
+
+    def test_listing(self):
+        for name in ("a/1", "a/2", "b", "c"):
+            self.server.put_object("cont", name, b"x")
+        mgr = self.client.get("cont").object_manager
+        names = [elem.get("name", elem.get("subdir"))
+                for elem in mgr.list(delimiter="/", return_raw=True)]
+        self.assertEqual(names, ["a/", "b", "c"])
+        names = [elem["name"] for elem in mgr.list(marker="a/1", limit=2,
+                return_raw=True)]
+        self.assertEqual(names, ["a/2", "b"])
+        names = [elem["name"] for elem in mgr.list(prefix="a/",
+                return_raw=True)]
+        self.assertEqual(names, ["a/1", "a/2"])
+        info = self.client.list_containers_info()
+        self.assertEqual(info, [{"name": "cont", "count": 4, "bytes": 4}])
+
+    def test_segmented_upload(self):
+        data = b"x" * 2500
+        for manifest in ("dlo", "slo"):
+            name = "big-%s" % manifest
+            self.client.upload_stream("cont", name, iter([data] * 4),
+                    segment_size=3000, manifest=manifest)
+            self.assertEqual(self.client.fetch_object("cont", name),
+                    data * 4)
+            self.assertEqual(self.client.get_object("cont", name).total_bytes,
+                    len(data) * 4)
+
+    def test_chunked_upload(self):
+        self.client.store_object("cont", "obj", iter([b"ab", b"cd"]),
+                chunk_size=2)
+        self.assertEqual(self.server.get_object("cont", "obj").data, b"abcd")
+
+    def test_copy(self):
+        self.server.put_object("cont", "src", b"data",
+                metadata={"x-object-meta-a": "b"})
+        self.client.copy_object("cont", "src", "cont", "dest")
+        obj = self.server.get_object("cont", "dest")
+        self.assertEqual(obj.data, b"data")
+        self.assertEqual(obj.metadata, {"x-object-meta-a": "b"})
+
+    def test_metadata(self):
+        clt = self.client
+        clt.set_container_metadata("cont", {"a": "1", "b": "2"})
+        clt.set_container_metadata("cont", {"a": ""})
+        self.assertEqual(clt.get_container_metadata("cont"), {"b": "2"})
+        clt.set_account_metadata({"c": "3"})
+        self.assertEqual(clt.get_account_metadata(), {"c": "3"})
+
+    def test_expiration(self):
+        self.server.put_object("cont", "obj", b"data")
+        self.server.get_object("cont", "obj").delete_at = time.time() - 1
+        self.assertRaises(exc.NoSuchObject, self.client.get_object, "cont",
+                "obj")
+
+    def test_bulk_delete(self):
+        for name in ("a", "b"):
+            self.server.put_object("cont", name, b"x")
+        ret = self.client.bulk_delete("cont", ["a", "b", "missing"])
+        self.assertEqual(ret["Number Deleted"], 2)
+        self.assertEqual(ret["Number Not Found"], 1)
+        self.assertEqual(self.client.list_container_object_names("cont"), [])
+
+    def test_delete_container(self):
+        self.server.put_object("cont", "obj", b"x")
+        self.assertRaises(exc.ClientException, self.client.delete, "cont")
+        self.client.delete("cont", del_objects=True)
+        self.assertEqual(self.server.containers, {})
+
+    def test_request_counts(self):
+        self.server.reset()
+        self.client.list_containers_info()
+        self.assertEqual(self.server.request_count, 1)
+        self.assertEqual(self.server.requests_by_method, {"GET": 1})
+
+    def test_authenticate(self):
+        ident = self.server.get_identity()
+        self.assertTrue(self.server.valid_token(ident.token))
+        self.assertEqual(ident.tenant_id, self.server.account)
+        svc = ident.services.object_store
+        self.assertEqual(svc.endpoints[self.server.region].public_url,
+                self.server.url)
+        self.assertEqual(ident.services.fake_json.endpoints[
+                self.server.region].public_url, self.server.json_url)
+        ident.password = utils.random_unicode()
+        self.assertRaises(exc.AuthenticationFailed, ident.authenticate)
+
+    def test_token_validation(self):
+        url = "%stokens/%s" % (self.server.auth_endpoint, self.server.token)
+        resp = requests.get(url)
+        self.assertEqual(resp.json()["access"]["token"]["id"],
+                self.server.token)
+        self.assertEqual(requests.delete(url).status_code, 204)
+        self.assertEqual(requests.get(url).status_code, 404)
+        self.assertFalse(self.server.valid_token(self.server.token))
+
+    def test_reauthenticate(self):
+        old_token = self.client.identity.token
+        self.server.expire_tokens()
+        self.server.reset()
+        self.assertEqual(self.client.list_containers_info(), [])
+        self.assertNotEqual(self.client.identity.token, old_token)
+        self.assertEqual(self.server.requests_by_method,
+                {"GET": 2, "POST": 1})
+
+    def test_reauthenticate_concurrently(self):
+        self.server.latency = 0.01
+        self.server.expire_tokens()
+        self.server.reset()
+        results = []
+
+        def list_containers():
+            for num in range(5):
+                results.append(self.client.list_containers_info())
+
+        threads = [threading.Thread(target=list_containers)
+                for num in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [[]] * 100)
+        self.assertEqual(self.server.requests_by_method["POST"], 1)
+
+    def test_json_api(self):
+        url = "%s/widgets" % self.server.json_url
+        hdrs = {"X-Auth-Token": self.server.token}
+        resp = requests.post(url, json={"widget": {"color": "red"}},
+                headers=hdrs)
+        self.assertEqual(resp.status_code, 201)
+        widget = resp.json()["widget"]
+        self.assertEqual(widget["color"], "red")
+        for color in ("blue", "red", "red"):
+            self.server.add_item("widgets", {"color": color})
+        resp = requests.get(url, params={"color": "red"}, headers=hdrs)
+        reds = resp.json()["widgets"]
+        self.assertEqual(len(reds), 3)
+        resp = requests.get(url, params={"color": "red", "limit": 1,
+                "marker": reds[0]["id"]}, headers=hdrs)
+        self.assertEqual(resp.json()["widgets"], reds[1:2])
+        item_url = "%s/%s" % (url, widget["id"])
+        resp = requests.put(item_url, json={"widget": {"color": "green"}},
+                headers=hdrs)
+        self.assertEqual(resp.json()["widget"]["color"], "green")
+        self.assertEqual(requests.delete(item_url, headers=hdrs).status_code,
+                204)
+        resp = requests.get(item_url, headers=hdrs)
+        self.assertEqual(resp.status_code, 404)
+        self.assertIn("itemNotFound", resp.json())
+        self.assertEqual(requests.get(url).status_code, 401)
+
+    def test_latency(self):
+        self.server.latency = 0.1
+        start = time.time()
+        self.client.list_containers_info()
+        self.assertTrue(time.time() - start >= 0.1)
+
+    def test_inject_fault(self):
+        self.server.inject_fault(500, method="GET", path="/cont$", count=2)
+        self.assertRaises(exc.ClientException,
+                self.client.list_container_objects, "cont")
+        self.assertRaises(exc.ClientException,
+                self.client.list_container_objects, "cont")
+        self.assertEqual(self.client.list_container_objects("cont"), [])
+        self.server.inject_fault(503, count=None, headers={"X-Fault": "yes"})
+        resp = requests.get(self.server.url)
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.headers["X-Fault"], "yes")
+        self.server.clear_faults()
+        self.assertEqual(self.server.faults, [])
+
+    def test_error_rate(self):
+        self.server.error_rate = 0.5
+        self.server.random.seed(1)
+        statuses = [requests.get(self.server.url,
+                headers={"X-Auth-Token": self.server.token}).status_code
+                for num in range(20)]
+        self.assertEqual(set(statuses), set([200, 503]))
+
+    def test_rate_limit(self):
+        self.server.rate_limit = 2
+        hdrs = {"X-Auth-Token": self.server.token}
+        statuses = [requests.head(self.server.url, headers=hdrs).status_code
+                for num in range(3)]
+        self.assertEqual(statuses, [204, 204, 413])
+        self.server.rate_limit_status = 429
+        resp = requests.head(self.server.url, headers=hdrs)
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers["Retry-After"], "1")
+        self.assertRaises(exc.ClientException,
+                self.client.get_account_metadata)
+
+
+if __name__ == "__main__":
+    unittest.main()
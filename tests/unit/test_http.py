@@ -42,6 +42,14 @@ class HttpTest(unittest.TestCase):
                 headers=headers)
         self.http.req_methods[mthd] = sav_method
 
+    def test_request_session(self):
+        session = Mock()
+        session.request.return_value = fakes.FakeResponse()
+        uri = utils.random_unicode()
+        headers = {utils.random_unicode(): utils.random_unicode()}
+        self.http.request("get", uri, headers=headers, session=session)
+        session.request.assert_called_once_with("GET", uri, headers=headers)
+
     def test_request_no_json(self):
         mthd = random.choice(self.http.req_methods.keys())
         sav_method = self.http.req_methods[mthd]
@@ -6,6 +6,8 @@ import json
 import os
 import random
 import sys
+import threading
+import time
 import unittest
 
 from six import StringIO
@@ -83,6 +85,87 @@ class IdentityTest(unittest.TestCase):
         ep = svc._ep_for_region("notthere")
         self.assertEqual(ep, good_ep)
 
+    def test_svc_ep_for_region_reassigned(self):
+        svc = self.service
+        old_ep = fakes.FakeEndpoint({}, svc.service_type, "ORD", self.identity)
+        new_ep = fakes.FakeEndpoint({}, svc.service_type, "ORD", self.identity)
+        svc.endpoints = utils.DotDict({"ORD": old_ep})
+        self.assertEqual(svc._ep_for_region("ord"), old_ep)
+        svc.endpoints = utils.DotDict({"ORD": new_ep})
+        self.assertEqual(svc._ep_for_region("ord"), new_ep)
+
+    def test_get_setting(self):
+        ident = self.rax_identity_class()
+        val = utils.random_unicode()
+        with patch.object(pyrax, "get_setting", return_value=val) as gs:
+            self.assertEqual(ident.get_setting("region"), val)
+            gs.assert_called_once_with("region", env=None)
+            ident.env = "other"
+            ident.settings = {"region": "ORD"}
+            self.assertEqual(ident.get_setting("region"), "ORD")
+            ident.get_setting("auth_endpoint")
+            gs.assert_called_with("auth_endpoint", env="other")
+
+    def test_settings_not_shared(self):
+        ident = self.rax_identity_class()
+        other = self.rax_identity_class()
+        ident.settings["region"] = "ORD"
+        self.assertEqual(other.settings, {})
+
+    def test_getattr_region_mapper(self):
+        ident = self.rax_identity_class()
+        ident._parse_response(fakes.fake_identity_response)
+        ident.authenticated = True
+        ident.service_mapping = {"files": "object_store"}
+        self.assertTrue(ident.DFW.files is ident.services.object_store.
+                endpoints["DFW"])
+        self.assertEqual(utils.DotDict._att_mapper, {})
+
+    def test_catalog_index(self):
+        catalog = [{"type": "rax:object-store", "name": "files",
+                "endpoints": [{"region": "DFW", "publicURL": "pub_dfw",
+                "internalURL": "int_dfw"}]},
+                {"type": "compute", "name": "cloudServers",
+                "endpoints": [{"publicURL": "first_gen"}]},
+                {"type": "dns", "name": "dns",
+                "endpoints": [{"publicURL": "dns_all"}]},
+                {"type": "compute", "name": "servers",
+                "endpoints": [{"region": "ord", "publicURL": "pub_ord"}]}]
+        index = base_identity.ServiceCatalogIndex.from_catalog(catalog)
+        self.assertEqual(index.url_for("object_store", "dfw"), "pub_dfw")
+        self.assertEqual(index.url_for("object_store", "DFW", "private"),
+                "int_dfw")
+        self.assertIsNone(index.url_for("object_store", "ORD"))
+        self.assertEqual(index.url_for("compute", "ORD"), "pub_ord")
+        self.assertIsNone(index.url_for("compute", "DFW"))
+        self.assertEqual(index.url_for("dns", "ORD"), "dns_all")
+        self.assertEqual(index.url_for("dns", "dfw"), "dns_all")
+        self.assertIsNone(index.url_for("dns", None))
+        self.assertEqual(index.regions, frozenset(["DFW", "ORD"]))
+        self.assertEqual(len(index), 5)
+
+    def test_catalog_index_serialize(self):
+        catalog = fakes.fake_identity_response["access"]["serviceCatalog"]
+        index = base_identity.ServiceCatalogIndex.from_catalog(catalog)
+        dct = json.loads(json.dumps(index.to_dict()))
+        copy = base_identity.ServiceCatalogIndex.from_dict(dct)
+        self.assertEqual(copy, index)
+        self.assertNotEqual(copy, base_identity.ServiceCatalogIndex())
+        self.assertRaises(AttributeError, setattr, copy, "_urls", {})
+
+    def test_parse_service_catalog_unchanged(self):
+        ident = self.rax_identity_class()
+        ident._parse_response(fakes.fake_identity_response)
+        services = ident.services
+        self.assertEqual(ident.catalog_index.url_for("object_store", "dfw"),
+                "https://aa.dfw1.clouddrive.com/v1/MossoCloudFS_abc")
+        ident._parse_response(fakes.fake_identity_response)
+        self.assertTrue(ident.services is services)
+        ident.unauthenticate()
+        self.assertEqual(len(ident.catalog_index), 0)
+        ident._parse_response(fakes.fake_identity_response)
+        self.assertFalse(ident.services is services)
+
     def test_svc_ep_for_region_not_found(self):
         svc = self.service
         region = utils.random_unicode().upper()
@@ -1310,6 +1393,138 @@ class IdentityTest(unittest.TestCase):
             self.assertFalse(valid)
         pyrax.http.request = savrequest
 
+    def _expiring_identity(self, seconds):
+        ident = self.rax_identity_class(username=self.username,
+                password=self.password)
+        ident.token = utils.random_unicode()
+        ident.expires = (datetime.datetime.utcnow() +
+                datetime.timedelta(seconds=seconds))
+        ident.refresh_margin = 60
+
+        def fake_auth():
+            ident.token = utils.random_unicode()
+            ident.expires = (datetime.datetime.utcnow() +
+                    datetime.timedelta(hours=1))
+
+        ident.authenticate = Mock(side_effect=fake_auth)
+        return ident
+
+    def test_refresh_token(self):
+        ident = self._expiring_identity(3600)
+        tok = ident.token
+        self.assertEqual(ident.refresh_token(), tok)
+        self.assertFalse(ident.authenticate.called)
+        ident.expires = datetime.datetime.utcnow()
+        self.assertNotEqual(ident.refresh_token(), tok)
+        ident.authenticate.assert_called_once_with()
+        ident.refresh_token(force=True)
+        self.assertEqual(ident.authenticate.call_count, 2)
+
+    def test_refresh_token_no_credentials(self):
+        ident = self._expiring_identity(10)
+        ident.password = ident.api_key = None
+        ident.refresh_token()
+        self.assertFalse(ident.authenticate.called)
+
+    def test_refresh_token_margin_setting(self):
+        ident = self._expiring_identity(200)
+        ident.refresh_margin = None
+        with patch.object(pyrax, "get_setting", return_value=None):
+            self.assertTrue(ident._token_expires_soon())
+        with patch.object(pyrax, "get_setting", return_value="100"):
+            self.assertFalse(ident._token_expires_soon())
+
+    def test_refresh_token_single_flight(self):
+        ident = self._expiring_identity(10)
+        tokens = []
+        threads = [threading.Thread(target=lambda:
+                tokens.append(ident.refresh_token())) for num in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(ident.authenticate.call_count, 1)
+        self.assertEqual(set(tokens), set([ident.token]))
+
+    def test_refresh_token_stale(self):
+        ident = self._expiring_identity(3600)
+        tok = ident.token
+        self.assertEqual(ident.refresh_token(force=True,
+                stale_token=utils.random_unicode()), tok)
+        self.assertFalse(ident.authenticate.called)
+        self.assertNotEqual(ident.refresh_token(force=True, stale_token=tok),
+                tok)
+        ident.authenticate.assert_called_once_with()
+
+    def test_refresh_token_shared_failure(self):
+        ident = self._expiring_identity(3600)
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def slow_failure():
+            started.set()
+            release.wait(5)
+            raise exc.AuthenticationFailed("")
+
+        def refresh():
+            try:
+                ident.refresh_token(force=True)
+            except exc.AuthenticationFailed as e:
+                errors.append(e)
+
+        ident.authenticate.side_effect = slow_failure
+        first = threading.Thread(target=refresh)
+        first.start()
+        started.wait(5)
+        others = [threading.Thread(target=refresh) for num in range(5)]
+        for thread in others:
+            thread.start()
+        # Give the other threads time to start waiting for the first one.
+        time.sleep(0.2)
+        release.set()
+        for thread in [first] + others:
+            thread.join()
+        self.assertEqual(ident.authenticate.call_count, 1)
+        self.assertEqual(len(errors), 6)
+
+    def test_start_token_refresh(self):
+        ident = self._expiring_identity(10)
+        refreshed = threading.Event()
+        ident.authenticate.side_effect = lambda: refreshed.set()
+        ident.start_token_refresh()
+        try:
+            self.assertTrue(refreshed.wait(5))
+        finally:
+            ident.stop_token_refresh()
+        self.assertIsNone(ident._refresh_timer)
+
+    def test_schedule_refresh(self):
+        ident = self._expiring_identity(3600)
+        with patch("threading.Timer") as fake_timer:
+            ident._schedule_refresh()
+            delay = fake_timer.call_args[0][0]
+            self.assertTrue(3500 < delay <= 3540)
+            ident.expires = None
+            ident._schedule_refresh()
+            fake_timer.assert_called_with(base_identity.REFRESH_RETRY_INTERVAL,
+                    ident._background_refresh)
+
+    def test_background_refresh_failure(self):
+        ident = self._expiring_identity(10)
+        ident.authenticate.side_effect = exc.AuthenticationFailed("")
+        ident._refresh_timer = threading.current_thread()
+        ident._schedule_refresh = Mock()
+        with patch("logging.getLogger") as get_logger:
+            ident._background_refresh()
+            ident._schedule_refresh.assert_called_once_with(
+                    base_identity.REFRESH_RETRY_INTERVAL)
+            self.assertTrue(get_logger.return_value.warning.called)
+            ident._refresh_timer = None
+            ident._schedule_refresh.reset_mock()
+            ident._background_refresh()
+        self.assertFalse(ident._schedule_refresh.called)
+
     def test_list_token(self):
         for cls in self.id_classes.values():
             ident = cls()
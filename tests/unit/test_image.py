@@ -158,21 +158,59 @@ class ImageTest(unittest.TestCase):
         mgr._list.assert_called_once_with(expected, return_raw=return_raw)
         utils.dict_to_qs = sav
 
+    def test_imgmgr_findall_params(self):
+        clt = self.client
+        mgr = clt._manager
+        nm = utils.random_unicode()
+        tag = utils.random_unicode()
+        params, searches = mgr._findall_params({"name": nm, "tag": tag,
+                "visibility": "public"})
+        self.assertEqual(params, {"name": nm, "tag": tag})
+        self.assertEqual(searches, {"visibility": "public"})
+
+    def test_imgmgr_findall(self):
+        clt = self.client
+        mgr = clt._manager
+        img_id = utils.random_ascii()
+        bodies = [{"images": [{"status": "active"}],
+                "next": "/v2/images?marker=%s&status=active" % img_id},
+                {"images": []}]
+        mgr.list = Mock(side_effect=[(None, body) for body in bodies])
+        ret = mgr.findall(status="active", tag="gold")
+        self.assertEqual(len(ret), 1)
+        self.assertEqual(ret[0].status, "active")
+        mgr.list.assert_called_with(limit=pyrax.manager.LIST_PAGE_SIZE,
+                marker=img_id, return_raw=True, status="active", tag="gold")
+
     def test_imgmgr_list_all(self):
         clt = self.client
         mgr = clt._manager
-        next_link = "/images?marker=00000000-0000-0000-0000-0000000000"
-        fake_body = {"images": [{"name": "fake1"}], "next": "/v2%s" % next_link}
-        mgr.list = Mock(return_value=(None, fake_body))
-        fake_last_body = {"images": [{"name": "fake2"}], "next": ""}
-        mgr.api.method_get = Mock(return_value=(None, fake_last_body))
+        marker = "00000000-0000-0000-0000-0000000000"
+        fake_body = {"images": [{"name": "fake1"}],
+                "next": "/v2/images?marker=%s" % marker}
+        fake_last_body = {"images": [{"name": "fake2"}]}
+        mgr.list = Mock(side_effect=[(None, fake_body),
+                (None, fake_last_body)])
         ret = mgr.list_all()
         self.assertEqual(len(ret), 2)
-        mgr.list.assert_called_once_with(name=None, visibility=None,
+        self.assertEqual(mgr.list.call_count, 2)
+        mgr.list.assert_called_with(limit=None, marker=marker,
+                return_raw=True, name=None, visibility=None,
                 member_status=None, owner=None, tag=None, status=None,
-                size_min=None, size_max=None, sort_key=None, sort_dir=None,
-                return_raw=True)
-        mgr.api.method_get.assert_called_once_with(next_link)
+                size_min=None, size_max=None, sort_key=None, sort_dir=None)
+
+    def test_imgmgr_list_all_prefetch(self):
+        clt = self.client
+        mgr = clt._manager
+        marker = "00000000-0000-0000-0000-0000000000"
+        fake_body = {"images": [{"name": "fake1"}],
+                "next": "/v2/images?marker=%s" % marker}
+        fake_last_body = {"images": [{"name": "fake2"}]}
+        mgr.list = Mock(side_effect=[(None, fake_body),
+                (None, fake_last_body)])
+        ret = mgr.list_all(prefetch=True)
+        self.assertEqual(len(ret), 2)
+        self.assertEqual(mgr.list.call_count, 2)
 
     def test_imgmgr_update(self):
         clt = self.client
@@ -411,7 +449,8 @@ class ImageTest(unittest.TestCase):
         clt.list_all()
         mgr.list_all.assert_called_once_with(name=None, visibility=None,
                 member_status=None, owner=None, tag=None, status=None,
-                size_min=None, size_max=None, sort_key=None, sort_dir=None)
+                size_min=None, size_max=None, sort_key=None, sort_dir=None,
+                prefetch=False)
 
     def test_clt_update(self):
         clt = self.client
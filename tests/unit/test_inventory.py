@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+import unittest
+
+from mock import MagicMock as Mock
+
+import pyrax.exceptions as exc
+import pyrax.inventory as inventory
+import pyrax.utils as utils
+
+
+def _listing(prefix, count):
+    return [{"name": "%s%04d" % (prefix, num),
+            "bytes": num,
+            "hash": "hash%s" % num,
+            "last_modified": "2014-01-01T00:00:00.000000",
+            "content_type": "text/plain"}
+            for num in range(count)]
+
+
+class InventoryTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(InventoryTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.listings = {"alpha": _listing("a", 25), "beta": [],
+                "gamma": _listing("g", 7) + [{"subdir": "g/"}]}
+        self.client = self._fake_client(self.listings)
+
+    def tearDown(self):
+        pass
+
+    def _fake_client(self, listings):
+        clt = Mock()
+        clt._manager.iter_containers_info.side_effect = (
+                lambda page_size=None: iter([{"name": name}
+                for name in sorted(listings)]))
+
+        def get_container(name):
+            cont = Mock()
+            cont.name = name
+            cont.object_manager.iter_raw_listing.side_effect = (
+                    lambda prefix=None, page_size=None: iter(listings[name]))
+            return cont
+
+        clt.get_container.side_effect = get_container
+        return clt
+
+    def _export(self, fmt, concurrency=1, suffix="", **kwargs):
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "inv" + suffix)
+            summary = inventory.export_inventory(self.client, path,
+                    format=fmt, concurrency=concurrency, page_size=10,
+                    **kwargs)
+            with open(path, "rb") as ff:
+                raw = ff.read()
+            records = list(inventory.read_inventory(path))
+        return summary, raw, records
+
+    def test_export_ndjson(self):
+        summary, raw, records = self._export("ndjson")
+        self.assertEqual(summary, {"containers": 3, "objects": 32,
+                "bytes": sum(range(25)) + sum(range(7))})
+        lines = raw.splitlines()
+        self.assertEqual(len(lines), 32)
+        first = json.loads(lines[0])
+        self.assertEqual(first["container"], "alpha")
+        self.assertEqual(first["name"], "a0000")
+        self.assertEqual(sorted(first.keys()), ["bytes", "container",
+                "content_type", "hash", "last_modified", "name"])
+        self.assertEqual(records[-1]["name"], "g0006")
+
+    def test_export_ndjson_gzip(self):
+        summary, raw, records = self._export("ndjson", suffix=".gz")
+        self.assertTrue(raw.startswith(b"\x1f\x8b"))
+        self.assertEqual(len(records), 32)
+
+    def test_export_columnar(self):
+        summary, raw, records = self._export("columnar")
+        self.assertTrue(raw.startswith(b"\x1f\x8b"))
+        nd_summary, nd_raw, nd_records = self._export("ndjson")
+        self.assertEqual(records, nd_records)
+        self.assertTrue(len(raw) < len(nd_raw))
+
+    def test_export_concurrent(self):
+        summary, raw, records = self._export("ndjson", concurrency=3)
+        seq_summary, seq_raw, seq_records = self._export("ndjson")
+        self.assertEqual(records, seq_records)
+        self.assertEqual(summary, seq_summary)
+
+    def test_export_containers(self):
+        summary, raw, records = self._export("ndjson",
+                containers=["gamma", "alpha"])
+        self.assertEqual(summary["containers"], 2)
+        self.assertEqual(records[0]["container"], "alpha")
+        self.assertFalse(self.client._manager.iter_containers_info.called)
+
+    def test_export_listing_failure(self):
+        self.client.get_container.side_effect = exc.NoSuchContainer("")
+        self.assertRaises(exc.NoSuchContainer, self._export, "ndjson")
+
+    def test_export_failure_stops_workers(self):
+        listings = {"alpha": _listing("a", 5), "beta": _listing("b", 200),
+                "gamma": _listing("g", 200)}
+        self.client = self._fake_client(listings)
+        get_container = self.client.get_container.side_effect
+        workers = []
+
+        def failing_get_container(name):
+            workers.append(threading.current_thread())
+            if name == "alpha":
+                raise exc.NoSuchContainer("")
+            return get_container(name)
+
+        self.client.get_container.side_effect = failing_get_container
+        self.assertRaises(exc.NoSuchContainer, self._export, "ndjson",
+                concurrency=3)
+        self.assertEqual(len(workers), 3)
+        for worker in workers:
+            worker.join(5)
+            self.assertFalse(worker.is_alive())
+
+    def test_export_bad_format(self):
+        self.assertRaises(exc.InvalidInventoryFormat,
+                inventory.export_inventory, self.client, "x",
+                format=utils.random_unicode())
+
+    def test_diff(self):
+        old = [{"container": "c", "name": nm, "bytes": 1, "hash": "x",
+                "content_type": "text/plain"} for nm in ("a", "b", "c")]
+        new = [dict(rec) for rec in old[1:]]
+        new[0]["hash"] = "y"
+        new.append({"container": "d", "name": "a", "bytes": 1, "hash": "x",
+                "content_type": "text/plain"})
+        changes = list(inventory.diff_inventories(old, new))
+        self.assertEqual([(chg, rec["container"], rec["name"])
+                for chg, rec in changes], [("removed", "c", "a"),
+                ("modified", "c", "b"), ("added", "d", "a")])
+
+    def test_diff_files(self):
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            old_path = os.path.join(tmpdir, "old")
+            new_path = os.path.join(tmpdir, "new")
+            inventory.export_inventory(self.client, old_path)
+            self.listings["alpha"].pop(3)
+            self.listings["beta"].append(_listing("b", 1)[0])
+            self.client = self._fake_client(self.listings)
+            inventory.export_inventory(self.client, new_path,
+                    format="columnar")
+            changes = list(inventory.diff_inventories(old_path, new_path))
+        self.assertEqual([(chg, rec["name"]) for chg, rec in changes],
+                [("removed", "a0003"), ("added", "b0000")])
+
+    def test_diff_identical(self):
+        recs = [{"container": "c", "name": utils.random_unicode()}]
+        self.assertEqual(list(inventory.diff_inventories(recs, recs)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
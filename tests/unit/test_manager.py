@@ -4,10 +4,13 @@
 import random
 import unittest
 
+from mock import patch
 from mock import MagicMock as Mock
 
 import pyrax.exceptions as exc
 from pyrax import manager
+from pyrax.pagination import marker_from_uri
+from pyrax import resource
 import pyrax.utils as utils
 
 from pyrax import fakes
@@ -41,6 +44,64 @@ class ManagerTest(unittest.TestCase):
         mgr._list.assert_called_once_with(exp_uri, return_raw=return_raw,
                 other_keys=other_keys)
 
+    def _unloaded_resources(self, count):
+        mgr = self.manager
+        return [resource.BaseResource(mgr, {"id": "id%s" % num})
+                for num in range(count)]
+
+    def test_load_all(self):
+        mgr = self.manager
+        resources = self._unloaded_resources(5)
+        resources[0].loaded = True
+
+        def fake_get(res):
+            return resource.BaseResource(mgr, {"id": res.id,
+                    "size": int(res.id[2:])}, loaded=True)
+
+        mgr.get = Mock(side_effect=fake_get)
+        ret = mgr.load_all(iter(resources), concurrency=3)
+        self.assertEqual(ret, resources)
+        self.assertEqual(mgr.get.call_count, 4)
+        self.assertEqual([res.size for res in resources[1:]], [1, 2, 3, 4])
+        self.assertTrue(all(res.loaded for res in resources))
+
+    def test_load_all_no_details(self):
+        mgr = self.manager
+        resources = self._unloaded_resources(2)
+        for res in resources:
+            res.get_details = False
+        mgr.get = Mock()
+        mgr.load_all(resources)
+        self.assertFalse(mgr.get.called)
+        self.assertTrue(all(res.loaded for res in resources))
+
+    def test_load_all_failure(self):
+        mgr = self.manager
+        resources = self._unloaded_resources(3)
+        mgr.get = Mock(side_effect=exc.NotFound(404))
+        self.assertRaises(exc.NotFound, mgr.load_all, resources)
+        self.assertEqual(mgr.get.call_count, 3)
+
+    def test_load_all_detail_listing(self):
+        mgr = self.manager
+        mgr.plural_response_key = "things"
+        mgr.detail_uri = "things/detail"
+        resources = self._unloaded_resources(3)
+        pages = {"/things/detail": {"things": [{"id": "id0", "size": 0},
+                {"id": "other", "size": 9}]},
+                "/things/detail?marker=other": {"things": [
+                {"id": "id1", "size": 1}]},
+                "/things/detail?marker=id1": {"things": []},
+                }
+        mgr.api.method_get = Mock(side_effect=lambda uri: (None, pages[uri]))
+        mgr.get = Mock(return_value=None)
+        mgr.load_all(resources)
+        self.assertEqual(mgr.api.method_get.call_count, 3)
+        self.assertEqual(resources[0].size, 0)
+        self.assertEqual(resources[1].size, 1)
+        mgr.get.assert_called_once_with(resources[2])
+        self.assertTrue(all(res.loaded for res in resources))
+
     def test_under_list_return_raw(self):
         mgr = self.manager
         uri = utils.random_unicode()
@@ -262,12 +323,134 @@ class ManagerTest(unittest.TestCase):
         self.assertFalse(o2 in ret)
         self.assertFalse(o3 in ret)
 
+    def test_findall_pages(self):
+        mgr = self.manager
+        mgr.marker_attribute = "id"
+        o1 = fakes.FakeEntity()
+        o1.some_att = "ok"
+        o2 = fakes.FakeEntity()
+        o2.some_att = "bad"
+        o3 = fakes.FakeEntity()
+        o3.some_att = "ok"
+        pages = {None: [o1, o2], o2.id: [o3]}
+        mgr.list = Mock(side_effect=lambda marker=None, limit=None:
+                pages[marker])
+        with patch.object(manager, "LIST_PAGE_SIZE", 2):
+            ret = mgr.findall(some_att="ok")
+        self.assertEqual(ret, [o1, o3])
+        self.assertEqual(mgr.list.call_count, 2)
+
+    def test_findall_marker_ignored(self):
+        mgr = self.manager
+        mgr.marker_attribute = "id"
+        o1 = fakes.FakeEntity()
+        o1.some_att = "ok"
+        mgr.list = Mock(return_value=[o1])
+        with patch.object(manager, "LIST_PAGE_SIZE", 1):
+            self.assertEqual(mgr.findall(some_att="ok"), [o1])
+        self.assertEqual(mgr.list.call_count, 2)
+
+    def test_paginate(self):
+        mgr = self.manager
+        mgr.marker_attribute = "id"
+        o1 = fakes.FakeEntity()
+        o2 = fakes.FakeEntity()
+        o3 = fakes.FakeEntity()
+        pages = {None: [o1, o2], o2.id: [o3]}
+        mgr.list = Mock(side_effect=lambda marker=None, limit=None,
+                status=None: pages[marker])
+        pgn = mgr.paginate(page_size=2, status="active")
+        self.assertFalse(mgr.list.called)
+        self.assertEqual(list(pgn), [o1, o2, o3])
+        self.assertEqual(mgr.list.call_count, 2)
+        mgr.list.assert_called_with(marker=o2.id, limit=2, status="active")
+        self.assertEqual(list(mgr.paginate(limit=1)), [o1])
+
+    def test_findall_params(self):
+        mgr = self.manager
+        o1 = fakes.FakeEntity()
+        o1.some_att = "ok"
+        mgr._findall_params = Mock(return_value=({"att": "ok"}, {}))
+        mgr.list = Mock(return_value=[o1])
+        self.assertEqual(mgr.findall(some_att="ok"), [o1])
+        mgr.list.assert_called_once_with(att="ok")
+
+    def test_paginate_list_marker(self):
+        mgr = self.manager
+        mgr.marker_attribute = "id"
+        mgr.uri_base = "things"
+        items = [fakes.FakeEntity() for num in range(7)]
+        for item in items:
+            item.id = utils.random_ascii()
+        ids = [item.id for item in items]
+
+        def fake_list(uri, return_raw=False, other_keys=None):
+            marker = marker_from_uri(uri)
+            limit = int(marker_from_uri(uri, "limit"))
+            start = ids.index(marker) + 1 if marker else 0
+            return items[start:start + limit]
+
+        mgr._list = Mock(side_effect=fake_list)
+        self.assertEqual(list(mgr.paginate(page_size=3)), items)
+        self.assertEqual(mgr._list.call_count, 3)
+
+    def test_paginate_no_page_size(self):
+        mgr = self.manager
+        mgr.marker_attribute = "id"
+        items = [fakes.FakeEntity() for num in range(5)]
+        mgr.list = Mock(return_value=items)
+        self.assertEqual(list(mgr.paginate()), items)
+        mgr.list.assert_called_once_with()
+
+    def test_paginate_no_marker_attribute(self):
+        mgr = self.manager
+        self.assertIsNone(mgr.marker_attribute)
+        items = [fakes.FakeEntity() for num in range(5)]
+        mgr.list = Mock(return_value=items)
+        self.assertEqual(list(mgr.paginate(page_size=2)), items)
+        mgr.list.assert_called_once_with()
+
+    def test_build_index(self):
+        mgr = self.manager
+        o1 = fakes.FakeEntity()
+        o1.some_att = "ok"
+        o1.other_att = 1
+        o2 = fakes.FakeEntity()
+        o2.some_att = "bad"
+        o2.other_att = 1
+        o3 = fakes.FakeEntity()
+        o3.some_att = ["unhashable"]
+        mgr.list = Mock(return_value=[o1, o2, o3])
+        mgr.build_index("some_att")
+        mgr.list.reset_mock()
+        self.assertEqual(mgr.findall(some_att="ok"), [o1])
+        self.assertEqual(mgr.findall(some_att="ok", other_att=2), [])
+        self.assertEqual(mgr.findall(some_att="missing"), [])
+        self.assertFalse(mgr.list.called)
+        self.assertEqual(mgr.findall(other_att=1), [o1, o2])
+        self.assertTrue(mgr.list.called)
+        mgr.clear_index()
+        mgr.list.reset_mock()
+        self.assertEqual(mgr.findall(some_att="ok"), [o1])
+        self.assertTrue(mgr.list.called)
+
+    def test_count_lazy_load(self):
+        mgr = self.manager
+        other = manager.BaseManager(self.fake_api)
+        rsc = resource.BaseResource(mgr, {})
+        mgr.count_lazy_load(rsc)
+        mgr.count_lazy_load(rsc)
+        self.assertEqual(mgr.lazy_loads, {"BaseResource": 2})
+        self.assertEqual(other.lazy_loads, {})
+
     def test_add_hook(self):
         mgr = self.manager
         tfunc = Mock()
         mgr.add_hook("test", tfunc)
         self.assertTrue("test" in mgr._hooks_map)
         self.assertTrue(tfunc in mgr._hooks_map["test"])
+        other = manager.BaseManager(self.fake_api)
+        self.assertFalse("test" in other._hooks_map)
 
     def test_run_hooks(self):
         mgr = self.manager
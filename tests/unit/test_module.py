@@ -3,6 +3,8 @@
 
 import json
 import os
+import requests
+import threading
 import unittest
 import warnings
 
@@ -48,6 +50,7 @@ class PyraxInitTest(unittest.TestCase):
                     "tenant_name": None,
                     "user_agent": "pyrax/%s" % vers,
                     "use_servicenet": False,
+                    "transfer_bandwidth": None,
                     "verify_ssl": False,
                 },
                 "alternate": {
@@ -62,6 +65,7 @@ class PyraxInitTest(unittest.TestCase):
                     "tenant_name": None,
                     "user_agent": "pyrax/%s" % vers,
                     "use_servicenet": False,
+                    "transfer_bandwidth": None,
                     "verify_ssl": False,
                 }}
         pyrax.identity = fakes.FakeIdentity()
@@ -133,7 +137,7 @@ class PyraxInitTest(unittest.TestCase):
         pyrax._create_identity.assert_called_once_with(id_type=id_type,
                 username=username, password=password, tenant_id=tenant_id,
                 tenant_name=tenant_name, api_key=api_key,
-                verify_ssl=verify_ssl, return_context=True)
+                verify_ssl=verify_ssl, env=None, return_context=True)
         pyrax._create_identity = sav
 
     def test_settings_get(self):
@@ -196,6 +200,13 @@ class PyraxInitTest(unittest.TestCase):
         self.assertIsNone(ret)
         pyrax.identity = sav
 
+    def test_settings_set_transfer_bandwidth(self):
+        key = "transfer_bandwidth"
+        val = utils.random_unicode()
+        pyrax.settings.set(key, val)
+        self.assertEqual(pyrax.get_setting(key), val)
+        pyrax.settings.set(key, None)
+
     def test_read_config(self):
         dummy_cfg = fakes.fake_config_file
         sav_region = pyrax.default_region
@@ -418,11 +429,83 @@ class PyraxInitTest(unittest.TestCase):
 
     def test_connect_to_services(self):
         pyrax.connect_to_services()
-        pyrax.connect_to_cloudservers.assert_called_once_with(region=None)
-        pyrax.connect_to_cloudfiles.assert_called_once_with(region=None)
+        self.assertFalse(pyrax.connect_to_cloudservers.called)
+        self.assertFalse(pyrax.connect_to_cloudfiles.called)
+        lazy = pyrax.cloudfiles
+        self.assertTrue(isinstance(lazy, pyrax._LazyClient))
+        lazy.list_containers()
+        pyrax.connect_to_cloudfiles.assert_called_once_with(region=None,
+                context=pyrax.identity)
+        clt = pyrax.connect_to_cloudfiles.return_value
+        clt.list_containers.assert_called_once_with()
+        self.assertTrue(pyrax.cloudfiles is clt)
+        lazy.http_log_debug = True
+        self.assertTrue(clt.http_log_debug)
+        pyrax.cloud_loadbalancers.list()
         pyrax.connect_to_cloud_loadbalancers.assert_called_once_with(
-                region=None)
-        pyrax.connect_to_cloud_databases.assert_called_once_with(region=None)
+                region=None, context=pyrax.identity)
+        self.assertFalse(pyrax.connect_to_cloudservers.called)
+        self.assertFalse(pyrax.connect_to_cloud_databases.called)
+
+    def test_connect_to_services_unavailable(self):
+        pyrax.connect_to_cloud_databases.return_value = None
+        pyrax.connect_to_services(region="DFW")
+        self.assertFalse(pyrax.cloud_databases)
+        pyrax.connect_to_cloud_databases.assert_called_once_with(
+                region="DFW", context=pyrax.identity)
+        self.assertIsNone(pyrax.cloud_databases)
+
+    def test_connect_to_services_cleared(self):
+        pyrax.connect_to_services()
+        lazy = pyrax.cloudfiles
+        pyrax.clear_credentials()
+        lazy.list_containers()
+        self.assertIsNone(pyrax.cloudfiles)
+
+    def test_connect_to_services_keeps_identity(self):
+        pyrax.connect_to_services()
+        lazy = pyrax.cloudfiles
+        ident = pyrax.identity
+        pyrax.identity = fakes.FakeIdentity()
+        lazy.list_containers()
+        pyrax.connect_to_cloudfiles.assert_called_once_with(region=None,
+                context=ident)
+
+    def test_create_client_context(self):
+        context = fakes.FakeIdentity()
+        context._parse_response(fakes.fake_identity_response)
+        context.authenticated = True
+        context.settings = {"verify_ssl": False, "http_debug": True}
+        sav_ident = pyrax.identity
+        pyrax.identity = None
+        cls = Mock()
+        with patch.dict(pyrax._client_classes, {"object_store": cls}):
+            with patch.object(pyrax, "_http_debug", False):
+                clt = pyrax._create_client("object_store", "DFW",
+                        context=context)
+        self.assertIsNone(pyrax.identity)
+        pyrax.identity = sav_ident
+        self.assertTrue(clt is cls.return_value)
+        self.assertTrue(cls.call_args[0][0] is context)
+        self.assertFalse(cls.call_args[1]["verify_ssl"])
+        self.assertTrue(cls.call_args[1]["http_log_debug"])
+
+    def test_create_client_context_not_authenticated(self):
+        context = fakes.FakeIdentity()
+        context.authenticated = False
+        self.assertRaises(exc.NotAuthenticated, pyrax._create_client,
+                "object_store", "DFW", context=context)
+
+    def test_connect_to_services_thread_safe(self):
+        pyrax.connect_to_services()
+        lazy = pyrax.cloudfiles
+        threads = [threading.Thread(target=lazy.list_containers)
+                for num in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(pyrax.connect_to_cloudfiles.call_count, 1)
 
     @patch('pyrax._cs_client.Client', new=fakes.FakeCSClient)
     def test_connect_to_cloudservers(self):
@@ -440,6 +523,26 @@ class PyraxInitTest(unittest.TestCase):
         pyrax.cloudfiles = pyrax.connect_to_cloudfiles(self.identity)
         self.assertIsNotNone(pyrax.cloudfiles)
 
+    def test_connect_to_cloudservers_context(self):
+        context = fakes.FakeIdentity()
+        context._parse_response(fakes.fake_identity_response)
+        context.authenticated = True
+        context.settings = {"identity_type": "keystone", "verify_ssl": False,
+                "http_debug": True}
+        context.session = Mock()
+        with patch.object(pyrax._cs_client, "Client") as client_class:
+            with patch.object(pyrax, "get_setting") as global_setting:
+                clt = self.orig_connect_to_cloudservers(region="DFW",
+                        context=context)
+        # Anything the context doesn't override is read from its own env.
+        for call in global_setting.call_args_list:
+            self.assertTrue("env" in call[1])
+        kwargs = client_class.call_args[1]
+        self.assertTrue(kwargs["insecure"])
+        self.assertTrue(kwargs["http_log_debug"])
+        self.assertIsNone(kwargs["auth_plugin"])
+        self.assertTrue(clt.client._session is context.session)
+
     def test_connect_to_cloudfiles_ServiceNet(self):
         orig = pyrax.get_setting("use_servicenet")
         pyrax.set_setting("use_servicenet", True)
@@ -449,7 +552,7 @@ class PyraxInitTest(unittest.TestCase):
         pyrax._create_client = Mock()
         cf = pyrax.connect_to_cloudfiles(public=False)
         pyrax._create_client.assert_called_once_with(ep_name="object_store",
-                region=None, public=False)
+                region=None, public=False, context=None)
         pyrax.set_setting("use_servicenet", orig)
         pyrax._create_client = sav
 
@@ -480,6 +583,34 @@ class PyraxInitTest(unittest.TestCase):
         self.assertFalse(pyrax.cloudservers.http_log_debug)
         pyrax.connect_to_cloudservers = sav
 
+    def test_create_context_isolated(self):
+        ctx = pyrax.create_context(env="alternate", username=self.username,
+                settings={"auth_endpoint": "CTX_AUTH"})
+        self.assertEqual(pyrax.settings.environment, "default")
+        self.assertTrue(isinstance(ctx,
+                pyrax.keystone_identity.KeystoneIdentity))
+        self.assertEqual(ctx.env, "alternate")
+        self.assertEqual(ctx.auth_endpoint, "CTX_AUTH")
+        self.assertEqual(ctx.get_setting("region"), "NOWHERE")
+        self.assertTrue(isinstance(ctx.session, requests.Session))
+        other = pyrax.create_context(username=self.username)
+        self.assertEqual(other.auth_endpoint, "DEFAULT_AUTH")
+        self.assertFalse(other.session is ctx.session)
+        with patch.object(ctx.session, "close") as close:
+            ctx.close()
+        close.assert_called_once_with()
+
+    def test_get_service_endpoint(self):
+        ident = fakes.FakeIdentity()
+        ident._parse_response(fakes.fake_identity_response)
+        get_ep = self.orig_get_service_endpoint
+        self.assertEqual(get_ep(ident, "object_store", "dfw"),
+                "https://aa.dfw1.clouddrive.com/v1/MossoCloudFS_abc")
+        self.assertEqual(get_ep(ident, "object_store", "DFW", public=False),
+                "https://snet-aa.dfw1.clouddrive.com/v1/MossoCloudFS_abc")
+        self.assertIsNone(get_ep(ident, "object_store", "IAD"))
+        self.assertIsNone(get_ep(ident, utils.random_unicode(), "DFW"))
+
     def test_get_encoding(self):
         sav = pyrax.get_setting
         pyrax.get_setting = Mock(return_value=None)
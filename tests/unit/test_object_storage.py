@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import json
 import logging
 import mimetypes
 import os
@@ -18,22 +19,31 @@ import pyrax.object_storage
 from pyrax.object_storage import ACCOUNT_META_PREFIX
 from pyrax.object_storage import assure_container
 from pyrax.object_storage import BulkDeleter
+from pyrax.object_storage import CDNPurgeQueue
 from pyrax.object_storage import Container
 from pyrax.object_storage import CONTAINER_META_PREFIX
 from pyrax.object_storage import Fault_cls
 from pyrax.object_storage import FAULT
+from pyrax.object_storage import FileSegment
 from pyrax.object_storage import FolderUploader
 from pyrax.object_storage import get_file_size
 from pyrax.object_storage import _handle_container_not_found
 from pyrax.object_storage import _handle_object_not_found
+from pyrax.object_storage import _iter_stream
 from pyrax.object_storage import OBJECT_META_PREFIX
+from pyrax.object_storage import SegmentUploader
 from pyrax.object_storage import _massage_metakeys
 from pyrax.object_storage import StorageClient
 from pyrax.object_storage import StorageObject
 from pyrax.object_storage import StorageObjectIterator
+from pyrax.object_storage import StorageObjectRecord
 from pyrax.object_storage import _validate_file_or_path
 from pyrax.object_storage import _valid_upload_key
 import pyrax.exceptions as exc
+from pyrax.transfer import BandwidthLimiter
+from pyrax.transfer import ProgressReader
+from pyrax.transfer import ThrottledReader
+from pyrax.transfer import TransferJob
 import pyrax.utils as utils
 
 import pyrax.fakes as fakes
@@ -110,10 +120,9 @@ class ObjectStorageTest(unittest.TestCase):
         def test(self, upload_key):
             return "OK"
 
-        key = utils.random_unicode()
-        fake_status = utils.random_unicode()
-        clt.folder_upload_status = {key: fake_status}
-        ret = test(clt, key)
+        job = clt.transfer_manager.submit(Mock())
+        job.wait()
+        ret = test(clt, job.id)
         self.assertEqual(ret, "OK")
 
     def test_valid_upload_key_bad(self):
@@ -123,10 +132,9 @@ class ObjectStorageTest(unittest.TestCase):
         def test(self, upload_key):
             return "OK"
 
-        key = utils.random_unicode()
+        job = clt.transfer_manager.submit(Mock())
+        job.wait()
         bad_key = utils.random_unicode()
-        fake_status = utils.random_unicode()
-        clt.folder_upload_status = {key: fake_status}
         self.assertRaises(exc.InvalidUploadID, test, clt, bad_key)
 
     def test_handle_container_not_found(self):
@@ -233,6 +241,13 @@ class ObjectStorageTest(unittest.TestCase):
         self.assertIsNone(ret)
         self.assertIsNone(cont.cdn_uri)
 
+    def test_set_cdn_data_disabled(self):
+        cont = self.container
+        cdn_uri = utils.random_unicode()
+        cont._set_cdn_data({"X-Cdn-Enabled": "False", "X-Cdn-Uri": cdn_uri})
+        self.assertFalse(cont.cdn_enabled)
+        self.assertEqual(cont.cdn_uri, cdn_uri)
+
     def test_cont_get_metadata(self):
         cont = self.container
         prefix = utils.random_unicode()
@@ -319,7 +334,7 @@ class ObjectStorageTest(unittest.TestCase):
                 full_listing=full_listing, return_raw=return_raw)
         cont.object_manager.list.assert_called_once_with(marker=marker,
                 limit=limit, prefix=prefix, delimiter=delimiter,
-                end_marker=end_marker, return_raw=return_raw)
+                end_marker=end_marker, return_raw=return_raw, compact=False)
 
     def test_cont_list_full(self):
         cont = self.container
@@ -335,7 +350,7 @@ class ObjectStorageTest(unittest.TestCase):
                 delimiter=delimiter, end_marker=end_marker,
                 full_listing=full_listing, return_raw=return_raw)
         cont.manager.object_listing_iterator.assert_called_once_with(cont,
-                prefix=prefix)
+                prefix=prefix, compact=False)
 
     def test_cont_list_all(self):
         cont = self.container
@@ -343,7 +358,7 @@ class ObjectStorageTest(unittest.TestCase):
         cont.manager.object_listing_iterator = Mock()
         cont.list_all(prefix=prefix)
         cont.manager.object_listing_iterator.assert_called_once_with(cont,
-                prefix=prefix)
+                prefix=prefix, compact=False)
 
     def test_cont_list_object_names_full(self):
         cont = self.container
@@ -478,6 +493,31 @@ class ObjectStorageTest(unittest.TestCase):
                 content_length=content_length, ttl=ttl,
                 return_none=return_none)
 
+    def test_cont_upload_stream(self):
+        cont = self.container
+        cont.object_manager.upload_stream = Mock()
+        obj_name = utils.random_unicode()
+        stream = utils.random_unicode()
+        segment_size = utils.random_unicode()
+        concurrency = utils.random_unicode()
+        manifest = utils.random_unicode()
+        content_type = utils.random_unicode()
+        content_encoding = utils.random_unicode()
+        ttl = utils.random_unicode()
+        metadata = utils.random_unicode()
+        headers = utils.random_unicode()
+        return_none = utils.random_unicode()
+        cont.upload_stream(obj_name, stream, segment_size=segment_size,
+                concurrency=concurrency, manifest=manifest,
+                content_type=content_type, content_encoding=content_encoding,
+                ttl=ttl, metadata=metadata, headers=headers,
+                return_none=return_none)
+        cont.object_manager.upload_stream.assert_called_once_with(obj_name,
+                stream, segment_size=segment_size, concurrency=concurrency,
+                manifest=manifest, content_type=content_type,
+                content_encoding=content_encoding, ttl=ttl, metadata=metadata,
+                headers=headers, return_none=return_none)
+
     def test_cont_fetch(self):
         cont = self.container
         cont.object_manager.fetch = Mock()
@@ -639,6 +679,22 @@ class ObjectStorageTest(unittest.TestCase):
         cont.object_manager.set_metadata.assert_called_once_with(obj, metadata,
                 clear=clear, prefix=prefix)
 
+    def test_cont_bulk_set_object_metadata(self):
+        cont = self.container
+        cont.object_manager.bulk_set_metadata = Mock()
+        items = utils.random_unicode()
+        name_prefix = utils.random_unicode()
+        transform = utils.random_unicode()
+        clear = utils.random_unicode()
+        prefix = utils.random_unicode()
+        concurrency = utils.random_unicode()
+        cont.bulk_set_object_metadata(items=items, name_prefix=name_prefix,
+                transform=transform, clear=clear, prefix=prefix,
+                concurrency=concurrency)
+        cont.object_manager.bulk_set_metadata.assert_called_once_with(
+                items=items, name_prefix=name_prefix, transform=transform,
+                clear=clear, prefix=prefix, concurrency=concurrency)
+
     def test_cont_list_subdirs(self):
         cont = self.container
         marker = utils.random_unicode()
@@ -805,6 +861,73 @@ class ObjectStorageTest(unittest.TestCase):
         ret = mgr.fetch_cdn_data(cont)
         self.assertEqual(ret, {})
 
+    def test_cmgr_iter_cdn_containers_info(self):
+        mgr = self.container.manager
+        pages = [[{"name": "a"}, {"name": "b"}], [{"name": "c"}]]
+        mgr.api.cdn_request = Mock(side_effect=[(None, page)
+                for page in pages])
+        ret = list(mgr.iter_cdn_containers_info(page_size=2))
+        self.assertEqual([info["name"] for info in ret], ["a", "b", "c"])
+        self.assertEqual(mgr.api.cdn_request.call_count, 2)
+        uri = mgr.api.cdn_request.call_args[0][0]
+        self.assertTrue(uri.startswith("/?"))
+        self.assertTrue("format=json" in uri)
+        self.assertTrue("marker=b" in uri)
+
+    def _cdn_listing(self, names):
+        return [{"name": name,
+                "cdn_enabled": True,
+                "cdn_uri": "http://%s" % name,
+                "cdn_ssl_uri": "https://%s" % name,
+                "cdn_streaming_uri": None,
+                "ttl": 3600,
+                "log_retention": False,
+                } for name in names]
+
+    def test_cmgr_prefetch_cdn_data(self):
+        cont = self.container
+        mgr = cont.manager
+        other = Container(mgr, {"name": utils.random_ascii()})
+        listing = self._cdn_listing([cont.name, "x"])
+        mgr.iter_cdn_containers_info = Mock(return_value=iter(listing))
+        ret = mgr.prefetch_cdn_data(containers=[cont])
+        self.assertEqual(sorted(ret), sorted([cont.name, "x"]))
+        self.assertEqual(ret["x"]["X-Ttl"], "3600")
+        self.assertFalse("X-Cdn-Streaming-Uri" in ret["x"])
+        self.assertTrue(cont._cdn_enabled)
+        self.assertEqual(cont._cdn_uri, "http://%s" % cont.name)
+        self.assertEqual(cont._cdn_ttl, 3600)
+        self.assertFalse(cont._cdn_log_retention)
+        mgr.api.cdn_request = Mock()
+        self.assertEqual(other.cdn_uri, None)
+        self.assertFalse(other.cdn_enabled)
+        self.assertEqual(mgr.fetch_cdn_data("x"), ret["x"])
+        self.assertFalse(mgr.api.cdn_request.called)
+
+    def test_cmgr_prefetch_cdn_data_expired(self):
+        cont = self.container
+        mgr = cont.manager
+        mgr.cdn_cache_ttl = -1
+        mgr.iter_cdn_containers_info = Mock(
+                return_value=iter(self._cdn_listing([cont.name])))
+        mgr.prefetch_cdn_data()
+        resp = fakes.FakeResponse()
+        resp.headers = {}
+        mgr.api.cdn_request = Mock(return_value=(resp, None))
+        mgr.fetch_cdn_data(cont)
+        mgr.api.cdn_request.assert_called_once_with("/%s" % cont.name, "HEAD")
+
+    def test_cmgr_cdn_changes_clear_cache(self):
+        cont = self.container
+        mgr = cont.manager
+        mgr.api.cdn_request = Mock(return_value=(None, None))
+        for func, args in ((mgr.make_public, ()),
+                (mgr.set_cdn_log_retention, (True, )),
+                (mgr.set_cdn_metadata, ({"X-Ttl": 60}, ))):
+            mgr._cdn_cache = (time.time() + 60, {})
+            func(cont, *args)
+            self.assertIsNone(mgr._cdn_cache)
+
     def test_cmgr_get_account_headers(self):
         cont = self.container
         mgr = cont.manager
@@ -977,6 +1100,29 @@ class ObjectStorageTest(unittest.TestCase):
         ret = mgr.set_metadata(cont, metadata, clear=True, prefix=prefix)
         self.assertTrue(ret)
 
+    def test_cmgr_bulk_set_metadata(self):
+        mgr = self.container.manager
+        names = [utils.random_ascii() for num in range(5)]
+        metadata = {utils.random_ascii(): utils.random_ascii()}
+        mgr.set_metadata = Mock()
+        ret = mgr.bulk_set_metadata([(name, metadata) for name in names],
+                clear=True, concurrency=2)
+        self.assertEqual(ret["updated"], len(names))
+        self.assertEqual(mgr.set_metadata.call_count, len(names))
+        mgr.set_metadata.assert_any_call(names[0], metadata, clear=True,
+                prefix=None)
+
+    def test_cmgr_bulk_set_object_metadata(self):
+        cont = self.container
+        mgr = cont.manager
+        cont.bulk_set_object_metadata = Mock()
+        items = utils.random_unicode()
+        clear = utils.random_unicode()
+        mgr.bulk_set_object_metadata(cont, items=items, clear=clear)
+        cont.bulk_set_object_metadata.assert_called_once_with(items=items,
+                name_prefix=None, transform=None, clear=clear, prefix=None,
+                concurrency=None)
+
     def test_cmgr_remove_metadata_key(self):
         cont = self.container
         mgr = cont.manager
@@ -1092,6 +1238,24 @@ class ObjectStorageTest(unittest.TestCase):
         self.assertEqual(mgr.api.method_get.call_count, 1)
         self.assertEqual(ret, body)
 
+    def test_cmgr_iter_containers_info(self):
+        cont = self.container
+        mgr = cont.manager
+        pages = [[{"name": "a"}, {"name": "b"}], [{"name": "c"}], []]
+        mgr.list_containers_info = Mock(side_effect=pages)
+        ret = [info["name"] for info in mgr.iter_containers_info()]
+        self.assertEqual(ret, ["a", "b", "c"])
+        mgr.list_containers_info.assert_called_with(limit=None, marker="c")
+
+    def test_cmgr_iter_containers_info_short_page(self):
+        cont = self.container
+        mgr = cont.manager
+        pages = [[{"name": "a"}, {"name": "b"}], [{"name": "c"}]]
+        mgr.list_containers_info = Mock(side_effect=pages)
+        ret = list(mgr.iter_containers_info(page_size=2))
+        self.assertEqual(len(ret), 3)
+        self.assertEqual(mgr.list_containers_info.call_count, 2)
+
     def test_cmgr_list_public_containers(self):
         cont = self.container
         mgr = cont.manager
@@ -1234,7 +1398,8 @@ class ObjectStorageTest(unittest.TestCase):
                 delimiter=delimiter, end_marker=end_marker,
                 full_listing=full_listing)
         cont.list.assert_called_once_with(marker=marker, limit=limit,
-                prefix=prefix, delimiter=delimiter, end_marker=end_marker)
+                prefix=prefix, delimiter=delimiter, end_marker=end_marker,
+                compact=False)
 
     def test_cmgr_list_objects_full(self):
         cont = self.container
@@ -1250,7 +1415,7 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.list_objects(cont, marker=marker, limit=limit, prefix=prefix,
                 delimiter=delimiter, end_marker=end_marker,
                 full_listing=full_listing)
-        cont.list_all.assert_called_once_with(prefix=prefix)
+        cont.list_all.assert_called_once_with(prefix=prefix, compact=False)
 
     def test_cmgr_list_object_names(self):
         cont = self.container
@@ -1309,6 +1474,32 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.get_object(cont, obj)
         cont.get_object.assert_called_once_with(obj)
 
+    def test_cmgr_upload_stream(self):
+        cont = self.container
+        mgr = cont.manager
+        cont.upload_stream = Mock()
+        obj_name = utils.random_unicode()
+        stream = utils.random_unicode()
+        segment_size = utils.random_unicode()
+        concurrency = utils.random_unicode()
+        manifest = utils.random_unicode()
+        content_type = utils.random_unicode()
+        content_encoding = utils.random_unicode()
+        ttl = utils.random_unicode()
+        metadata = utils.random_unicode()
+        headers = utils.random_unicode()
+        return_none = utils.random_unicode()
+        mgr.upload_stream(cont, obj_name, stream, segment_size=segment_size,
+                concurrency=concurrency, manifest=manifest,
+                content_type=content_type, content_encoding=content_encoding,
+                ttl=ttl, metadata=metadata, headers=headers,
+                return_none=return_none)
+        cont.upload_stream.assert_called_once_with(obj_name, stream,
+                segment_size=segment_size, concurrency=concurrency,
+                manifest=manifest, content_type=content_type,
+                content_encoding=content_encoding, ttl=ttl, metadata=metadata,
+                headers=headers, return_none=return_none)
+
     def test_cmgr_create_object(self):
         cont = self.container
         mgr = cont.manager
@@ -1653,6 +1844,44 @@ class ObjectStorageTest(unittest.TestCase):
         it = StorageObjectIterator(mgr)
         self.assertEqual(it.list_method, mgr.list)
 
+    def test_sobj_iter_compact(self):
+        cont = self.container
+        mgr = cont.object_manager
+        mgr.list = Mock(return_value=[])
+        prefix = utils.random_unicode()
+        it = StorageObjectIterator(mgr, prefix=prefix, compact=True)
+        self.assertEqual(list(it), [])
+        mgr.list.assert_called_once_with(marker=None, limit=1000,
+                prefix=prefix, compact=True)
+
+    def test_sobj_record(self):
+        cont = self.container
+        mgr = cont.object_manager
+        info = {"name": utils.random_unicode(), "bytes": 42,
+                "hash": utils.random_ascii(), "content_type": "text/plain",
+                "last_modified": utils.random_ascii()}
+        rec = StorageObjectRecord(mgr, info)
+        self.assertFalse(hasattr(rec, "__dict__"))
+        self.assertEqual(rec.id, info["name"])
+        self.assertEqual(rec.total_bytes, 42)
+        self.assertEqual(rec.etag, info["hash"])
+        self.assertEqual(rec.to_dict(), info)
+        self.assertEqual(rec, StorageObjectRecord(mgr, dict(info)))
+        obj = rec.to_object()
+        self.assertTrue(isinstance(obj, StorageObject))
+        self.assertEqual(obj.name, info["name"])
+        self.assertEqual(obj.total_bytes, 42)
+        self.assertEqual(obj.manager, mgr)
+
+    def test_sobj_record_subdir(self):
+        cont = self.container
+        mgr = cont.object_manager
+        subdir = utils.random_unicode()
+        rec = StorageObjectRecord(mgr, {"subdir": subdir})
+        self.assertEqual(rec.name, subdir)
+        self.assertEqual(rec.content_type, "pseudo/subdirectory")
+        self.assertIsNone(rec.bytes)
+
     def test_sobj_mgr_name(self):
         cont = self.container
         mgr = cont.object_manager
@@ -1673,6 +1902,19 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.api.get = Mock(return_value=new_cont)
         self.assertEqual(mgr.container, new_cont)
 
+    def test_sobj_mgr_iter_raw_listing(self):
+        cont = self.container
+        mgr = cont.object_manager
+        prefix = utils.random_unicode()
+        pages = [[{"name": "a"}, {"subdir": "b/"}], [{"name": "c"}], []]
+        mgr.list = Mock(side_effect=pages)
+        ret = list(mgr.iter_raw_listing(prefix=prefix))
+        self.assertEqual(ret, pages[0] + pages[1])
+        mgr.list.assert_any_call(marker="b/", limit=None, prefix=prefix,
+                return_raw=True)
+        mgr.list.assert_called_with(marker="c", limit=None, prefix=prefix,
+                return_raw=True)
+
     def test_sobj_mgr_list_raw(self):
         cont = self.container
         mgr = cont.object_manager
@@ -1711,6 +1953,37 @@ class ObjectStorageTest(unittest.TestCase):
         obj = ret[0]
         self.assertEqual(obj.name, nm)
 
+    def test_sobj_mgr_findall(self):
+        cont = self.container
+        mgr = cont.object_manager
+        nm = utils.random_unicode()
+        obj = StorageObject(mgr, {"name": nm})
+        other = StorageObject(mgr, {"name": nm + "x"})
+        mgr.list = Mock(return_value=[obj, other])
+        self.assertEqual(mgr.findall(name=nm), [obj])
+        mgr.list.assert_called_once_with(limit=pyrax.manager.LIST_PAGE_SIZE,
+                prefix=nm)
+
+    def test_cmgr_findall_params(self):
+        mgr = self.container.manager
+        nm = utils.random_unicode()
+        self.assertEqual(mgr._findall_params({"name": nm}),
+                ({"prefix": nm}, {"name": nm}))
+        self.assertEqual(mgr._findall_params({"count": 0}),
+                ({}, {"count": 0}))
+
+    def test_sobj_mgr_list_compact(self):
+        cont = self.container
+        mgr = cont.object_manager
+        nm = utils.random_unicode()
+        fake_resp_body = [{"name": nm, "bytes": 1}]
+        mgr.api.method_get = Mock(return_value=(None, fake_resp_body))
+        ret = mgr.list(compact=True)
+        self.assertEqual(len(ret), 1)
+        self.assertTrue(isinstance(ret[0], StorageObjectRecord))
+        self.assertEqual(ret[0].name, nm)
+        self.assertEqual(ret[0].bytes, 1)
+
     def test_sobj_mgr_get(self):
         cont = self.container
         mgr = cont.object_manager
@@ -2039,8 +2312,181 @@ class ObjectStorageTest(unittest.TestCase):
                         content_encoding, content_length, etag, chunked,
                         chunk_size, headers)
                 self.assertEqual(mgr._store_object.call_count, 3)
+                call_args = mgr._store_object.call_args_list
+                segs = [cargs[1]["content"] for cargs in call_args[:2]]
+                self.assertEqual([len(seg) for seg in segs], [42, 24])
+                self.assertEqual(segs[1].offset, 42)
+                self.assertEqual(segs[1].read(), "x" * 24)
         pyrax.object_storage.MAX_FILE_SIZE = sav
 
+    def test_sobj_mgr_upload_multiple_throttled_once(self):
+        obj = self.obj
+        mgr = obj.manager
+        obj_name = utils.random_ascii()
+        sent = []
+
+        def fake_put(uri, data=None, headers=None):
+            if data is not None:
+                sent.append(data.read())
+            return (None, None)
+
+        mgr.api.method_put = Mock(side_effect=fake_put)
+        limiter = BandwidthLimiter(rate=10 ** 9)
+        limiter.consume = Mock()
+        job = TransferJob(Mock())
+        with patch.object(pyrax.object_storage, "MAX_FILE_SIZE", 42):
+            with patch.object(pyrax.object_storage, "get_bandwidth_limiter",
+                    return_value=limiter):
+                with patch.object(pyrax.transfer, "get_bandwidth_limiter",
+                        return_value=limiter):
+                    content = ProgressReader(StringIO("x" * 66), job)
+                    mgr._upload(obj_name, content, None, None, None, None,
+                            False, None, {})
+        self.assertEqual([len(data) for data in sent], [42, 24])
+        consumed = sum(call[0][0] for call in limiter.consume.call_args_list)
+        self.assertEqual(consumed, 66)
+        self.assertEqual(job.bytes_done, 66)
+
+    def test_file_segment(self):
+        with utils.SelfDeletingTempfile() as tmp:
+            with open(tmp, "w") as content:
+                content.write("0123456789")
+            with open(tmp) as content:
+                seg = FileSegment(content, 3, 4)
+                self.assertEqual(len(seg), 4)
+                self.assertEqual(seg.read(2), "34")
+                self.assertEqual(seg.tell(), 2)
+                self.assertEqual(seg.read(), "56")
+                self.assertEqual(seg.read(), "")
+                seg.seek(1)
+                self.assertEqual(seg.read(100), "456")
+                seg.seek(-1, 2)
+                self.assertEqual(seg.read(), "6")
+
+    def test_file_segment_checksum(self):
+        with utils.SelfDeletingTempfile() as tmp:
+            with open(tmp, "w") as content:
+                content.write("0123456789")
+            with open(tmp) as content:
+                seg = FileSegment(content, 3, 4)
+                ret = utils.get_checksum(seg)
+        self.assertEqual(ret, utils.get_checksum("3456"))
+
+    def test_iter_stream_file(self):
+        content = StringIO("x" * 10)
+        ret = list(_iter_stream(content, chunk_size=4))
+        self.assertEqual(ret, ["xxxx", "xxxx", "xx"])
+
+    def test_iter_stream_iterable(self):
+        ret = list(_iter_stream(iter(["ab", "", "cde"])))
+        self.assertEqual(ret, ["ab", "cde"])
+
+    def test_sobj_mgr_upload_none_chunked(self):
+        obj = self.obj
+        mgr = obj.manager
+        obj_name = utils.random_unicode()
+        content = iter(["abc"])
+        mgr._store_object = Mock()
+        mgr._upload(obj_name, content, None, None, None, None, True, 1024, {})
+        mgr._store_object.assert_called_once_with(obj_name, content=content,
+                etag=None, chunked=True, chunk_size=1024, headers={})
+
+    def _fake_store(self, mgr):
+        stored = {}
+
+        def fake_store(obj_name, content, etag=None, chunked=False,
+                chunk_size=None, headers=None):
+            stored[obj_name] = (content.read() if content else None,
+                    dict(headers))
+
+        mgr._store_object = Mock(side_effect=fake_store)
+        return stored
+
+    def test_sobj_mgr_upload_stream_small(self):
+        obj = self.obj
+        mgr = obj.manager
+        obj_name = utils.random_ascii()
+        stored = self._fake_store(mgr)
+        mgr.get = Mock()
+        ret = mgr.upload_stream(obj_name, iter(["abc", "def"]),
+                segment_size=10, content_type="text/plain")
+        self.assertEqual(list(stored.keys()), [obj_name])
+        self.assertEqual(stored[obj_name][0], "abcdef")
+        self.assertEqual(stored[obj_name][1]["Content-Type"], "text/plain")
+        mgr.get.assert_called_once_with(obj_name)
+        self.assertEqual(ret, mgr.get.return_value)
+
+    def test_sobj_mgr_upload_stream_dlo(self):
+        obj = self.obj
+        mgr = obj.manager
+        obj_name = utils.random_ascii()
+        stored = self._fake_store(mgr)
+        content = StringIO("x" * 25)
+        headers = {"X-Fake": "fake"}
+        ret = mgr.upload_stream(obj_name, content, segment_size=10,
+                concurrency=2, ttl=42, headers=headers, return_none=True)
+        self.assertIsNone(ret)
+        self.assertEqual(headers, {"X-Fake": "fake"})
+        seg_names = ["%s.%08d" % (obj_name, num) for num in (1, 2, 3)]
+        for seg_name, size in zip(seg_names, (10, 10, 5)):
+            self.assertEqual(stored[seg_name][0], "x" * size)
+            self.assertEqual(stored[seg_name][1], {"X-Delete-After": 42})
+        manifest_hdrs = stored[obj_name][1]
+        self.assertEqual(manifest_hdrs["X-Object-Manifest"],
+                "%s/%s." % (mgr.name, obj_name))
+        self.assertEqual(manifest_hdrs["X-Delete-After"], 42)
+        self.assertEqual(manifest_hdrs["X-Fake"], "fake")
+
+    def test_sobj_mgr_upload_stream_slo(self):
+        obj = self.obj
+        mgr = obj.manager
+        obj_name = utils.random_ascii()
+        stored = self._fake_store(mgr)
+        mgr.api.method_put = Mock(return_value=(None, None))
+        mgr.upload_stream(obj_name, iter(["x" * 15]), segment_size=10,
+                manifest="SLO", return_none=True)
+        self.assertEqual(len(stored), 2)
+        exp_uri = "/%s/%s?multipart-manifest=put" % (mgr.uri_base, obj_name)
+        args, kwargs = mgr.api.method_put.call_args
+        self.assertEqual(args, (exp_uri, ))
+        segs = json.loads(kwargs["data"])
+        self.assertEqual([seg["size_bytes"] for seg in segs], [10, 5])
+        self.assertEqual(segs[0]["path"],
+                "/%s/%s.%08d" % (mgr.name, obj_name, 1))
+        self.assertEqual(segs[1]["etag"], utils.get_checksum("x" * 5))
+
+    def test_sobj_mgr_upload_stream_bad_manifest(self):
+        obj = self.obj
+        mgr = obj.manager
+        self.assertRaises(exc.InvalidManifestType, mgr.upload_stream,
+                "fake", iter(["x"]), manifest="fake")
+
+    def test_sobj_mgr_upload_stream_failure(self):
+        obj = self.obj
+        mgr = obj.manager
+        obj_name = utils.random_ascii()
+        mgr._store_object = Mock(side_effect=exc.ClientException(""))
+        mgr.api.method_put = Mock()
+        self.assertRaises(exc.ClientException, mgr.upload_stream, obj_name,
+                iter(["x" * 50]), segment_size=10, concurrency=1)
+        self.assertFalse(mgr.api.method_put.called)
+
+    def test_segment_uploader(self):
+        obj = self.obj
+        mgr = obj.manager
+        mgr._store_object = Mock()
+        slots = Mock()
+        fileobj = StringIO("abcdef")
+        fileobj.seek(6)
+        uploader = SegmentUploader(mgr, "fake.1", fileobj, {}, slots)
+        uploader.run()
+        self.assertEqual(uploader.size, 6)
+        self.assertEqual(uploader.etag, utils.get_checksum("abcdef"))
+        self.assertIsNone(uploader.error)
+        self.assertTrue(uploader.completed)
+        self.assertTrue(fileobj.closed)
+        slots.release.assert_called_once_with()
+
     def test_sobj_mgr_store_object(self):
         obj = self.obj
         mgr = obj.manager
@@ -2105,6 +2551,29 @@ class ObjectStorageTest(unittest.TestCase):
             mgr._fetch_chunker.assert_called_once_with(exp_uri, chunk_size,
                     size, obj.bytes)
 
+    def test_sobj_mgr_store_object_throttled(self):
+        obj = self.obj
+        mgr = obj.manager
+        obj_name = utils.random_unicode()
+        mgr.api.method_put = Mock(return_value=(None, None))
+        limiter = BandwidthLimiter(rate=10 ** 9)
+        with patch("pyrax.object_storage.get_bandwidth_limiter",
+                return_value=limiter):
+            content = StringIO(utils.random_ascii())
+            mgr._store_object(obj_name, content, etag="x", headers={})
+            sent = mgr.api.method_put.call_args[1]["data"]
+            self.assertTrue(isinstance(sent, ThrottledReader))
+            self.assertTrue(sent.fileobj is content)
+            chunks = [utils.random_ascii(), utils.random_ascii()]
+            mgr._store_object(obj_name, iter(chunks), chunked=True,
+                    headers={})
+            sent = mgr.api.method_put.call_args[1]["data"]
+            self.assertEqual(list(sent), chunks)
+            text = utils.random_ascii()
+            mgr._store_object(obj_name, text, headers={})
+            sent = mgr.api.method_put.call_args[1]["data"]
+            self.assertEqual(sent, text)
+
     def test_sobj_mgr_fetch_chunker(self):
         obj = self.obj
         mgr = obj.manager
@@ -2120,6 +2589,84 @@ class ObjectStorageTest(unittest.TestCase):
         txt = "".join([part for part in ret])
         self.assertEqual(mgr.api.method_get.call_count, num_chunks)
 
+    @patch("pyrax.transfer.BandwidthLimiter.consume")
+    def test_sobj_mgr_fetch_chunker_throttled(self, mock_consume):
+        obj = self.obj
+        mgr = obj.manager
+        uri = utils.random_unicode()
+        chunk_size = random.randint(10, 50)
+        resp = fakes.FakeResponse()
+        resp_body = "x" * chunk_size
+        mgr.api.method_get = Mock(return_value=(resp, resp_body))
+        ret = mgr._fetch_chunker(uri, chunk_size, None, obj.total_bytes)
+        for part in ret:
+            pass
+        self.assertEqual(mock_consume.call_count,
+                mgr.api.method_get.call_count)
+        mock_consume.assert_called_with(chunk_size)
+
+    def test_sobj_mgr_download_to_file(self):
+        obj = self.obj
+        mgr = obj.manager
+        chunks = ["x" * 10, "y" * 5]
+        mgr._fetch_chunker = Mock(return_value=iter(chunks))
+        job = TransferJob(Mock())
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            target = os.path.join(tmpdir, "sub", "dir", "file")
+            mgr._download_to_file(obj, target, size=15, chunk_size=10,
+                    job=job)
+            with open(target) as ff:
+                self.assertEqual(ff.read(), "".join(chunks))
+            self.assertEqual(os.listdir(os.path.dirname(target)), ["file"])
+        mgr._fetch_chunker.assert_called_once_with("/%s/%s" % (mgr.uri_base,
+                obj.name), 10, None, 15)
+        self.assertEqual(job.bytes_done, 15)
+
+    def test_sobj_mgr_download_to_file_no_size(self):
+        obj = self.obj
+        mgr = obj.manager
+        chunks = ["x" * 10, "y" * 5]
+        mgr.get = Mock(return_value=Mock(total_bytes=15))
+        mgr._fetch_chunker = Mock(return_value=iter(chunks))
+        mgr.fetch = Mock()
+        job = TransferJob(Mock(), total_bytes=0)
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            target = os.path.join(tmpdir, "file")
+            mgr._download_to_file(obj, target, size=0, chunk_size=10,
+                    job=job)
+            with open(target) as ff:
+                self.assertEqual(ff.read(), "".join(chunks))
+        mgr.get.assert_called_once_with(obj.name)
+        mgr._fetch_chunker.assert_called_once_with("/%s/%s" % (mgr.uri_base,
+                obj.name), 10, None, 15)
+        self.assertFalse(mgr.fetch.called)
+        self.assertEqual(job.total_bytes, 15)
+
+    def test_sobj_mgr_download_to_file_empty(self):
+        obj = self.obj
+        mgr = obj.manager
+        mgr.get = Mock(return_value=Mock(total_bytes=0))
+        mgr._fetch_chunker = Mock()
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            target = os.path.join(tmpdir, "file")
+            mgr._download_to_file(obj, target)
+            self.assertEqual(os.path.getsize(target), 0)
+        self.assertFalse(mgr._fetch_chunker.called)
+
+    def test_sobj_mgr_download_to_file_failure(self):
+        obj = self.obj
+        mgr = obj.manager
+        mgr._fetch_chunker = Mock(side_effect=exc.NoSuchObject(""))
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            target = os.path.join(tmpdir, "file")
+            with open(target, "w") as ff:
+                ff.write("old")
+            self.assertRaises(exc.NoSuchObject, mgr._download_to_file, obj,
+                    target, size=10)
+            with open(target) as ff:
+                self.assertEqual(ff.read(), "old")
+            self.assertEqual(os.listdir(tmpdir), ["file"])
+
     def test_sobj_mgr_fetch_chunker_eof(self):
         obj = self.obj
         mgr = obj.manager
@@ -2325,6 +2872,85 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.set_metadata(obj, metadata, clear=clear, prefix=prefix)
         mgr.api.method_post.assert_called_once_with(exp_uri, headers=exp_meta)
 
+    def test_sobj_mgr_bulk_set_metadata(self):
+        mgr = self.obj.manager
+        names = [utils.random_ascii() for num in range(8)]
+        bad_name = names[3]
+        metadata = {utils.random_ascii(): utils.random_ascii()}
+        err = exc.NoSuchObject("")
+
+        def set_metadata(obj, meta, clear=False, prefix=None):
+            if obj == bad_name:
+                raise err
+
+        mgr.set_metadata = Mock(side_effect=set_metadata)
+        items = [(name, metadata) for name in names] + [(names[0], None)]
+        ret = mgr.bulk_set_metadata(items=iter(items), concurrency=3)
+        self.assertEqual(ret["total"], len(names) + 1)
+        self.assertEqual(ret["updated"], len(names) - 1)
+        self.assertEqual(ret["skipped"], 1)
+        self.assertEqual(ret["failed"], 1)
+        self.assertEqual(ret["failures"], [(bad_name, err)])
+        self.assertTrue(ret["per_second"] >= 0)
+        self.assertEqual(mgr.set_metadata.call_count, len(names))
+        mgr.set_metadata.assert_any_call(names[0], metadata, clear=False,
+                prefix=None)
+
+    def test_sobj_mgr_bulk_set_metadata_transform(self):
+        mgr = self.obj.manager
+        name_prefix = utils.random_ascii()
+        listing = [{"name": "a", "content_type": "text/plain"},
+                {"subdir": "b/"},
+                {"name": "c", "content_type": "image/png"}]
+        mgr.iter_raw_listing = Mock(return_value=iter(listing))
+
+        def transform(elem):
+            if elem["content_type"].startswith("text/"):
+                return {"kind": "text"}
+
+        mgr.set_metadata = Mock()
+        ret = mgr.bulk_set_metadata(name_prefix=name_prefix,
+                transform=transform, clear=True)
+        mgr.iter_raw_listing.assert_called_once_with(prefix=name_prefix)
+        mgr.set_metadata.assert_called_once_with("a", {"kind": "text"},
+                clear=True, prefix=None)
+        self.assertEqual(ret["total"], 2)
+        self.assertEqual(ret["skipped"], 1)
+
+    def test_sobj_mgr_bulk_set_metadata_transform_error(self):
+        mgr = self.obj.manager
+        listing = [{"name": "a"}, {"name": "b"}, {"name": "c"}]
+        mgr.iter_raw_listing = Mock(return_value=iter(listing))
+        err = KeyError("content_type")
+
+        def transform(elem):
+            if elem["name"] == "b":
+                raise err
+            return {"kind": "text"}
+
+        mgr.set_metadata = Mock()
+        ret = mgr.bulk_set_metadata(transform=transform, clear=True)
+        self.assertEqual(ret["total"], 3)
+        self.assertEqual(ret["updated"], 2)
+        self.assertEqual(ret["failed"], 1)
+        self.assertEqual(ret["failures"], [("b", err)])
+        self.assertEqual(mgr.set_metadata.call_count, 2)
+
+    def test_sobj_mgr_bulk_set_metadata_clear_skips_head(self):
+        obj = self.obj
+        mgr = obj.manager
+        metadata = {utils.random_unicode(): utils.random_unicode()}
+        mgr.get_metadata = Mock()
+        mgr.api.method_post = Mock(return_value=(None, None))
+        ret = mgr.bulk_set_metadata(items=[(obj, metadata)], clear=True)
+        self.assertEqual(ret["updated"], 1)
+        self.assertFalse(mgr.get_metadata.called)
+        self.assertEqual(mgr.api.method_post.call_count, 1)
+
+    def test_sobj_mgr_bulk_set_metadata_nothing_specified(self):
+        mgr = self.obj.manager
+        self.assertRaises(exc.NoMetadataSpecified, mgr.bulk_set_metadata)
+
     def test_sobj_mgr_remove_metadata_key(self):
         obj = self.obj
         mgr = obj.manager
@@ -2507,6 +3133,14 @@ class ObjectStorageTest(unittest.TestCase):
         clt.list_public_containers()
         mgr.list_public_containers.assert_called_once_with()
 
+    def test_clt_prefetch_cdn_data(self):
+        clt = self.client
+        mgr = clt._manager
+        containers = utils.random_unicode()
+        mgr.prefetch_cdn_data = Mock()
+        clt.prefetch_cdn_data(containers=containers)
+        mgr.prefetch_cdn_data.assert_called_once_with(containers=containers)
+
     def test_clt_make_container_public(self):
         clt = self.client
         mgr = clt._manager
@@ -2586,6 +3220,133 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.purge_cdn_object.assert_called_once_with(cont, obj,
                 email_addresses=email_addresses)
 
+    def test_clt_queue_cdn_purge(self):
+        clt = self.client
+        cont = self.container
+        obj = self.obj
+        email_addresses = utils.random_unicode()
+        clt.purge_queue.add = Mock(return_value=True)
+        ret = clt.queue_cdn_purge(cont, obj, email_addresses=email_addresses)
+        self.assertTrue(ret)
+        clt.purge_queue.add.assert_called_once_with(cont, obj,
+                email_addresses=email_addresses)
+
+    def test_purge_queue(self):
+        clt = Mock()
+        queue = CDNPurgeQueue(clt, rate=1000, window=0)
+        cname = utils.random_ascii()
+        names = [utils.random_ascii() for num in range(5)]
+        for name in names:
+            self.assertTrue(queue.add(cname, name))
+        self.assertTrue(queue.flush(5))
+        self.assertEqual(clt.cdn_request.call_count, len(names))
+        clt.cdn_request.assert_any_call("/%s/%s" % (cname, names[0]),
+                method="DELETE", headers={})
+        stats = queue.stats()
+        self.assertEqual(stats["depth"], 0)
+        self.assertEqual(stats["queued"], len(names))
+        self.assertEqual(stats["purged"], len(names))
+        self.assertTrue(stats["max_latency"] >= stats["mean_latency"] >= 0)
+
+    def test_purge_queue_coalesce(self):
+        clt = Mock()
+        queue = CDNPurgeQueue(clt, rate=1000, window=60)
+        cname = utils.random_ascii()
+        oname = utils.random_ascii()
+        self.assertTrue(queue.add(cname, oname, email_addresses="a@b.c"))
+        self.assertFalse(queue.add(cname, oname, email_addresses="d@e.f"))
+        self.assertFalse(queue.add(cname, oname, email_addresses="a@b.c"))
+        self.assertEqual(queue.depth, 1)
+        self.assertFalse(clt.cdn_request.called)
+        self.assertTrue(queue.flush(5))
+        clt.cdn_request.assert_called_once_with("/%s/%s" % (cname, oname),
+                method="DELETE", headers={"X-Purge-Email": "a@b.c, d@e.f"})
+        stats = queue.stats()
+        self.assertEqual(stats["coalesced"], 2)
+        self.assertEqual(stats["purged"], 1)
+
+    def test_purge_queue_pacing(self):
+        clt = Mock()
+        queue = CDNPurgeQueue(clt, rate=20, burst=1, window=0)
+        start = time.time()
+        for num in range(5):
+            queue.add(utils.random_ascii(), utils.random_ascii())
+        queue.flush(5)
+        self.assertTrue(time.time() - start > 0.15)
+
+    def test_purge_queue_retry_over_limit(self):
+        clt = Mock()
+        clt.cdn_request.side_effect = [exc.OverLimit(413), exc.OverLimit(413),
+                None]
+        queue = CDNPurgeQueue(clt, rate=1000, window=0, retry_delay=0.01)
+        queue.add(utils.random_ascii(), utils.random_ascii())
+        self.assertTrue(queue.flush(5))
+        stats = queue.stats()
+        self.assertEqual(clt.cdn_request.call_count, 3)
+        self.assertEqual(stats["retried"], 2)
+        self.assertEqual(stats["purged"], 1)
+        self.assertEqual(stats["failed"], 0)
+
+    def test_purge_queue_failures(self):
+        clt = Mock()
+        over = exc.OverLimit(413)
+        missing = exc.NotCDNEnabled("")
+        cname = utils.random_ascii()
+
+        def cdn_request(uri, method=None, headers=None):
+            raise over if uri.endswith("/over") else missing
+
+        clt.cdn_request.side_effect = cdn_request
+        queue = CDNPurgeQueue(clt, rate=1000, window=0, max_retries=1,
+                retry_delay=0)
+        queue.add(cname, "over")
+        queue.add(cname, "missing")
+        self.assertTrue(queue.flush(5))
+        stats = queue.stats()
+        self.assertEqual(stats["failed"], 2)
+        self.assertEqual(sorted(stats["failures"]),
+                sorted([("/%s/over" % cname, over),
+                ("/%s/missing" % cname, missing)]))
+        self.assertEqual(clt.cdn_request.call_count, 3)
+
+    def test_purge_queue_daemon_close(self):
+        clt = Mock()
+        queue = CDNPurgeQueue(clt, rate=1000, window=60)
+        queue.add(utils.random_ascii(), utils.random_ascii())
+        self.assertTrue(queue._worker.daemon)
+        self.assertTrue(queue.close(5))
+        self.assertEqual(clt.cdn_request.call_count, 1)
+        self.assertEqual(queue.depth, 0)
+
+    def test_purge_queue_failures_capped(self):
+        clt = Mock()
+        err = exc.NotCDNEnabled("")
+        clt.cdn_request.side_effect = err
+        cname = utils.random_ascii()
+        with patch.object(pyrax.object_storage, "MAX_PURGE_FAILURES", 2):
+            queue = CDNPurgeQueue(clt, rate=1000, window=0)
+        for num in range(4):
+            queue.add(cname, "obj%s" % num)
+            self.assertTrue(queue.flush(5))
+        stats = queue.stats()
+        self.assertEqual(stats["failed"], 4)
+        self.assertEqual(stats["failures"], [("/%s/obj2" % cname, err),
+                ("/%s/obj3" % cname, err)])
+
+    def test_purge_queue_flush_at_exit(self):
+        clt = Mock()
+        queue = CDNPurgeQueue(clt, rate=1000, window=60)
+        queue.add(utils.random_ascii(), utils.random_ascii())
+        pyrax.object_storage._flush_purge_queues()
+        self.assertEqual(clt.cdn_request.call_count, 1)
+        self.assertEqual(queue.depth, 0)
+
+    def test_purge_queue_flush_timeout(self):
+        queue = CDNPurgeQueue(Mock(), rate=1000, window=0)
+        queue._in_flight = 1
+        self.assertFalse(queue.flush(0.01))
+        queue._in_flight = 0
+
     def test_clt_list_container_names(self):
         clt = self.client
         mgr = clt._manager
@@ -2609,6 +3370,25 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.list_containers_info.assert_called_once_with(limit=limit,
                 marker=marker)
 
+    @patch("pyrax.inventory.export_inventory")
+    def test_clt_export_inventory(self, mock_export):
+        clt = self.client
+        path = utils.random_unicode()
+        conts = [utils.random_unicode()]
+        prefix = utils.random_unicode()
+        clt.export_inventory(path, containers=conts, format="columnar",
+                concurrency=3, prefix=prefix)
+        mock_export.assert_called_once_with(clt, path, containers=conts,
+                format="columnar", concurrency=3, prefix=prefix)
+
+    @patch("pyrax.inventory.diff_inventories")
+    def test_clt_diff_inventories(self, mock_diff):
+        clt = self.client
+        old = utils.random_unicode()
+        new = utils.random_unicode()
+        clt.diff_inventories(old, new)
+        mock_diff.assert_called_once_with(old, new)
+
     def test_clt_list_container_subdirs(self):
         clt = self.client
         mgr = clt._manager
@@ -2721,6 +3501,37 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.set_object_metadata.assert_called_once_with(cont, obj, metadata,
                 clear=clear, prefix=prefix)
 
+    def test_clt_bulk_set_object_metadata(self):
+        clt = self.client
+        mgr = clt._manager
+        cont = self.container
+        items = utils.random_unicode()
+        name_prefix = utils.random_unicode()
+        transform = utils.random_unicode()
+        clear = utils.random_unicode()
+        prefix = utils.random_unicode()
+        concurrency = utils.random_unicode()
+        mgr.bulk_set_object_metadata = Mock()
+        clt.bulk_set_object_metadata(cont, items=items,
+                name_prefix=name_prefix, transform=transform, clear=clear,
+                prefix=prefix, concurrency=concurrency)
+        mgr.bulk_set_object_metadata.assert_called_once_with(cont,
+                items=items, name_prefix=name_prefix, transform=transform,
+                clear=clear, prefix=prefix, concurrency=concurrency)
+
+    def test_clt_bulk_set_container_metadata(self):
+        clt = self.client
+        mgr = clt._manager
+        items = utils.random_unicode()
+        clear = utils.random_unicode()
+        prefix = utils.random_unicode()
+        concurrency = utils.random_unicode()
+        mgr.bulk_set_metadata = Mock()
+        clt.bulk_set_container_metadata(items, clear=clear, prefix=prefix,
+                concurrency=concurrency)
+        mgr.bulk_set_metadata.assert_called_once_with(items, clear=clear,
+                prefix=prefix, concurrency=concurrency)
+
     def test_clt_remove_object_metadata_key(self):
         clt = self.client
         cont = self.container
@@ -2748,7 +3559,7 @@ class ObjectStorageTest(unittest.TestCase):
                 full_listing=full_listing)
         mgr.list_objects.assert_called_once_with(cont, limit=limit,
                 marker=marker, prefix=prefix, delimiter=delimiter,
-                end_marker=end_marker)
+                end_marker=end_marker, compact=False)
 
     def test_clt_list_container_objects_full(self):
         clt = self.client
@@ -2764,7 +3575,8 @@ class ObjectStorageTest(unittest.TestCase):
         clt.list_container_objects(cont, limit=limit, marker=marker,
                 prefix=prefix, delimiter=delimiter, end_marker=end_marker,
                 full_listing=full_listing)
-        mgr.object_listing_iterator.assert_called_once_with(cont, prefix=prefix)
+        mgr.object_listing_iterator.assert_called_once_with(cont,
+                prefix=prefix, compact=False)
 
     def test_clt_object_listing_iterator(self):
         clt = self.client
@@ -2773,7 +3585,8 @@ class ObjectStorageTest(unittest.TestCase):
         prefix = utils.random_unicode()
         mgr.object_listing_iterator = Mock()
         clt.object_listing_iterator(cont, prefix=prefix)
-        mgr.object_listing_iterator.assert_called_once_with(cont, prefix=prefix)
+        mgr.object_listing_iterator.assert_called_once_with(cont,
+                prefix=prefix, compact=False, prefetch=False)
 
     def test_clt_object_listing_iterator(self):
         clt = self.client
@@ -2782,7 +3595,8 @@ class ObjectStorageTest(unittest.TestCase):
         prefix = utils.random_unicode()
         mgr.object_listing_iterator = Mock()
         clt.object_listing_iterator(cont, prefix=prefix)
-        mgr.object_listing_iterator.assert_called_once_with(cont, prefix=prefix)
+        mgr.object_listing_iterator.assert_called_once_with(cont,
+                prefix=prefix, compact=False, prefetch=False)
 
     def test_clt_delete_object_in_seconds(self):
         clt = self.client
@@ -2830,6 +3644,33 @@ class ObjectStorageTest(unittest.TestCase):
                 return_none=return_none, chunk_size=chunk_size,
                 headers=headers, metadata=metadata)
 
+    def test_clt_upload_stream(self):
+        clt = self.client
+        mgr = clt._manager
+        cont = self.container
+        mgr.upload_stream = Mock()
+        obj_name = utils.random_unicode()
+        stream = utils.random_unicode()
+        segment_size = utils.random_unicode()
+        concurrency = utils.random_unicode()
+        manifest = utils.random_unicode()
+        content_type = utils.random_unicode()
+        content_encoding = utils.random_unicode()
+        ttl = utils.random_unicode()
+        metadata = utils.random_unicode()
+        headers = utils.random_unicode()
+        return_none = utils.random_unicode()
+        clt.upload_stream(cont, obj_name, stream, segment_size=segment_size,
+                concurrency=concurrency, manifest=manifest,
+                content_type=content_type, content_encoding=content_encoding,
+                ttl=ttl, metadata=metadata, headers=headers,
+                return_none=return_none)
+        mgr.upload_stream.assert_called_once_with(cont, obj_name, stream,
+                segment_size=segment_size, concurrency=concurrency,
+                manifest=manifest, content_type=content_type,
+                content_encoding=content_encoding, ttl=ttl, metadata=metadata,
+                headers=headers, return_none=return_none)
+
     def test_clt_upload_file(self):
         clt = self.client
         mgr = clt._manager
@@ -3034,24 +3875,60 @@ class ObjectStorageTest(unittest.TestCase):
         cont = self.container
         ignore = utils.random_unicode()
         ttl = utils.random_unicode()
-        clt._upload_folder_in_background = Mock()
+        max_rate = random.randint(1, 1000)
+        job = TransferJob(Mock())
+        clt._upload_folder_in_background = Mock(return_value=job)
         with utils.SelfDeletingTempDirectory() as folder_path:
             key, total = clt.upload_folder(folder_path, container=cont,
-                    ignore=ignore, ttl=ttl)
+                    ignore=ignore, ttl=ttl, max_rate=max_rate)
             clt._upload_folder_in_background.assert_called_once_with(
-                    folder_path, cont, [ignore], key, ttl)
+                    folder_path, cont, [ignore], total, ttl=ttl,
+                    max_rate=max_rate, weight=None)
+        self.assertEqual(key, job.id)
 
-    @patch("pyrax.object_storage.FolderUploader.start")
-    def test_clt_upload_folder_in_background(self, mock_start):
+    @patch("pyrax.object_storage.FolderUploader.run")
+    def test_clt_upload_folder_in_background(self, mock_run):
         clt = self.client
         cont = self.container
         folder_path = utils.random_unicode()
         ignore = utils.random_unicode()
-        upload_key = utils.random_unicode()
+        total = random.randint(1, 1000)
+        max_rate = random.randint(1, 1000)
         ttl = utils.random_unicode()
-        clt._upload_folder_in_background(folder_path, cont, ignore, upload_key,
-                ttl)
-        mock_start.assert_called_once_with()
+        job = clt._upload_folder_in_background(folder_path, cont, ignore,
+                total, ttl=ttl, max_rate=max_rate)
+        job.wait()
+        mock_run.assert_called_once_with(job)
+        self.assertEqual(job.total_bytes, total)
+        self.assertEqual(job.max_rate, max_rate)
+        self.assertTrue(clt.transfer_manager.get_job(job.id) is job)
+
+    def test_clt_upload_folder_progress(self):
+        clt = self.client
+        cont = self.container
+        txt = "x" * 1000
+        sent = []
+
+        def fake_store(obj_name, content=None, etag=None, chunked=False,
+                chunk_size=None, headers=None):
+            sent.append(content.read())
+
+        cont.object_manager._store_object = Mock(side_effect=fake_store)
+        with utils.SelfDeletingTempDirectory() as folder_path:
+            for fname in ("a", "b"):
+                with open(os.path.join(folder_path, fname), "w") as ff:
+                    ff.write(txt)
+            key, total = clt.upload_folder(folder_path, container=cont)
+            clt.get_transfer_job(key).wait()
+        self.assertEqual(total, 2 * len(txt))
+        self.assertEqual(sent, [txt, txt])
+        self.assertEqual(clt.get_uploaded(key), total)
+        self.assertEqual(clt.get_transfer_job(key).progress, 1.0)
+
+    def test_clt_get_transfer_job_bad(self):
+        clt = self.client
+        self.assertRaises(exc.InvalidUploadID, clt.get_transfer_job,
+                utils.random_unicode())
 
     @patch("logging.Logger.info")
     def test_clt_sync_folder_to_container(self, mock_log):
@@ -3080,6 +3957,54 @@ class ObjectStorageTest(unittest.TestCase):
                 ignore=ignore, ignore_timestamps=ignore_timestamps,
                 object_prefix=object_prefix, verbose=verbose)
 
+    def test_clt_sync_folder_to_container_async(self):
+        clt = self.client
+        cont = self.container
+        txt = "faketext"
+        cont.get_objects = Mock(return_value=[])
+
+        def fake_store(obj_name, content=None, etag=None, chunked=False,
+                chunk_size=None, headers=None):
+            content.read()
+
+        cont.object_manager._store_object = Mock(side_effect=fake_store)
+        with utils.SelfDeletingTempDirectory() as folder_path:
+            fname = utils.random_ascii()
+            with open(os.path.join(folder_path, fname), "w") as ff:
+                ff.write(txt)
+            job = clt.sync_folder_to_container(folder_path, cont,
+                    ignore_timestamps=True, async=True)
+            self.assertTrue(isinstance(job, TransferJob))
+            summary = job.wait()
+        self.assertEqual(summary["uploaded"], 1)
+        self.assertEqual(job.bytes_done, len(txt))
+        self.assertTrue(clt._sync_job is None)
+
+    @patch("pyrax.transfer.time.sleep")
+    def test_clt_sync_folder_to_container_max_rate(self, mock_sleep):
+        clt = self.client
+        cont = self.container
+        txt = "faketext" * 100
+        cont.get_objects = Mock(return_value=[])
+
+        def fake_store(obj_name, content=None, etag=None, chunked=False,
+                chunk_size=None, headers=None):
+            content.read()
+
+        cont.object_manager._store_object = Mock(side_effect=fake_store)
+        clt.transfer_manager.submit = Mock()
+        with utils.SelfDeletingTempDirectory() as folder_path:
+            fname = utils.random_ascii()
+            with open(os.path.join(folder_path, fname), "w") as ff:
+                ff.write(txt)
+            summary = clt.sync_folder_to_container(folder_path, cont,
+                    ignore_timestamps=True, max_rate=100)
+        # The sync runs in this thread, but is still rate limited.
+        self.assertFalse(clt.transfer_manager.submit.called)
+        self.assertEqual(summary["uploaded"], 1)
+        self.assertTrue(mock_sleep.called)
+        self.assertTrue(clt._sync_job is None)
+
     @patch("logging.Logger.info")
     def test_clt_sync_folder_to_container_failures(self, mock_log):
         clt = self.client
@@ -3295,13 +4220,16 @@ class ObjectStorageTest(unittest.TestCase):
                 full_listing=True)
         clt.bulk_delete.assert_called_once_with(cont, exp_del, async=True)
 
-    @patch("pyrax.object_storage.BulkDeleter.start")
+    @patch("pyrax.object_storage.BulkDeleter.run")
     def test_clt_bulk_delete_async(self, mock_del):
         clt = self.client
         cont = self.container
         obj_names = ["test1", "test2"]
         ret = clt.bulk_delete(cont, obj_names, async=True)
         self.assertTrue(isinstance(ret, BulkDeleter))
+        self.assertTrue(isinstance(ret.job, TransferJob))
+        ret.job.wait()
+        mock_del.assert_called_once_with(ret.job)
 
     def test_clt_bulk_delete_sync(self):
         clt = self.client
@@ -3310,7 +4238,6 @@ class ObjectStorageTest(unittest.TestCase):
         resp = fakes.FakeResponse()
         fake_res = utils.random_unicode()
         body = {"Response Status": "foo " + fake_res}
-        clt.bulk_delete_interval = 0.01
 
         def fake_bulk_resp(uri, data=None, headers=None):
             time.sleep(0.05)
@@ -3361,23 +4288,129 @@ class ObjectStorageTest(unittest.TestCase):
         clt.method_head = Mock(side_effect=exc.NotFound(""))
         self.assertRaises(exc.NotFound, clt.cdn_request, uri, method)
 
-    def test_clt_update_progress(self):
+    def _sync_to_folder_setup(self, contents):
+        clt = self.client
+        cont = self.container
+        mgr = cont.object_manager
+        clt.get_container = Mock(return_value=cont)
+        listing = [{"name": name, "bytes": len(txt),
+                "hash": utils.get_checksum(txt),
+                "last_modified": "2014-01-02T03:04:05.000000"}
+                for name, txt in sorted(contents.items())]
+        mgr.iter_raw_listing = Mock(return_value=iter(listing))
+
+        def fake_download(obj_name, target, size=None, chunk_size=None,
+                job=None):
+            with open(target, "w") as ff:
+                ff.write(contents[obj_name])
+
+        mgr._download_to_file = Mock(side_effect=fake_download)
+        return mgr
+
+    def test_clt_sync_container_to_folder(self):
+        clt = self.client
+        contents = {"a": "aaa", "b": "bbb", "c": "ccc", "skip.tmp": "x",
+                "dir/": ""}
+        mgr = self._sync_to_folder_setup(contents)
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "a"), "w") as ff:
+                ff.write("aaa")
+            with open(os.path.join(tmpdir, "b"), "w") as ff:
+                ff.write("BBB")
+            with open(os.path.join(tmpdir, "extra"), "w") as ff:
+                ff.write("extra")
+            summary = clt.sync_container_to_folder(self.container, tmpdir,
+                    delete=True, ignore="*.tmp", concurrency=2)
+            with open(os.path.join(tmpdir, "b")) as ff:
+                self.assertEqual(ff.read(), "bbb")
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["a", "b", "c"])
+            mtime = os.stat(os.path.join(tmpdir, "c")).st_mtime
+        self.assertEqual(summary["downloaded"], 2)
+        self.assertEqual(summary["duplicate"], 1)
+        self.assertEqual(summary["ignored"], 1)
+        self.assertEqual(summary["deleted"], 1)
+        self.assertEqual(summary["failed"], 0)
+        self.assertEqual(mgr._download_to_file.call_count, 2)
+        self.assertEqual(mtime, 1388631845)
+
+    def test_clt_sync_container_to_folder_checksum_cache(self):
+        clt = self.client
+        contents = {"a": "aaa"}
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            cache = os.path.join(tmpdir, "cache.json")
+            folder = os.path.join(tmpdir, "folder")
+            self._sync_to_folder_setup(contents)
+            clt.sync_container_to_folder(self.container, folder,
+                    checksum_cache=cache)
+            self._sync_to_folder_setup(contents)
+            with patch.object(utils, "get_checksum") as mock_sum:
+                summary = clt.sync_container_to_folder(self.container,
+                        folder, checksum_cache=cache)
+            self.assertFalse(mock_sum.called)
+            self.assertEqual(summary["duplicate"], 1)
+
+    def test_clt_sync_container_to_folder_manifest(self):
+        clt = self.client
+        contents = {"big": "segments"}
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            cache = os.path.join(tmpdir, "cache.json")
+            folder = os.path.join(tmpdir, "folder")
+            for attempt in range(2):
+                mgr = self._sync_to_folder_setup(contents)
+                # Manifests are listed with no content of their own.
+                listing = [{"name": "big", "bytes": 0,
+                        "hash": utils.get_checksum("")}]
+                mgr.iter_raw_listing = Mock(return_value=iter(listing))
+                summary = clt.sync_container_to_folder(self.container,
+                        folder, checksum_cache=cache)
+        self.assertEqual(summary["duplicate"], 1)
+        self.assertFalse(mgr._download_to_file.called)
+
+    def test_clt_sync_container_to_folder_failures(self):
+        clt = self.client
+        contents = {"a": "aaa", "../escape": "x"}
+        mgr = self._sync_to_folder_setup(contents)
+        mgr._download_to_file.side_effect = exc.NoSuchObject("")
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            summary = clt.sync_container_to_folder(self.container, tmpdir)
+        self.assertEqual(summary["failed"], 2)
+        self.assertEqual(mgr._download_to_file.call_count, 1)
+
+    def test_clt_bulk_delete_sync_failure(self):
+        clt = self.client
+        cont = self.container
+        obj_names = ["test1", "test2"]
+        clt.method_delete = Mock(side_effect=exc.ClientException(""))
+        self.assertRaises(exc.ClientException, clt.bulk_delete, cont,
+                obj_names, async=False)
+
+    def test_clt_get_uploaded(self):
         clt = self.client
-        key = utils.random_unicode()
         curr = random.randint(1, 100)
         size = random.randint(1, 100)
-        clt.folder_upload_status = {key: {"uploaded": curr}}
-        clt._update_progress(key, size)
-        new_size = clt.get_uploaded(key)
+        job = clt.transfer_manager.submit(Mock())
+        job.wait()
+        job.add_progress(curr)
+        job.add_progress(size)
+        new_size = clt.get_uploaded(job.id)
         self.assertEqual(new_size, curr + size)
 
+    def test_clt_get_uploaded_after_later_jobs(self):
+        clt = self.client
+        job = clt.transfer_manager.submit(Mock())
+        job.add_progress(42)
+        for num in range(150):
+            clt.transfer_manager.submit(Mock())
+        clt.transfer_manager.wait_all()
+        self.assertEqual(clt.get_uploaded(job.id), 42)
+
     def test_clt_cancel_folder_upload(self):
         clt = self.client
-        key = utils.random_unicode()
-        clt.folder_upload_status = {key: {"continue": True}}
-        self.assertFalse(clt._should_abort_folder_upload(key))
-        clt.cancel_folder_upload(key)
-        self.assertTrue(clt._should_abort_folder_upload(key))
+        job = clt.transfer_manager.submit(Mock())
+        job.wait()
+        self.assertFalse(job.cancelled)
+        clt.cancel_folder_upload(job.id)
+        self.assertTrue(job.cancelled)
 
     def test_folder_uploader_no_container(self):
         pth1 = utils.random_unicode().replace(os.sep, "")
@@ -3387,15 +4420,12 @@ class ObjectStorageTest(unittest.TestCase):
         root_folder = os.path.join(pth1, pth2, pth3, pth4)
         container = None
         ignore = utils.random_unicode()
-        upload_key = utils.random_unicode()
         client = self.client
         ttl = utils.random_unicode()
-        ret = FolderUploader(root_folder, container, ignore, upload_key,
-                client, ttl=ttl)
+        ret = FolderUploader(root_folder, container, ignore, client, ttl=ttl)
         self.assertEqual(ret.container.name, pth4)
         self.assertEqual(ret.root_folder, root_folder)
         self.assertEqual(ret.ignore, [ignore])
-        self.assertEqual(ret.upload_key, upload_key)
         self.assertEqual(ret.ttl, ttl)
         self.assertEqual(ret.client, client)
 
@@ -3403,12 +4433,10 @@ class ObjectStorageTest(unittest.TestCase):
         root_folder = utils.random_unicode()
         container = utils.random_unicode()
         ignore = utils.random_unicode()
-        upload_key = utils.random_unicode()
         client = self.client
         ttl = utils.random_unicode()
         client.create = Mock()
-        ret = FolderUploader(root_folder, container, ignore, upload_key,
-                client, ttl=ttl)
+        ret = FolderUploader(root_folder, container, ignore, client, ttl=ttl)
         client.create.assert_called_once_with(container)
 
     def test_folder_uploader_folder_name_from_path(self):
@@ -3424,14 +4452,13 @@ class ObjectStorageTest(unittest.TestCase):
         cont = self.container
         root_folder = utils.random_unicode()
         ignore = "*FAKE*"
-        upload_key = utils.random_unicode()
-        folder_up = FolderUploader(root_folder, cont, ignore, upload_key, clt)
-        arg = utils.random_unicode()
+        folder_up = FolderUploader(root_folder, cont, ignore, clt)
+        job = TransferJob(folder_up.run)
         dirname = "FAKE DIRECTORY"
         fname1 = utils.random_unicode()
         fname2 = utils.random_unicode()
         fnames = [fname1, fname2]
-        ret = folder_up.upload_files_in_folder(arg, dirname, fnames)
+        ret = folder_up.upload_files_in_folder(job, dirname, fnames)
         self.assertFalse(ret)
 
     def test_folder_uploader_upload_files_in_folder_abort(self):
@@ -3439,24 +4466,21 @@ class ObjectStorageTest(unittest.TestCase):
         cont = self.container
         root_folder = utils.random_unicode()
         ignore = "*FAKE*"
-        upload_key = utils.random_unicode()
-        folder_up = FolderUploader(root_folder, cont, ignore, upload_key, clt)
-        arg = utils.random_unicode()
+        folder_up = FolderUploader(root_folder, cont, ignore, clt)
+        job = TransferJob(folder_up.run)
         dirname = utils.random_unicode()
         fname1 = utils.random_unicode()
         fname2 = utils.random_unicode()
         fnames = [fname1, fname2]
-        clt._should_abort_folder_upload = Mock(return_value=True)
+        job.cancel()
         clt.upload_file = Mock()
-        ret = folder_up.upload_files_in_folder(arg, dirname, fnames)
+        ret = folder_up.upload_files_in_folder(job, dirname, fnames)
         self.assertEqual(clt.upload_file.call_count, 0)
 
     def test_folder_uploader_upload_files_in_folder(self):
         clt = self.client
         cont = self.container
         ignore = "*FAKE*"
-        upload_key = utils.random_unicode()
-        arg = utils.random_unicode()
         fname1 = utils.random_ascii()
         fname2 = utils.random_ascii()
         fname3 = utils.random_ascii()
@@ -3465,19 +4489,19 @@ class ObjectStorageTest(unittest.TestCase):
             for fname in fnames[1:]:
                 pth = os.path.join(tmpdir, fname)
                 open(pth, "w").write("faketext")
-            clt._should_abort_folder_upload = Mock(return_value=False)
             clt.upload_file = Mock()
-            clt._update_progress = Mock()
-            folder_up = FolderUploader(tmpdir, cont, ignore, upload_key, clt)
-            ret = folder_up.upload_files_in_folder(arg, tmpdir, fnames)
+            folder_up = FolderUploader(tmpdir, cont, ignore, clt)
+            job = TransferJob(folder_up.run)
+            ret = folder_up.upload_files_in_folder(job, tmpdir, fnames)
             self.assertEqual(clt.upload_file.call_count, len(fnames) - 1)
+            args, kwargs = clt.upload_file.call_args
+            self.assertTrue(isinstance(args[1], ProgressReader))
+            self.assertEqual(kwargs["etag"], utils.get_checksum("faketext"))
 
     def test_folder_uploader_run(self):
         clt = self.client
         cont = self.container
         ignore = "*FAKE*"
-        upload_key = utils.random_unicode()
-        arg = utils.random_unicode()
         fname1 = utils.random_ascii()
         fname2 = utils.random_ascii()
         fname3 = utils.random_ascii()
@@ -3486,10 +4510,11 @@ class ObjectStorageTest(unittest.TestCase):
             for fname in fnames[1:]:
                 pth = os.path.join(tmpdir, fname)
                 open(pth, "w").write("faketext")
-            clt._should_abort_folder_upload = Mock(return_value=False)
-            folder_up = FolderUploader(tmpdir, cont, ignore, upload_key, clt)
+            os.mkdir(os.path.join(tmpdir, "FAKE"))
+            folder_up = FolderUploader(tmpdir, cont, ignore, clt)
+            job = TransferJob(folder_up.run)
             folder_up.upload_files_in_folder = Mock()
-            folder_up.run()
+            folder_up.run(job)
             self.assertEqual(folder_up.upload_files_in_folder.call_count, 1)
 
 
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+
+from mock import MagicMock as Mock
+
+import pyrax.exceptions as exc
+from pyrax.pagination import marker_from_uri
+from pyrax.pagination import Paginator
+from pyrax.pagination import PrefetchThread
+import pyrax.utils as utils
+
+
+class PaginationTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(PaginationTest, self).__init__(*args, **kwargs)
+
+    def _fetcher(self, num_items, default_size=3):
+        """Pages through the integers below 'num_items' by offset."""
+        def fetch(marker, page_size):
+            start = marker or 0
+            end = min(start + (page_size or default_size), num_items)
+            next_marker = end if end < num_items else None
+            return list(range(start, end)), next_marker
+        return Mock(side_effect=fetch)
+
+    def test_marker_from_uri(self):
+        marker = utils.random_ascii()
+        uri = "/v2/images?limit=10&marker=%s" % marker
+        self.assertEqual(marker_from_uri(uri), marker)
+        self.assertEqual(marker_from_uri(uri, "limit"), "10")
+        self.assertIsNone(marker_from_uri(uri, "offset"))
+        self.assertIsNone(marker_from_uri(None))
+
+    def test_iterate(self):
+        fetch = self._fetcher(8)
+        pgn = Paginator(fetch)
+        self.assertFalse(fetch.called)
+        self.assertEqual(list(pgn), list(range(8)))
+        self.assertEqual(fetch.call_count, 3)
+        # Iterating again lists the items again.
+        self.assertEqual(list(pgn), list(range(8)))
+
+    def test_lazy(self):
+        fetch = self._fetcher(100)
+        items = iter(Paginator(fetch, page_size=10))
+        self.assertEqual([next(items) for ii in range(15)], list(range(15)))
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_page_size_limit(self):
+        fetch = self._fetcher(100)
+        pgn = Paginator(fetch, marker=5, page_size=4, limit=10)
+        pages = list(pgn.pages())
+        self.assertEqual(pages, [[5, 6, 7, 8], [9, 10, 11, 12], [13, 14]])
+        fetch.assert_called_with(13, 2)
+
+    def test_empty(self):
+        fetch = Mock(return_value=([], utils.random_unicode()))
+        self.assertEqual(list(Paginator(fetch)), [])
+        fetch.assert_called_once_with(None, None)
+
+    def test_prefetch(self):
+        fetch = self._fetcher(9)
+        items = iter(Paginator(fetch, prefetch=True))
+        self.assertEqual(next(items), 0)
+        # The second page is requested while the first is consumed.
+        for thread in threading.enumerate():
+            if isinstance(thread, PrefetchThread):
+                thread.join()
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(list(items), list(range(1, 9)))
+        self.assertEqual(fetch.call_count, 3)
+
+    def test_prefetch_thread(self):
+        val = utils.random_unicode()
+        thread = PrefetchThread(lambda x: x, val)
+        thread.start()
+        self.assertEqual(thread.result(), val)
+        thread = PrefetchThread(int, "x")
+        thread.start()
+        self.assertRaises(ValueError, thread.result)
+
+    def test_prefetch_error(self):
+        fetch = Mock(side_effect=[([1, 2], 2), exc.ServiceResponseFailure("")])
+        items = iter(Paginator(fetch, prefetch=True))
+        self.assertEqual([next(items), next(items)], [1, 2])
+        self.assertRaises(exc.ServiceResponseFailure, next, items)
+
+
+if __name__ == "__main__":
+    unittest.main()
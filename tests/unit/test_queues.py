@@ -316,6 +316,34 @@ class QueuesTest(unittest.TestCase):
         msgs = mgr.list(include_claimed=include_claimed, echo=echo,
                 marker=marker, limit=limit)
 
+    def test_queue_msg_mgr_list_deep(self):
+        q = self.queue
+        mgr = q._message_manager
+        num_pages = 2000
+        bodies = [{"messages": [{"href": "fake"}] * 10,
+                "links": [{"rel": "next",
+                    "href": "/v1/queues/q/messages?marker=%s" % (num + 1)}]}
+                for num in range(num_pages)]
+        bodies[-1]["links"] = []
+        mgr._list = Mock(side_effect=[(None, body) for body in bodies])
+        with patch.object(pyrax.queueing, "_parse_marker", _parse_marker):
+            msgs = mgr.list()
+        self.assertEqual(len(msgs), num_pages * 10)
+        self.assertEqual(mgr._list.call_count, num_pages)
+
+    def test_queue_msg_mgr_list_limit(self):
+        q = self.queue
+        mgr = q._message_manager
+        body = {"messages": [{"href": "fake"}] * 10,
+                "links": [{"rel": "next", "href": "/foo?marker=11"}]}
+        mgr._list = Mock(return_value=(None, body))
+        with patch.object(pyrax.queueing, "_parse_marker", _parse_marker):
+            msgs = mgr.list(limit=15)
+        self.assertEqual(len(msgs), 15)
+        uri = "/%s?include_claimed=false&echo=false&marker=11&limit=5" % (
+                mgr.uri_base)
+        mgr._list.assert_called_with(uri, return_raw=True)
+
     def test_queue_msg_mgr_no_limit_or_body(self):
         q = self.queue
         mgr = q._message_manager
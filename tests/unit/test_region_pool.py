@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+
+from mock import MagicMock as Mock
+
+import pyrax
+import pyrax.exceptions as exc
+from pyrax import fakes
+from pyrax.region_pool import RegionPool
+from pyrax.region_pool import RegionResults
+import pyrax.utils as utils
+
+
+class RegionPoolTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(RegionPoolTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.identity = fakes.FakeIdentity()
+        self.identity._parse_response(fakes.fake_identity_response)
+        self.identity.authenticated = True
+        self.identity.get_client = Mock(side_effect=self._fake_client)
+        self.pool = RegionPool(self.identity)
+
+    def tearDown(self):
+        pass
+
+    def _fake_client(self, service, region, public=True):
+        clt = Mock()
+        clt.region_name = region
+        return clt
+
+    def test_not_authenticated(self):
+        self.identity.authenticated = False
+        self.assertRaises(exc.NotAuthenticated, self.pool.regions_for,
+                "object_store")
+
+    def test_regions_for(self):
+        self.assertEqual(self.pool.regions_for("cloudfiles"),
+                ["DFW", "FAKE", "ORD", "SYD"])
+        self.assertEqual(self.pool.regions_for(utils.random_unicode()), [])
+        pool = RegionPool(self.identity, regions=["dfw", "syd"])
+        self.assertEqual(pool.regions_for("object_store"), ["DFW", "SYD"])
+
+    def test_client_cached(self):
+        clt = self.pool.client("object_store", "DFW")
+        self.assertTrue(self.pool.client("object_store", "DFW") is clt)
+        self.identity.get_client.assert_called_once_with("object_store",
+                "DFW", public=True)
+        clients = self.pool.clients("object_store")
+        self.assertEqual(sorted(clients), ["DFW", "FAKE", "ORD", "SYD"])
+        self.assertTrue(clients["DFW"] is clt)
+
+    def test_map(self):
+        results = self.pool.map("object_store",
+                lambda clt: [clt.region_name, clt.region_name.lower()])
+        self.assertEqual(sorted(results), ["DFW", "FAKE", "ORD", "SYD"])
+        self.assertEqual(results["ORD"], ["ORD", "ord"])
+        self.assertEqual(results.merged(), ["DFW", "dfw", "FAKE", "fake",
+                "ORD", "ord", "SYD", "syd"])
+        self.assertEqual(results.errors, {})
+        results.raise_for_errors()
+
+    def test_map_regions(self):
+        results = self.pool.map("object_store", lambda clt: clt.region_name,
+                regions=["ord"])
+        self.assertEqual(results, {"ORD": "ORD"})
+        self.assertEqual(results.merged(), ["ORD"])
+
+    def test_map_partial_failure(self):
+        def fn(clt):
+            if clt.region_name == "ORD":
+                raise exc.ServiceNotAvailable("")
+            return clt.region_name
+
+        results = self.pool.map("object_store", fn)
+        self.assertEqual(sorted(results), ["DFW", "FAKE", "SYD"])
+        self.assertEqual(results.failed, ["ORD"])
+        self.assertTrue(isinstance(results.errors["ORD"],
+                exc.ServiceNotAvailable))
+        self.assertRaises(exc.ServiceNotAvailable, results.raise_for_errors)
+
+    def test_map_timeout(self):
+        release = threading.Event()
+
+        def fn(clt):
+            if clt.region_name == "SYD":
+                release.wait(5)
+            return clt.region_name
+
+        try:
+            results = self.pool.map("object_store", fn, timeout=0.2)
+        finally:
+            release.set()
+        self.assertEqual(sorted(results), ["DFW", "FAKE", "ORD"])
+        self.assertTrue(isinstance(results.errors["SYD"], exc.RegionTimeout))
+
+    def test_map_timeout_per_region(self):
+        daemons = []
+
+        def fn(clt):
+            daemons.append(threading.current_thread().daemon)
+            time.sleep(0.1)
+            return clt.region_name
+
+        self.pool.max_workers = 1
+        results = self.pool.map("object_store", fn, timeout=0.3)
+        self.assertEqual(sorted(results), ["DFW", "FAKE", "ORD", "SYD"])
+        self.assertEqual(results.errors, {})
+        self.assertEqual(daemons, [True] * 4)
+
+    def test_map_concurrent(self):
+        started = []
+        barrier = threading.Event()
+
+        def fn(clt):
+            started.append(clt.region_name)
+            if len(started) == 4:
+                barrier.set()
+            # Only returns promptly if all regions are running at once.
+            return barrier.wait(5)
+
+        results = self.pool.map("object_store", fn)
+        self.assertEqual(list(results.values()), [True] * 4)
+
+    def test_merged(self):
+        results = RegionResults({"A": [1, 2], "B": None, "C": 3})
+        self.assertEqual(results.merged(), [1, 2, 3])
+
+    def test_exported(self):
+        self.assertTrue(pyrax.RegionPool is RegionPool)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -70,6 +70,48 @@ class ResourceTest(unittest.TestCase):
         self.assertEqual(rsc.foo, 1)
         self.assertEqual(rsc.bar, 2)
 
+    def test_add_details_lazy(self):
+        rsc = self.resource
+        self.assertFalse("size" in rsc.__dict__)
+        self.assertEqual(rsc.size, 42)
+        self.assertTrue("size" in rsc._attribute_names())
+        rsc.size = 7
+        self.assertEqual(rsc.size, 7)
+        rsc._add_details({"size": 99})
+        self.assertEqual(rsc.size, 99)
+        self.assertEqual(rsc._info["size"], 42)
+
+    def test_add_details_shadowed(self):
+        class ShadowResource(resource.BaseResource):
+            status = None
+
+            def __init__(self, *args, **kwargs):
+                self.href = None
+                super(ShadowResource, self).__init__(*args, **kwargs)
+
+        rsc = ShadowResource(fakes.FakeManager(), {"status": "ACTIVE",
+                "href": "http://example.com"})
+        self.assertEqual(rsc.status, "ACTIVE")
+        self.assertEqual(rsc.href, "http://example.com")
+
+    def test_getattr_lazy_load(self):
+        rsc = self.resource
+        rsc.manager.get = Mock(return_value=None)
+        rsc.manager.count_lazy_load = Mock()
+        self.assertRaises(AttributeError, getattr, rsc, "xname")
+        rsc.manager.count_lazy_load.assert_called_once_with(rsc)
+        rsc.manager.get.assert_called_once_with(rsc)
+        self.assertRaises(AttributeError, getattr, rsc, "xname")
+        self.assertEqual(rsc.manager.get.call_count, 1)
+
+    def test_getattr_no_lazy_load(self):
+        rsc = self.resource
+        rsc.manager.get = Mock()
+        rsc.lazy_load = False
+        self.assertRaises(AttributeError, getattr, rsc, "xname")
+        self.assertFalse(rsc.manager.get.called)
+        self.assertFalse(rsc.loaded)
+
     def test_getattr(self):
         rsc = self.resource
         sav = rsc.get
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+import time
+import unittest
+
+from mock import MagicMock as Mock
+from mock import patch
+
+import pyrax
+from pyrax import fakes
+from pyrax.identity import rax_identity
+from pyrax import token_cache
+from pyrax.token_cache import TokenCache
+import pyrax.utils as utils
+
+
+class TokenCacheTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(TokenCacheTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.tmpdir = utils.SelfDeletingTempDirectory()
+        self.directory = os.path.join(self.tmpdir.__enter__(), "tokens")
+        self.cache = TokenCache(self.directory)
+
+    def tearDown(self):
+        self.tmpdir.__exit__(None, None, None)
+
+    def _identity(self):
+        ident = rax_identity.RaxIdentity(username="fakeuser",
+                api_key=utils.random_ascii())
+        ident.token_cache = self.cache
+        resp = fakes.FakeIdentityResponse()
+        ident.method_post = Mock(return_value=(resp,
+                fakes.fake_identity_response))
+        return ident
+
+    def test_cache_key(self):
+        key = token_cache.cache_key(utils.random_unicode(), "user", None)
+        self.assertEqual(len(key), 64)
+        self.assertEqual(token_cache.cache_key("a", "b"),
+                token_cache.cache_key("a", "b"))
+        self.assertNotEqual(token_cache.cache_key("ab", "c"),
+                token_cache.cache_key("a", "bc"))
+
+    def test_set_get(self):
+        resp = {"access": {"token": {"id": utils.random_unicode()}}}
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.set("key", resp, time.time() + 3600)
+        self.assertEqual(self.cache.get("key"), resp)
+        mode = os.stat(os.path.join(self.directory, "key.json")).st_mode
+        self.assertEqual(stat.S_IMODE(mode), 0o600)
+        mode = os.stat(self.directory).st_mode
+        self.assertEqual(stat.S_IMODE(mode), 0o700)
+        self.assertEqual(os.listdir(self.directory), ["key.json"])
+
+    def test_get_expired(self):
+        self.cache.set("key", {}, time.time() + self.cache.margin - 1)
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_get_corrupt(self):
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, "key.json"), "w") as ff:
+            ff.write("{")
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_get_untrusted_entry(self):
+        self.cache.set("key", {}, time.time() + 3600)
+        path = os.path.join(self.directory, "key.json")
+        os.chmod(path, 0o666)
+        self.assertIsNone(self.cache.get("key"))
+        os.chmod(path, 0o600)
+        self.assertEqual(self.cache.get("key"), {})
+
+    def test_get_untrusted_directory(self):
+        self.cache.set("key", {}, time.time() + 3600)
+        os.chmod(self.directory, 0o777)
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_delete_clear(self):
+        for key in ("a", "b"):
+            self.cache.set(key, {}, time.time() + 3600)
+        self.cache.delete("a")
+        self.cache.delete("a")
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_lock(self):
+        with self.cache.lock("key"):
+            self.assertTrue(os.path.exists(os.path.join(self.directory,
+                    "key.lock")))
+
+    def test_authenticate_stores_token(self):
+        ident = self._identity()
+        ident.authenticate()
+        self.assertEqual(ident.method_post.call_count, 1)
+        other = self._identity()
+        other.api_key = ident.api_key
+        other.authenticate()
+        self.assertFalse(other.method_post.called)
+        self.assertEqual(other.token, ident.token)
+        self.assertEqual(other.services.keys(), ident.services.keys())
+        self.assertTrue(other.authenticated)
+
+    def test_authenticate_replaces_stale_token(self):
+        ident = self._identity()
+        ident.authenticate()
+        ident.authenticate()
+        self.assertEqual(ident.method_post.call_count, 2)
+
+    def test_authenticate_other_credentials(self):
+        ident = self._identity()
+        ident.authenticate()
+        other = self._identity()
+        other.authenticate()
+        self.assertEqual(other.method_post.call_count, 1)
+
+    def test_has_valid_token(self):
+        ident = self._identity()
+        ident.authenticate()
+        other = self._identity()
+        other.api_key = ident.api_key
+        self.assertTrue(other._has_valid_token())
+        self.assertEqual(other.token, ident.token)
+        self.assertFalse(other.method_post.called)
+
+    def test_setting(self):
+        ident = rax_identity.RaxIdentity()
+        with patch.object(pyrax, "get_setting", return_value=None):
+            self.assertIsNone(ident._get_token_cache())
+        with patch.object(pyrax, "get_setting", return_value=self.directory):
+            cache = ident._get_token_cache()
+        self.assertEqual(cache.directory, self.directory)
+        ident = rax_identity.RaxIdentity()
+        with patch.object(pyrax, "get_setting", return_value="True"):
+            cache = ident._get_token_cache()
+        self.assertEqual(cache.directory, os.path.expanduser(
+                token_cache.DEFAULT_DIRECTORY))
+        ident.token_cache = False
+        self.assertIsNone(ident._get_token_cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+import time
+import unittest
+
+from six import StringIO
+
+from mock import patch
+from mock import MagicMock as Mock
+
+import pyrax.transfer
+from pyrax.transfer import BandwidthLimiter
+from pyrax.transfer import get_bandwidth_limiter
+from pyrax.transfer import ProgressReader
+from pyrax.transfer import throttle_iter
+from pyrax.transfer import ThrottledReader
+from pyrax.transfer import TransferJob
+from pyrax.transfer import TransferManager
+import pyrax.utils as utils
+
+
+class TransferTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(TransferTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.manager = TransferManager(max_workers=2)
+
+    def tearDown(self):
+        self.manager.cancel_all()
+
+    def test_job_init(self):
+        func = Mock()
+        total = random.randint(1, 1000)
+        name = utils.random_unicode()
+        job = TransferJob(func, total_bytes=total, name=name)
+        self.assertEqual(job.status, pyrax.transfer.QUEUED)
+        self.assertEqual(job.total_bytes, total)
+        self.assertEqual(job.bytes_done, 0)
+        self.assertEqual(job.args, ())
+        self.assertEqual(job.kwargs, {})
+        self.assertFalse(job.completed)
+        self.assertIsNone(job.eta)
+        self.assertEqual(job.rate, 0.0)
+
+    def test_job_run(self):
+        arg = utils.random_unicode()
+        kwarg = utils.random_unicode()
+        result = utils.random_unicode()
+        func = Mock(return_value=result)
+        job = TransferJob(func, args=(arg, ), kwargs={"kw": kwarg})
+        job.run()
+        func.assert_called_once_with(job, arg, kw=kwarg)
+        self.assertEqual(job.status, pyrax.transfer.COMPLETED)
+        self.assertEqual(job.wait(), result)
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(job.eta, 0.0)
+
+    def test_job_run_failure(self):
+        func = Mock(side_effect=ValueError(""))
+        job = TransferJob(func)
+        job.run()
+        self.assertEqual(job.status, pyrax.transfer.FAILED)
+        self.assertTrue(job.completed)
+        self.assertRaises(ValueError, job.wait)
+
+    def test_job_cancel_before_run(self):
+        func = Mock()
+        job = TransferJob(func)
+        job.cancel()
+        job.run()
+        self.assertFalse(func.called)
+        self.assertEqual(job.status, pyrax.transfer.CANCELLED)
+
+    def test_job_cancel_while_running(self):
+        def func(job):
+            job.cancel()
+
+        job = TransferJob(func)
+        job.run()
+        self.assertTrue(job.cancelled)
+        self.assertEqual(job.status, pyrax.transfer.CANCELLED)
+
+    def test_job_wait_timeout(self):
+        job = TransferJob(Mock())
+        self.assertIsNone(job.wait(0.01))
+
+    def test_job_progress(self):
+        job = TransferJob(Mock(), total_bytes=200)
+        self.assertEqual(job.progress, 0.0)
+        job.add_progress(50)
+        self.assertEqual(job.bytes_done, 50)
+        self.assertEqual(job.progress, 0.25)
+        job.add_progress(500)
+        self.assertEqual(job.progress, 1.0)
+
+    def test_job_progress_unknown_size(self):
+        job = TransferJob(Mock())
+        job.add_progress(50)
+        self.assertIsNone(job.progress)
+
+    def test_job_eta(self):
+        job = TransferJob(Mock(), total_bytes=200)
+        job.start_time = time.time() - 10
+        job.add_progress(100)
+        self.assertAlmostEqual(job.rate, 10, places=0)
+        self.assertAlmostEqual(job.eta, 10, places=0)
+
+    @patch("time.sleep")
+    def test_job_max_rate(self, mock_sleep):
+        job = TransferJob(Mock(), max_rate=100)
+        job.start_time = time.time()
+        job.add_progress(100)
+        self.assertEqual(mock_sleep.call_count, 1)
+        delay = mock_sleep.call_args[0][0]
+        self.assertTrue(0.9 < delay <= 1.0)
+
+    @patch("time.sleep")
+    def test_job_max_rate_not_exceeded(self, mock_sleep):
+        job = TransferJob(Mock(), max_rate=100)
+        job.start_time = time.time() - 10
+        job.add_progress(100)
+        self.assertFalse(mock_sleep.called)
+
+    def test_job_weight(self):
+        job = TransferJob(Mock())
+        self.assertEqual(job.weight, 1)
+        job = self.manager.submit(Mock(), weight=3)
+        self.assertEqual(job.weight, 3)
+
+    @patch("time.sleep")
+    def test_limiter_unlimited(self, mock_sleep):
+        limiter = BandwidthLimiter()
+        limiter.consume(10 ** 9)
+        self.assertIsNone(limiter.rate)
+        self.assertFalse(mock_sleep.called)
+
+    def test_limiter_burst(self):
+        limiter = BandwidthLimiter(rate=1000, burst=500)
+        start = time.time()
+        limiter.consume(500)
+        self.assertTrue(time.time() - start < 0.1)
+        self.assertEqual(limiter.burst, 500)
+
+    def test_limiter_rate(self):
+        limiter = BandwidthLimiter(rate=10000)
+        start = time.time()
+        for num in range(15):
+            limiter.consume(1000)
+        elapsed = time.time() - start
+        # The first 10000 bytes are the initial burst.
+        self.assertTrue(0.4 < elapsed < 1.0)
+
+    def test_limiter_weights(self):
+        limiter = BandwidthLimiter(rate=200000, burst=2000)
+        counts = {1: 0, 3: 0}
+        stop = threading.Event()
+
+        def consumer(weight):
+            while not stop.is_set():
+                limiter.consume(2000, weight)
+                counts[weight] += 1
+
+        threads = [threading.Thread(target=consumer, args=(weight, ))
+                for weight in counts]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(counts[3] > 2 * counts[1])
+
+    def test_limiter_set_rate_wakes_waiters(self):
+        limiter = BandwidthLimiter(rate=1, burst=1)
+        limiter.consume(1)
+        thread = threading.Thread(target=limiter.consume, args=(1000, ))
+        thread.start()
+        time.sleep(0.05)
+        limiter.set_rate(None)
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+
+    @patch("pyrax.get_setting")
+    def test_get_bandwidth_limiter_setting(self, mock_get):
+        mock_get.return_value = "5000"
+        limiter = get_bandwidth_limiter()
+        mock_get.assert_called_once_with("transfer_bandwidth")
+        self.assertTrue(limiter is pyrax.transfer.bandwidth_limiter)
+        self.assertEqual(limiter.rate, 5000)
+        mock_get.return_value = None
+        self.assertIsNone(get_bandwidth_limiter().rate)
+
+    def test_throttle_iter(self):
+        chunks = [utils.random_ascii() for num in range(3)]
+        with patch.object(BandwidthLimiter, "consume") as mock_consume:
+            ret = list(throttle_iter(iter(chunks), weight=2))
+        self.assertEqual(ret, chunks)
+        mock_consume.assert_called_with(len(chunks[-1]), 2)
+        self.assertEqual(mock_consume.call_count, len(chunks))
+
+    def test_throttled_reader(self):
+        txt = "x" * 100
+        reader = ThrottledReader(StringIO(txt), weight=2)
+        with patch.object(BandwidthLimiter, "consume") as mock_consume:
+            self.assertEqual(reader.read(40), txt[:40])
+        mock_consume.assert_called_once_with(40, 2)
+        self.assertEqual(len(reader), len(txt))
+
+    def test_progress_reader(self):
+        txt = "x" * 100
+        job = TransferJob(Mock())
+        reader = ProgressReader(StringIO(txt), job)
+        self.assertEqual(len(reader), len(txt))
+        self.assertEqual(reader.read(40), txt[:40])
+        self.assertEqual(job.bytes_done, 40)
+        reader.seek(0)
+        self.assertEqual(reader.read(60), txt[:60])
+        self.assertEqual(job.bytes_done, 60)
+        self.assertEqual(reader.tell(), 60)
+        reader.read()
+        self.assertEqual(job.bytes_done, len(txt))
+
+    def test_progress_reader_checksum(self):
+        txt = "x" * 100
+        job = TransferJob(Mock())
+        reader = ProgressReader(StringIO(txt), job)
+        self.assertEqual(utils.get_checksum(reader), utils.get_checksum(txt))
+        self.assertEqual(reader.tell(), 0)
+
+    def test_manager_submit(self):
+        mgr = self.manager
+        result = utils.random_unicode()
+        func = Mock(return_value=result)
+        job = mgr.submit(func, total_bytes=42)
+        self.assertEqual(job.wait(), result)
+        self.assertEqual(job.total_bytes, 42)
+        self.assertTrue(mgr.get_job(job.id) is job)
+
+    def test_manager_get_job_missing(self):
+        self.assertIsNone(self.manager.get_job(utils.random_unicode()))
+
+    def test_manager_bounded_workers(self):
+        mgr = self.manager
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+        release = threading.Event()
+
+        def func(job):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            release.wait(5)
+            with lock:
+                running[0] -= 1
+
+        jobs = [mgr.submit(func) for num in range(6)]
+        self.assertTrue(len(mgr._workers) <= mgr.max_workers)
+        time.sleep(0.05)
+        self.assertEqual(len(mgr.list_jobs(include_finished=False)), 6)
+        release.set()
+        self.assertTrue(mgr.wait_all(5))
+        self.assertEqual(peak[0], mgr.max_workers)
+        self.assertTrue(all(job.status == pyrax.transfer.COMPLETED
+                for job in jobs))
+
+    def test_manager_cancel_queued(self):
+        mgr = TransferManager(max_workers=1)
+        release = threading.Event()
+        first = mgr.submit(lambda job: release.wait(5))
+        func = Mock()
+        second = mgr.submit(func)
+        mgr.cancel_all()
+        release.set()
+        mgr.wait_all(5)
+        self.assertFalse(func.called)
+        self.assertEqual(second.status, pyrax.transfer.CANCELLED)
+
+    def test_manager_remove_finished(self):
+        mgr = self.manager
+        job = mgr.submit(Mock())
+        job.wait()
+        mgr.remove_finished()
+        self.assertIsNone(mgr.get_job(job.id))
+        self.assertEqual(mgr.list_jobs(), [])
+
+    def test_manager_prunes_finished(self):
+        mgr = TransferManager(max_workers=1, max_finished=2)
+        jobs = [mgr.submit(Mock()) for num in range(5)]
+        for job in jobs:
+            job.wait()
+        for num in range(100):
+            if len(mgr._finished) == 2 and len(mgr.list_jobs()) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(set(mgr.list_jobs()), set(jobs[-2:]))
+        self.assertIsNone(mgr.get_job(jobs[0].id))
+
+    def test_manager_keeps_all_finished(self):
+        mgr = TransferManager(max_workers=1)
+        jobs = [mgr.submit(Mock()) for num in range(5)]
+        mgr.wait_all()
+        self.assertEqual(len(mgr.list_jobs()), 5)
+        mgr.remove_finished()
+        self.assertEqual(mgr.list_jobs(), [])
+
+    def test_manager_idle_workers_exit(self):
+        mgr = self.manager
+        with patch.object(pyrax.transfer, "WORKER_IDLE_TIMEOUT", 0.01):
+            job = mgr.submit(Mock())
+            job.wait()
+            for num in range(100):
+                if not mgr._workers:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(mgr._workers, [])
+
+    def test_managers_share_no_state(self):
+        other = TransferManager()
+        job = self.manager.submit(Mock())
+        job.wait()
+        self.assertIsNone(other.get_job(job.id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,9 +3,11 @@
 
 import datetime
 import hashlib
+import logging
 import os
 import random
 import sys
+import threading
 import time
 import unittest
 
@@ -129,6 +131,18 @@ class UtilsTest(unittest.TestCase):
         ret = utils.coerce_to_list(val)
         self.assertEqual(ret, val)
 
+    def test_replace_file(self):
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            src = os.path.join(tmpdir, "src")
+            dest = os.path.join(tmpdir, "dest")
+            for pth, txt in ((src, "new"), (dest, "old")):
+                with open(pth, "w") as ff:
+                    ff.write(txt)
+            utils.replace_file(src, dest)
+            self.assertEqual(os.listdir(tmpdir), ["dest"])
+            with open(dest) as ff:
+                self.assertEqual(ff.read(), "new")
+
     def test_folder_size_no_ignore(self):
         with utils.SelfDeletingTempDirectory() as tmpdir:
             # write 5 files of 100 bytes each
@@ -401,6 +415,115 @@ class UtilsTest(unittest.TestCase):
         utils.params_to_dict(params, dct)
         self.assertEqual(dct, expected)
 
+    def _pages_iterator(self, pages, **kwargs):
+        it = fakes.FakeIterator(None, limit=2, prefix=None, **kwargs)
+        it.list_method = Mock(side_effect=pages)
+        it.marker_att = "name"
+        return it
+
+    def test_results_iterator(self):
+        items = [fakes.FakeEntity() for ii in range(3)]
+        for num, item in enumerate(items):
+            item.name = num
+        it = self._pages_iterator([items[:2], items[2:]])
+        self.assertEqual(list(it), items)
+        # The second page is short, so it is the last one.
+        self.assertEqual(it.list_method.call_count, 2)
+        it.list_method.assert_called_with(marker=1, limit=2, prefix=None)
+
+    def test_results_iterator_no_next_uri(self):
+        it = self._pages_iterator([])
+        it.next_uri = None
+        self.assertEqual(list(it), [])
+        self.assertFalse(it.list_method.called)
+
+    def test_results_iterator_prefetch(self):
+        items = [fakes.FakeEntity() for ii in range(3)]
+        for num, item in enumerate(items):
+            item.name = num
+        fetched = threading.Event()
+
+        def list_method(marker=None, limit=None, prefix=None):
+            if marker is not None:
+                fetched.set()
+                return items[2:]
+            return items[:2]
+
+        it = self._pages_iterator(None, prefetch=True)
+        it.list_method = Mock(side_effect=list_method)
+        self.assertTrue(it.next() is items[0])
+        # The second page is requested before the first one is consumed.
+        self.assertTrue(fetched.wait(5))
+        it.list_method.assert_called_with(marker=1, limit=2, prefix=None)
+        self.assertEqual(it.next(), items[1])
+        self.assertEqual(it.next(), items[2])
+        # The second page is short, so the one after it is not requested.
+        self.assertRaises(StopIteration, it.next)
+        self.assertEqual(it.list_method.call_count, 2)
+
+    def test_results_iterator_prefetch_error(self):
+        items = [fakes.FakeEntity() for ii in range(2)]
+        for num, item in enumerate(items):
+            item.name = num
+        it = self._pages_iterator([items, exc.ServiceResponseFailure("")],
+                prefetch=True)
+        self.assertEqual([it.next(), it.next()], items)
+        self.assertRaises(exc.ServiceResponseFailure, it.next)
+
+    def test_is_trusted_path(self):
+        with utils.SelfDeletingTempfile() as tmp:
+            os.chmod(tmp, 0o600)
+            self.assertTrue(utils.is_trusted_path(tmp))
+            os.chmod(tmp, 0o620)
+            self.assertFalse(utils.is_trusted_path(tmp))
+        self.assertFalse(utils.is_trusted_path(tmp))
+
+    def test_is_trusted_path_other_owner(self):
+        info = Mock(st_mode=0o100600, st_uid=1001)
+        with patch.object(os, "stat", return_value=info):
+            with patch.object(os, "getuid", return_value=1000, create=True):
+                self.assertFalse(utils.is_trusted_path("/fake"))
+            with patch.object(os, "getuid", return_value=1001, create=True):
+                self.assertTrue(utils.is_trusted_path("/fake"))
+
+    def test_run_in_workers_bounded(self):
+        concurrency = 3
+        release = threading.Event()
+        taken = []
+        done = []
+
+        def items():
+            for num in range(100):
+                taken.append(num)
+                yield (num,)
+
+        def func(num):
+            release.wait()
+            done.append(num)
+
+        runner = threading.Thread(target=utils.run_in_workers,
+                args=(func, items(), concurrency))
+        runner.start()
+        time.sleep(0.1)
+        # One item per worker, a full queue, and one waiting to be queued.
+        self.assertTrue(len(taken) <= 2 * concurrency + 1)
+        release.set()
+        runner.join(5)
+        self.assertFalse(runner.is_alive())
+        self.assertEqual(sorted(done), list(range(100)))
+
+    def test_run_in_workers_unhandled_error(self):
+        done = []
+
+        def func(num):
+            if num == 2:
+                raise ValueError()
+            done.append(num)
+
+        with patch.object(logging.getLogger("pyrax"), "exception"):
+            utils.run_in_workers(func, [(num,) for num in range(5)], 2)
+        self.assertEqual(sorted(done), [0, 1, 3, 4])
+
     def test_import_class(self):
         cls_string = "pyrax.utils.SelfDeletingTempfile"
         ret = utils.import_class(cls_string)